@@ -0,0 +1,275 @@
+import os
+import threading
+from typing import Any, Dict, Optional
+from fastapi import Request
+from elasticsearch import AsyncElasticsearch, Elasticsearch
+
+# internal imports
+from app.pipeline.cache import get_answer_cache
+from app.pipeline.index import ElasticVectorManager
+from app.pipeline.retrieve import ElasticRetriever
+from app.pipeline.store import LocalVectorStore, SharedElasticVectorStore
+from app.utils.logger import Logger
+
+_log = Logger.get_logger(__name__)
+
+VECTOR_STORES = ("elasticsearch", "local")
+
+
+class IndexNotFoundError(LookupError):
+    """Raised for an `index_name` that cannot be searched: unknown, or the shared index itself."""
+
+
+class ClientRegistry:
+    """Process-wide Elasticsearch client with per-index retriever and vector manager caches.
+
+    Created once in the FastAPI lifespan (see `main.py`) so request handlers reuse warm,
+    keep-alive connections from a single pool instead of opening a new client (and TCP/TLS
+    session) per request. Retrievers and managers are cached per index, which also
+    memoizes the index-existence check done when a manager is created.
+
+    Attributes:
+        elastic_url (str): Elasticsearch URL.
+        es (Elasticsearch): shared client; its connection pool holds up to
+            `connections_per_node` keep-alive connections per node.
+        async_es (AsyncElasticsearch): shared async client used by the async question path.
+        retriever_options (Dict[str, Any]): keyword arguments for every `ElasticRetriever`,
+            e.g. `search_mode="hybrid"` and the fusion settings.
+        vector_store (str): where chunks live, "elasticsearch" or "local" (embedded `LocalVectorStore`
+            under `vector_store_path`, one directory per index; Elasticsearch is then never queried).
+        vector_store_options (Dict[str, Any]): keyword arguments for every `LocalVectorStore`.
+        quantization (str): vector quantization of new indices ("none", "int8", "int4" on Elasticsearch
+            only, or "binary"), searched in two phases with full-precision rescoring.
+        shared_index (Optional[str]): with Elasticsearch, store every session in this one index instead of
+            one index per session (see `SharedElasticVectorStore`); each `index_name` becomes a filtered
+            alias and its retriever filters and routes searches to the session's chunks.
+        vector_encoding (str): embeddings in Elasticsearch bulk requests, "float" (the default, any
+            version) or "base64" (packed float32, opt-in for Elasticsearch 8.19 / 9.1 and later).
+    """
+
+    def __init__(
+        self,
+        elastic_url: str,
+        api_key: str,
+        connections_per_node: int = 25,
+        request_timeout: float = 30,
+        max_retries: int = 3,
+        http_compress: bool = True,
+        retriever_options: Optional[Dict[str, Any]] = None,
+        vector_store: str = "elasticsearch",
+        vector_store_path: str = ".cache/vector_store",
+        vector_store_options: Optional[Dict[str, Any]] = None,
+        quantization: str = "none",
+        shared_index: Optional[str] = None,
+        vector_encoding: str = "float",
+        es: Optional[Elasticsearch] = None,
+        async_es: Optional[AsyncElasticsearch] = None,
+    ):
+        self.elastic_url = elastic_url
+        self.api_key = api_key
+        self.retriever_options = retriever_options or {}
+        if vector_store not in VECTOR_STORES:
+            raise ValueError(f"vector_store must be one of {VECTOR_STORES}, got '{vector_store}'")
+        self.vector_store = vector_store
+        self.vector_store_path = vector_store_path
+        self.vector_store_options = vector_store_options or {}
+        self.quantization = quantization
+        self.shared_index = shared_index if vector_store == "elasticsearch" else None
+        self.vector_encoding = vector_encoding
+        client_options = dict(
+            api_key=api_key,
+            connections_per_node=connections_per_node,
+            request_timeout=request_timeout,
+            max_retries=max_retries,
+            retry_on_timeout=True,
+            http_compress=http_compress,
+        )
+        self.es = es or Elasticsearch(elastic_url, **client_options)
+        self.async_es = async_es or AsyncElasticsearch(elastic_url, **client_options)
+        self._retrievers: Dict[str, ElasticRetriever] = {}
+        self._managers: Dict[str, ElasticVectorManager] = {}
+        self._stores: Dict[str, LocalVectorStore] = {}
+        self._lock = threading.Lock()
+        _log.info(
+            f"Client registry ready | elastic_url={elastic_url} | connections_per_node={connections_per_node} | "
+            f"vector_store={vector_store} | shared_index={self.shared_index}"
+        )
+
+    @classmethod
+    def from_env(cls) -> "ClientRegistry":
+        """Build the registry from ELASTIC_*, RETRIEVAL_* and VECTOR_STORE_* environment variables."""
+        retriever_options = {
+            "search_mode": os.environ.get("RETRIEVAL_MODE", "knn"),
+            "fusion": os.environ.get("RETRIEVAL_FUSION", "rrf"),
+            "bm25_weight": float(os.environ.get("RETRIEVAL_BM25_WEIGHT", 1.0)),
+            "vector_weight": float(os.environ.get("RETRIEVAL_VECTOR_WEIGHT", 1.0)),
+        }
+        vector_store_options = {"approximate": os.environ.get("VECTOR_STORE_APPROXIMATE", "false").lower() == "true"}
+        if os.environ.get("VECTOR_RESCORE_OVERSAMPLE"):
+            retriever_options["rescore_oversample"] = float(os.environ["VECTOR_RESCORE_OVERSAMPLE"])
+            vector_store_options["rescore_oversample"] = float(os.environ["VECTOR_RESCORE_OVERSAMPLE"])
+        return cls(
+            elastic_url=os.environ["ELASTIC_SEARCH_URL"],
+            api_key=os.environ["ELASTIC_SEARCH_API_KEY"],
+            connections_per_node=int(os.environ.get("ELASTIC_CONNECTIONS_PER_NODE", 25)),
+            request_timeout=float(os.environ.get("ELASTIC_REQUEST_TIMEOUT", 30)),
+            max_retries=int(os.environ.get("ELASTIC_MAX_RETRIES", 3)),
+            retriever_options=retriever_options,
+            vector_store=os.environ.get("VECTOR_STORE_BACKEND", "elasticsearch"),
+            vector_store_path=os.environ.get("VECTOR_STORE_PATH", ".cache/vector_store"),
+            vector_store_options=vector_store_options,
+            quantization=os.environ.get("VECTOR_QUANTIZATION", "none"),
+            shared_index=os.environ.get("ELASTIC_SHARED_INDEX") or None,
+            vector_encoding=os.environ.get("ELASTIC_VECTOR_ENCODING", "float"),
+        )
+
+    def get_retriever(self, index_name: str) -> ElasticRetriever:
+        """Cached retriever for an index, sharing the registry's client.
+
+        In shared-index mode the retriever filters and routes its searches with the session of
+        the `index_name` alias; any other name must be a per-session index not merged yet, never
+        the shared index itself, whose unfiltered searches would see every user's chunks. Such a
+        per-session index is not cached, so its retriever follows it once it is merged.
+
+        Raises:
+            IndexNotFoundError: in shared-index mode, when `index_name` is neither a session alias
+                nor a per-session index.
+        """
+        with self._lock:
+            if index_name in self._retrievers:
+                return self._retrievers[index_name]
+
+            options = dict(self.retriever_options)
+            shared = self._shared_store(index_name) if self.shared_index else None
+            if shared is not None:
+                options.update(filters=shared.scope(), routing=shared.routing)
+            elif self.shared_index and not self._is_session_index(index_name):
+                raise IndexNotFoundError(f"'{index_name}' is not a session of the shared index '{self.shared_index}'")
+            retriever = ElasticRetriever(
+                elastic_url=self.elastic_url,
+                api_key=self.api_key,
+                index_name=index_name,
+                es=self.es,
+                async_es=self.async_es,
+                store=self._local_store(index_name),
+                **options,
+            )
+            if shared is not None or not self.shared_index:
+                self._retrievers[index_name] = retriever
+            return retriever
+
+    def get_vector_manager(self, index_name: str, user_id: Optional[str] = None, session_id: Optional[str] = None) -> ElasticVectorManager:
+        """Cached vector manager for an index; the index is checked/created only on first use.
+
+        In shared-index mode a new `index_name` becomes an alias of the shared index for its
+        `user_id` and `session_id`, and an existing alias is reused; without a user and session,
+        or for a per-session index not merged yet, the manager keeps a per-session index.
+
+        Raises:
+            ValueError: in shared-index mode, when `index_name` is the shared index itself.
+        """
+        if self.shared_index and index_name == self.shared_index:
+            raise ValueError(f"'{index_name}' is the shared index; use the index name of a session")
+        with self._lock:
+            if index_name not in self._managers:
+                store = self._local_store(index_name)
+                if self.shared_index:
+                    store = self._shared_store(index_name, user_id, session_id)
+                self._managers[index_name] = ElasticVectorManager(
+                    elastic_url=self.elastic_url,
+                    api_key=self.api_key,
+                    index_name=index_name,
+                    es=self.es,
+                    quantization=self.quantization,
+                    vector_encoding=self.vector_encoding,
+                    store=store,
+                )
+            return self._managers[index_name]
+
+    def index_exists(self, index_name: str) -> bool:
+        """Whether `index_name` exists (an index, or the alias of a session in the shared index),
+        checked without creating it or caching a manager for it."""
+        if self.vector_store == "local":
+            with self._lock:
+                store = self._stores.get(index_name)
+            if store is not None:
+                return store.exists()
+            return os.path.isdir(os.path.join(self.vector_store_path, index_name))
+        if self.shared_index and index_name == self.shared_index:
+            return False
+        return bool(self.es.indices.exists(index=index_name))
+
+    def delete_index(self, index_name: str):
+        """Delete an index from the configured store and forget its cached objects.
+
+        In shared-index mode this deletes the session's chunks and alias, not the shared index.
+        """
+        with self._lock:
+            store = self._local_store(index_name)
+            if self.shared_index:
+                store = self._shared_store(index_name)
+        try:
+            if store is not None:
+                store.drop()
+            else:
+                self.es.indices.delete(index=index_name, ignore_unavailable=True)
+        finally:
+            self.forget_index(index_name)
+
+    def forget_index(self, index_name: str):
+        """Drop cached objects of an index, e.g. after it was deleted."""
+        with self._lock:
+            self._retrievers.pop(index_name, None)
+            self._managers.pop(index_name, None)
+            self._stores.pop(index_name, None)
+        answer_cache = get_answer_cache()
+        if answer_cache is not None:
+            answer_cache.invalidate(index_name)
+
+    def _local_store(self, index_name: str) -> Optional[LocalVectorStore]:
+        """Shared embedded store of an index with the "local" backend (call with the lock held)."""
+        if self.vector_store != "local":
+            return None
+        if index_name not in self._stores:
+            self._stores[index_name] = LocalVectorStore(
+                self.vector_store_path, index_name, quantization=self.quantization, **self.vector_store_options
+            )
+        return self._stores[index_name]
+
+    def _is_session_index(self, index_name: str) -> bool:
+        """Whether `index_name` is a concrete per-session index, not the shared index nor an alias."""
+        if index_name == self.shared_index or self.es.indices.exists_alias(name=index_name):
+            return False
+        return bool(self.es.indices.exists(index=index_name))
+
+    def _shared_store(
+        self, index_name: str, user_id: Optional[str] = None, session_id: Optional[str] = None
+    ) -> Optional[SharedElasticVectorStore]:
+        """Session store of `index_name` in the shared index: read from its alias, or new for `user_id`/`session_id`.
+
+        None for an index that is not in the shared index: unknown without a user and session,
+        or a per-session index created before shared-index mode (see `scripts/merge_session_indices.py`).
+        """
+        store = SharedElasticVectorStore.from_alias(
+            self.es, index_name, async_es=self.async_es, quantization=self.quantization,
+            vector_encoding=self.vector_encoding,
+        )
+        if store is not None or user_id is None or session_id is None:
+            return store
+        if self.es.indices.exists(index=index_name):
+            _log.warning(f"'{index_name}' is a per-session index; merge it into '{self.shared_index}' to share it")
+            return None
+        return SharedElasticVectorStore(
+            self.es, index_name, self.shared_index, user_id, session_id,
+            async_es=self.async_es, quantization=self.quantization, vector_encoding=self.vector_encoding,
+        )
+
+    async def aclose(self):
+        self.es.close()
+        await self.async_es.close()
+        _log.info("Client registry closed")
+
+
+def get_clients(request: Request) -> ClientRegistry:
+    """FastAPI dependency returning the registry created in the app lifespan."""
+    return request.app.state.clients
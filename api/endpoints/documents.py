@@ -1,71 +1,120 @@
-import uuid
-import os
-from fastapi import APIRouter, UploadFile, File, Form
+from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from typing import List, Optional
+from api.clients import ClientRegistry, get_clients
+from api.jobs import IngestJobQueue, get_jobs
 from app.pipeline.extract import PdfReader
-from app.pipeline.index import ElasticVectorManager
 from app.utils.logger import Logger
 from dotenv import load_dotenv
 
 load_dotenv()
 _log = Logger.get_logger(__name__)
 
-elastic_url = os.environ["ELASTIC_SEARCH_URL"]
-elastic_api_key = os.environ["ELASTIC_SEARCH_API_KEY"]
-
 router = APIRouter()
 
-@router.post("/")
+@router.post("/", status_code=202)
 async def index_documents(
     user_id: str = Form(...),
     session_id: str = Form(...),
     index_name: Optional[str] = Form(None),
-    files: List[UploadFile] = File(...)
+    bulk_load: bool = Form(False),
+    files: List[UploadFile] = File(...),
+    jobs: IngestJobQueue = Depends(get_jobs),
+    clients: ClientRegistry = Depends(get_clients),
 ):
     """
-    Index one or more PDF documents into Elasticsearch with user/session info.
+    Queue one or more PDF documents for indexing into Elasticsearch with user/session info.
     Optional index_name can be provided; otherwise a random one is generated.
-    Returns number of documents processed and total chunks.
+    With `bulk_load`, the job runs in bulk load mode (for large backfills, see `IngestJobQueue`);
+    it is refused in shared-index mode, where it would retune the index of every session.
+    Returns the ingestion job id right away; poll `GET /documents/jobs/{job_id}` for progress.
+    `document_ids` are the ids to pass to `PUT` / `DELETE /documents/{document_id}`.
     """
     if not index_name:
         index_name = f"index-{user_id}-{session_id}"
+    if clients.shared_index and index_name == clients.shared_index:
+        raise HTTPException(status_code=400, detail=f"'{index_name}' is the shared index; use the index name of a session")
+    if bulk_load and clients.shared_index:
+        raise HTTPException(status_code=400, detail="bulk_load is not available with a shared index (ELASTIC_SHARED_INDEX)")
 
-    vector_database = ElasticVectorManager(
-        elastic_url=elastic_url,
-        api_key=elastic_api_key,
-        index_name=index_name,
-    )
-
-    total_docs = 0
-    total_chunks = 0
+    uploads = [(file.filename, await file.read()) for file in files]
+    job = await run_in_threadpool(jobs.submit, user_id, session_id, index_name, uploads, None, bulk_load)
 
-    for file in files:
-        pdf_content = await file.read()
-        temp_path = f"/tmp/{file.filename}"
-        with open(temp_path, "wb") as f:
-            f.write(pdf_content)
+    return {
+        "message": "Documents queued for indexing",
+        "job_id": job["id"],
+        "status": job["status"],
+        "index_name": index_name,
+        "bulk_load": bulk_load,
+        "document_ids": [PdfReader.document_id_for(content) for _, content in uploads],
+        "status_url": f"/documents/jobs/{job['id']}",
+    }
 
-        reader = PdfReader()
-        docs = reader.read(temp_path)
 
-        # Add user_id and session_id to each document
-        for doc in docs:
-            doc.user_id = user_id
-            doc.session_id = session_id
+@router.put("/{document_id}", status_code=202)
+async def replace_document(
+    document_id: str,
+    user_id: str = Form(...),
+    session_id: str = Form(...),
+    index_name: Optional[str] = Form(None),
+    file: UploadFile = File(...),
+    jobs: IngestJobQueue = Depends(get_jobs),
+    clients: ClientRegistry = Depends(get_clients),
+):
+    """
+    Queue a new version of an indexed document. Chunks whose text did not change keep their
+    indexed embeddings; the old version's chunks are deleted once the new one is indexed.
+    Returns the ingestion job id right away, like `POST /documents/`.
+    """
+    if not index_name:
+        index_name = f"index-{user_id}-{session_id}"
 
-        try:
-            vector_database.index_documents(docs)
-        except Exception as e:
-            _log.info(f"Failed to index documents from {file.filename}. Deleting temporary index {index_name}")
-            vector_database.es.indices.delete(index=index_name)
-            return {"error": str(e)}
+    # a missing index is a 404 too; getting its manager would create it
+    if not await run_in_threadpool(clients.index_exists, index_name):
+        raise HTTPException(status_code=404, detail=f"Index '{index_name}' not found")
+    manager = await run_in_threadpool(clients.get_vector_manager, index_name, user_id, session_id)
+    if not await run_in_threadpool(manager.count_chunks, document_id, user_id):
+        raise HTTPException(status_code=404, detail=f"Document '{document_id}' not found in '{index_name}'")
 
-        total_docs += 1
-        total_chunks += len(docs)
+    upload = [(file.filename, await file.read())]
+    job = await run_in_threadpool(jobs.submit, user_id, session_id, index_name, upload, document_id)
 
     return {
-        "message": "Documents processed successfully",
+        "message": "Document update queued for indexing",
+        "job_id": job["id"],
+        "status": job["status"],
         "index_name": index_name,
-        "documents_indexed": total_docs,
-        "total_chunks": total_chunks
+        "document_id": PdfReader.document_id_for(upload[0][1]),
+        "replaces": document_id,
+        "status_url": f"/documents/jobs/{job['id']}",
     }
+
+
+@router.delete("/{document_id}")
+async def delete_document(
+    document_id: str,
+    user_id: str,
+    session_id: str,
+    index_name: Optional[str] = None,
+    clients: ClientRegistry = Depends(get_clients),
+):
+    """Delete every chunk of a document; the other documents of the index are kept."""
+    if not index_name:
+        index_name = f"index-{user_id}-{session_id}"
+
+    if not await run_in_threadpool(clients.index_exists, index_name):
+        raise HTTPException(status_code=404, detail=f"Index '{index_name}' not found")
+    manager = await run_in_threadpool(clients.get_vector_manager, index_name, user_id, session_id)
+    deleted = await run_in_threadpool(manager.delete_document, document_id, user_id)
+    if not deleted:
+        raise HTTPException(status_code=404, detail=f"Document '{document_id}' not found in '{index_name}'")
+    return {"message": "Document deleted", "document_id": document_id, "index_name": index_name, "chunks_deleted": deleted}
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, jobs: IngestJobQueue = Depends(get_jobs)):
+    """Status of an ingestion job: pages extracted, chunks embedded and indexed, and throughput."""
+    job = await run_in_threadpool(jobs.status, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job
@@ -1,7 +1,25 @@
 from fastapi import APIRouter
 
+# internal imports
+from app.pipeline.cache import get_answer_cache, get_query_embedding_cache
+from app.pipeline.gateway import get_genai_gateway
+
 router = APIRouter()
 
 @router.get("/health")
 async def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+@router.get("/health/cache")
+async def cache_stats():
+    """Hit/miss counters of the shared query-embedding and answer caches"""
+    answer_cache = get_answer_cache()
+    return {
+        "query_embedding_cache": get_query_embedding_cache().stats(),
+        "answer_cache": answer_cache.stats() if answer_cache is not None else None,
+    }
+
+@router.get("/health/genai")
+async def genai_stats():
+    """Adaptive concurrency limit, circuit state and counters of each Gemini model"""
+    return get_genai_gateway().stats()
@@ -1,22 +1,29 @@
 import os
-from fastapi import APIRouter
-from pydantic import BaseModel
+import json
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 
 # google imports
 from google import genai
 
 # internal imports
-from app.pipeline.retrieve import ElasticRetriever
+from api.clients import ClientRegistry, IndexNotFoundError, get_clients
+from app.pipeline.cache import get_answer_cache
+from app.pipeline.context import ContextBuilder
 from app.pipeline.generate import RAGAgent
+from app.pipeline.rerank import get_reranker
 from app.utils.logger import Logger
 
 load_dotenv()
 _log = Logger.get_logger(__name__)
 google_client = genai.Client()
-
-elastic_url = os.environ["ELASTIC_SEARCH_URL"]
-elastic_api_key = os.environ["ELASTIC_SEARCH_API_KEY"]
+context_builder = ContextBuilder(max_tokens=int(os.environ.get("CONTEXT_MAX_TOKENS", 6000)))
+# upper bound of the generations a batch runs at once, whatever the request asks for
+batch_concurrency = int(os.environ.get("QUESTION_BATCH_CONCURRENCY", 8))
 
 router = APIRouter()
 
@@ -26,16 +33,67 @@ class QuestionRequest(BaseModel):
     index_name: str
     question: str
 
+class BatchQuestionRequest(BaseModel):
+    user_id: str
+    session_id: str
+    index_name: str
+    questions: List[str] = Field(min_length=1, max_length=int(os.environ.get("QUESTION_BATCH_MAX_SIZE", 1000)))
+    max_concurrency: Optional[int] = Field(default=None, ge=1)
+
+async def _get_retriever(clients: ClientRegistry, index_name: str):
+    """Retriever of `index_name`; an index that cannot be searched is a 404."""
+    # building a retriever takes the registry lock and may query Elasticsearch
+    try:
+        return await run_in_threadpool(clients.get_retriever, index_name)
+    except IndexNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
 @router.post("/")
-def generate_answer(req: QuestionRequest):
+async def generate_answer(req: QuestionRequest, clients: ClientRegistry = Depends(get_clients)):
     """Generate answer using RAG with session/user context"""
-    retriever = ElasticRetriever(
-        elastic_url=elastic_url,
-        api_key=elastic_api_key,
-        index_name=req.index_name
-    )
+    retriever = await _get_retriever(clients, req.index_name)
 
-    agent = RAGAgent(model="gemini-2.5-flash", retriever=retriever)
-    response = agent.run(req.question)
+    agent = RAGAgent(model="gemini-2.5-flash", retriever=retriever, reranker=get_reranker(),
+                     context_builder=context_builder, answer_cache=get_answer_cache())
+    response = await agent.arun(req.question)
 
     return response
+
+
+@router.post("/stream")
+async def stream_answer(req: QuestionRequest, clients: ClientRegistry = Depends(get_clients)):
+    """Stream the answer as Server-Sent Events: `token` events, then `references`, then `done` with timings"""
+    retriever = await _get_retriever(clients, req.index_name)
+    agent = RAGAgent(model="gemini-2.5-flash", retriever=retriever, reranker=get_reranker(),
+                     context_builder=context_builder, answer_cache=get_answer_cache())
+
+    async def events():
+        try:
+            async for event in agent.astream(req.question):
+                yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+        except Exception as e:
+            _log.error(f"Streaming answer failed: {e}")
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@router.post("/batch")
+async def batch_answers(req: BatchQuestionRequest, clients: ClientRegistry = Depends(get_clients)):
+    """Answer many questions as Server-Sent Events: an `answer` (or `error`) event per question as it
+    completes, then `done` with per-stage throughput"""
+    retriever = await _get_retriever(clients, req.index_name)
+    agent = RAGAgent(model="gemini-2.5-flash", retriever=retriever, reranker=get_reranker(),
+                     context_builder=context_builder, answer_cache=get_answer_cache())
+    max_concurrency = min(req.max_concurrency or batch_concurrency, batch_concurrency)
+
+    async def events():
+        try:
+            async for event in agent.arun_batch(req.questions, max_concurrency=max_concurrency):
+                yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+        except Exception as e:
+            _log.error(f"Batch answering failed: {e}")
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
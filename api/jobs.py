@@ -0,0 +1,350 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import sqlite3
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import Request
+
+# internal imports
+from api.clients import ClientRegistry
+from app.pipeline.bulk import BulkStats
+from app.pipeline.extract import PdfReader
+from app.pipeline.ingest import IngestPipeline, IngestProgress
+from app.utils.logger import Logger
+
+_log = Logger.get_logger(__name__)
+
+PROGRESS_FIELDS = ("pages_extracted", "chunks_embedded", "chunks_indexed")
+# columns added after the table was first released, with their definitions
+ADDED_COLUMNS = {"replaces": "TEXT", "bulk_load": "INTEGER NOT NULL DEFAULT 0", "bulk_stats": "TEXT"}
+
+
+class JobInterrupted(Exception):
+    """Raised in a running job when the queue shuts down; the job is resumed on the next start."""
+
+
+class IngestJobStore:
+    """SQLite table of ingestion jobs, so queued and running jobs survive a restart.
+
+    Attributes:
+        path (str): SQLite database file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS ingest_jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                index_name TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                session_id TEXT NOT NULL,
+                files TEXT NOT NULL,
+                replaces TEXT,
+                bulk_load INTEGER NOT NULL DEFAULT 0,
+                bulk_stats TEXT,
+                documents_indexed INTEGER NOT NULL DEFAULT 0,
+                total_chunks INTEGER NOT NULL DEFAULT 0,
+                pages_extracted INTEGER NOT NULL DEFAULT 0,
+                chunks_embedded INTEGER NOT NULL DEFAULT 0,
+                chunks_indexed INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            )"""
+        )
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(ingest_jobs)")}
+        for name, definition in ADDED_COLUMNS.items():
+            if name not in columns:
+                self._conn.execute(f"ALTER TABLE ingest_jobs ADD COLUMN {name} {definition}")
+        self._conn.commit()
+
+    def create(
+        self, job_id: str, index_name: str, user_id: str, session_id: str, files: List[str],
+        replaces: Optional[str] = None, bulk_load: bool = False,
+    ) -> Dict:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO ingest_jobs (id, status, index_name, user_id, session_id, files, replaces, bulk_load, created_at) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, index_name, user_id, session_id, json.dumps(files), replaces, int(bulk_load), time.time()),
+            )
+            self._conn.commit()
+        return self.get(job_id)
+
+    def update(self, job_id: str, **fields):
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE ingest_jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+            self._conn.commit()
+
+    def requeue(self, job_id: str) -> bool:
+        """Put a running job back to `queued`; False if it is no longer running."""
+        with self._lock:
+            cursor = self._conn.execute("UPDATE ingest_jobs SET status = 'queued' WHERE id = ? AND status = 'running'", (job_id,))
+            self._conn.commit()
+        return cursor.rowcount > 0
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM ingest_jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row is not None else None
+
+    def unfinished(self) -> List[Dict]:
+        """Queued or running jobs, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM ingest_jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict:
+        job = dict(row)
+        job["files"] = json.loads(job["files"])
+        job["bulk_load"] = bool(job["bulk_load"])
+        job["bulk_stats"] = json.loads(job["bulk_stats"]) if job["bulk_stats"] else None
+        return job
+
+
+class IngestJobQueue:
+    """Runs PDF ingestion in the background on a bounded pool of workers.
+
+    Uploads are spooled to disk and recorded in an `IngestJobStore` before the request
+    returns, so the HTTP handler only pays for the upload itself. Each job ingests its files
+    in order with `IngestPipeline`, and its progress counters can be polled while it runs.
+    On start, `recover` re-enqueues jobs left queued or running by a previous process; an
+    interrupted job resumes at its first unfinished file. `shutdown` waits up to
+    `shutdown_timeout` seconds for running jobs to reach the end of their current file and
+    puts them back to `queued`. A job that fails keeps the files it already indexed; the
+    pipeline rolls back the chunks of the failing file only.
+
+    Jobs submitted with `bulk_load=True` run inside `ElasticVectorManager.bulk_load` (no
+    refreshes or replicas during the load, parallel bulk requests with retries of rejected
+    items, force merge at the end), with `bulk_options` as its settings; their status reports
+    the load's docs/sec and rejected items.
+
+    Attributes:
+        clients (ClientRegistry): shared Elasticsearch clients and vector managers.
+        store (IngestJobStore): persistent job records.
+        spool_dir (str): directory holding uploaded files until their job finishes.
+        max_workers (int): jobs processed concurrently.
+        extract_workers (int): processes extracting page ranges of each PDF (1 reads serially).
+        bulk_options (Dict[str, Any]): keyword arguments of `bulk_load` for bulk-load jobs.
+        shutdown_timeout (float): seconds `shutdown` waits for running jobs.
+    """
+
+    def __init__(
+        self,
+        clients: ClientRegistry,
+        store: IngestJobStore,
+        spool_dir: str,
+        max_workers: int = 2,
+        extract_workers: int = 1,
+        bulk_options: Optional[Dict[str, Any]] = None,
+        shutdown_timeout: float = 30.0,
+    ):
+        self.clients = clients
+        self.store = store
+        self.spool_dir = spool_dir
+        self.max_workers = max_workers
+        self.extract_workers = extract_workers
+        self.bulk_options = bulk_options or {}
+        self.shutdown_timeout = shutdown_timeout
+        self._stopping = threading.Event()
+        self._futures: Dict[Future, str] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest-job")
+        self._progress: Dict[str, IngestProgress] = {}
+        self._bulk_stats: Dict[str, BulkStats] = {}
+        os.makedirs(spool_dir, exist_ok=True)
+
+    @classmethod
+    def from_env(cls, clients: ClientRegistry) -> "IngestJobQueue":
+        """Build the queue from INGEST_* and BULK_* environment variables."""
+        return cls(
+            clients=clients,
+            store=IngestJobStore(os.environ.get("INGEST_JOBS_DB", ".cache/ingest_jobs.sqlite")),
+            spool_dir=os.environ.get("INGEST_SPOOL_DIR", ".cache/ingest_spool"),
+            max_workers=int(os.environ.get("INGEST_WORKERS", 2)),
+            extract_workers=int(os.environ.get("PDF_EXTRACT_WORKERS", 1)),
+            bulk_options=bulk_options_from_env(),
+            shutdown_timeout=float(os.environ.get("INGEST_SHUTDOWN_TIMEOUT", 30)),
+        )
+
+    def submit(
+        self, user_id: str, session_id: str, index_name: str, files: List[Tuple[str, bytes]],
+        replaces: Optional[str] = None, bulk_load: bool = False,
+    ) -> Dict:
+        """Spool the uploaded files, record a queued job and schedule it.
+
+        Arguments:
+            files (List[Tuple[str, bytes]]): (filename, contents) of every uploaded PDF.
+            replaces (Optional[str]): id of the indexed document that the (single) file replaces.
+            bulk_load (bool): ingest in bulk load mode (see the class docstring).
+
+        Returns:
+            The job record.
+        """
+        job_id = uuid.uuid4().hex
+        job_dir = os.path.join(self.spool_dir, job_id)
+        os.makedirs(job_dir)
+        for position, (filename, content) in enumerate(files):
+            with open(self._spool_path(job_id, position, filename), "wb") as f:
+                f.write(content)
+
+        job = self.store.create(job_id, index_name, user_id, session_id, [filename for filename, _ in files], replaces, bulk_load)
+        _log.info(f"Queued ingest job {job_id} | index={index_name} | files={len(files)} | replaces={replaces} | bulk_load={bulk_load}")
+        self._schedule(job_id)
+        return job
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        """Job record with live progress and throughput (pages/sec, chunks/sec)."""
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+
+        progress = self._progress.get(job_id)
+        counters = progress.snapshot() if progress is not None else {name: job[name] for name in PROGRESS_FIELDS}
+        elapsed = (job["finished_at"] or time.time()) - job["started_at"] if job["started_at"] else 0.0
+        return {
+            "job_id": job["id"],
+            "status": job["status"],
+            "index_name": job["index_name"],
+            "files": job["files"],
+            "replaces": job["replaces"],
+            "documents_total": len(job["files"]),
+            "documents_indexed": job["documents_indexed"],
+            "total_chunks": job["total_chunks"],
+            "progress": {
+                **counters,
+                "elapsed_seconds": round(elapsed, 3),
+                "pages_per_second": round(counters["pages_extracted"] / elapsed, 2) if elapsed else 0.0,
+                "chunks_per_second": round(counters["chunks_indexed"] / elapsed, 2) if elapsed else 0.0,
+            },
+            "bulk_load": job["bulk_load"],
+            "bulk": self._bulk_stats[job_id].snapshot() if job_id in self._bulk_stats else job["bulk_stats"],
+            "error": job["error"],
+            "created_at": job["created_at"],
+            "started_at": job["started_at"],
+            "finished_at": job["finished_at"],
+        }
+
+    def recover(self) -> int:
+        """Re-enqueue jobs a previous process did not finish. Returns the number of jobs resumed."""
+        jobs = self.store.unfinished()
+        for job in jobs:
+            _log.info(f"Resuming ingest job {job['id']} | status={job['status']} | done={job['documents_indexed']}/{len(job['files'])}")
+            self._schedule(job["id"])
+        return len(jobs)
+
+    def shutdown(self):
+        """Stop accepting work and wait up to `shutdown_timeout` seconds for the running jobs.
+
+        Queued jobs are not started. Running jobs stop at the end of their current file; those
+        still running after the timeout are put back to `queued` as well. `recover` resumes
+        all of them on the next start.
+        """
+        self._stopping.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        _, running = wait(list(self._futures), timeout=self.shutdown_timeout)
+        for future in running:
+            job_id = self._futures.get(future)
+            if job_id is not None and self.store.requeue(job_id):
+                _log.warning(f"Ingest job {job_id} still running after {self.shutdown_timeout}s | requeued for the next start")
+
+    def _schedule(self, job_id: str):
+        future = self._executor.submit(self._run, job_id)
+        self._futures[future] = job_id
+        future.add_done_callback(lambda done: self._futures.pop(done, None))
+
+    def _run(self, job_id: str):
+        job = self.store.get(job_id)
+        # a job started before (interrupted, or requeued on shutdown) may have a partially indexed file
+        resumed = job["started_at"] is not None
+        started_at = job["started_at"] or time.time()
+        self.store.update(job_id, status="running", started_at=started_at)
+
+        progress = IngestProgress(**{name: job[name] for name in PROGRESS_FIELDS})
+        self._progress[job_id] = progress
+        documents_indexed, total_chunks = job["documents_indexed"], job["total_chunks"]
+        index_name = job["index_name"]
+
+        try:
+            vector_database = self.clients.get_vector_manager(index_name, user_id=job["user_id"], session_id=job["session_id"])
+            reader = PdfReader(user_id=job["user_id"], session_id=job["session_id"], max_workers=self.extract_workers)
+            pipeline = IngestPipeline(reader=reader, vector_manager=vector_database)
+
+            with vector_database.bulk_load(**self.bulk_options) if job["bulk_load"] else nullcontext() as writer:
+                if writer is not None:
+                    self._bulk_stats[job_id] = writer.stats
+                for position, filename in enumerate(job["files"]):
+                    if position < documents_indexed:
+                        continue
+                    if self._stopping.is_set():
+                        raise JobInterrupted(f"shutdown before file {position + 1}/{len(job['files'])}")
+                    with open(self._spool_path(job_id, position, filename), "rb") as f:
+                        pdf_content = f.read()
+
+                    # the first unfinished file of a resumed job may be partially indexed
+                    total_chunks += pipeline.run(
+                        pdf_content, filename, progress=progress, skip_existing=not (resumed and position == documents_indexed),
+                        replaces=job["replaces"], writer=writer,
+                    )
+                    documents_indexed += 1
+                    self.store.update(job_id, documents_indexed=documents_indexed, total_chunks=total_chunks, **progress.snapshot())
+
+            self.store.update(job_id, status="completed", finished_at=time.time(), **self._final_stats(job_id), **progress.snapshot())
+            _log.info(f"Ingest job {job_id} completed | documents={documents_indexed} | chunks={total_chunks}")
+        except Exception as e:
+            if self._stopping.is_set():
+                # interrupted by the shutdown (or by the clients it closed): resume on the next start
+                _log.warning(f"Ingest job {job_id} interrupted | documents_indexed={documents_indexed} | error={e}")
+                self.store.update(job_id, **progress.snapshot())
+                self.store.requeue(job_id)
+                return
+            _log.error(f"Ingest job {job_id} failed | index={index_name} | documents_indexed={documents_indexed} | error={e}")
+            self.store.update(
+                job_id, status="failed", error=str(e), finished_at=time.time(), **self._final_stats(job_id), **progress.snapshot()
+            )
+        finally:
+            self._progress.pop(job_id, None)
+            self._bulk_stats.pop(job_id, None)
+
+        shutil.rmtree(os.path.join(self.spool_dir, job_id), ignore_errors=True)
+
+    def _final_stats(self, job_id: str) -> Dict[str, str]:
+        """`bulk_stats` column of a finished bulk-load job (nothing for other jobs)."""
+        stats = self._bulk_stats.get(job_id)
+        return {"bulk_stats": json.dumps(stats.snapshot())} if stats is not None else {}
+
+    def _spool_path(self, job_id: str, position: int, filename: str) -> str:
+        return os.path.join(self.spool_dir, job_id, f"{position:04d}_{os.path.basename(filename)}")
+
+
+def bulk_options_from_env() -> Dict[str, Any]:
+    """`bulk_load` settings from BULK_* environment variables."""
+    return {
+        "workers": int(os.environ.get("BULK_WORKERS", 4)),
+        "max_actions": int(os.environ.get("BULK_MAX_ACTIONS", 500)),
+        "max_bytes": int(os.environ.get("BULK_MAX_BYTES", 10 * 1024 * 1024)),
+        "max_retries": int(os.environ.get("BULK_MAX_RETRIES", 5)),
+        "force_merge": os.environ.get("BULK_FORCE_MERGE", "true").lower() == "true",
+    }
+
+
+def get_jobs(request: Request) -> IngestJobQueue:
+    """FastAPI dependency returning the job queue created in the app lifespan."""
+    return request.app.state.jobs
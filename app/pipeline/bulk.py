@@ -0,0 +1,252 @@
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from elasticsearch import ApiError, Elasticsearch
+from elasticsearch.helpers import BulkIndexError, expand_action
+
+# internal imports
+from ..utils.logger import Logger
+from ..utils.metrics import get_metrics
+
+_log = Logger.get_logger(__name__)
+
+# settings changed while an index is bulk loaded, and the value used during the load
+LOAD_SETTINGS = {"index.refresh_interval": "-1", "index.number_of_replicas": 0}
+
+# index -> (bulk loads in progress, settings to restore once the last one ends)
+_loads: Dict[str, Tuple[int, Dict[str, Optional[str]]]] = {}
+# guards `_loads` and `_index_locks` only; Elasticsearch calls hold the lock of their index
+_loads_lock = threading.Lock()
+_index_locks: Dict[str, threading.Lock] = {}
+
+
+class BulkStats:
+    """Thread-safe counters of a bulk load.
+
+    Attributes:
+        indexed (int): items acknowledged by Elasticsearch.
+        rejected (int): item rejections (429, `es_rejected_execution_exception`) that were retried.
+        failed (int): items that failed for good (other errors, or rejected after every retry).
+        requests (int): bulk requests sent, retries included.
+    """
+
+    def __init__(self):
+        self.indexed = 0
+        self.rejected = 0
+        self.failed = 0
+        self.requests = 0
+        self._started = time.perf_counter()
+        self._finished: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def add(self, indexed: int = 0, rejected: int = 0, failed: int = 0, requests: int = 0):
+        with self._lock:
+            self.indexed += indexed
+            self.rejected += rejected
+            self.failed += failed
+            self.requests += requests
+
+    def finish(self):
+        self._finished = time.perf_counter()
+
+    def snapshot(self) -> Dict:
+        """Counters, elapsed seconds and indexed docs per second."""
+        with self._lock:
+            elapsed = (self._finished or time.perf_counter()) - self._started
+            return {
+                "indexed": self.indexed,
+                "rejected": self.rejected,
+                "failed": self.failed,
+                "requests": self.requests,
+                "elapsed_seconds": round(elapsed, 3),
+                "docs_per_second": round(self.indexed / elapsed, 2) if elapsed else 0.0,
+            }
+
+
+class ParallelBulkWriter:
+    """Sends bulk actions as requests bounded by action count and bytes, `workers` requests at a time.
+
+    Unlike `helpers.streaming_bulk`, several requests are in flight at once, and items the
+    cluster rejects for back-pressure (status 429, e.g. `es_rejected_execution_exception`
+    when its write queue is full) are retried on their own with exponential backoff, instead
+    of failing the load or resending the whole request. Other item errors are not retried;
+    like `streaming_bulk`, `write` raises `BulkIndexError` once its actions are sent if any
+    of them failed for good. At most `2 * workers` requests are built ahead, so memory stays bounded.
+
+    Attributes:
+        es (Elasticsearch): client sending the requests; its pool needs `workers` connections.
+        workers (int): bulk requests in flight.
+        max_actions (int): items per request.
+        max_bytes (int): serialized size of a request.
+        max_retries (int): retries of a rejected item before it counts as failed.
+        initial_backoff (float): seconds before the first retry, doubled on each retry.
+        max_backoff (float): upper bound of the backoff.
+        stats (BulkStats): counters of everything written by this writer.
+    """
+
+    def __init__(
+        self,
+        es: Elasticsearch,
+        workers: int = 4,
+        max_actions: int = 500,
+        max_bytes: int = 10 * 1024 * 1024,
+        max_retries: int = 5,
+        initial_backoff: float = 1.0,
+        max_backoff: float = 30.0,
+    ):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.es = es
+        self.workers = workers
+        self.max_actions = max_actions
+        self.max_bytes = max_bytes
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.stats = BulkStats()
+        self._serializer = es.transport.serializers.get_serializer("application/json")
+
+    def write(self, actions: Iterable[Dict], raise_on_error: bool = True) -> Iterator[bool]:
+        """Write `helpers.bulk`-style actions; yields one success flag per action, in order.
+
+        Raises `BulkIndexError` with the failed items at the end, unless `raise_on_error` is False.
+        """
+        errors: List[Dict] = []
+
+        def flags(future) -> List[bool]:
+            results, failed = future.result()
+            errors.extend(failed)
+            return results
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bulk") as executor:
+            in_flight = deque()
+            for request in self._requests(actions):
+                if len(in_flight) >= 2 * self.workers:
+                    yield from flags(in_flight.popleft())
+                in_flight.append(executor.submit(self._send, request))
+            while in_flight:
+                yield from flags(in_flight.popleft())
+
+        if errors and raise_on_error:
+            raise BulkIndexError(f"{len(errors)} document(s) failed to index.", errors)
+
+    def _requests(self, actions: Iterable[Dict]) -> Iterator[List[bytes]]:
+        """Serialized items (action line, then source line) grouped into requests."""
+        request: List[bytes] = []
+        size = 0
+        for action in actions:
+            item = b"\n".join(self._serializer.dumps(line) for line in expand_action(action) if line is not None) + b"\n"
+            if request and (len(request) >= self.max_actions or size + len(item) > self.max_bytes):
+                yield request
+                request, size = [], 0
+            request.append(item)
+            size += len(item)
+        if request:
+            yield request
+
+    def _send(self, items: List[bytes]) -> Tuple[List[bool], List[Dict]]:
+        """One request, then the rejected items again until they succeed or run out of retries.
+
+        Returns the success flag of each item and the last response item of those that failed.
+        """
+        results: List[Optional[bool]] = [None] * len(items)
+        responses: Dict[int, Dict] = {}
+        pending = list(range(len(items)))
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(min(self.max_backoff, self.initial_backoff * 2 ** (attempt - 1)))
+            pending = self._attempt(items, pending, results, responses)
+            if not pending:
+                break
+            self.stats.add(rejected=len(pending))
+            get_metrics().inc(get_metrics().bulk_items, len(pending), outcome="rejected")
+            _log.warning(f"Bulk items rejected | items={len(pending)} | attempt={attempt + 1}/{self.max_retries + 1}")
+
+        failed = sum(1 for ok in results if not ok)
+        self.stats.add(indexed=len(items) - failed, failed=failed)
+        get_metrics().inc(get_metrics().bulk_items, len(items) - failed, outcome="indexed")
+        get_metrics().inc(get_metrics().bulk_items, failed, outcome="failed")
+        return [bool(ok) for ok in results], [responses[position] for position, ok in enumerate(results) if not ok]
+
+    def _attempt(
+        self, items: List[bytes], positions: List[int], results: List[Optional[bool]], responses: Dict[int, Dict]
+    ) -> List[int]:
+        """Send the items at `positions`, setting their results and response items; returns the positions to retry."""
+        self.stats.add(requests=1)
+        try:
+            response = self.es.bulk(operations=[items[position] for position in positions])
+        except ApiError as e:
+            if e.meta.status == 429:
+                responses.update((position, {"index": {"status": 429, "error": str(e)}}) for position in positions)
+                return positions
+            raise
+
+        retry = []
+        for position, item in zip(positions, response["items"]):
+            status = next(iter(item.values()))
+            responses[position] = item
+            if status.get("status") == 429:
+                retry.append(position)
+            else:
+                results[position] = "error" not in status
+                if "error" in status:
+                    _log.error(f"Bulk item failed | id={status.get('_id')} | error={status['error']}")
+        return retry
+
+
+@contextmanager
+def bulk_load_settings(es: Elasticsearch, index: str, force_merge: bool = True) -> Iterator[None]:
+    """Turn off refreshes and replicas of `index` for the enclosed load, then restore them.
+
+    When the load succeeds the index is refreshed and, with `force_merge`, merged down to one
+    segment before its replicas come back, so they copy the merged segments instead of
+    merging on their own. Concurrent loads of one index share the settings change: the
+    original values are restored (and the index merged) when the last of them ends.
+
+    The settings calls and the merge of an index are serialized by a lock of that index
+    only; loads of other indices start and finish meanwhile.
+    """
+    with _index_lock(index):
+        with _loads_lock:
+            loads, previous = _loads.get(index, (0, None))
+        if not loads:
+            current = next(iter(es.indices.get_settings(index=index, flat_settings=True).values()))["settings"]
+            # settings left at their default are reset to it (None) afterwards
+            previous = {name: current.get(name) for name in LOAD_SETTINGS}
+            es.indices.put_settings(index=index, settings=LOAD_SETTINGS)
+            _log.info(f"Bulk load mode on | index={index} | previous={previous}")
+        with _loads_lock:
+            _loads[index] = (loads + 1, previous)
+
+    succeeded = False
+    try:
+        yield
+        succeeded = True
+    finally:
+        with _index_lock(index):
+            with _loads_lock:
+                loads, previous = _loads.pop(index)
+                if loads > 1:
+                    _loads[index] = (loads - 1, previous)
+            if loads == 1:
+                try:
+                    if succeeded:
+                        es.indices.refresh(index=index)
+                        if force_merge:
+                            start = time.perf_counter()
+                            # merging a large index takes longer than the client's request timeout
+                            es.options(request_timeout=None).indices.forcemerge(index=index, max_num_segments=1)
+                            _log.info(f"Force-merged '{index}' | seconds={time.perf_counter() - start:.1f}")
+                finally:
+                    es.indices.put_settings(index=index, settings=previous)
+                    _log.info(f"Bulk load mode off | index={index} | restored={previous}")
+
+
+def _index_lock(index: str) -> threading.Lock:
+    """Lock serializing the settings changes and merge of one index."""
+    with _loads_lock:
+        return _index_locks.setdefault(index, threading.Lock())
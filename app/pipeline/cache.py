@@ -0,0 +1,393 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Iterable, List, Optional
+
+import numpy as np
+
+# internal imports
+from ..utils.logger import Logger
+
+_log = Logger.get_logger(__name__)
+
+def make_cache_key(model: str, dimensionality: int, task_type: str, text: str) -> str:
+    """Build a cache key from the embedding request parameters and the normalized text.
+
+    Text is lowercased and whitespace-collapsed, so trivially different spellings of the
+    same question share an entry.
+    """
+    normalized = " ".join(text.lower().split())
+    raw = f"{model}|{dimensionality}|{task_type}|{normalized}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def chunk_content_hash(text: str, title: str, model: str, dimensionality: int) -> str:
+    """Content address of a document chunk embedding: the same chunk text, title, model and
+    dimensionality always produce the same embedding, so they share a hash."""
+    raw = "\x1f".join([model, str(dimensionality), title, text])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache(ABC):
+    """Base class for embedding caches, with hit/miss counters."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[List[float]]:
+        vector = self._get(key)
+        with self._lock:
+            if vector is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return vector
+
+    def set(self, key: str, vector: List[float]):
+        self._set(key, vector)
+
+    def set_many(self, vectors: Dict[str, List[float]]):
+        for key, vector in vectors.items():
+            self._set(key, vector)
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "backend": type(self).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self),
+        }
+
+    @abstractmethod
+    def _get(self, key: str) -> Optional[List[float]]: ...
+
+    @abstractmethod
+    def _set(self, key: str, vector: List[float]): ...
+
+    @abstractmethod
+    def clear(self): ...
+
+    @abstractmethod
+    def __len__(self) -> int: ...
+
+
+class LRUEmbeddingCache(EmbeddingCache):
+    """In-process cache with least-recently-used eviction and a time-to-live per entry.
+
+    Attributes:
+        max_entries (int): entries kept before the least recently used one is evicted.
+        ttl_seconds (Optional[float]): entry lifetime; None keeps entries until evicted.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: Optional[float] = 24 * 3600):
+        super().__init__()
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def _get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            vector, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return vector
+
+    def _set(self, key: str, vector: List[float]):
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds is not None else None
+        with self._lock:
+            self._entries[key] = (list(vector), expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteEmbeddingCache(EmbeddingCache):
+    """On-disk cache backed by SQLite, so entries survive restarts.
+
+    Vectors are stored as packed float32 blobs.
+
+    Attributes:
+        path (str): SQLite database file.
+        ttl_seconds (Optional[float]): entry lifetime; None keeps entries forever.
+    """
+
+    def __init__(self, path: str, ttl_seconds: Optional[float] = None):
+        super().__init__()
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            row = self._conn.execute("SELECT vector, created_at FROM embeddings WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        blob, created_at = row
+        if self.ttl_seconds is not None and created_at + self.ttl_seconds < time.time():
+            return None
+        return array("f", blob).tolist()
+
+    def _set(self, key: str, vector: List[float]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embeddings (key, vector, created_at) VALUES (?, ?, ?)",
+                (key, array("f", vector).tobytes(), time.time()),
+            )
+            self._conn.commit()
+
+    def set_many(self, vectors: Dict[str, List[float]]):
+        """Write several vectors in a single transaction."""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, created_at) VALUES (?, ?, ?)",
+                [(key, array("f", vector).tobytes(), now) for key, vector in vectors.items()],
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+
+class SemanticAnswerCache:
+    """Cache of generated answers, looked up by query-embedding similarity.
+
+    An answer is reused when a new query of the same index is at least `similarity_threshold`
+    cosine-similar to a cached query *and* retrieved exactly the same chunk ids, so a
+    paraphrase only hits when the evidence behind the answer is unchanged. Query vectors of
+    each index are kept as rows of a normalized float32 NumPy matrix, so a lookup is one
+    matrix-vector product.
+
+    Attributes:
+        max_entries (int): answers kept across all indices before the least recently used is evicted.
+        ttl_seconds (Optional[float]): answer lifetime; None keeps answers until evicted or invalidated.
+        similarity_threshold (float): minimum cosine similarity between queries.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: Optional[float] = 3600, similarity_threshold: float = 0.95):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.hits = 0
+        self.misses = 0
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._entries: Dict[str, List[Dict]] = {}
+        self._lru: "OrderedDict[int, str]" = OrderedDict()  # entry id -> index name
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def get(self, index_name: str, query_embedding: List[float], evidence_ids: Iterable[str]) -> Optional[Dict]:
+        """Cached answer for a similar query with the same evidence, or None."""
+        evidence = frozenset(evidence_ids)
+        query = self._normalize(query_embedding)
+        with self._lock:
+            answer = self._lookup(index_name, query, evidence)
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return answer
+
+    def set(self, index_name: str, query_embedding: List[float], evidence_ids: Iterable[str], answer: Dict):
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds is not None else None
+        query = self._normalize(query_embedding)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            entry = {"id": entry_id, "evidence": frozenset(evidence_ids), "answer": answer, "expires_at": expires_at}
+            vectors = self._vectors.get(index_name)
+            self._vectors[index_name] = query[None, :] if vectors is None else np.vstack([vectors, query])
+            self._entries.setdefault(index_name, []).append(entry)
+            self._lru[entry_id] = index_name
+            while len(self._lru) > self.max_entries:
+                evicted_id, evicted_index = self._lru.popitem(last=False)
+                self._remove(evicted_index, lambda e: e["id"] == evicted_id)
+
+    def invalidate(self, index_name: str):
+        """Drop every answer of an index, e.g. after documents were added or deleted."""
+        with self._lock:
+            entries = self._entries.pop(index_name, [])
+            self._vectors.pop(index_name, None)
+            for entry in entries:
+                self._lru.pop(entry["id"], None)
+        if entries:
+            _log.info(f"Invalidated {len(entries)} cached answers of '{index_name}'")
+
+    def clear(self):
+        with self._lock:
+            self._vectors.clear()
+            self._entries.clear()
+            self._lru.clear()
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "backend": type(self).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self),
+        }
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    def _lookup(self, index_name: str, query: np.ndarray, evidence: FrozenSet[str]) -> Optional[Dict]:
+        vectors = self._vectors.get(index_name)
+        if vectors is None:
+            return None
+        now = time.monotonic()
+        self._remove(index_name, lambda e: e["expires_at"] is not None and e["expires_at"] < now)
+        vectors = self._vectors.get(index_name)
+        if vectors is None:
+            return None
+
+        similarities = vectors @ query
+        for row in np.argsort(-similarities):
+            if similarities[row] < self.similarity_threshold:
+                break
+            entry = self._entries[index_name][row]
+            if entry["evidence"] == evidence:
+                self._lru.move_to_end(entry["id"])
+                return entry["answer"]
+        return None
+
+    def _remove(self, index_name: str, predicate):
+        entries = self._entries.get(index_name, [])
+        keep = [i for i, entry in enumerate(entries) if not predicate(entry)]
+        if len(keep) == len(entries):
+            return
+        for entry in entries:
+            if predicate(entry):
+                self._lru.pop(entry["id"], None)
+        if keep:
+            self._entries[index_name] = [entries[i] for i in keep]
+            self._vectors[index_name] = self._vectors[index_name][keep]
+        else:
+            self._entries.pop(index_name, None)
+            self._vectors.pop(index_name, None)
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+
+_query_cache: Optional[EmbeddingCache] = None
+_query_cache_lock = threading.Lock()
+
+def get_query_embedding_cache() -> EmbeddingCache:
+    """Process-wide query-embedding cache shared by every ElasticRetriever.
+
+    Configured through environment variables:
+        QUERY_CACHE_BACKEND: "memory" (default) or "sqlite".
+        QUERY_CACHE_PATH: SQLite file for the "sqlite" backend (default: .cache/query_embeddings.sqlite).
+        QUERY_CACHE_MAX_ENTRIES: LRU size for the "memory" backend (default: 10000).
+        QUERY_CACHE_TTL_SECONDS: entry lifetime (default: 86400).
+    """
+    global _query_cache
+    with _query_cache_lock:
+        if _query_cache is None:
+            backend = os.environ.get("QUERY_CACHE_BACKEND", "memory")
+            ttl_seconds = float(os.environ.get("QUERY_CACHE_TTL_SECONDS", 24 * 3600))
+            if backend == "sqlite":
+                path = os.environ.get("QUERY_CACHE_PATH", ".cache/query_embeddings.sqlite")
+                _query_cache = SQLiteEmbeddingCache(path, ttl_seconds=ttl_seconds)
+            elif backend == "memory":
+                max_entries = int(os.environ.get("QUERY_CACHE_MAX_ENTRIES", 10000))
+                _query_cache = LRUEmbeddingCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+            else:
+                raise ValueError(f"Unknown QUERY_CACHE_BACKEND '{backend}', expected 'memory' or 'sqlite'")
+            _log.info(f"Initialized query embedding cache | backend={backend}")
+        return _query_cache
+
+
+_chunk_store: Optional[EmbeddingCache] = None
+_chunk_store_lock = threading.Lock()
+
+def get_chunk_embedding_store() -> Optional[EmbeddingCache]:
+    """Process-wide content-addressed store for document chunk embeddings.
+
+    Configured through environment variables:
+        EMBEDDING_STORE_BACKEND: "sqlite" (default), "memory" or "none" to disable it.
+        EMBEDDING_STORE_PATH: SQLite file for the "sqlite" backend (default: .cache/chunk_embeddings.sqlite).
+    """
+    global _chunk_store
+    backend = os.environ.get("EMBEDDING_STORE_BACKEND", "sqlite")
+    if backend == "none":
+        return None
+    with _chunk_store_lock:
+        if _chunk_store is None:
+            if backend == "sqlite":
+                _chunk_store = SQLiteEmbeddingCache(os.environ.get("EMBEDDING_STORE_PATH", ".cache/chunk_embeddings.sqlite"))
+            elif backend == "memory":
+                _chunk_store = LRUEmbeddingCache(max_entries=1_000_000, ttl_seconds=None)
+            else:
+                raise ValueError(f"Unknown EMBEDDING_STORE_BACKEND '{backend}', expected 'sqlite', 'memory' or 'none'")
+            _log.info(f"Initialized chunk embedding store | backend={backend}")
+        return _chunk_store
+
+
+_answer_cache: Optional[SemanticAnswerCache] = None
+_answer_cache_lock = threading.Lock()
+
+def get_answer_cache() -> Optional[SemanticAnswerCache]:
+    """Process-wide semantic answer cache used by the API.
+
+    Configured through environment variables:
+        ANSWER_CACHE_BACKEND: "memory" (default) or "none" to disable it.
+        ANSWER_CACHE_MAX_ENTRIES: answers kept (default: 1000).
+        ANSWER_CACHE_TTL_SECONDS: answer lifetime (default: 3600).
+        ANSWER_CACHE_SIMILARITY: minimum cosine similarity between queries (default: 0.95).
+    """
+    global _answer_cache
+    backend = os.environ.get("ANSWER_CACHE_BACKEND", "memory")
+    if backend == "none":
+        return None
+    if backend != "memory":
+        raise ValueError(f"Unknown ANSWER_CACHE_BACKEND '{backend}', expected 'memory' or 'none'")
+    with _answer_cache_lock:
+        if _answer_cache is None:
+            _answer_cache = SemanticAnswerCache(
+                max_entries=int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", 1000)),
+                ttl_seconds=float(os.environ.get("ANSWER_CACHE_TTL_SECONDS", 3600)),
+                similarity_threshold=float(os.environ.get("ANSWER_CACHE_SIMILARITY", 0.95)),
+            )
+            _log.info(f"Initialized semantic answer cache | backend={backend}")
+        return _answer_cache
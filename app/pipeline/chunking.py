@@ -0,0 +1,242 @@
+import re
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import pymupdf
+
+# internal imports
+from .context import estimate_tokens
+
+# text, lines and spans of `get_text("dict")`, without the image blocks and their bytes
+_DICT_FLAGS = pymupdf.TEXTFLAGS_DICT & ~pymupdf.TEXT_PRESERVE_IMAGES
+_BOLD = 16  # span flag
+_LIST_ITEM = re.compile(r"^(?:[•▪●◦–\-*]|\(?\d{1,3}[.)]|\(?[a-zA-Z][.)])\s+")
+_SENTENCE_END = re.compile(r"(?<=[.!?:;]) ")
+_HEADING_MAX_WORDS = 20
+
+
+class Block(NamedTuple):
+    """Layout block of a page.
+
+    Attributes:
+        kind (str): "heading", "paragraph", "list" or "table".
+        units (Tuple[str, ...]): pieces a chunk may be cut between: list items, table rows
+            (cells joined with " | ") or the single paragraph / heading text.
+    """
+    kind: str
+    units: Tuple[str, ...]
+
+
+class Chunk(NamedTuple):
+    """Chunk of a document.
+
+    Attributes:
+        text (str): chunk text, `document_text[char_start:char_end]`.
+        page_number (int): page of the chunk's first block.
+        char_start (Optional[int]): offset of the chunk in the document text, see `LayoutChunker`; None for word windows.
+        char_end (Optional[int]): end offset (exclusive).
+    """
+    text: str
+    page_number: int
+    char_start: Optional[int]
+    char_end: Optional[int]
+
+
+def _line_text(line: dict) -> str:
+    return " ".join("".join(span["text"] for span in line["spans"]).split())
+
+
+def _is_heading(line: dict, text: str, body_size: float) -> bool:
+    spans = [span for span in line["spans"] if span["text"].strip()]
+    if not spans or len(text.split()) > _HEADING_MAX_WORDS or text.endswith("."):
+        return False
+    return all(span["flags"] & _BOLD for span in spans) or max(span["size"] for span in spans) >= 1.15 * body_size
+
+
+def _rows(lines: List[dict]) -> List[List[dict]]:
+    """Consecutive lines grouped into rows: a line whose vertical centre falls inside the first line of the row joins it."""
+    rows: List[List[dict]] = []
+    for line in lines:
+        y0, y1 = line["bbox"][1], line["bbox"][3]
+        if rows:
+            anchor = rows[-1][0]["bbox"]
+            if anchor[1] <= (y0 + y1) / 2 <= anchor[3]:
+                rows[-1].append(line)
+                continue
+        rows.append([line])
+    return rows
+
+
+def page_blocks(page: pymupdf.Page) -> List[Block]:
+    """Headings, paragraphs, lists and tables of a page, in reading order.
+
+    Built from the block / line / span layout of `get_text("dict")`:
+        - a block whose lines sit side by side on at least two rows is a table, one unit per row;
+        - leading lines that are bold, or larger than the page's body text, and short are a heading;
+        - lines starting with a bullet or an enumerator ("1.", "a)") open list items;
+        - the remaining lines of a block form one paragraph, with whitespace normalized.
+    """
+    blocks = [block for block in page.get_text("dict", flags=_DICT_FLAGS)["blocks"] if block.get("lines")]
+
+    # body size: the font size carrying most characters on the page
+    sizes = {}
+    for block in blocks:
+        for line in block["lines"]:
+            for span in line["spans"]:
+                size = round(span["size"], 1)
+                sizes[size] = sizes.get(size, 0) + len(span["text"])
+    body_size = max(sizes, key=sizes.get) if sizes else 0.0
+
+    result: List[Block] = []
+    for block in blocks:
+        rows = _rows(block["lines"])
+        if len(rows) >= 2 and sum(len(row) > 1 for row in rows) >= 2:
+            units = tuple(" | ".join(text for text in map(_line_text, row) if text) for row in rows)
+            result.append(Block("table", tuple(unit for unit in units if unit)))
+            continue
+
+        lines = [(line, _line_text(line)) for line in block["lines"]]
+        lines = [(line, text) for line, text in lines if text]
+        heading = []
+        while lines and _is_heading(lines[0][0], lines[0][1], body_size):
+            heading.append(lines.pop(0)[1])
+        if heading:
+            result.append(Block("heading", (" ".join(heading),)))
+
+        items: List[str] = []
+        paragraph: List[str] = []
+        for _, text in lines:
+            if _LIST_ITEM.match(text):
+                items.append(text)
+            elif items:
+                items[-1] += " " + text
+            else:
+                paragraph.append(text)
+        if paragraph:
+            result.append(Block("paragraph", (" ".join(paragraph),)))
+        if items:
+            result.append(Block("list", tuple(items)))
+    return result
+
+
+class _Piece(NamedTuple):
+    separator: str  # character between the previous piece and this one in the document text
+    text: str
+    kind: str
+    page_number: int
+    start: int
+
+
+class LayoutChunker:
+    """Groups layout blocks into chunks of about `max_tokens` tokens, in one pass.
+
+    The document text is the text of every block unit in reading order, units separated by
+    a newline (pages included), and chunks are contiguous slices of it, so `char_start` and
+    `char_end` locate a chunk in the document. Token counts are the estimate used for the
+    prompt budget (`estimate_tokens`).
+
+    Chunks are not cut inside a block that fits in one: a table, list or paragraph that does
+    not fit in the current chunk starts the next one, unless the current chunk is still below
+    `min_tokens`. A heading starts a new chunk (once the current one has `min_tokens`) and is
+    never the last piece of a chunk. Blocks larger than `max_tokens` are cut between their
+    units (rows, items), then paragraphs between sentences, then between words.
+
+    Pages do not end chunks: the tail of a page continues into the next one, and a final
+    chunk below `min_tokens` is merged into the previous one, so short tails do not become
+    chunks of their own.
+
+    Attributes:
+        max_tokens (int): token budget of a chunk.
+        min_tokens (int): chunks are only cut early (before a heading or an unsplit block) past this size.
+    """
+
+    def __init__(self, max_tokens: int = 512, min_tokens: int = 128):
+        if not 0 < min_tokens <= max_tokens:
+            raise ValueError("chunk sizes must satisfy 0 < min_tokens <= max_tokens")
+        self.max_tokens = max_tokens
+        self.min_tokens = min_tokens
+
+    def chunk(self, pages: Iterable[Tuple[int, List[Block]]]) -> Iterator[Chunk]:
+        """Chunks of a stream of (page_number, blocks), yielded as soon as they are complete.
+
+        At most one finished chunk is held back, in case the document ends with a short tail.
+        A chunker holds the state of the document being chunked: use one per document.
+        """
+        self._offset = 0
+        self._current: List[_Piece] = []
+        self._chars = 0
+        held: Optional[List[_Piece]] = None
+        for page_number, blocks in pages:
+            for block in blocks:
+                for pieces in self._add_block(block, page_number):
+                    if held is not None:
+                        yield self._emit(held)
+                    held = pieces
+
+        tail = self._current
+        if tail and held is not None and self._tokens() < self.min_tokens:
+            yield self._emit(held + tail)
+        else:
+            if held is not None:
+                yield self._emit(held)
+            if tail:
+                yield self._emit(tail)
+
+    def _add_block(self, block: Block, page_number: int) -> Iterator[List[_Piece]]:
+        """Add a block to the current chunk; yields the pieces of every chunk completed on the way."""
+        block_tokens = estimate_tokens("\n".join(block.units))
+        fits = self._tokens() + block_tokens <= self.max_tokens
+        if (block.kind == "heading" or (not fits and block_tokens <= self.max_tokens)) and self._can_flush(self.min_tokens):
+            yield self._flush()
+
+        for unit in block.units:
+            for separator, text in self._split(unit):
+                if self._tokens() + estimate_tokens(text) > self.max_tokens and self._can_flush(1):
+                    yield self._flush()
+                self._append(separator, text, block.kind, page_number)
+
+    def _split(self, unit: str) -> Iterator[Tuple[str, str]]:
+        """(separator, text) pieces of a unit no larger than `max_tokens`: the unit, its sentences or word runs."""
+        if estimate_tokens(unit) <= self.max_tokens:
+            yield "\n", unit
+            return
+        separator = "\n"
+        max_chars = 4 * self.max_tokens
+        for sentence in _SENTENCE_END.split(unit):
+            if len(sentence) <= max_chars:
+                yield separator, sentence
+                separator = " "
+                continue
+            # one very long sentence: runs of whole words (a single over-long word is its own piece)
+            start = 0
+            while start < len(sentence):
+                end = sentence.rfind(" ", start, start + max_chars + 1) if start + max_chars < len(sentence) else len(sentence)
+                if end <= start:
+                    end = sentence.find(" ", start + max_chars)
+                    end = len(sentence) if end == -1 else end
+                yield separator, sentence[start:end]
+                separator = " "
+                start = end + 1
+
+    def _append(self, separator: str, text: str, kind: str, page_number: int):
+        # the first piece of the document has no separator before it
+        start = self._offset + (len(separator) if self._offset else 0)
+        self._current.append(_Piece(separator if self._offset else "", text, kind, page_number, start))
+        self._offset = start + len(text)
+        self._chars += len(text) + 1
+
+    def _tokens(self) -> int:
+        return -(-self._chars // 4)
+
+    def _can_flush(self, min_tokens: int) -> bool:
+        """Whether the current chunk can end here: it has `min_tokens` and does not end with a heading."""
+        return bool(self._current) and self._current[-1].kind != "heading" and self._tokens() >= min_tokens
+
+    def _flush(self) -> List[_Piece]:
+        pieces, self._current, self._chars = self._current, [], 0
+        return pieces
+
+    @staticmethod
+    def _emit(pieces: List[_Piece]) -> Chunk:
+        text = pieces[0].text + "".join(piece.separator + piece.text for piece in pieces[1:])
+        start = pieces[0].start
+        return Chunk(text, pieces[0].page_number, start, start + len(text))
@@ -0,0 +1,163 @@
+import re
+import math
+from typing import Dict, List, Optional
+
+# internal imports
+from ..utils.logger import Logger
+
+_log = Logger.get_logger(__name__)
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token for Gemini on English text)."""
+    return math.ceil(len(text) / 4)
+
+
+class PackedContext:
+    """Passages selected for the prompt, plus what the builder did to get there.
+
+    Attributes:
+        passages (List[Dict]): merged, deduplicated chunks in priority order.
+        candidates (int): chunks received.
+        merged (int): chunks folded into the preceding chunk of their document.
+        duplicates (int): passages dropped as near-duplicates.
+        over_budget (int): passages dropped because they did not fit the token budget.
+        tokens (int): estimated tokens of the packed passages.
+    """
+
+    def __init__(self, passages: List[Dict], candidates: int, merged: int, duplicates: int, over_budget: int):
+        self.passages = passages
+        self.candidates = candidates
+        self.merged = merged
+        self.duplicates = duplicates
+        self.over_budget = over_budget
+        self.tokens = sum(estimate_tokens(passage["text"]) for passage in passages)
+
+    def stats(self) -> Dict:
+        return {
+            "candidates": self.candidates,
+            "passages": len(self.passages),
+            "merged": self.merged,
+            "duplicates": self.duplicates,
+            "over_budget": self.over_budget,
+            "context_tokens": self.tokens,
+        }
+
+
+class ContextBuilder:
+    """Turns retrieved chunks into a compact, token-budgeted context.
+
+    1. Consecutive chunks (`chunk_id` n and n+1) of the same document are merged, across
+       pages: layout chunks by their character offsets, word-window chunks dropping the
+       words they share because of the chunker's overlap.
+    2. Passages whose word 3-gram Jaccard similarity with a higher-priority passage reaches
+       `duplicate_threshold` are dropped.
+    3. Passages are packed in priority order (the retrieval or rerank order) until
+       `max_tokens` is reached; passages that do not fit are skipped, smaller ones after
+       them may still be packed. The first passage is truncated rather than dropped.
+
+    Attributes:
+        max_tokens (int): token budget of the context.
+        duplicate_threshold (float): shingle similarity above which a passage is a near-duplicate.
+        max_overlap_words (int): longest word overlap looked for between adjacent word-window chunks.
+    """
+
+    def __init__(self, max_tokens: int = 6000, duplicate_threshold: float = 0.8, max_overlap_words: int = 100):
+        self.max_tokens = max_tokens
+        self.duplicate_threshold = duplicate_threshold
+        self.max_overlap_words = max_overlap_words
+
+    def build(self, documents: List[Dict]) -> PackedContext:
+        """Merge, deduplicate and pack `documents` (ordered by priority)."""
+        passages, merged = self._merge_adjacent(documents)
+        passages, duplicates = self._drop_duplicates(passages)
+
+        packed, used, over_budget = [], 0, 0
+        for passage in passages:
+            tokens = estimate_tokens(passage["text"])
+            if used + tokens <= self.max_tokens:
+                packed.append(passage)
+                used += tokens
+            elif not packed:
+                packed.append({**passage, "text": passage["text"][:self.max_tokens * 4]})
+                used = self.max_tokens
+            else:
+                over_budget += 1
+
+        context = PackedContext(packed, len(documents), merged, duplicates, over_budget)
+        _log.info(
+            f"Packed context | candidates={context.candidates} | passages={len(packed)} | merged={merged} | "
+            f"duplicates={duplicates} | over_budget={over_budget} | context_tokens={context.tokens}/{self.max_tokens}"
+        )
+        return context
+
+    def _merge_adjacent(self, documents: List[Dict]):
+        """Fold chunks into the passage holding their predecessor; the passage keeps the best rank."""
+        passages: List[Dict] = []
+        ends: Dict[tuple, Dict] = {}  # (document_id, chunk_id) -> passage ending with that chunk
+        merged = 0
+        for rank, doc in sorted(enumerate(documents), key=lambda item: self._position(item[1])):
+            document_id, chunk_id = doc.get("document_id"), doc.get("chunk_id")
+            previous = ends.get((document_id, chunk_id - 1)) if document_id is not None and chunk_id is not None else None
+            text = self._join(previous, doc) if previous is not None else None
+            if text is not None:
+                previous["text"] = text
+                previous["char_end"] = doc.get("char_end")
+                previous["score"] = max(previous["score"], doc["score"])
+                previous["_rank"] = min(previous["_rank"], rank)
+                previous["chunk_ids"].append(chunk_id)
+                ends[(document_id, chunk_id)] = previous
+                merged += 1
+                continue
+            passage = {**doc, "_rank": rank, "chunk_ids": [chunk_id]}
+            passages.append(passage)
+            if document_id is not None and chunk_id is not None:
+                ends[(document_id, chunk_id)] = passage
+
+        passages.sort(key=lambda passage: passage.pop("_rank"))
+        return passages, merged
+
+    @staticmethod
+    def _position(doc: Dict):
+        """Sort key putting the chunks of a document in chunk order, so neighbours meet."""
+        return (str(doc.get("document_id")), doc.get("chunk_id") or 0)
+
+    def _join(self, passage: Dict, doc: Dict) -> Optional[str]:
+        """Text of `passage` followed by the next chunk of its document, or None if they are not contiguous.
+
+        Chunks with character offsets (`LayoutChunker`) are slices of the document text: the
+        next one starts one separator after the previous one ends (joined with a newline), and
+        any overlap is cut by offset. Word-window chunks have no offsets; the longest word
+        overlap between them, left by the chunker's `chunk_overlap`, is removed.
+        """
+        first, second = passage["text"], doc["text"]
+        end, start = passage.get("char_end"), doc.get("char_start")
+        if end is not None and start is not None:
+            if start > end + 1:
+                return None
+            return first + ("\n" if start == end + 1 else "") + second[max(end - start, 0):]
+
+        first_words, second_words = first.split(), second.split()
+        for size in range(min(self.max_overlap_words, len(first_words), len(second_words)), 0, -1):
+            if first_words[-size:] == second_words[:size]:
+                return " ".join(first_words + second_words[size:])
+        return f"{first} {second}"
+
+    def _drop_duplicates(self, passages: List[Dict]):
+        kept, shingles, duplicates = [], [], 0
+        for passage in passages:
+            current = _shingles(passage["text"])
+            if any(_jaccard(current, other) >= self.duplicate_threshold for other in shingles):
+                duplicates += 1
+                continue
+            kept.append(passage)
+            shingles.append(current)
+        return kept, duplicates
+
+
+def _shingles(text: str, size: int = 3) -> set:
+    words = re.findall(r"\w+", text.lower())
+    return {tuple(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))}
+
+
+def _jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
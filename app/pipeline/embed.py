@@ -0,0 +1,212 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterable, Iterator, List, Optional
+
+# google imports
+from google import genai
+from google.genai import types
+
+# internal imports
+from .cache import EmbeddingCache, chunk_content_hash
+from .gateway import GenAIGateway, estimate_request_tokens, get_genai_gateway
+from ..schemas.chunk_batch import ChunkBatch
+from ..schemas.schema import Document
+from ..utils.logger import Logger
+from ..utils.metrics import get_metrics
+
+_log = Logger.get_logger(__name__)
+
+class BatchEmbedder:
+    """Generates embeddings for Documents in batches, keeping a bounded number of requests in flight.
+
+    Consecutive chunks that share a title are grouped into a single `embed_content` request
+    (the title is part of the request config for RETRIEVAL_DOCUMENT embeddings). Batches are
+    dispatched on a thread pool of `max_concurrency` workers and sent through the shared
+    `GenAIGateway`, which rate limits them per model and retries a failed batch as a whole,
+    so a 429 costs one batch retry instead of one retry per chunk.
+
+    When a `store` is configured, every chunk is addressed by its content hash (text, title,
+    model and dimensionality) and looked up there first; only chunks missing from the store
+    are sent to the API, and their embeddings are written back.
+
+    Attributes:
+        client: Google GenAI client (or any object exposing `models.embed_content`).
+        embedding_model (str): The Google GenAI model used to generate embeddings.
+        embedding_dim (int): Dimensionality of the embedding vectors.
+        task_type (str): Embedding task type sent with each request.
+        batch_size (int): Maximum number of chunk texts per request (the Gemini API accepts up to 100).
+        max_concurrency (int): Maximum number of embedding requests in flight at once.
+        max_retries (int): Attempts per batch before giving up.
+        initial_backoff (float): Base delay in seconds for the exponential backoff.
+        store (Optional[EmbeddingCache]): content-addressed embedding store checked before any API call.
+        gateway (GenAIGateway): rate limiter, adaptive concurrency and circuit breaker of the Gemini calls.
+    """
+
+    def __init__(
+        self,
+        client: Optional[Any] = None,
+        embedding_model: str = "gemini-embedding-001",
+        embedding_dim: int = 768,
+        task_type: str = "RETRIEVAL_DOCUMENT",
+        batch_size: int = 100,
+        max_concurrency: int = 4,
+        max_retries: int = 10,
+        initial_backoff: float = 1.0,
+        store: Optional[EmbeddingCache] = None,
+        gateway: Optional[GenAIGateway] = None,
+    ):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+
+        self.client = client or genai.Client()
+        self.embedding_model = embedding_model
+        self.embedding_dim = embedding_dim
+        self.task_type = task_type
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.store = store
+        self.gateway = gateway or get_genai_gateway()
+
+    def embed_documents(self, documents: List[Document]) -> List[Document]:
+        """Fill `embedding` on every Document, preserving the input order.
+
+        Arguments:
+            documents (List[Document]): chunks to embed.
+
+        Returns:
+            The same list of Documents, with embeddings set.
+        """
+        _log.info(
+            f"Starting batched embedding | chunks={len(documents)} | "
+            f"batch_size={self.batch_size} | max_concurrency={self.max_concurrency}"
+        )
+        for _ in self.iter_embedded(documents):
+            pass
+
+        _log.info(f"Completed batched embedding | chunks={len(documents)}")
+        return documents
+
+    def iter_embedded(self, documents: Iterable[Document]) -> Iterator[Document]:
+        """Embed a stream of Documents, yielding each one (in input order) once its embedding is set.
+
+        At most `max_concurrency` batches are in flight; the input iterable is only advanced
+        when a slot frees up, which gives upstream stages backpressure.
+
+        Arguments:
+            documents (Iterable[Document]): chunks to embed, possibly a lazy generator.
+
+        Returns:
+            Iterator over the same Documents, with embeddings set.
+        """
+        for batch in self._iter_completed(documents):
+            yield from batch
+
+    def iter_embedded_batches(self, documents: Iterable[Document]) -> Iterator[ChunkBatch]:
+        """`iter_embedded`, yielding each request batch as a ChunkBatch once it is embedded.
+
+        The store writes the batch's float32 matrix directly, instead of reading the
+        embedding lists back from every Document.
+        """
+        for batch in self._iter_completed(documents):
+            yield ChunkBatch.from_documents(batch)
+
+    def embed_texts(self, texts: List[str], title: Optional[str] = None) -> List[List[float]]:
+        """Embed raw texts in a single batched call (split by `batch_size` if needed)."""
+        embeddings: List[List[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            embeddings.extend(self._call(texts[start:start + self.batch_size], title))
+        return embeddings
+
+    def content_hash(self, doc: Document) -> str:
+        """Address of a chunk's embedding: its text and title, embedded by this model at this dimensionality."""
+        return chunk_content_hash(doc.text, doc.title, self.embedding_model, self.embedding_dim)
+
+    def _iter_batches(self, documents: Iterable[Document]) -> Iterator[List[Document]]:
+        """Group consecutive Documents with the same title into batches of at most `batch_size`."""
+        batch: List[Document] = []
+        for doc in documents:
+            doc.content_hash = self.content_hash(doc)
+            if batch and (len(batch) >= self.batch_size or batch[-1].title != doc.title):
+                yield batch
+                batch = []
+            batch.append(doc)
+        if batch:
+            yield batch
+
+    def _iter_completed(self, documents: Iterable[Document]) -> Iterator[List[Document]]:
+        """Request batches in input order, each yielded once its Documents have their embeddings set."""
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            in_flight = deque()
+            for batch in self._iter_batches(documents):
+                if len(in_flight) >= self.max_concurrency:
+                    yield self._collect(*in_flight.popleft())
+                in_flight.append((batch, executor.submit(self._embed_batch, batch)))
+
+            while in_flight:
+                yield self._collect(*in_flight.popleft())
+
+    @staticmethod
+    def _collect(batch: List[Document], future) -> List[Document]:
+        """Wait for a batch request; its Documents have their embeddings set once it completes."""
+        future.result()
+        return batch
+
+    def _embed_batch(self, batch: List[Document]):
+        """Embed one batch, retried as a whole by the gateway.
+
+        Chunks that already have an embedding, or whose content hash is in the store, are
+        not sent to the API.
+        """
+        pending = [doc for doc in batch if doc.embedding is None]
+        if self.store is not None and pending:
+            for doc in pending:
+                doc.embedding = self.store.get(doc.content_hash)
+            pending = [doc for doc in pending if doc.embedding is None]
+            _log.debug(f"Embedding store lookup | batch={len(batch)} | missing={len(pending)}")
+        if not pending:
+            return
+
+        texts = [doc.text for doc in pending]
+        title = pending[0].title
+
+        try:
+            embeddings = self._call(texts, title)
+        except Exception as e:
+            _log.error(
+                f"Failed to embed batch after {self.max_retries} retries | "
+                f"doc_id={batch[0].document_id} | first_chunk={batch[0].chunk_id} | error={e}"
+            )
+            raise Exception(f"Embedding generation failed after retries: {e}")
+
+        for doc, embedding in zip(pending, embeddings):
+            doc.embedding = embedding
+        if self.store is not None:
+            self.store.set_many({doc.content_hash: doc.embedding for doc in pending})
+
+    def _call(self, texts: List[str], title: Optional[str] = None) -> List[List[float]]:
+        """`_request` through the gateway, with this embedder's retry budget."""
+        with get_metrics().span("embed"):
+            return self.gateway.call(
+                self.embedding_model, lambda: self._request(texts, title), tokens=estimate_request_tokens(texts),
+                max_retries=self.max_retries, initial_backoff=self.initial_backoff,
+            )
+
+    def _request(self, texts: List[str], title: Optional[str] = None) -> List[List[float]]:
+        """Single `embed_content` call for a list of texts."""
+        response = self.client.models.embed_content(
+            model=self.embedding_model,
+            contents=texts,
+            config=types.EmbedContentConfig(
+                title=title,
+                task_type=self.task_type,
+                output_dimensionality=self.embedding_dim,
+            )
+        )
+        embeddings = [embedding.values for embedding in response.embeddings]
+        if len(embeddings) != len(texts):
+            raise ValueError(f"Expected {len(texts)} embeddings, got {len(embeddings)}")
+        return embeddings
@@ -1,7 +1,11 @@
+import hashlib
+import threading
+import multiprocessing
 import pymupdf
-from uuid import uuid4
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pydantic import BaseModel
-from typing import List, Optional, Union
+from typing import Dict, Iterable, Iterator, List, Literal, Optional, Tuple, Union
 from datetime import datetime
 
 # getting current datetime for file saving
@@ -9,36 +13,99 @@ current_datetime = datetime.now()
 formatted_current_datetime = current_datetime.strftime("%Y%m%d%H%M%S")
 
 # internal imports
+from .chunking import Block, Chunk, LayoutChunker, page_blocks
 from ..schemas.schema import Document
 from ..utils.logger import Logger
+from ..utils.metrics import TimedIterator, get_metrics
 
 _log = Logger.get_logger(__name__)
 
+_process_pools: Dict[int, ProcessPoolExecutor] = {}
+_process_pools_lock = threading.Lock()
+
+def _get_process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Process pool shared by every reader with the same worker count.
+
+    Workers are spawned rather than forked, since the API process runs other threads.
+    """
+    with _process_pools_lock:
+        if max_workers not in _process_pools:
+            _process_pools[max_workers] = ProcessPoolExecutor(
+                max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _process_pools[max_workers]
+
+
+def _page_content(page: pymupdf.Page, layout: bool) -> Union[List[Block], str]:
+    """Layout blocks of a page, or its plain text for word chunking."""
+    return page_blocks(page) if layout else page.get_text("text")
+
+
+def _extract_page_range(pdf_bytes: bytes, start: int, stop: int, layout: bool = True) -> List[Union[List[Block], str]]:
+    """Worker task: content (see `_page_content`) of pages [start, stop) of a PDF."""
+    with pymupdf.open(stream=pdf_bytes, filetype="pdf") as pdf_doc:
+        return [_page_content(pdf_doc[page_index], layout) for page_index in range(start, stop)]
+
+
 class PdfReader(BaseModel):
-    """Reader is linked to the user and session."""
+    """Reader is linked to the user and session.
+
+    With `chunking="layout"` (the default), pages are read as headings, paragraphs, lists and
+    tables and grouped by `LayoutChunker` into chunks of about `chunk_tokens` tokens that
+    follow the document structure, continue across pages and carry their character offsets.
+    `chunking="words"` keeps the fixed windows of `chunk_size` words overlapping by
+    `chunk_overlap` words, cut at every page end.
+
+    With `max_workers > 1`, PDFs longer than `pages_per_task` pages are split into page
+    ranges whose text is extracted on a shared process pool. Ranges are merged back in page
+    order, so chunk ids are the same as in a serial read.
+    """
     user_id: Optional[str] = None
     session_id: Optional[str] = None
+    chunking: Literal["layout", "words"] = "layout"
+    chunk_tokens: int = 512
+    min_chunk_tokens: int = 128
     chunk_size: int = 300
     chunk_overlap: int = 50
+    max_workers: int = 1
+    pages_per_task: int = 16
 
     def read(self, pdf_source: Union[str, bytes], original_filename: Optional[str] = None) -> List[Document]:
         """Extract text from PDFs and return configured chunks for indexing"""
-        doc_id = str(uuid4())
-        _log.info(
-            f"Starting PDF read | user_id={self.user_id or 'unknown_user'} | "
-            f"doc_id={doc_id} | chunk_size={self.chunk_size} | chunk_overlap={self.chunk_overlap}"
-        )
+        return list(self.iter_documents(pdf_source, original_filename))
+
+    def read_many(self, sources: List[Tuple[Union[str, bytes], Optional[str]]]) -> List[List[Document]]:
+        """Read several PDFs concurrently; their page ranges share the process pool.
 
+        Arguments:
+            sources (List[Tuple[Union[str, bytes], Optional[str]]]): (pdf_source, original_filename) pairs.
+
+        Returns:
+            The chunks of each PDF, in the order of `sources`.
+        """
+        with ThreadPoolExecutor(max_workers=max(1, min(len(sources), self.max_workers))) as executor:
+            return list(executor.map(lambda source: self.read(*source), sources))
+
+    def iter_documents(self, pdf_source: Union[str, bytes], original_filename: Optional[str] = None) -> Iterator[Document]:
+        """Extract text from PDFs page by page, yielding chunks as soon as each page is read.
+
+        Only one page of text is held in memory at a time, so downstream stages
+        (embedding, bulk indexing) can start before the whole PDF has been read.
+
+        The document id is derived from the file contents, so re-reading an unchanged
+        PDF yields the same ids (and the same chunk `_id`s in the index).
+        """
         # find PDF source type
         if isinstance(pdf_source, str):
             _log.debug(f"PDF source type: path | path={pdf_source}")
-            pdf_doc = pymupdf.open(pdf_source)
+            with open(pdf_source, "rb") as f:
+                pdf_bytes = f.read()
             title = pdf_source.split("/")[-1]
             source_file = pdf_source
 
         elif isinstance(pdf_source, bytes):
             _log.debug(f"PDF source type: bytes | original_filename={original_filename}")
-            pdf_doc = pymupdf.open(stream=pdf_source, filetype="pdf")
+            pdf_bytes = pdf_source
             title = original_filename or f"uploaded_file_{formatted_current_datetime}.pdf"
             source_file = original_filename or "uploaded_bytes.pdf"
 
@@ -46,52 +113,109 @@ class PdfReader(BaseModel):
             _log.error(f"Invalid pdf_source type: {type(pdf_source).__name__}")
             raise ValueError("pdf_source must be a file path or bytes")
 
-        all_documents: List[Document] = []
-        chunk_id = 0
-        total_pages = len(pdf_doc)
-        _log.info(f"Opened PDF successfully | title={title} | pages={total_pages}")
+        doc_id = self.document_id_for(pdf_bytes)
+        if self.chunking == "layout":
+            sizing = f"chunk_tokens={self.chunk_tokens} | min_chunk_tokens={self.min_chunk_tokens}"
+        else:
+            sizing = f"chunk_size={self.chunk_size} | chunk_overlap={self.chunk_overlap}"
+        _log.info(
+            f"Starting PDF read | user_id={self.user_id or 'unknown_user'} | "
+            f"doc_id={doc_id} | chunking={self.chunking} | {sizing}"
+        )
 
-        for page_num, page in enumerate(pdf_doc, start=1):
-            _log.debug(f"Processing page {page_num}/{total_pages}")
-            text = page.get_text("text")
+        # closed even when the consumer stops early or a page fails to extract
+        with pymupdf.open(stream=pdf_bytes, filetype="pdf") as pdf_doc:
+            chunk_id = 0
+            total_pages = len(pdf_doc)
+            _log.info(f"Opened PDF successfully | title={title} | pages={total_pages}")
+
+            # time spent extracting page content, excluding the consumers of the yielded chunks
+            page_contents = TimedIterator(self._iter_page_contents(pdf_doc, pdf_bytes))
+            pages = self._non_empty_pages(page_contents, total_pages)
+            chunks = self._layout_chunks(pages) if self.chunking == "layout" else self._word_chunks(pages)
+            for chunk in chunks:
+                doc = Document(
+                    document_id=doc_id,
+                    title=title,
+                    session_id=self.session_id or "default_session",
+                    user_id=self.user_id or "unknown_user",
+                    chunk_id=chunk_id,
+                    text=chunk.text,
+                    source_file=source_file,
+                    page_number=chunk.page_number,
+                    char_start=chunk.char_start,
+                    char_end=chunk.char_end,
+                )
+                yield doc
+                _log.debug(f"Added chunk {chunk_id} from page {chunk.page_number} | length={len(chunk.text)} chars")
+                chunk_id += 1
+
+            get_metrics().observe("extract", page_contents.elapsed)
+            _log.info(
+                f"Completed PDF read | total_chunks={chunk_id} | "
+                f"total_pages_processed={total_pages} | doc_id={doc_id}"
+            )
 
-            if not text.strip():
+    @staticmethod
+    def _non_empty_pages(page_contents: Iterable, total_pages: int) -> Iterator[Tuple[int, Union[List[Block], str]]]:
+        """(page number, content) of the pages with text."""
+        for page_num, content in enumerate(page_contents, start=1):
+            _log.debug(f"Processing page {page_num}/{total_pages}")
+            if not (content.strip() if isinstance(content, str) else content):
                 _log.warning(f"Page {page_num} contains no extractable text. Skipping.")
                 continue
+            yield page_num, content
+
+    def _layout_chunks(self, pages: Iterable[Tuple[int, List[Block]]]) -> Iterator[Chunk]:
+        return LayoutChunker(self.chunk_tokens, self.min_chunk_tokens).chunk(pages)
 
+    def _word_chunks(self, pages: Iterable[Tuple[int, str]]) -> Iterator[Chunk]:
+        for page_num, text in pages:
             chunks = self._chunk_text(text)
             _log.debug(
                 f"Page {page_num}: extracted {len(chunks)} chunks | "
                 f"avg_chunk_length={sum(len(c) for c in chunks) / len(chunks):.1f} chars"
             )
-
             for chunk_text in chunks:
                 if not chunk_text.strip():
                     _log.debug(f"Skipping empty chunk on page {page_num}")
                     continue
+                yield Chunk(chunk_text, page_num, None, None)
 
-                doc = Document(
-                    document_id=doc_id,
-                    title=title,
-                    session_id=self.session_id or "default_session",
-                    user_id=self.user_id or "unknown_user",
-                    chunk_id=chunk_id,
-                    text=chunk_text,
-                    source_file=source_file,
-                    page_number=page_num
-                )
-                all_documents.append(doc)
-                _log.debug(f"Added chunk {chunk_id} from page {page_num} | length={len(chunk_text)} chars")
-                chunk_id += 1
+    def _iter_page_contents(self, pdf_doc: pymupdf.Document, pdf_bytes: bytes) -> Iterator[Union[List[Block], str]]:
+        """Content of every page (see `_page_content`), in page order; extracted on the process pool for long PDFs.
 
-        _log.info(
-            f"Completed PDF read | total_chunks={len(all_documents)} | "
-            f"total_pages_processed={total_pages} | doc_id={doc_id}"
-        )
-        return all_documents
+        At most two page ranges per worker are in flight, so memory stays bounded.
+        """
+        layout = self.chunking == "layout"
+        total_pages = len(pdf_doc)
+        if self.max_workers <= 1 or total_pages <= self.pages_per_task:
+            for page in pdf_doc:
+                yield _page_content(page, layout)
+            return
+
+        _log.debug(f"Parallel extraction | pages={total_pages} | workers={self.max_workers} | pages_per_task={self.pages_per_task}")
+        pool = _get_process_pool(self.max_workers)
+        ranges = iter(range(0, total_pages, self.pages_per_task))
+        in_flight = deque()
+        try:
+            for start in ranges:
+                if len(in_flight) >= 2 * self.max_workers:
+                    yield from in_flight.popleft().result()
+                in_flight.append(pool.submit(_extract_page_range, pdf_bytes, start, min(start + self.pages_per_task, total_pages), layout))
+            while in_flight:
+                yield from in_flight.popleft().result()
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+    @staticmethod
+    def document_id_for(pdf_bytes: bytes) -> str:
+        """Content-derived document id: the first 128 bits of the file's SHA-256."""
+        return hashlib.sha256(pdf_bytes).hexdigest()[:32]
 
     def _chunk_text(self, text: str) -> List[str]:
-        """Splits text into overlapping chunks by word count."""
+        """Splits text into overlapping chunks by word count (`chunking="words"`)."""
         words = text.split()
         total_words = len(words)
         _log.debug(f"Chunking text | total_words={total_words}")
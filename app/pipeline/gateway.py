@@ -0,0 +1,521 @@
+import os
+import json
+import time
+import random
+import asyncio
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+import httpx
+
+# internal imports
+from .context import estimate_tokens
+from ..utils.logger import Logger
+from ..utils.metrics import get_metrics
+
+_log = Logger.get_logger(__name__)
+
+T = TypeVar("T")
+
+# HTTP statuses worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+
+class CircuitOpenError(Exception):
+    """Raised, without calling the API, while the circuit breaker of a model is open."""
+
+
+def estimate_request_tokens(contents: Any) -> int:
+    """Rough input tokens of `contents`: a text, a list of texts or a list of `types.Content`."""
+    if contents is None:
+        return 0
+    if isinstance(contents, str):
+        return estimate_tokens(contents)
+    total = 0
+    for item in contents:
+        if isinstance(item, str):
+            total += estimate_tokens(item)
+        else:
+            total += sum(estimate_tokens(getattr(part, "text", None) or "") for part in getattr(item, "parts", None) or [])
+    return total
+
+
+class TokenBucket:
+    """Token bucket refilled at `rate_per_minute`, holding at most `capacity` tokens.
+
+    `reserve` takes the tokens right away, letting the balance go negative, and returns how
+    long the caller has to wait before using them. Reservations are served in order and the
+    bucket works the same for threads (`time.sleep`) and coroutines (`asyncio.sleep`).
+
+    Attributes:
+        rate (float): tokens added per second.
+        capacity (float): largest burst; defaults to one second of budget.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute must be positive")
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` tokens; returns the seconds to wait until they are available."""
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            return max(0.0, -self._tokens / self.rate)
+
+    def adjust(self, amount: float):
+        """Take (or give back, if negative) tokens once the actual cost of a request is known."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens - amount)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class AdaptiveConcurrency:
+    """Concurrency limit adjusted with AIMD (additive increase, multiplicative decrease).
+
+    Each success raises the limit by `1 / limit`, i.e. about one slot per round of requests;
+    a rate-limited request multiplies it by `decrease_ratio`, at most once per
+    `decrease_interval` seconds so a burst of 429s from requests already in flight counts
+    once. Threads (`acquire`) and coroutines (`aacquire`) wait for a free slot.
+
+    Attributes:
+        limit (float): current limit; `int(limit)` requests may run at once.
+        min_limit (int): lower bound of the limit.
+        max_limit (int): upper bound of the limit.
+        in_flight (int): requests holding a slot.
+    """
+
+    def __init__(self, max_limit: int = 16, min_limit: int = 1, decrease_ratio: float = 0.5, decrease_interval: float = 1.0):
+        self.limit = float(max_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_ratio = decrease_ratio
+        self.decrease_interval = decrease_interval
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+        self._async_waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    def acquire(self):
+        with self._condition:
+            while not self._try_acquire():
+                self._condition.wait()
+
+    async def aacquire(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condition:
+                if self._try_acquire():
+                    return
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            await waiter
+
+    def release(self, rate_limited: bool = False, succeeded: bool = False):
+        with self._condition:
+            self.in_flight -= 1
+            if rate_limited:
+                now = time.monotonic()
+                if now - self._last_decrease >= self.decrease_interval:
+                    self.limit = max(float(self.min_limit), self.limit * self.decrease_ratio)
+                    self._last_decrease = now
+                    _log.warning(f"GenAI concurrency limit decreased | limit={int(self.limit)}")
+            elif succeeded:
+                self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+            self._condition.notify_all()
+            waiters, self._async_waiters = self._async_waiters, []
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(_wake, waiter)
+
+    def _try_acquire(self) -> bool:
+        if self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return True
+        return False
+
+
+def _wake(waiter: asyncio.Future):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class CircuitBreaker:
+    """Fails fast after `failure_threshold` consecutive server errors, for `cooldown` seconds.
+
+    After the cooldown a single probe request is let through (half-open): its success closes
+    the circuit, its failure opens it again. Rate limiting is not a server failure; it is
+    left to the token buckets and the adaptive concurrency.
+
+    Attributes:
+        failure_threshold (int): consecutive failures opening the circuit.
+        cooldown (float): seconds the circuit stays open before a probe.
+    """
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        return "half_open" if self._probing or time.monotonic() - self._opened_at >= self.cooldown else "open"
+
+    def allow(self) -> Optional[str]:
+        """"closed" or "probe" when a request may be sent (the latter being the half-open probe), else None."""
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if not self._probing and time.monotonic() - self._opened_at >= self.cooldown:
+                self._probing = True
+                return "probe"
+            return None
+
+    def cancel_probe(self):
+        """Give back the probe of a request that was never sent, so the next request probes instead."""
+        with self._lock:
+            self._probing = False
+
+    def record(self, failed: bool):
+        with self._lock:
+            if not failed:
+                self.failures, self._opened_at, self._probing = 0, None, False
+                return
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                self._opened_at, self._probing = time.monotonic(), False
+                _log.warning(f"GenAI circuit opened | consecutive_failures={self.failures} | cooldown={self.cooldown}s")
+
+
+class _Lease:
+    """Slot of one request; set `response` to charge the request's reported token usage."""
+
+    def __init__(self):
+        self.response = None
+
+
+class _ModelGate:
+    """Limits and counters of one model."""
+
+    def __init__(self, requests_per_minute: Optional[float], tokens_per_minute: Optional[float],
+                 concurrency: AdaptiveConcurrency, breaker: CircuitBreaker):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.concurrency = concurrency
+        self.breaker = breaker
+        self.paused_until = 0.0
+        self.counts = {"requests": 0, "rate_limited": 0, "server_errors": 0, "rejected": 0}
+
+
+class GenAIGateway:
+    """Single entry point of the Gemini requests of the pipeline, with limits per model.
+
+    Embeddings (`BatchEmbedder`, `ElasticRetriever`) and generations (`RAGAgent`) call the API
+    through `call` / `acall`, or `slot` / `aslot` for streams whose retries the caller handles.
+    Before a request is sent:
+        1. circuit breaker: fail fast with `CircuitOpenError` while the model's circuit is open.
+        2. shared pause: wait out a `Retry-After` the server sent to any caller of the model.
+        3. token buckets: wait for the model's requests/min and tokens/min budget.
+        4. adaptive concurrency: wait for a slot under the model's AIMD limit.
+    Rate limiting (429), server errors (5xx) and transport errors are retried up to `max_retries`
+    times with full-jitter exponential backoff, never sooner than the server's `Retry-After`
+    header or `RetryInfo` delay. One gateway is shared by the process (`get_genai_gateway`),
+    so concurrent callers slow down together instead of each retrying on its own.
+
+    Attributes:
+        requests_per_minute (Optional[float]): requests/min budget of a model (None: unlimited).
+        tokens_per_minute (Optional[float]): tokens/min budget of a model (None: unlimited).
+        model_limits (Dict[str, Dict[str, float]]): per-model `requests_per_minute` / `tokens_per_minute` overrides.
+        max_concurrency (int): upper bound of the adaptive concurrency limit of each model.
+        min_concurrency (int): lower bound of the adaptive concurrency limit.
+        max_retries (int): attempts per request.
+        initial_backoff (float): base delay in seconds of the exponential backoff.
+        max_backoff (float): largest backoff delay in seconds.
+        failure_threshold (int): consecutive server errors opening a model's circuit.
+        cooldown (float): seconds an open circuit waits before a probe request.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        model_limits: Optional[Dict[str, Dict[str, float]]] = None,
+        max_concurrency: int = 16,
+        min_concurrency: int = 1,
+        max_retries: int = 8,
+        initial_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        failure_threshold: int = 5,
+        cooldown: float = 30.0,
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.model_limits = model_limits or {}
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._gates: Dict[str, _ModelGate] = {}
+        self._lock = threading.Lock()
+
+    def call(self, model: str, request: Callable[[], T], tokens: int = 0,
+             max_retries: Optional[int] = None, initial_backoff: Optional[float] = None) -> T:
+        """Run `request` (one API call to `model`) under the model's limits, retrying transient errors.
+
+        Arguments:
+            model (str): model the request is sent to; limits and counters are kept per model.
+            request (Callable): sends the request and returns its response.
+            tokens (int): estimated input tokens, charged to the tokens/min budget up front.
+            max_retries (Optional[int]): attempts for this request instead of `self.max_retries`.
+            initial_backoff (Optional[float]): backoff base for this request instead of `self.initial_backoff`.
+        """
+        attempts = max_retries or self.max_retries
+        for attempt in range(attempts):
+            try:
+                with self.slot(model, tokens) as lease:
+                    lease.response = request()
+                return lease.response
+            except Exception as e:
+                delay = self.retry_delay(e, attempt, initial_backoff)
+                if delay is None or attempt == attempts - 1:
+                    raise
+                _log.warning(f"GenAI request to '{model}' failed (attempt {attempt + 1}/{attempts}) | error={e} | retrying in {delay:.2f}s")
+                time.sleep(delay)
+
+    async def acall(self, model: str, request: Callable[[], Awaitable[T]], tokens: int = 0,
+                    max_retries: Optional[int] = None, initial_backoff: Optional[float] = None) -> T:
+        """Async variant of `call`; `request` returns an awaitable."""
+        attempts = max_retries or self.max_retries
+        for attempt in range(attempts):
+            try:
+                async with self.aslot(model, tokens) as lease:
+                    lease.response = await request()
+                return lease.response
+            except Exception as e:
+                delay = self.retry_delay(e, attempt, initial_backoff)
+                if delay is None or attempt == attempts - 1:
+                    raise
+                _log.warning(f"GenAI request to '{model}' failed (attempt {attempt + 1}/{attempts}) | error={e} | retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    @contextmanager
+    def slot(self, model: str, tokens: int = 0) -> Iterator[_Lease]:
+        """Admit one request to `model` (see the class docstring) and record how it ended.
+
+        Retries are up to the caller, with `retry_delay`; streams use this directly because
+        they can only be retried before their first token.
+        """
+        gate = self._gate(model)
+        wait, probe = self._admit(model, gate, tokens)
+        lease = _Lease()
+        acquired = False
+        error = None
+        try:
+            # waiting for the rate budget or a permit can be interrupted too
+            time.sleep(wait)
+            gate.concurrency.acquire()
+            acquired = True
+            yield lease
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._finish(model, gate, lease, tokens, error, acquired, probe)
+
+    @asynccontextmanager
+    async def aslot(self, model: str, tokens: int = 0) -> AsyncIterator[_Lease]:
+        """Async variant of `slot`."""
+        gate = self._gate(model)
+        wait, probe = self._admit(model, gate, tokens)
+        lease = _Lease()
+        acquired = False
+        error = None
+        try:
+            # cancellation while waiting must not leak the probe
+            await asyncio.sleep(wait)
+            await gate.concurrency.aacquire()
+            acquired = True
+            yield lease
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._finish(model, gate, lease, tokens, error, acquired, probe)
+
+    def retry_delay(self, error: BaseException, attempt: int, initial_backoff: Optional[float] = None) -> Optional[float]:
+        """Seconds to wait before retrying after `error` on attempt `attempt` (0-based), or None if it is not retryable."""
+        if not _is_retryable(error):
+            return None
+        base = self.initial_backoff if initial_backoff is None else initial_backoff
+        delay = random.uniform(0, min(self.max_backoff, base * 2 ** attempt))  # full jitter
+        return max(delay, _retry_after(error) or 0.0)
+
+    def stats(self) -> Dict[str, Dict]:
+        """Adaptive limit, circuit state and counters of each model."""
+        with self._lock:
+            gates = dict(self._gates)
+        return {
+            model: {
+                "concurrency_limit": int(gate.concurrency.limit),
+                "in_flight": gate.concurrency.in_flight,
+                "circuit": gate.breaker.state,
+                **gate.counts,
+            }
+            for model, gate in gates.items()
+        }
+
+    def _gate(self, model: str) -> _ModelGate:
+        with self._lock:
+            if model not in self._gates:
+                limits = self.model_limits.get(model, {})
+                self._gates[model] = _ModelGate(
+                    requests_per_minute=limits.get("requests_per_minute", self.requests_per_minute),
+                    tokens_per_minute=limits.get("tokens_per_minute", self.tokens_per_minute),
+                    concurrency=AdaptiveConcurrency(self.max_concurrency, self.min_concurrency),
+                    breaker=CircuitBreaker(self.failure_threshold, self.cooldown),
+                )
+            return self._gates[model]
+
+    def _admit(self, model: str, gate: _ModelGate, tokens: int) -> Tuple[float, bool]:
+        """Check the circuit and reserve the rate budget.
+
+        Returns the seconds to wait before sending, and whether the request is the half-open probe.
+        """
+        admission = gate.breaker.allow()
+        if admission is None:
+            gate.counts["rejected"] += 1
+            metrics = get_metrics()
+            metrics.inc(metrics.genai_requests, model=model, outcome="circuit_open")
+            raise CircuitOpenError(f"Circuit open for '{model}' after {gate.breaker.failures} consecutive failures")
+        wait = gate.paused_until - time.monotonic()
+        if gate.requests is not None:
+            wait = max(wait, gate.requests.reserve(1))
+        if gate.tokens is not None and tokens:
+            wait = max(wait, gate.tokens.reserve(tokens))
+        return max(0.0, wait), admission == "probe"
+
+    def _finish(self, model: str, gate: _ModelGate, lease: _Lease, tokens: int, error: Optional[BaseException],
+                acquired: bool, probe: bool):
+        """Record a request that held a permit; a request stopped before that only gives back its probe."""
+        if acquired:
+            self._release(model, gate, lease, tokens, error)
+        elif probe:
+            gate.breaker.cancel_probe()
+
+    def _release(self, model: str, gate: _ModelGate, lease: _Lease, tokens: int, error: Optional[BaseException]):
+        gate.counts["requests"] += 1
+        status = _status_code(error) if error is not None else None
+        metrics = get_metrics()
+        if status == 429:
+            gate.counts["rate_limited"] += 1
+            metrics.inc(metrics.genai_requests, model=model, outcome="rate_limited")
+            retry_after = _retry_after(error)
+            if retry_after:
+                # the server asked every caller to wait, not only this one
+                gate.paused_until = max(gate.paused_until, time.monotonic() + retry_after)
+            gate.concurrency.release(rate_limited=True)
+            gate.breaker.record(failed=False)
+            return
+
+        server_error = error is not None and _is_retryable(error)
+        if server_error:
+            gate.counts["server_errors"] += 1
+        outcome = "success" if error is None else "server_error" if server_error else "error"
+        metrics.inc(metrics.genai_requests, model=model, outcome=outcome)
+        gate.concurrency.release(succeeded=error is None)
+        gate.breaker.record(failed=server_error)
+
+        usage = getattr(lease.response, "usage_metadata", None)
+        actual = getattr(usage, "total_token_count", None)
+        if gate.tokens is not None and isinstance(actual, int):
+            gate.tokens.adjust(actual - tokens)
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    for attribute in ("code", "status_code"):
+        value = getattr(error, attribute, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def _is_retryable(error: BaseException) -> bool:
+    if isinstance(error, (TimeoutError, ConnectionError, httpx.TransportError)):
+        return True
+    return _status_code(error) in RETRYABLE_STATUS
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    """Delay requested by the server: the `Retry-After` header, or the `RetryInfo` detail of a Google API error."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    value = headers.get("retry-after") if headers is not None else None
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+
+    details = getattr(error, "details", None)
+    if isinstance(details, dict):
+        for detail in details.get("error", {}).get("details", []):
+            if str(detail.get("@type", "")).endswith("RetryInfo") and detail.get("retryDelay"):
+                try:
+                    return float(str(detail["retryDelay"]).rstrip("s"))
+                except ValueError:
+                    pass
+    return None
+
+
+_gateway: Optional[GenAIGateway] = None
+_gateway_lock = threading.Lock()
+
+def get_genai_gateway() -> GenAIGateway:
+    """Process-wide gateway shared by every Gemini call of the pipeline.
+
+    Configured through environment variables:
+        GENAI_REQUESTS_PER_MINUTE: requests/min per model (default: unlimited).
+        GENAI_TOKENS_PER_MINUTE: input + output tokens/min per model (default: unlimited).
+        GENAI_MODEL_LIMITS: JSON of per-model overrides, e.g.
+            `{"gemini-2.5-flash": {"requests_per_minute": 1000, "tokens_per_minute": 1000000}}`.
+        GENAI_MAX_CONCURRENCY: upper bound of the adaptive concurrency per model (default: 16).
+        GENAI_MAX_RETRIES: attempts per request (default: 8).
+        GENAI_BREAKER_THRESHOLD: consecutive server errors opening the circuit (default: 5).
+        GENAI_BREAKER_COOLDOWN_SECONDS: seconds before an open circuit lets a probe through (default: 30).
+    """
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            rpm = os.environ.get("GENAI_REQUESTS_PER_MINUTE")
+            tpm = os.environ.get("GENAI_TOKENS_PER_MINUTE")
+            _gateway = GenAIGateway(
+                requests_per_minute=float(rpm) if rpm else None,
+                tokens_per_minute=float(tpm) if tpm else None,
+                model_limits=json.loads(os.environ.get("GENAI_MODEL_LIMITS") or "{}"),
+                max_concurrency=int(os.environ.get("GENAI_MAX_CONCURRENCY", 16)),
+                max_retries=int(os.environ.get("GENAI_MAX_RETRIES", 8)),
+                failure_threshold=int(os.environ.get("GENAI_BREAKER_THRESHOLD", 5)),
+                cooldown=float(os.environ.get("GENAI_BREAKER_COOLDOWN_SECONDS", 30)),
+            )
+            _log.info(f"Initialized GenAI gateway | requests_per_minute={rpm} | tokens_per_minute={tpm}")
+        return _gateway
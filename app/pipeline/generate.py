@@ -1,6 +1,9 @@
+import re
 import time
 import json
-from typing import Optional, Dict, List
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import AsyncIterator, Iterator, Optional, Dict, List, Tuple
 from dotenv import load_dotenv
 
 # google imports
@@ -8,9 +11,14 @@ from google import genai
 from google.genai import types
 
 # internal imports
+from .cache import SemanticAnswerCache
+from .context import ContextBuilder, PackedContext
+from .gateway import GenAIGateway, estimate_request_tokens, get_genai_gateway
+from .rerank import Reranker
 from .retrieve import ElasticRetriever
 from ..schemas.schema import RAGResponse
 from ..utils.logger import Logger
+from ..utils.metrics import format_timings, get_metrics
 from ..prompts.rag  import DEFAULT_RAG_PROMPT_TEMPLATE
 
 # set-ups
@@ -18,6 +26,67 @@ load_dotenv()
 _log = Logger.get_logger(__name__)
 google_client = genai.Client()
 
+_RESPONSE_FIELD = re.compile(r'"response"\s*:\s*"')
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+class _ResponseFieldStreamer:
+    """Incrementally decodes the `response` string of a streamed `RAGResponse` JSON.
+
+    Controlled generation emits the answer as JSON, so raw chunks look like
+    `{"response": "Moto` ... `rs must be...`. Each `feed` returns the newly decoded
+    answer text, handling escape sequences split across chunks.
+    """
+
+    def __init__(self):
+        self.raw = ""
+        self._pos = None  # index of the next undecoded character inside the string
+        self.done = False
+
+    def feed(self, chunk: str) -> str:
+        self.raw += chunk
+        if self.done:
+            return ""
+        if self._pos is None:
+            match = _RESPONSE_FIELD.search(self.raw)
+            if match is None:
+                return ""
+            self._pos = match.end()
+
+        out = []
+        raw, i = self.raw, self._pos
+        while i < len(raw):
+            char = raw[i]
+            if char == '"':
+                self.done = True
+                i += 1
+                break
+            if char != "\\":
+                out.append(char)
+                i += 1
+                continue
+            if i + 1 >= len(raw):
+                break  # escape split across chunks; wait for more
+            if raw[i + 1] != "u":
+                out.append(_ESCAPES.get(raw[i + 1], raw[i + 1]))
+                i += 2
+                continue
+            if i + 6 > len(raw):
+                break
+            code = int(raw[i + 2:i + 6], 16)
+            if 0xD800 <= code < 0xDC00:  # high surrogate: needs the low half as well
+                if i + 12 > len(raw):
+                    break
+                low = int(raw[i + 8:i + 12], 16)
+                out.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                i += 12
+            else:
+                out.append(chr(code))
+                i += 6
+
+        self._pos = i
+        return "".join(out)
+
+
 class RAGAgent:
     def __init__(self,  
                  model: str, 
@@ -26,16 +95,28 @@ class RAGAgent:
                  name: Optional[str] = "RAG Agent",
                  system_instructions: Optional[str] = "You are a Retrieval-Augmented Generation (RAG) Assistant",
                  additional_instructions: Optional[str] = "",
-                 rag_prompt: str = DEFAULT_RAG_PROMPT_TEMPLATE
+                 rag_prompt: str = DEFAULT_RAG_PROMPT_TEMPLATE,
+                 top_k: int = 5,
+                 reranker: Optional[Reranker] = None,
+                 rerank_candidates: int = 20,
+                 context_builder: Optional[ContextBuilder] = None,
+                 answer_cache: Optional[SemanticAnswerCache] = None,
+                 gateway: Optional[GenAIGateway] = None,
                  ):
         
         self.model = model
         self.retriever = retriever
+        self.top_k = top_k
+        self.reranker = reranker
+        self.rerank_candidates = rerank_candidates
+        self.context_builder = context_builder or ContextBuilder()
+        self.answer_cache = answer_cache
         self.similarity_threshold = similarity_threshold
         self.name = name
         self.system_instructions = system_instructions
         self.additional_instructions = additional_instructions
         self.rag_prompt = rag_prompt
+        self.gateway = gateway or get_genai_gateway()
     
     def run(self, user_query: str) -> List[Dict]:
         """Agent run method for generating completions based on documents.
@@ -49,18 +130,408 @@ class RAGAgent:
         Returns:
             string with the agent response.
         """
-        # begin by retrieving context
+        metrics = get_metrics()
+        with metrics.timings() as timings:
+            with metrics.span("question"):
+                # begin by retrieving context
+                _log.info(f"Agent '{self.name} is searching for relevant documents'")
+                retrieved_documents = self._retrieve(user_query)
+                query_embedding = self.retriever.embed_query(user_query) if self.answer_cache is not None else None
+                response = self._answer(user_query, query_embedding, retrieved_documents)
+        self._log_timings(timings)
+        return response
+
+    async def arun(self, user_query: str) -> List[Dict]:
+        """Async variant of `run`.
+
+        Uses the retriever's async search and the async GenAI client, and backs off with
+        `asyncio.sleep`, so a request waiting on Elasticsearch, Gemini or a retry does not
+        hold a threadpool worker.
+
+        Arguments:
+            user_query (str): The user request for retrieve and generation
+
+        Returns:
+            string with the agent response.
+        """
+        metrics = get_metrics()
+        with metrics.timings() as timings:
+            with metrics.span("question"):
+                _log.info(f"Agent '{self.name} is searching for relevant documents'")
+                retrieved_documents = await self._aretrieve(user_query)
+                query_embedding = await self.retriever.aembed_query(user_query) if self.answer_cache is not None else None
+                response = await self._aanswer(user_query, query_embedding, retrieved_documents)
+        self._log_timings(timings)
+        return response
+
+    def run_batch(self, user_queries: List[str], max_concurrency: int = 8) -> Iterator[Dict]:
+        """Answer many questions with shared retrieval and a bounded number of concurrent generations.
+
+        All questions are embedded in batched requests and searched with `msearch` (see
+        `ElasticRetriever.embed_queries` and `search_batch`) instead of one embedding request
+        and one search each. Answers are then generated on `max_concurrency` threads; their
+        requests share the gateway's rate limits, so when one is rate limited all of them slow down.
+
+        Yields events as dicts with `event` and `data` keys, answers in completion order:
+            - `answer`: `{"index": ..., "question": ..., **response}`, `response` as returned by `run`.
+            - `error`: `{"index": ..., "question": ..., "error": ...}` for a question whose generation failed.
+            - `done`: counts, per-stage timings and throughput of the batch (see `_batch_stats`).
+
+        Arguments:
+            user_queries (List[str]): the questions; `index` in the events is their position.
+            max_concurrency (int): generations running at the same time.
+        """
+        start = time.perf_counter()
+        stages: Dict[str, float] = {}
+        query_embeddings, retrieved = self._retrieve_batch(user_queries, stages)
+
+        counts = {"answered": 0, "cached": 0, "failed": 0}
+        generation_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            futures = {
+                executor.submit(self._answer, query, embedding, documents): position
+                for position, (query, embedding, documents) in enumerate(zip(user_queries, query_embeddings, retrieved))
+            }
+            try:
+                for future in as_completed(futures):
+                    position = futures[future]
+                    yield self._batch_event(position, user_queries[position], future.exception() or future.result(), counts)
+            finally:
+                executor.shutdown(cancel_futures=True)  # the caller stopped early: drop the queued questions
+        stages["generate"] = time.perf_counter() - generation_start
+
+        yield {"event": "done", "data": self._batch_stats(len(user_queries), stages, start, counts)}
+
+    async def arun_batch(self, user_queries: List[str], max_concurrency: int = 8) -> AsyncIterator[Dict]:
+        """Async variant of `run_batch`, yielding the same events; generations are bounded by a semaphore."""
+        start = time.perf_counter()
+        stages: Dict[str, float] = {}
+        query_embeddings, retrieved = await self._aretrieve_batch(user_queries, stages)
+
+        counts = {"answered": 0, "cached": 0, "failed": 0}
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def answer(position: int) -> Tuple[int, object]:
+            async with semaphore:
+                try:
+                    return position, await self._aanswer(user_queries[position], query_embeddings[position], retrieved[position])
+                except Exception as e:
+                    return position, e
+
+        generation_start = time.perf_counter()
+        tasks = [asyncio.create_task(answer(position)) for position in range(len(user_queries))]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                position, result = await next_done
+                yield self._batch_event(position, user_queries[position], result, counts)
+        finally:
+            for task in tasks:
+                task.cancel()  # the client went away: stop generating the remaining answers
+        stages["generate"] = time.perf_counter() - generation_start
+
+        yield {"event": "done", "data": self._batch_stats(len(user_queries), stages, start, counts)}
+
+    def run_stream(self, user_query: str) -> Iterator[Dict]:
+        """Streaming variant of `run`, built on `generate_content_stream`.
+
+        Yields events as dicts with `event` and `data` keys:
+            - `token`: `{"text": ...}` pieces of the answer, as soon as they are generated.
+            - `references`: the list of `RAGReference` objects, once the full JSON is parsed.
+            - `done`: `{"ttft_ms": ..., "total_ms": ...}` timings of the request, its token usage and
+              whether the answer came from the answer cache (then it is sent as a single token).
+
+        Retries (with the gateway's backoff) only happen before the first token is sent.
+
+        Arguments:
+            user_query (str): The user request for retrieve and generation
+        """
+        start = time.perf_counter()
         _log.info(f"Agent '{self.name} is searching for relevant documents'")
-        retrieved_documents = self.retriever.retrieve(user_query)
-        
+        retrieved_documents = self._retrieve(user_query)
+        query_embedding = self.retriever.embed_query(user_query) if self.answer_cache is not None else None
+        cached = self._cached_answer(query_embedding, retrieved_documents)
+        if cached is not None:
+            yield from self._cached_stream(cached, start)
+            return
+        with get_metrics().span("context_build"):
+            contents, context = self._build_contents(user_query, retrieved_documents)
+
+        tokens = estimate_request_tokens(contents)
+        max_retries = self.gateway.max_retries
+        for attempt in range(max_retries):
+            streamer = _ResponseFieldStreamer()
+            try:
+                with self.gateway.slot(self.model, tokens) as lease:
+                    _log.info(f"Agent '{self.name}' streaming response")
+                    stream = google_client.models.generate_content_stream(
+                        model=self.model,
+                        contents=contents,
+                        config=self._generation_config(),
+                    )
+                    ttft, last_chunk = None, None
+                    for chunk in stream:
+                        last_chunk = chunk
+                        text = streamer.feed(chunk.text or "")
+                        if text:
+                            ttft = ttft if ttft is not None else time.perf_counter() - start
+                            yield {"event": "token", "data": {"text": text}}
+                    lease.response = last_chunk
+                break
+            except Exception as e:
+                sleep_time = self.gateway.retry_delay(e, attempt)
+                if streamer.raw or sleep_time is None or attempt == max_retries - 1:
+                    _log.error(f"Streaming failed for agent '{self.name}': {e}")
+                    raise
+                _log.warning(f"Could not stream response due to {e}")
+                _log.warning(f"Retrying in {sleep_time:.2f}s...")
+                time.sleep(sleep_time)
+
+        model_response = yield from self._finish_stream(streamer, start, ttft, self._usage(last_chunk, context))
+        self._store_answer(query_embedding, retrieved_documents, model_response)
+
+    async def astream(self, user_query: str) -> AsyncIterator[Dict]:
+        """Async variant of `run_stream`, yielding the same events."""
+        start = time.perf_counter()
+        _log.info(f"Agent '{self.name} is searching for relevant documents'")
+        retrieved_documents = await self._aretrieve(user_query)
+        query_embedding = await self.retriever.aembed_query(user_query) if self.answer_cache is not None else None
+        cached = self._cached_answer(query_embedding, retrieved_documents)
+        if cached is not None:
+            for event in self._cached_stream(cached, start):
+                yield event
+            return
+        with get_metrics().span("context_build"):
+            contents, context = self._build_contents(user_query, retrieved_documents)
+
+        tokens = estimate_request_tokens(contents)
+        max_retries = self.gateway.max_retries
+        for attempt in range(max_retries):
+            streamer = _ResponseFieldStreamer()
+            try:
+                async with self.gateway.aslot(self.model, tokens) as lease:
+                    _log.info(f"Agent '{self.name}' streaming response")
+                    stream = await google_client.aio.models.generate_content_stream(
+                        model=self.model,
+                        contents=contents,
+                        config=self._generation_config(),
+                    )
+                    ttft, last_chunk = None, None
+                    async for chunk in stream:
+                        last_chunk = chunk
+                        text = streamer.feed(chunk.text or "")
+                        if text:
+                            ttft = ttft if ttft is not None else time.perf_counter() - start
+                            yield {"event": "token", "data": {"text": text}}
+                    lease.response = last_chunk
+                break
+            except Exception as e:
+                sleep_time = self.gateway.retry_delay(e, attempt)
+                if streamer.raw or sleep_time is None or attempt == max_retries - 1:
+                    _log.error(f"Streaming failed for agent '{self.name}': {e}")
+                    raise
+                _log.warning(f"Could not stream response due to {e}")
+                _log.warning(f"Retrying in {sleep_time:.2f}s...")
+                await asyncio.sleep(sleep_time)
+
+        # an async generator cannot `yield from`; drive `_finish_stream` by hand to get its parsed answer
+        closing = self._finish_stream(streamer, start, ttft, self._usage(last_chunk, context))
+        while True:
+            try:
+                event = next(closing)
+            except StopIteration as stop:
+                model_response = stop.value
+                break
+            yield event
+        self._store_answer(query_embedding, retrieved_documents, model_response)
+
+    def _answer(self, user_query: str, query_embedding: Optional[List[float]], retrieved_documents: List[Dict]) -> Dict:
+        """Answer to a query whose chunks are already retrieved: from the answer cache, or generated.
+
+        The generation goes through the gateway, which rate limits it and retries 429s and
+        server errors with backoff.
+        """
+        cached = self._cached_answer(query_embedding, retrieved_documents)
+        if cached is not None:
+            return self._cached_response(cached)
+        with get_metrics().span("context_build"):
+            contents, context = self._build_contents(user_query, retrieved_documents)
+
+        _log.info(f"Agent '{self.name}' generating response")
+        try:
+            with get_metrics().span("generation"):
+                response = self.gateway.call(
+                    self.model,
+                    lambda: google_client.models.generate_content(model=self.model, contents=contents, config=self._generation_config()),
+                    tokens=estimate_request_tokens(contents),
+                )
+        except Exception as e:
+            _log.error(f"Generation failed for agent '{self.name}': {e}")
+            raise
+        _log.info(f"Response generated successfully: {response.text[:50]}...")
+
+        return self._model_response(response, context, query_embedding, retrieved_documents)
+
+    async def _aanswer(self, user_query: str, query_embedding: Optional[List[float]], retrieved_documents: List[Dict]) -> Dict:
+        """Async variant of `_answer`."""
+        cached = self._cached_answer(query_embedding, retrieved_documents)
+        if cached is not None:
+            return self._cached_response(cached)
+        with get_metrics().span("context_build"):
+            contents, context = self._build_contents(user_query, retrieved_documents)
+
+        _log.info(f"Agent '{self.name}' generating response")
+        try:
+            with get_metrics().span("generation"):
+                response = await self.gateway.acall(
+                    self.model,
+                    lambda: google_client.aio.models.generate_content(model=self.model, contents=contents, config=self._generation_config()),
+                    tokens=estimate_request_tokens(contents),
+                )
+        except Exception as e:
+            _log.error(f"Generation failed for agent '{self.name}': {e}")
+            raise
+        _log.info(f"Response generated successfully: {response.text[:50]}...")
+
+        return self._model_response(response, context, query_embedding, retrieved_documents)
+
+    def _model_response(self, response, context: PackedContext, query_embedding: Optional[List[float]], retrieved_documents: List[Dict]) -> Dict:
+        """Parse a generated answer, store it in the answer cache and add its token usage."""
+        with get_metrics().span("json_parse"):
+            model_response = json.loads(response.text)
+        self._store_answer(query_embedding, retrieved_documents, model_response)
+        model_response["usage"] = self._usage(response, context)
+        model_response["cached"] = False
+
+        return model_response
+
+    def _retrieve_batch(self, user_queries: List[str], stages: Dict[str, float]) -> Tuple[List[List[float]], List[List[Dict]]]:
+        """Query embeddings and top-k chunks of every query, timing the `embed` and `retrieve` stages."""
+        start = time.perf_counter()
+        query_embeddings = self.retriever.embed_queries(user_queries)
+        stages["embed"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        top_k = self.top_k if self.reranker is None else max(self.rerank_candidates, self.top_k)
+        retrieved = self.retriever.search_batch(user_queries, query_embeddings, top_k=top_k)
+        if self.reranker is not None:
+            retrieved = [self.reranker.rerank(query, candidates, self.top_k) for query, candidates in zip(user_queries, retrieved)]
+        stages["retrieve"] = time.perf_counter() - start
+        return query_embeddings, retrieved
+
+    async def _aretrieve_batch(self, user_queries: List[str], stages: Dict[str, float]) -> Tuple[List[List[float]], List[List[Dict]]]:
+        """Async variant of `_retrieve_batch`; reranking runs in a worker thread."""
+        start = time.perf_counter()
+        query_embeddings = await self.retriever.aembed_queries(user_queries)
+        stages["embed"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        top_k = self.top_k if self.reranker is None else max(self.rerank_candidates, self.top_k)
+        retrieved = await self.retriever.asearch_batch(user_queries, query_embeddings, top_k=top_k)
+        if self.reranker is not None:
+            retrieved = await asyncio.to_thread(
+                lambda: [self.reranker.rerank(query, candidates, self.top_k) for query, candidates in zip(user_queries, retrieved)]
+            )
+        stages["retrieve"] = time.perf_counter() - start
+        return query_embeddings, retrieved
+
+    def _batch_event(self, position: int, user_query: str, result, counts: Dict[str, int]) -> Dict:
+        """`answer` or `error` event of one question of a batch, counted in `counts`."""
+        if isinstance(result, Exception):
+            counts["failed"] += 1
+            _log.error(f"Agent '{self.name}' failed to answer batch question {position}: {result}")
+            return {"event": "error", "data": {"index": position, "question": user_query, "error": str(result)}}
+        counts["answered"] += 1
+        counts["cached"] += result["cached"]
+        return {"event": "answer", "data": {"index": position, "question": user_query, **result}}
+
+    def _batch_stats(self, questions: int, stages: Dict[str, float], start: float, counts: Dict[str, int]) -> Dict:
+        """Counts, duration and throughput (questions/sec) of the batch and of each stage."""
+        total = time.perf_counter() - start
+        stats = {"questions": questions, **counts, "total_ms": round(total * 1000, 1)}
+        for stage, seconds in stages.items():
+            stats[f"{stage}_ms"] = round(seconds * 1000, 1)
+            stats[f"{stage}_per_sec"] = round(questions / seconds, 1) if seconds else None
+        stats["questions_per_sec"] = round(questions / total, 1) if total else None
+        _log.info(
+            f"Agent '{self.name}' answered batch | questions={questions} | answered={counts['answered']} | "
+            f"cached={counts['cached']} | failed={counts['failed']} | " + " | ".join(
+                f"{stage}_per_sec={stats[f'{stage}_per_sec']}" for stage in stages
+            )
+        )
+        return stats
+
+    def _finish_stream(self, streamer: _ResponseFieldStreamer, start: float, ttft: Optional[float], usage: Dict) -> Iterator[Dict]:
+        """Parse the complete JSON and emit the closing events, logging time-to-first-token and total latency.
+
+        Returns the parsed answer once exhausted (the value of `yield from`).
+        """
+        model_response = json.loads(streamer.raw)
+        if ttft is None:
+            # the answer never streamed (e.g. `reference` generated first); send it in one piece
+            ttft = time.perf_counter() - start
+            yield {"event": "token", "data": {"text": model_response.get("response", "")}}
+
+        total = time.perf_counter() - start
+        _log.info(f"Agent '{self.name}' streamed response | ttft_ms={ttft * 1000:.0f} | total_ms={total * 1000:.0f}")
+        yield {"event": "references", "data": model_response.get("reference", [])}
+        yield {"event": "done", "data": {"ttft_ms": round(ttft * 1000, 1), "total_ms": round(total * 1000, 1), "usage": usage, "cached": False}}
+        return model_response
+
+    def _cached_stream(self, answer: Dict, start: float) -> Iterator[Dict]:
+        """Replay a cached answer as the usual `token`, `references` and `done` events."""
+        response = self._cached_response(answer)
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+        yield {"event": "token", "data": {"text": response.get("response", "")}}
+        yield {"event": "references", "data": response.get("reference", [])}
+        yield {"event": "done", "data": {"ttft_ms": elapsed_ms, "total_ms": elapsed_ms, "usage": response["usage"], "cached": True}}
+
+    def _cached_answer(self, query_embedding: Optional[List[float]], retrieved_documents: List[Dict]) -> Optional[Dict]:
+        """Answer of a similar earlier query that retrieved the same chunks, if the answer cache has one."""
+        if self.answer_cache is None:
+            return None
+        answer = self.answer_cache.get(self.retriever.index_name, query_embedding, [doc["id"] for doc in retrieved_documents])
+        if answer is not None:
+            _log.info(f"Agent '{self.name}' answered from the semantic answer cache")
+        return answer
+
+    def _store_answer(self, query_embedding: Optional[List[float]], retrieved_documents: List[Dict], model_response: Dict):
+        if self.answer_cache is not None:
+            self.answer_cache.set(self.retriever.index_name, query_embedding, [doc["id"] for doc in retrieved_documents], dict(model_response))
+
+    @staticmethod
+    def _cached_response(answer: Dict) -> Dict:
+        """A cached answer costs no generation tokens."""
+        return {**answer, "usage": {"prompt_tokens": 0, "output_tokens": 0}, "cached": True}
+
+    def _retrieve(self, user_query: str) -> List[Dict]:
+        """Top-k chunks for the query; with a reranker, over-fetch `rerank_candidates` and keep the best `top_k`."""
+        if self.reranker is None:
+            return self.retriever.retrieve(user_query, top_k=self.top_k)
+        candidates = self.retriever.retrieve(user_query, top_k=max(self.rerank_candidates, self.top_k))
+        with get_metrics().span("rerank"):
+            return self.reranker.rerank(user_query, candidates, self.top_k)
+
+    async def _aretrieve(self, user_query: str) -> List[Dict]:
+        """Async variant of `_retrieve`; reranking runs in a worker thread to keep the event loop free."""
+        if self.reranker is None:
+            return await self.retriever.aretrieve(user_query, top_k=self.top_k)
+        candidates = await self.retriever.aretrieve(user_query, top_k=max(self.rerank_candidates, self.top_k))
+        with get_metrics().span("rerank"):
+            return await asyncio.to_thread(self.reranker.rerank, user_query, candidates, self.top_k)
+
+    def _build_contents(self, user_query: str, retrieved_documents: List[Dict]) -> Tuple[List[types.Content], PackedContext]:
+        """Filter retrieved documents by relevancy, pack them into the context budget and build the Gemini conversation contents."""
         # checking for document relevancy through similarity score
         relevant_documents = [doc for doc in retrieved_documents if doc['score'] >= self.similarity_threshold]
         _log.info(f"Agent '{self.name}' found {len(relevant_documents)} relevant documents from {len(retrieved_documents)} retrieved")
 
+        # merging overlapping chunks, dropping near-duplicates and enforcing the token budget
+        context = self.context_builder.build(relevant_documents)
+
         # defining the formatted context for generation
         formatted_context = "\n\n".join(
             f"Title: {doc['title']}\nScore: {doc['score']}\nContent: {doc['text']}"
-            for doc in relevant_documents
+            for doc in context.passages
         )
         _log.debug(f"Final formatted context from retrieved documents")
         _log.debug(
@@ -95,8 +566,33 @@ class RAGAgent:
                     types.Part.from_text(text=user_query)
                 ]
             )
-        ] 
-        generate_content_config = types.GenerateContentConfig(
+        ]
+        return contents, context
+
+    def _usage(self, response, context: PackedContext) -> Dict:
+        """Token usage of one request: estimated context tokens and the counts reported by Gemini."""
+        metadata = getattr(response, "usage_metadata", None)
+        usage = {
+            **context.stats(),
+            "prompt_tokens": getattr(metadata, "prompt_token_count", None),
+            "output_tokens": getattr(metadata, "candidates_token_count", None),
+        }
+        _log.info(
+            f"Agent '{self.name}' token usage | prompt_tokens={usage['prompt_tokens']} | "
+            f"output_tokens={usage['output_tokens']} | context_tokens={usage['context_tokens']} | "
+            f"passages={usage['passages']}/{usage['candidates']}"
+        )
+        metrics = get_metrics()
+        metrics.inc(metrics.genai_tokens, usage["prompt_tokens"] or 0, model=self.model, type="prompt")
+        metrics.inc(metrics.genai_tokens, usage["output_tokens"] or 0, model=self.model, type="output")
+        return usage
+
+    def _log_timings(self, timings: Dict[str, float]):
+        if timings:
+            _log.info(f"Agent '{self.name}' stage timings | {format_timings(timings)}")
+
+    def _generation_config(self) -> types.GenerateContentConfig:
+        return types.GenerateContentConfig(
             temperature=1,
             top_p=1,
             seed=0,
@@ -112,33 +608,3 @@ class RAGAgent:
             system_instruction=[types.Part.from_text(text=self.system_instructions)],
             thinking_config=types.ThinkingConfig(thinking_budget=0),
         )
-
-        # generating response
-        # developed a retry loop for the 429 resource exhausted problem
-        # the loop has exponential backoff
-        max_retries = 10
-        backoff = 1  # initial delay in seconds
-
-        for attempt in range(max_retries):
-            try:
-                _log.info(f"Agent '{self.name}' generating response")
-                response = google_client.models.generate_content(
-                    model=self.model,
-                    contents=contents,
-                    config=generate_content_config,
-                )
-                _log.info(f"Response generated successfully: {response.text[:50]}...")
-                break 
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    sleep_time = backoff * (2 ** attempt)
-                    _log.warning(f"Could not generate response due to {e}")
-                    _log.warning(f"Retrying in {sleep_time:.2f}s...")
-                    time.sleep(sleep_time)
-                else:
-                    _log.error("Max retries reached. Raising exception.")
-                    raise
-        
-        model_response = json.loads(response.text)
-
-        return model_response
\ No newline at end of file
@@ -1,18 +1,24 @@
 import time
-import random
-from typing import List
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional
 from dotenv import load_dotenv
 
 # elasticsearch imports
-from elasticsearch import Elasticsearch, helpers
+from elasticsearch import Elasticsearch
 
 # google imports
 from google import genai
-from google.genai import types
 
 # internal imports
+from .cache import EmbeddingCache, SemanticAnswerCache, get_answer_cache, get_chunk_embedding_store
+from .bulk import ParallelBulkWriter
+from .embed import BatchEmbedder
+from .store import ElasticVectorStore, VectorStore
 from ..schemas.schema import Document
 from ..utils.logger import Logger
+from ..utils.metrics import TimedIterator, get_metrics
+
+if TYPE_CHECKING:
+    from .ingest import IngestProgress
 
 _log = Logger.get_logger(__name__)
 
@@ -21,7 +27,16 @@ load_dotenv(".env")
 google_client = genai.Client()
 
 class ElasticVectorManager:
-    """Indexes Documents into Elasticsearch, generates embeddings via Google AI."""
+    """Indexes Documents into Elasticsearch, generates embeddings via Google AI.
+
+    Chunks are written through a `VectorStore`: by default an `ElasticVectorStore` on `es`,
+    or any other store passed as `store` (e.g. the embedded `LocalVectorStore`), in which
+    case no Elasticsearch request is made. `migrate_index`, `has_vector_index` and
+    `bulk_load` are Elasticsearch-only. `quantization` ("none", "int8", "int4" or "binary")
+    selects the quantized HNSW index type of newly created Elasticsearch indices; existing
+    indices keep their mapping. `vector_encoding` ("float" or, on Elasticsearch 8.19 / 9.1 and later,
+    "base64") is how embeddings are sent in bulk requests, see `ElasticVectorStore`.
+    """
 
     def __init__(
         self,
@@ -29,103 +44,221 @@ class ElasticVectorManager:
         api_key: str,
         index_name: str,
         embedding_model: str = "gemini-embedding-001",
-        embedding_dim: int = 768
+        embedding_dim: int = 768,
+        embedding_batch_size: int = 100,
+        embedding_concurrency: int = 4,
+        bulk_chunk_size: int = 200,
+        similarity: str = "cosine",
+        hnsw_m: int = 16,
+        hnsw_ef_construction: int = 100,
+        quantization: str = "none",
+        vector_encoding: str = "float",
+        embedding_store: Optional[EmbeddingCache] = None,
+        answer_cache: Optional[SemanticAnswerCache] = None,
+        es: Optional[Elasticsearch] = None,
+        store: Optional[VectorStore] = None,
     ):
         self.elastic_url = elastic_url
         self.api_key = api_key
         self.index_name = index_name
         self.embedding_model = embedding_model
         self.embedding_dim = embedding_dim
+        self.bulk_chunk_size = bulk_chunk_size
+        self.similarity = similarity
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_construction = hnsw_ef_construction
+        self.quantization = quantization
+        self.embedder = BatchEmbedder(
+            client=google_client,
+            embedding_model=self.embedding_model,
+            embedding_dim=self.embedding_dim,
+            task_type="RETRIEVAL_DOCUMENT",
+            batch_size=embedding_batch_size,
+            max_concurrency=embedding_concurrency,
+            store=embedding_store if embedding_store is not None else get_chunk_embedding_store(),
+        )
+        # answers generated from this index go stale whenever its chunks change
+        self.answer_cache = answer_cache if answer_cache is not None else get_answer_cache()
+
+        # Initialize Elasticsearch client (or reuse the one provided)
+        self.es = es or Elasticsearch(self.elastic_url, api_key=self.api_key)
+        self.store = store if store is not None else ElasticVectorStore(
+            self.es, index_name, similarity=similarity, hnsw_m=hnsw_m, hnsw_ef_construction=hnsw_ef_construction,
+            quantization=quantization, vector_encoding=vector_encoding,
+        )
+        _log.info(f"Vector manager for '{index_name}' | store={type(self.store).__name__}")
+
+        self.ensure_index()
 
-        # Initialize Elasticsearch client
-        self.es = Elasticsearch(self.elastic_url, api_key=self.api_key)
-        _log.info(f"Connected to Elasticsearch at {self.elastic_url}")
+    def ensure_index(self):
+        """Create the index if it does not exist (checked once per manager instance)."""
+        if getattr(self, "_index_ready", False):
+            return
 
         # Only create the index if it does not exist
-        if not self.es.indices.exists(index=self.index_name):
+        if not self.store.exists():
             _log.info(f"Index '{self.index_name}' did not exist. Creating index...")
-            self._create_index()
+            self.store.create(self.embedding_dim)
         else:
             _log.info(f"Index '{self.index_name}' already exists. Skipping creation.")
+        self._index_ready = True
 
-    def index_documents(self, documents: List[Document]):
-        """Generate embeddings for chunks and bulk index to Elasticsearch with retry + backoff."""
+    def index_documents(self, documents: List[Document]) -> int:
+        """Generate embeddings for chunks in concurrent batches and bulk index to Elasticsearch."""
         _log.info(f"Starting embedding generation | Total documents to analyze: {len(documents)}")
-        actions = []
+        return self.index_stream(documents)
 
-        for i, doc in enumerate(documents):
-            _log.debug(
-                f"Generating embeddings for document {i+1}/{len(documents)} | "
-                f"Doc Title: {doc.title} | Doc Text: {doc.text[:100]}..."
-            )
+    def index_stream(
+        self,
+        documents: Iterable[Document],
+        progress: Optional["IngestProgress"] = None,
+        known_embeddings: Optional[Dict[str, List[float]]] = None,
+        writer: Optional[ParallelBulkWriter] = None,
+    ) -> int:
+        """Embed and index a stream of Documents with overlapping stages.
+
+        Documents are pulled lazily from `documents`, embedded in bounded concurrent batches
+        (handed to the store as columnar `ChunkBatch`es) and written to the store in batches of
+        `bulk_chunk_size` chunks (`streaming_bulk` requests on Elasticsearch), so memory stays flat and the first chunks reach the index while later pages are
+        still being extracted.
 
-            # retry loop for embeddings
-            max_retries = 10
-            backoff = 1  # seconds
-            embedding = None
-
-            for attempt in range(max_retries):
-                try:
-                    embedding = google_client.models.embed_content(
-                        model=self.embedding_model,
-                        contents=doc.text,
-                        config=types.EmbedContentConfig(
-                            title=doc.title,
-                            task_type="RETRIEVAL_DOCUMENT",
-                            output_dimensionality=self.embedding_dim,
-                        )
-                    ).embeddings[0].values
-                    break 
-                except Exception as e:
-                    wait_time = backoff * (2 ** attempt) + random.uniform(0, 1)
-                    _log.warning(
-                        f"Rate limit hit (attempt {attempt+1}/{max_retries}). "
-                        f"Retrying in {wait_time:.2f}s..."
-                    )
-                    time.sleep(wait_time)
-
-            if embedding is None:
-                _log.error(f"Failed to generate embedding for doc {doc.document_id} after {max_retries} retries")
-                raise Exception("Embedding generation failed after retries")
-
-            doc.embedding = embedding
-            actions.append({
-                "_index": self.index_name,
-                "_id": f"{doc.user_id}_{doc.document_id}_{doc.chunk_id}",
-                "_source": doc.model_dump()
-            })
-
-        _log.info("Embedding generation completed successfully!")
-        _log.info(f"Starting bulk index to {self.index_name}...")
+        Arguments:
+            documents (Iterable[Document]): chunks to index, possibly a lazy generator.
+            progress (Optional[IngestProgress]): counters for embedded and indexed chunks.
+            known_embeddings (Optional[Dict[str, List[float]]]): embeddings by content hash, e.g.
+                the `document_embeddings` of a previous version; matching chunks are not re-embedded.
+            writer (Optional[ParallelBulkWriter]): writer of a `bulk_load`, used instead of `streaming_bulk`.
 
+        Returns:
+            Number of chunks indexed.
+        """
+        if known_embeddings:
+            documents = self._reuse_embeddings(documents, known_embeddings)
+
+        def embedded():
+            for batch in self.embedder.iter_embedded_batches(documents):
+                if progress is not None:
+                    progress.add(chunks_embedded=len(batch))
+                yield batch
+
+        _log.info(f"Starting streaming bulk index to {self.index_name} | chunk_size={self.bulk_chunk_size}")
+        indexed = 0
+        # the store pulls chunks from the embedding stage; only the rest of its time is spent writing
+        upstream = TimedIterator(embedded())
+        start = time.perf_counter()
         try:
-            helpers.bulk(self.es, actions)
-            _log.info(f"Indexed {len(documents)} documents into '{self.index_name}'.")
+            for ok in self.store.write_batches(upstream, batch_size=self.bulk_chunk_size, writer=writer):
+                indexed += ok
+                if progress is not None and ok:
+                    progress.add(chunks_indexed=1)
         except Exception as e:
-            _log.error(f"Failed to complete document indexing: {e}")
+            _log.error(f"Failed to complete document indexing after {indexed} chunks: {e}")
             raise Exception(f"Failed to complete document indexing: {e}")
+        finally:
+            get_metrics().observe("bulk", time.perf_counter() - start - upstream.elapsed)
+            if indexed:
+                self._invalidate_answers()
+
+        _log.info(f"Indexed {indexed} documents into '{self.index_name}'.")
+        return indexed
+
+    def count_chunks(self, document_id: str, user_id: str) -> int:
+        """Number of chunks already indexed for a document of a user."""
+        return self.store.count(document_id, user_id)
+
+    def delete_stale_chunks(self, document_id: str, user_id: str, source_file: str) -> int:
+        """Delete chunks of previous versions of a file, i.e. same user and source file but another document id.
+
+        Returns:
+            Number of chunks deleted.
+        """
+        deleted = self.store.delete_stale(document_id, user_id, source_file)
+        if deleted:
+            _log.info(f"Deleted {deleted} stale chunks of '{source_file}' from '{self.index_name}'")
+            self._invalidate_answers()
+        return deleted
 
-    
-    def _create_index(self):
-        """Internal method for creating Elasticsearch index with mapping for text + embeddings."""
-        mapping = {
-            "mappings": {
-                "properties": {
-                    "document_id": {"type": "keyword"},
-                    "title": {"type": "text"},
-                    "user_id": {"type": "keyword"},
-                    "session_id": {"type": "keyword"},
-                    "chunk_id": {"type": "integer"},
-                    "text": {"type": "text"},
-                    "embedding": {"type": "dense_vector", "dims": self.embedding_dim},
-                    "source_file": {"type": "keyword"},
-                    "page_number": {"type": "integer"}
-                }
-            }
-        }
+    def delete_document(self, document_id: str, user_id: str) -> int:
+        """Delete every chunk of a document of a user.
+
+        Returns:
+            Number of chunks deleted.
+        """
+        deleted = self.store.delete_document(document_id, user_id)
+        if deleted:
+            _log.info(f"Deleted {deleted} chunks of document {document_id} from '{self.index_name}'")
+            self._invalidate_answers()
+        return deleted
+
+    def document_embeddings(self, document_id: str, user_id: str) -> Dict[str, List[float]]:
+        """Embeddings already indexed for a document of a user, by chunk content hash."""
+        return self.store.embeddings(document_id, user_id)
+
+    def bulk_load(self, **options):
+        """Context manager for large ingests: see `ElasticVectorStore.bulk_load` (Elasticsearch stores
+        with an index of their own only, not sessions of a shared index).
+
+        Refreshes and replicas of the index are off inside the block, which yields the load's
+        `ParallelBulkWriter`; pass it to `index_stream` (or `IngestPipeline.run`) to write with
+        parallel bulk requests. Other writes to the index are not affected.
+        """
+        if not isinstance(self.store, ElasticVectorStore):
+            raise ValueError(f"Bulk load mode needs an Elasticsearch store, not {type(self.store).__name__}")
+        return self.store.bulk_load(**options)
+
+    def _reuse_embeddings(self, documents: Iterable[Document], known_embeddings: Dict[str, List[float]]) -> Iterator[Document]:
+        """Set the embedding of every chunk whose content hash is in `known_embeddings`."""
+        reused = total = 0
+        for doc in documents:
+            doc.content_hash = self.embedder.content_hash(doc)
+            if doc.embedding is None and doc.content_hash in known_embeddings:
+                doc.embedding = known_embeddings[doc.content_hash]
+                reused += 1
+            total += 1
+            yield doc
+        _log.info(f"Reused indexed embeddings | chunks={total} | reused={reused} | embedded={total - reused}")
+
+    def _invalidate_answers(self):
+        if self.answer_cache is not None:
+            self.answer_cache.invalidate(self.index_name)
+
+    def migrate_index(self, source_index: str, delete_source: bool = False):
+        """Copy an existing index into this (kNN-mapped) index.
+
+        Indices created before the HNSW mapping store `embedding` without a vector index,
+        so they can only be searched by brute force. This reindexes their chunks into
+        `self.index_name`, which is created with the current mapping, keeping the stored
+        embeddings (no re-embedding). With `delete_source=True` the old index is removed
+        and replaced by an alias of the same name, so clients can keep using it.
+
+        Arguments:
+            source_index (str): name of the index to migrate.
+            delete_source (bool): delete `source_index` and alias its name to the new index.
+        """
+        _log.info(f"Migrating index '{source_index}' into '{self.index_name}'...")
         try:
-            self.es.indices.create(index=self.index_name, body=mapping)
-            _log.info(f"Successfully created index '{self.index_name}'")
+            response = self.es.reindex(
+                source={"index": source_index},
+                dest={"index": self.index_name},
+                wait_for_completion=True,
+                refresh=True,
+            )
+            _log.info(f"Reindexed {response.get('total', 0)} chunks from '{source_index}' to '{self.index_name}'")
+
+            if delete_source:
+                self.es.indices.delete(index=source_index)
+                self.es.indices.put_alias(index=self.index_name, name=source_index)
+                _log.info(f"Deleted '{source_index}' and aliased it to '{self.index_name}'")
         except Exception as e:
-            _log.error(f"Failed to create index '{self.index_name}': {e}")
-            raise Exception(f"Failed to create index '{self.index_name}': {e}")
+            _log.error(f"Failed to migrate index '{source_index}': {e}")
+            raise Exception(f"Failed to migrate index '{source_index}': {e}")
+
+    def has_vector_index(self, index_name: Optional[str] = None) -> bool:
+        """Whether the `embedding` field of an index is mapped for kNN search."""
+        index_name = index_name or self.index_name
+        mappings = self.es.indices.get_mapping(index=index_name)
+        for index_mapping in mappings.values():
+            embedding = index_mapping["mappings"].get("properties", {}).get("embedding", {})
+            if not embedding.get("index", False):
+                return False
+        return True
@@ -0,0 +1,181 @@
+import queue
+import itertools
+import threading
+from typing import Dict, Iterable, Iterator, Optional, TypeVar, Union
+
+# internal imports
+from .bulk import ParallelBulkWriter
+from .extract import PdfReader
+from .index import ElasticVectorManager
+from ..utils.logger import Logger
+
+_log = Logger.get_logger(__name__)
+
+T = TypeVar("T")
+_END = object()
+
+def prefetch(iterable: Iterable[T], maxsize: int = 256) -> Iterator[T]:
+    """Run `iterable` in a background thread, buffering at most `maxsize` items.
+
+    The producer blocks when the buffer is full (backpressure) and stops as soon as the
+    consumer goes away. Exceptions raised by the producer are re-raised in the consumer.
+    """
+    buffer: queue.Queue = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+            put(_END)
+        except BaseException as e:
+            put(e)
+
+    producer = threading.Thread(target=produce, name="prefetch", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
+
+class IngestProgress:
+    """Thread-safe progress counters of an ingest run, updated by the pipeline stages.
+
+    Attributes:
+        pages_extracted (int): pages with text read from the PDFs so far.
+        chunks_embedded (int): chunks whose embedding is set (from the API or the store).
+        chunks_indexed (int): chunks acknowledged by the bulk API.
+    """
+
+    def __init__(self, pages_extracted: int = 0, chunks_embedded: int = 0, chunks_indexed: int = 0):
+        self.pages_extracted = pages_extracted
+        self.chunks_embedded = chunks_embedded
+        self.chunks_indexed = chunks_indexed
+        self._lock = threading.Lock()
+
+    def add(self, pages_extracted: int = 0, chunks_embedded: int = 0, chunks_indexed: int = 0):
+        with self._lock:
+            self.pages_extracted += pages_extracted
+            self.chunks_embedded += chunks_embedded
+            self.chunks_indexed += chunks_indexed
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "pages_extracted": self.pages_extracted,
+                "chunks_embedded": self.chunks_embedded,
+                "chunks_indexed": self.chunks_indexed,
+            }
+
+
+def _count_pages(documents: Iterable, progress: IngestProgress) -> Iterator:
+    """Pass documents through, counting each new page number as an extracted page."""
+    last_page = object()
+    for doc in documents:
+        if doc.page_number != last_page:
+            last_page = doc.page_number
+            progress.add(pages_extracted=1)
+        yield doc
+
+
+class IngestPipeline:
+    """Streams a PDF through extract → embed → bulk-write as overlapping, bounded stages.
+
+    Page extraction runs in its own thread and feeds a bounded buffer; embedding keeps a
+    bounded number of batches in flight; bulk writes go out every `bulk_chunk_size` chunks.
+    Each stage only pulls from the previous one when it has room, so peak memory does not
+    depend on the PDF size.
+
+    Document ids are content-derived, so a PDF that is already fully indexed is skipped.
+    After a revised PDF is indexed, chunks of its previous versions (same user and source
+    file, other document id) are deleted; its unchanged pages are served from the
+    embedding store instead of the API. `run(..., replaces=document_id)` replaces a given
+    document, whatever its file name: its indexed embeddings are reused for unchanged
+    chunks and its chunks are deleted once the new version is indexed.
+
+    If indexing fails, only the chunks already written for the failing PDF are deleted;
+    other documents of the index are left as they were.
+
+    Attributes:
+        reader (PdfReader): extracts and chunks PDF pages.
+        vector_manager (ElasticVectorManager): embeds and writes chunks to Elasticsearch.
+        prefetch_size (int): maximum number of extracted chunks buffered ahead of embedding.
+    """
+
+    def __init__(self, reader: PdfReader, vector_manager: ElasticVectorManager, prefetch_size: int = 256):
+        self.reader = reader
+        self.vector_manager = vector_manager
+        self.prefetch_size = prefetch_size
+
+    def run(
+        self,
+        pdf_source: Union[str, bytes],
+        original_filename: Optional[str] = None,
+        progress: Optional[IngestProgress] = None,
+        skip_existing: bool = True,
+        replaces: Optional[str] = None,
+        writer: Optional[ParallelBulkWriter] = None,
+    ) -> int:
+        """Ingest one PDF and return the number of chunks indexed.
+
+        Arguments:
+            pdf_source (Union[str, bytes]): PDF path or contents.
+            original_filename (Optional[str]): file name used as title/source for bytes input.
+            progress (Optional[IngestProgress]): counters updated while the PDF streams through.
+            skip_existing (bool): return early when the document already has chunks in the index.
+                Disable it to resume an interrupted run, whose chunks may be incomplete.
+            replaces (Optional[str]): id of an indexed document this PDF is a new version of.
+            writer (Optional[ParallelBulkWriter]): writer of a `bulk_load` to index the chunks with.
+        """
+        source = pdf_source if isinstance(pdf_source, str) else original_filename
+        _log.info(f"Starting streaming ingest | index={self.vector_manager.index_name} | source={source}")
+        extracted = self.reader.iter_documents(pdf_source, original_filename)
+        if progress is not None:
+            extracted = _count_pages(extracted, progress)
+        documents = prefetch(extracted, self.prefetch_size)
+
+        first = next(documents, None)
+        if first is None:
+            _log.warning(f"No extractable text in {source}. Nothing to index.")
+            return 0
+
+        existing = self.vector_manager.count_chunks(first.document_id, first.user_id) if skip_existing else 0
+        if existing:
+            documents.close()
+            _log.info(f"Document {first.document_id} is already indexed ({existing} chunks). Skipping.")
+            if progress is not None:
+                progress.add(chunks_embedded=existing, chunks_indexed=existing)
+            return existing
+
+        known = self.vector_manager.document_embeddings(replaces, first.user_id) if replaces else None
+        try:
+            indexed = self.vector_manager.index_stream(itertools.chain([first], documents), progress=progress, known_embeddings=known, writer=writer)
+        except Exception:
+            documents.close()
+            if first.document_id != replaces:
+                rolled_back = self.vector_manager.delete_document(first.document_id, first.user_id)
+                _log.info(f"Rolled back {rolled_back} partially indexed chunks of {source} | doc_id={first.document_id}")
+            raise
+
+        if replaces and replaces != first.document_id:
+            self.vector_manager.delete_document(replaces, first.user_id)
+        self.vector_manager.delete_stale_chunks(first.document_id, first.user_id, first.source_file)
+        return indexed
@@ -0,0 +1,186 @@
+import os
+import re
+import math
+import time
+import threading
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Dict, List, Optional
+
+# internal imports
+from ..utils.logger import Logger
+
+_log = Logger.get_logger(__name__)
+
+_TOKEN = re.compile(r"\w+")
+
+def _tokens(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+
+class Reranker(ABC):
+    """Rescores retrieved chunks against the query and keeps the best ones.
+
+    Subclasses implement `score`, which receives every candidate of a query at once so
+    models can batch them. `rerank` times each call and keeps counters for `stats()`.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.candidates = 0
+        self.total_ms = 0.0
+        self._lock = threading.Lock()
+
+    def rerank(self, query: str, documents: List[Dict], top_n: int) -> List[Dict]:
+        """Return the `top_n` documents by rerank score, each with a `rerank_score` key.
+
+        Arguments:
+            query (str): user question.
+            documents (List[Dict]): retrieved chunks with at least `text` and `score`.
+            top_n (int): number of chunks to keep.
+        """
+        if not documents:
+            return []
+
+        start = time.perf_counter()
+        scores = self.score(query, documents)
+        ranked = sorted(
+            ({**doc, "rerank_score": float(score)} for doc, score in zip(documents, scores)),
+            key=lambda doc: -doc["rerank_score"],
+        )[:top_n]
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        with self._lock:
+            self.calls += 1
+            self.candidates += len(documents)
+            self.total_ms += elapsed_ms
+        _log.info(f"Reranked {len(documents)} candidates to {len(ranked)} | backend={type(self).__name__} | latency_ms={elapsed_ms:.1f}")
+        return ranked
+
+    def stats(self) -> Dict:
+        return {
+            "backend": type(self).__name__,
+            "calls": self.calls,
+            "candidates": self.candidates,
+            "avg_ms": self.total_ms / self.calls if self.calls else 0.0,
+        }
+
+    @abstractmethod
+    def score(self, query: str, documents: List[Dict]) -> List[float]: ...
+
+
+class LexicalReranker(Reranker):
+    """CPU-only reranker: BM25 over the candidate set, blended with the retrieval score.
+
+    Term statistics (IDF, average length) come from the candidates themselves, so no index
+    or model is needed. Query bigrams found verbatim in a chunk add a phrase bonus. Lexical
+    scores are min-max normalized and retrieval scores divided by the best one before blending,
+    so close retrieval scores stay close.
+
+    Attributes:
+        retrieval_weight (float): weight of the original retrieval score, in [0, 1].
+        phrase_weight (float): bonus per matching query bigram, relative to the BM25 score.
+        k1 (float): BM25 term-frequency saturation.
+        b (float): BM25 length normalization.
+    """
+
+    def __init__(self, retrieval_weight: float = 0.5, phrase_weight: float = 0.5, k1: float = 1.2, b: float = 0.75):
+        super().__init__()
+        self.retrieval_weight = retrieval_weight
+        self.phrase_weight = phrase_weight
+        self.k1 = k1
+        self.b = b
+
+    def score(self, query: str, documents: List[Dict]) -> List[float]:
+        query_terms = set(_tokens(query))
+        query_tokens = _tokens(query)
+        query_bigrams = set(zip(query_tokens, query_tokens[1:]))
+        chunks = [_tokens(doc["text"]) for doc in documents]
+        avg_length = sum(len(tokens) for tokens in chunks) / len(chunks) or 1.0
+        document_frequency = Counter(term for tokens in chunks for term in set(tokens) & query_terms)
+
+        lexical = []
+        for tokens in chunks:
+            frequencies = Counter(tokens)
+            norm = self.k1 * (1 - self.b + self.b * len(tokens) / avg_length)
+            bm25 = 0.0
+            for term in query_terms:
+                tf = frequencies.get(term, 0)
+                if tf:
+                    idf = math.log(1 + (len(chunks) - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+                    bm25 += idf * tf * (self.k1 + 1) / (tf + norm)
+            phrases = len(query_bigrams & set(zip(tokens, tokens[1:])))
+            lexical.append(bm25 * (1 + self.phrase_weight * phrases))
+
+        retrieval = [doc.get("score", 0.0) for doc in documents]
+        return [
+            (1 - self.retrieval_weight) * lex + self.retrieval_weight * ret
+            for lex, ret in zip(_min_max(lexical), _max_norm(retrieval))
+        ]
+
+
+class CrossEncoderReranker(Reranker):
+    """Reranker backed by a local cross-encoder from `sentence-transformers`, run on CPU.
+
+    Install the optional dependency with `uv sync --extra rerank`.
+
+    Attributes:
+        model_name (str): Hugging Face cross-encoder model.
+        batch_size (int): (query, chunk) pairs scored per forward pass.
+    """
+
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2", batch_size: int = 32, device: str = "cpu"):
+        super().__init__()
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError as e:
+            raise ImportError(
+                "CrossEncoderReranker requires sentence-transformers. Install it with `uv sync --extra rerank`."
+            ) from e
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.model = CrossEncoder(model_name, device=device)
+        _log.info(f"Loaded cross-encoder '{model_name}' on {device}")
+
+    def score(self, query: str, documents: List[Dict]) -> List[float]:
+        pairs = [(query, doc["text"]) for doc in documents]
+        return list(self.model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False))
+
+
+def _min_max(values: List[float]) -> List[float]:
+    low, high = min(values), max(values)
+    if high <= low:
+        return [1.0 if high > 0 else 0.0 for _ in values]
+    return [(value - low) / (high - low) for value in values]
+
+
+def _max_norm(values: List[float]) -> List[float]:
+    high = max(values)
+    return [max(value, 0.0) / high if high > 0 else 0.0 for value in values]
+
+
+_reranker: Optional[Reranker] = None
+_reranker_lock = threading.Lock()
+
+def get_reranker() -> Optional[Reranker]:
+    """Process-wide reranker used by the API.
+
+    Configured through environment variables:
+        RERANKER: "none" (default), "lexical" or "cross-encoder".
+        RERANKER_MODEL: model of the "cross-encoder" backend (default: cross-encoder/ms-marco-MiniLM-L-6-v2).
+    """
+    global _reranker
+    backend = os.environ.get("RERANKER", "none")
+    if backend == "none":
+        return None
+    with _reranker_lock:
+        if _reranker is None:
+            if backend == "lexical":
+                _reranker = LexicalReranker()
+            elif backend == "cross-encoder":
+                _reranker = CrossEncoderReranker(os.environ.get("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2"))
+            else:
+                raise ValueError(f"Unknown RERANKER '{backend}', expected 'none', 'lexical' or 'cross-encoder'")
+            _log.info(f"Initialized reranker | backend={backend}")
+        return _reranker
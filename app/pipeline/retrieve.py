@@ -1,26 +1,80 @@
-from elasticsearch import Elasticsearch
-from typing import List, Dict
+import re
+from elasticsearch import ApiError, AsyncElasticsearch, Elasticsearch, BadRequestError
+from typing import List, Dict, Optional, Sequence, Tuple
 from google import genai
 from google.genai import types
 
 # internal imports
+from .cache import EmbeddingCache, get_query_embedding_cache, make_cache_key
+from .gateway import GenAIGateway, estimate_request_tokens, get_genai_gateway
+from .store import VectorStore, format_hits, knn_section
 from ..utils.logger import Logger
+from ..utils.metrics import get_metrics
 
 _log = Logger.get_logger(__name__)
 google_client = genai.Client()
 
+SEARCH_MODES = ("knn", "script_score", "hybrid")
+FUSION_METHODS = ("rrf", "weighted")
+# kNN search on a dense_vector field mapped with `index: false` (indices created before the HNSW mapping)
+UNINDEXED_VECTOR_ERROR = re.compile(r"not indexed for knn|must have \[index\] set to \[true\]", re.IGNORECASE)
+# texts per `embed_content` request, the API's batch limit
+QUERY_EMBEDDING_BATCH_SIZE = 100
+
 class ElasticRetriever:
     """Retriver for getting documents stored in a Vector DB
 
-    ElasticRetriever provides semantic search capabilities by combining Google Generative AI 
-    embeddings with Elasticsearch vector search. It allows retrieving the most relevant 
+    ElasticRetriever provides semantic search capabilities by combining Google Generative AI
+    embeddings with Elasticsearch vector search. It allows retrieving the most relevant
     documents from an Elasticsearch index based on semantic similarity to a given query.
 
+    By default it uses the native `knn` search section, which walks the HNSW graph built by
+    `ElasticVectorManager` instead of scoring every chunk in the index. Indices created before
+    the HNSW mapping cannot be searched that way; each search of those is sent again as a
+    brute-force `script_score` query until they are migrated (see `ElasticVectorManager.migrate_index`).
+
+    Note that kNN scores with `cosine` similarity are normalized to `(1 + cosine) / 2`, i.e. in
+    [0, 1], while `script_score` returns the raw cosine in [-1, 1].
+
+    `search_mode="hybrid"` runs a BM25 query over `bm25_fields` next to the kNN search and fuses
+    both rankings, which recovers exact tokens such as part numbers and fault codes that
+    embeddings blur. Fusion uses the Elasticsearch retrievers API (`rrf`, or `linear` for
+    weighted scoring) when the cluster supports it; otherwise (older versions, or a license
+    without RRF) both queries are sent in one `msearch` and fused client-side with the same
+    formula. Hybrid search requires an index mapped for kNN.
+
+    With `store` set (e.g. a `LocalVectorStore`), vector searches go to that store instead of
+    Elasticsearch; `search_mode` then only accepts "knn", as BM25 and fusion need Elasticsearch.
+
+    Many queries can be handled at once: `embed_queries` embeds them in batched requests and
+    `search_batch` sends their searches in one `msearch` per `msearch_batch_size` queries.
+
     Attributes:
         index_name (str): Name of the Elasticsearch index where documents are stored.
         embedding_model (str): The Google GenAI model used to generate embeddings (default: "gemini-embedding-001").
         embedding_dim (int): Dimensionality of the embedding vectors (default: 768).
+        search_mode (str): "knn" for approximate HNSW search, "script_score" for exact brute force or
+            "hybrid" for BM25 + kNN.
+        num_candidates (int): Candidates considered per shard by kNN search; higher is more accurate but slower.
+        fusion (str): hybrid fusion method, "rrf" (reciprocal rank fusion) or "weighted" (min-max normalized scores).
+        bm25_weight (float): weight of the BM25 ranking in the fusion.
+        vector_weight (float): weight of the kNN ranking in the fusion.
+        rank_window_size (int): hits taken from each ranking before fusing.
+        rank_constant (int): RRF constant `k` in `1 / (k + rank)`; higher flattens the rank contribution.
+        bm25_fields (Sequence[str]): text fields searched by BM25, with optional `^boost`.
+        rescore_oversample (Optional[float]): on indices with quantized vectors, rescore `k * oversample`
+            kNN candidates with the raw float vectors (two-phase search).
+        msearch_batch_size (int): queries per `msearch` request of `search_batch`.
+        embedding_cache (EmbeddingCache): Query-embedding cache; defaults to the process-wide shared cache,
+            so retrievers created per request still reuse embeddings of repeated questions.
         es (Elasticsearch): Elasticsearch client instance used to perform search queries.
+        async_es (AsyncElasticsearch): Async client used by `aretrieve`; created on first use if not provided.
+        store (Optional[VectorStore]): store searched instead of Elasticsearch.
+        filters (List[Dict]): filter clauses applied to every search, e.g. the `user_id`/`session_id`
+            terms of a session in a shared index (pre-filtering inside kNN, `filter` context for BM25).
+        routing (Optional[str]): shard routing value of every search, so only the shard holding the
+            filtered chunks is queried.
+        gateway (GenAIGateway): rate limiter, adaptive concurrency and circuit breaker of the embedding calls.
     """
 
     def __init__(
@@ -30,66 +84,520 @@ class ElasticRetriever:
         index_name: str,
         embedding_model: str = "gemini-embedding-001",
         embedding_dim: str = 768,
+        search_mode: str = "knn",
+        num_candidates: int = 100,
+        fusion: str = "rrf",
+        bm25_weight: float = 1.0,
+        vector_weight: float = 1.0,
+        rank_window_size: int = 50,
+        rank_constant: int = 60,
+        bm25_fields: Sequence[str] = ("text", "title"),
+        rescore_oversample: Optional[float] = None,
+        msearch_batch_size: int = 50,
+        embedding_cache: Optional[EmbeddingCache] = None,
+        es: Optional[Elasticsearch] = None,
+        async_es: Optional[AsyncElasticsearch] = None,
+        store: Optional[VectorStore] = None,
+        filters: Optional[List[Dict]] = None,
+        routing: Optional[str] = None,
+        gateway: Optional[GenAIGateway] = None,
     ):
+        if search_mode not in SEARCH_MODES:
+            raise ValueError(f"search_mode must be one of {SEARCH_MODES}, got '{search_mode}'")
+        if store is not None and search_mode != "knn":
+            raise ValueError(f"search_mode '{search_mode}' needs Elasticsearch; {type(store).__name__} only supports 'knn'")
+        if fusion not in FUSION_METHODS:
+            raise ValueError(f"fusion must be one of {FUSION_METHODS}, got '{fusion}'")
+
         self.index_name = index_name
         self.embedding_model = embedding_model
         self.embedding_dim = embedding_dim
+        self.search_mode = search_mode
+        self.num_candidates = num_candidates
+        self.fusion = fusion
+        self.bm25_weight = bm25_weight
+        self.vector_weight = vector_weight
+        self.rank_window_size = rank_window_size
+        self.rank_constant = rank_constant
+        self.bm25_fields = list(bm25_fields)
+        self.rescore_oversample = rescore_oversample
+        self.msearch_batch_size = msearch_batch_size
+        self._native_fusion: Optional[bool] = None  # unknown until the first hybrid search
+        self.embedding_cache = embedding_cache if embedding_cache is not None else get_query_embedding_cache()
+        self.store = store
+        self.filters = list(filters or [])
+        self.routing = routing
+        self.gateway = gateway or get_genai_gateway()
 
-        # Connect to Elasticsearch
-        self.es = Elasticsearch(elastic_url, api_key=api_key)
+        # Connect to Elasticsearch (or reuse the client provided)
+        self.elastic_url = elastic_url
+        self.api_key = api_key
+        self.es = es or Elasticsearch(elastic_url, api_key=api_key)
+        self._async_es = async_es
         _log.info(f"Connected to Elasticsearch at {elastic_url}")
 
-    def retrieve(self, query_text: str, top_k: int = 5) -> List[Dict]:
+    @property
+    def async_es(self) -> AsyncElasticsearch:
+        if self._async_es is None:
+            self._async_es = AsyncElasticsearch(self.elastic_url, api_key=self.api_key)
+        return self._async_es
+
+    def retrieve(self, query_text: str, top_k: int = 5, num_candidates: Optional[int] = None) -> List[Dict]:
         """
         Retrieve top-k most similar documents using precomputed embeddings.
-        Returns a list of dicts with 'title', 'text', and 'score'.
+        Returns a list of dicts with 'id', 'title', 'text', 'score', 'document_id', 'chunk_id' and 'page_number'.
         """
-        _log.info(f"Running vector search | Top-K: {top_k} | Query: {query_text[:50]}...")
+        _log.info(f"Running vector search | Mode: {self.search_mode} | Top-K: {top_k} | Query: {query_text[:50]}...")
 
+        metrics = get_metrics()
         # Generate query embedding locally
+        with metrics.span("query_embed"):
+            query_embedding = self._generate_embeddings(query_text)
+
+        with metrics.span("search"):
+            if self.search_mode == "hybrid":
+                return self.hybrid_search(query_text, query_embedding, top_k=top_k, num_candidates=num_candidates)
+            return self.search_by_vector(query_embedding, top_k=top_k, num_candidates=num_candidates)
+
+    def embed_query(self, query_text: str) -> List[float]:
+        """Embedding of a query, served from the query-embedding cache when it was already computed."""
+        return self._generate_embeddings(query_text)
+
+    async def aembed_query(self, query_text: str) -> List[float]:
+        """Async variant of `embed_query`."""
+        return await self._agenerate_embeddings(query_text)
+
+    def embed_queries(self, query_texts: List[str]) -> List[List[float]]:
+        """Embeddings of many queries: cached ones from the query-embedding cache, the others in
+        `embed_content` requests of up to `QUERY_EMBEDDING_BATCH_SIZE` texts."""
+        keys, embeddings, missing = self._cached_query_embeddings(query_texts)
+        for batch in self._embedding_batches(missing):
+            response = self._embed_content([missing[key] for key in batch])
+            self._cache_query_embeddings(batch, response.embeddings, embeddings)
+        return [embeddings[key] for key in keys]
+
+    async def aembed_queries(self, query_texts: List[str]) -> List[List[float]]:
+        """Async variant of `embed_queries`."""
+        keys, embeddings, missing = self._cached_query_embeddings(query_texts)
+        for batch in self._embedding_batches(missing):
+            response = await self._aembed_content([missing[key] for key in batch])
+            self._cache_query_embeddings(batch, response.embeddings, embeddings)
+        return [embeddings[key] for key in keys]
+
+    def search_batch(
+        self, query_texts: List[str], query_embeddings: List[List[float]], top_k: int = 5, num_candidates: Optional[int] = None
+    ) -> List[List[Dict]]:
+        """Search many already embedded queries, one `msearch` per `msearch_batch_size` queries.
+
+        Runs the same search as `retrieve` for each query (including the script_score and
+        client-side fusion fallbacks) and returns the hits of each query, in order.
+        """
+        num_candidates = num_candidates or self.num_candidates
+        if self.store is not None:
+            return self.store.search_batch(query_embeddings, top_k=top_k, num_candidates=num_candidates)
+
+        results = []
+        for start in range(0, len(query_texts), self.msearch_batch_size):
+            texts = query_texts[start:start + self.msearch_batch_size]
+            embeddings = query_embeddings[start:start + self.msearch_batch_size]
+            searches = self._batch_searches(texts, embeddings, top_k, num_candidates)
+            responses = self.es.msearch(index=self.index_name, searches=searches)["responses"]
+            script_score = self._fall_back_after_batch_error(responses)
+            if script_score is not None:
+                searches = self._batch_searches(texts, embeddings, top_k, num_candidates, script_score=script_score)
+                responses = self.es.msearch(index=self.index_name, searches=searches)["responses"]
+                self._fall_back_after_batch_error(responses, fall_back=False)
+            results.extend(self._batch_hits(responses, top_k))
+        _log.info(f"Batch search | queries={len(query_texts)} | mode={self.search_mode} | top_k={top_k}")
+        return results
+
+    async def asearch_batch(
+        self, query_texts: List[str], query_embeddings: List[List[float]], top_k: int = 5, num_candidates: Optional[int] = None
+    ) -> List[List[Dict]]:
+        """Async variant of `search_batch`."""
+        num_candidates = num_candidates or self.num_candidates
+        if self.store is not None:
+            return self.store.search_batch(query_embeddings, top_k=top_k, num_candidates=num_candidates)
+
+        results = []
+        for start in range(0, len(query_texts), self.msearch_batch_size):
+            texts = query_texts[start:start + self.msearch_batch_size]
+            embeddings = query_embeddings[start:start + self.msearch_batch_size]
+            searches = self._batch_searches(texts, embeddings, top_k, num_candidates)
+            responses = (await self.async_es.msearch(index=self.index_name, searches=searches))["responses"]
+            script_score = self._fall_back_after_batch_error(responses)
+            if script_score is not None:
+                searches = self._batch_searches(texts, embeddings, top_k, num_candidates, script_score=script_score)
+                responses = (await self.async_es.msearch(index=self.index_name, searches=searches))["responses"]
+                self._fall_back_after_batch_error(responses, fall_back=False)
+            results.extend(self._batch_hits(responses, top_k))
+        _log.info(f"Batch search | queries={len(query_texts)} | mode={self.search_mode} | top_k={top_k}")
+        return results
+
+    def retrieve_batch(self, query_texts: List[str], top_k: int = 5, num_candidates: Optional[int] = None) -> List[List[Dict]]:
+        """`retrieve` for many queries: batched embeddings, then `search_batch`."""
+        return self.search_batch(query_texts, self.embed_queries(query_texts), top_k=top_k, num_candidates=num_candidates)
+
+    async def aretrieve_batch(self, query_texts: List[str], top_k: int = 5, num_candidates: Optional[int] = None) -> List[List[Dict]]:
+        """Async variant of `retrieve_batch`."""
+        query_embeddings = await self.aembed_queries(query_texts)
+        return await self.asearch_batch(query_texts, query_embeddings, top_k=top_k, num_candidates=num_candidates)
+
+    def search_by_vector(self, query_embedding: List[float], top_k: int = 5, num_candidates: Optional[int] = None) -> List[Dict]:
+        """Search the index with an already computed query embedding."""
+        if self.store is not None:
+            return self.store.search(query_embedding, top_k=top_k, num_candidates=num_candidates or self.num_candidates)
+        try:
+            response = self.es.search(
+                index=self.index_name, body=self._search_body(query_embedding, top_k, num_candidates), routing=self.routing
+            )
+        except BadRequestError as e:
+            if not self._needs_script_score(e):
+                raise
+            response = self.es.search(
+                index=self.index_name, body=self._script_score_query(query_embedding, top_k), routing=self.routing
+            )
+
+        return self._format_hits(response)
+
+    async def aretrieve(self, query_text: str, top_k: int = 5, num_candidates: Optional[int] = None) -> List[Dict]:
+        """Async variant of `retrieve`, using the async GenAI and Elasticsearch clients."""
+        _log.info(f"Running vector search | Mode: {self.search_mode} | Top-K: {top_k} | Query: {query_text[:50]}...")
+        metrics = get_metrics()
+        with metrics.span("query_embed"):
+            query_embedding = await self._agenerate_embeddings(query_text)
+        with metrics.span("search"):
+            if self.search_mode == "hybrid":
+                return await self.ahybrid_search(query_text, query_embedding, top_k=top_k, num_candidates=num_candidates)
+            return await self.asearch_by_vector(query_embedding, top_k=top_k, num_candidates=num_candidates)
+
+    async def asearch_by_vector(self, query_embedding: List[float], top_k: int = 5, num_candidates: Optional[int] = None) -> List[Dict]:
+        """Async variant of `search_by_vector`."""
+        if self.store is not None:
+            return await self.store.asearch(query_embedding, top_k=top_k, num_candidates=num_candidates or self.num_candidates)
+        try:
+            response = await self.async_es.search(
+                index=self.index_name, body=self._search_body(query_embedding, top_k, num_candidates), routing=self.routing
+            )
+        except BadRequestError as e:
+            if not self._needs_script_score(e):
+                raise
+            response = await self.async_es.search(
+                index=self.index_name, body=self._script_score_query(query_embedding, top_k), routing=self.routing
+            )
+
+        return self._format_hits(response)
+
+    def hybrid_search(self, query_text: str, query_embedding: List[float], top_k: int = 5, num_candidates: Optional[int] = None) -> List[Dict]:
+        """BM25 + kNN search fused with `self.fusion`, natively if the cluster supports it."""
+        num_candidates = num_candidates or self.num_candidates
+        if self._native_fusion is not False:
+            try:
+                response = self.es.search(
+                    index=self.index_name,
+                    body=self._native_hybrid_query(query_text, query_embedding, top_k, num_candidates),
+                    routing=self.routing,
+                )
+                self._native_fusion = True
+                return self._format_hits(response)
+            except ApiError as e:
+                if not self._can_fall_back_to_client_fusion(e.status_code, e):
+                    raise
+
+        searches = self._hybrid_searches(query_text, query_embedding, num_candidates)
+        responses = self.es.msearch(index=self.index_name, searches=searches)["responses"]
+        return self._format_hits(self._fuse_responses(responses, top_k))
+
+    async def ahybrid_search(self, query_text: str, query_embedding: List[float], top_k: int = 5, num_candidates: Optional[int] = None) -> List[Dict]:
+        """Async variant of `hybrid_search`."""
+        num_candidates = num_candidates or self.num_candidates
+        if self._native_fusion is not False:
+            try:
+                response = await self.async_es.search(
+                    index=self.index_name,
+                    body=self._native_hybrid_query(query_text, query_embedding, top_k, num_candidates),
+                    routing=self.routing,
+                )
+                self._native_fusion = True
+                return self._format_hits(response)
+            except ApiError as e:
+                if not self._can_fall_back_to_client_fusion(e.status_code, e):
+                    raise
+
+        searches = self._hybrid_searches(query_text, query_embedding, num_candidates)
+        responses = (await self.async_es.msearch(index=self.index_name, searches=searches))["responses"]
+        return self._format_hits(self._fuse_responses(responses, top_k))
+
+    def _can_fall_back_to_client_fusion(self, status_code: int, error) -> bool:
+        """Switch to client-side fusion when the cluster rejects the retrievers API.
+
+        Only done before a native hybrid search has succeeded; afterwards errors are real.
+        """
+        if self._native_fusion or status_code not in (400, 403):
+            return False
+        _log.warning(
+            f"Native {self.fusion} fusion is not available on '{self.index_name}' ({error}). "
+            f"Falling back to client-side fusion over msearch."
+        )
+        self._native_fusion = False
+        return True
+
+    def _native_hybrid_query(self, query_text: str, query_embedding: List[float], top_k: int, num_candidates: int) -> Dict:
+        """Retrievers API body: `rrf` for reciprocal rank fusion, `linear` for weighted scores."""
+        window = max(self.rank_window_size, top_k)
+        bm25 = {"standard": {"query": self._bm25_query(query_text)}}
+        knn = {"knn": self._knn_section(query_embedding, window, num_candidates)}
+
+        if self.fusion == "rrf":
+            retrievers = [bm25, knn]
+            if self.bm25_weight != 1.0 or self.vector_weight != 1.0:
+                retrievers = [{"retriever": bm25, "weight": self.bm25_weight}, {"retriever": knn, "weight": self.vector_weight}]
+            retriever = {"rrf": {"retrievers": retrievers, "rank_window_size": window, "rank_constant": self.rank_constant}}
+        else:
+            retriever = {
+                "linear": {
+                    "retrievers": [
+                        {"retriever": bm25, "weight": self.bm25_weight, "normalizer": "minmax"},
+                        {"retriever": knn, "weight": self.vector_weight, "normalizer": "minmax"},
+                    ],
+                    "rank_window_size": window,
+                }
+            }
+        return {"size": top_k, "retriever": retriever, "_source": {"excludes": ["embedding"]}}
 
-        query_embedding = self._generate_embeddings(query_text)
+    def _hybrid_searches(self, query_text: str, query_embedding: List[float], num_candidates: int) -> List[Dict]:
+        """msearch lines for client-side fusion: a BM25 search and a kNN search, `rank_window_size` hits each."""
+        header = {"routing": self.routing} if self.routing is not None else {}
+        return [
+            header,
+            {"size": self.rank_window_size, "query": self._bm25_query(query_text), "_source": {"excludes": ["embedding"]}},
+            header,
+            self._knn_query(query_embedding, self.rank_window_size, num_candidates),
+        ]
+
+    def _batch_searches(
+        self, query_texts: List[str], query_embeddings: List[List[float]], top_k: int, num_candidates: int, script_score: bool = False
+    ) -> List[Dict]:
+        """msearch lines running the search of the current mode (or `script_score`) for each query."""
+        if self.search_mode == "hybrid" and self._native_fusion is False:
+            return [
+                line
+                for text, embedding in zip(query_texts, query_embeddings)
+                for line in self._hybrid_searches(text, embedding, num_candidates)
+            ]
+
+        header = {"routing": self.routing} if self.routing is not None else {}
+        searches = []
+        for text, embedding in zip(query_texts, query_embeddings):
+            if script_score:
+                body = self._script_score_query(embedding, top_k)
+            elif self.search_mode == "hybrid":
+                body = self._native_hybrid_query(text, embedding, top_k, num_candidates)
+            else:
+                body = self._search_body(embedding, top_k, num_candidates)
+            searches.extend([header, body])
+        return searches
+
+    def _fall_back_after_batch_error(self, responses: List[Dict], fall_back: bool = True) -> Optional[bool]:
+        """Apply the single-search fallbacks to a failed msearch.
+
+        Returns None when the batch succeeded, otherwise whether to send it again with
+        script_score queries (True) or with the fallback already recorded on the retriever (False).
+        """
+        failed = next((response for response in responses if "error" in response), None)
+        if failed is None:
+            if self.search_mode == "hybrid" and self._native_fusion is None:
+                self._native_fusion = True
+            return None
+
+        if fall_back:
+            status_code = failed.get("status", 500)
+            if self.search_mode == "hybrid" and self._native_fusion is None and self._can_fall_back_to_client_fusion(status_code, failed["error"]):
+                return False
+            if status_code == 400 and self._needs_script_score(failed["error"]):
+                return True
+        _log.error(f"Batch search failed on '{self.index_name}': {failed['error']}")
+        raise Exception(f"Batch search failed on '{self.index_name}': {failed['error']}")
+
+    def _batch_hits(self, responses: List[Dict], top_k: int) -> List[List[Dict]]:
+        """Hits of each query from the responses of `_batch_searches`."""
+        if self.search_mode == "hybrid" and self._native_fusion is False:
+            return [self._format_hits(self._fuse_responses(responses[i:i + 2], top_k)) for i in range(0, len(responses), 2)]
+        return [self._format_hits(response) for response in responses]
+
+    def _fuse_responses(self, responses: List[Dict], top_k: int) -> Dict:
+        """Fuse BM25 and kNN msearch responses into one search-like response of `top_k` hits."""
+        for response in responses:
+            if "error" in response:
+                _log.error(f"Hybrid search failed on '{self.index_name}': {response['error']}")
+                raise Exception(f"Hybrid search failed on '{self.index_name}': {response['error']}")
+        bm25_hits, knn_hits = (response["hits"]["hits"] for response in responses)
+        fused = fuse_rankings(
+            [bm25_hits, knn_hits],
+            [self.bm25_weight, self.vector_weight],
+            method=self.fusion,
+            rank_constant=self.rank_constant,
+        )
+        return {"hits": {"hits": fused[:top_k]}}
+
+    def _bm25_query(self, query_text: str) -> Dict:
+        query = {"multi_match": {"query": query_text, "fields": self.bm25_fields}}
+        if self.filters:
+            return {"bool": {"must": [query], "filter": self.filters}}
+        return query
 
-        # Use script_score to compute similarity (cosineSimilarity)
-        query_body = {
+    def _search_body(self, query_embedding: List[float], top_k: int, num_candidates: Optional[int]) -> Dict:
+        if self.search_mode in ("knn", "hybrid"):
+            return self._knn_query(query_embedding, top_k, num_candidates or self.num_candidates)
+        return self._script_score_query(query_embedding, top_k)
+
+    def _needs_script_score(self, error) -> bool:
+        """Whether a failed kNN search should be sent again as script_score, for this request only.
+
+        Only the error of a vector field mapped without an index qualifies; the search mode is
+        left as it is, so other errors (or a later migration of the index) are not masked.
+        """
+        details = error.body if isinstance(error, ApiError) else error  # the reason is only in the response body
+        if self.search_mode != "knn" or not UNINDEXED_VECTOR_ERROR.search(str(details)):
+            return False
+        _log.warning(
+            f"kNN search failed on '{self.index_name}' ({error}). The index is not mapped for kNN; "
+            f"searching it with script_score. Migrate it with ElasticVectorManager.migrate_index."
+        )
+        return True
+
+    @staticmethod
+    def _format_hits(response) -> List[Dict]:
+        return format_hits(response)
+
+    def _knn_query(self, query_embedding: List[float], top_k: int, num_candidates: int) -> Dict:
+        """Approximate nearest-neighbour search over the HNSW graph."""
+        return {
+            "size": top_k,
+            "knn": self._knn_section(query_embedding, top_k, num_candidates),
+            "_source": {"excludes": ["embedding"]},  # vectors are not needed in the response
+        }
+
+    def _knn_section(self, query_embedding: List[float], k: int, num_candidates: int) -> Dict:
+        return knn_section(query_embedding, k, num_candidates, self.rescore_oversample, self.filters)
+
+    def _script_score_query(self, query_embedding: List[float], top_k: int) -> Dict:
+        """Exact brute-force search: computes cosine similarity against every chunk in the index."""
+        return {
             "size": top_k,
             "query": {
                 "script_score": {
-                    "query": {"match_all": {}},  # search all docs
+                    # search all docs (of the session, in a shared index)
+                    "query": {"bool": {"filter": self.filters}} if self.filters else {"match_all": {}},
                     "script": {
                         "source": "cosineSimilarity(params.query_vector, 'embedding')",
                         "params": {"query_vector": query_embedding}
                     }
                 }
-            }
+            },
+            "_source": {"excludes": ["embedding"]},
         }
 
-        response = self.es.search(index=self.index_name, body=query_body)
+    def _cached_query_embeddings(self, query_texts: List[str]) -> Tuple[List[str], Dict[str, List[float]], Dict[str, str]]:
+        """Cache keys of the queries, the embeddings found in the cache and the texts still to embed (by key)."""
+        keys = [make_cache_key(self.embedding_model, self.embedding_dim, "SEMANTIC_SIMILARITY", text) for text in query_texts]
+        embeddings, missing = {}, {}
+        for key, text in zip(keys, query_texts):
+            cached = self.embedding_cache.get(key)
+            if cached is not None:
+                embeddings[key] = cached
+            else:
+                missing[key] = text  # repeated queries are embedded once
+        _log.debug(f"Query embeddings | queries={len(query_texts)} | cached={len(embeddings)} | to_embed={len(missing)}")
+        return keys, embeddings, missing
 
-        hits = response.get("hits", {}).get("hits", [])
-        _log.info(f"Retrieved {len(hits)} results for query.")
+    @staticmethod
+    def _embedding_batches(missing: Dict[str, str]) -> List[List[str]]:
+        keys = list(missing)
+        return [keys[start:start + QUERY_EMBEDDING_BATCH_SIZE] for start in range(0, len(keys), QUERY_EMBEDDING_BATCH_SIZE)]
 
-        # Extract title, text, and score
-        results = [
-            {
-                "title": hit["_source"]["title"],
-                "text": hit["_source"]["text"],
-                "score": hit["_score"]
-            }
-            for hit in hits
-        ]
+    def _cache_query_embeddings(self, keys: List[str], response_embeddings, embeddings: Dict[str, List[float]]):
+        if len(response_embeddings) != len(keys):
+            raise ValueError(f"Expected {len(keys)} embeddings, got {len(response_embeddings)}")
+        for key, embedding in zip(keys, response_embeddings):
+            embeddings[key] = embedding.values
+            self.embedding_cache.set(key, embedding.values)
 
-        return results
+    def _embed_content(self, contents):
+        """One `embed_content` request for query texts, sent through the gateway."""
+        return self.gateway.call(
+            self.embedding_model,
+            lambda: google_client.models.embed_content(model=self.embedding_model, contents=contents, config=self._embed_config()),
+            tokens=estimate_request_tokens(contents),
+        )
+
+    async def _aembed_content(self, contents):
+        """Async variant of `_embed_content`."""
+        return await self.gateway.acall(
+            self.embedding_model,
+            lambda: google_client.aio.models.embed_content(model=self.embedding_model, contents=contents, config=self._embed_config()),
+            tokens=estimate_request_tokens(contents),
+        )
+
+    def _embed_config(self) -> types.EmbedContentConfig:
+        return types.EmbedContentConfig(task_type="SEMANTIC_SIMILARITY", output_dimensionality=self.embedding_dim)
 
     def _generate_embeddings(self, text: str) -> List[float]:
-        response = google_client.models.embed_content(
-                model=self.embedding_model,
-                contents=text,
-                config=types.EmbedContentConfig(
-                    task_type="SEMANTIC_SIMILARITY",
-                    output_dimensionality=self.embedding_dim,)
-            ).embeddings
-        
-        embedding_values = response[0].values
-
-        return embedding_values
\ No newline at end of file
+        cache_key = make_cache_key(self.embedding_model, self.embedding_dim, "SEMANTIC_SIMILARITY", text)
+        cached = self.embedding_cache.get(cache_key)
+        if cached is not None:
+            _log.debug("Query embedding served from cache")
+            return cached
+
+        response = self._embed_content(text)
+
+        embedding_values = response.embeddings[0].values
+        self.embedding_cache.set(cache_key, embedding_values)
+
+        return embedding_values
+
+    async def _agenerate_embeddings(self, text: str) -> List[float]:
+        cache_key = make_cache_key(self.embedding_model, self.embedding_dim, "SEMANTIC_SIMILARITY", text)
+        cached = self.embedding_cache.get(cache_key)
+        if cached is not None:
+            _log.debug("Query embedding served from cache")
+            return cached
+
+        response = await self._aembed_content(text)
+
+        embedding_values = response.embeddings[0].values
+        self.embedding_cache.set(cache_key, embedding_values)
+
+        return embedding_values
+
+
+def fuse_rankings(rankings: List[List[Dict]], weights: List[float], method: str = "rrf", rank_constant: int = 60) -> List[Dict]:
+    """Fuse ranked lists of Elasticsearch hits into one ranking, keyed by `_id`.
+
+    `rrf` scores a hit with `sum(weight / (rank_constant + rank))` over the lists it appears in
+    (ranks start at 1). `weighted` min-max normalizes each list's scores to [0, 1] and sums
+    them with the weights. Both match the Elasticsearch `rrf` and `linear` retrievers.
+
+    Arguments:
+        rankings (List[List[Dict]]): hits of each ranking, best first.
+        weights (List[float]): weight of each ranking.
+        method (str): "rrf" or "weighted".
+        rank_constant (int): RRF constant.
+
+    Returns:
+        The hits ordered by fused score, with `_score` replaced by it.
+    """
+    fused: Dict[str, Dict] = {}
+    for hits, weight in zip(rankings, weights):
+        if method == "weighted" and hits:
+            scores = [hit["_score"] for hit in hits]
+            low, high = min(scores), max(scores)
+        for rank, hit in enumerate(hits, start=1):
+            if method == "rrf":
+                contribution = weight / (rank_constant + rank)
+            else:
+                contribution = weight * ((hit["_score"] - low) / (high - low) if high > low else 1.0)
+            entry = fused.setdefault(hit["_id"], {**hit, "_score": 0.0})
+            entry["_score"] += contribution
+
+    return sorted(fused.values(), key=lambda hit: -hit["_score"])
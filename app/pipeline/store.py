@@ -0,0 +1,946 @@
+import os
+import json
+import shutil
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+from elasticsearch import AsyncElasticsearch, Elasticsearch, NotFoundError, helpers
+
+# internal imports
+from .bulk import ParallelBulkWriter, bulk_load_settings
+from ..schemas.chunk_batch import VECTOR_ENCODINGS, ChunkBatch, ChunkRow, decode_vector, iter_chunk_batches
+from ..schemas.schema import Document
+from ..utils.logger import Logger
+
+_log = Logger.get_logger(__name__)
+
+# `index_options.type` of the Elasticsearch mapping for each quantization
+ELASTIC_INDEX_TYPES = {"none": "hnsw", "int8": "int8_hnsw", "int4": "int4_hnsw", "binary": "bbq_hnsw"}
+LOCAL_QUANTIZATIONS = ("none", "int8", "binary")
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def chunk_key(doc: Union[Document, ChunkRow]) -> str:
+    """Id of a chunk in every store: one entry per user, document and chunk position."""
+    return f"{doc.user_id}_{doc.document_id}_{doc.chunk_id}"
+
+
+def scope_filters(user_id: str, session_id: str) -> List[Dict]:
+    """Filters selecting the chunks of one user session in a shared index."""
+    return [{"term": {"user_id": user_id}}, {"term": {"session_id": session_id}}]
+
+
+def format_hits(response: Dict) -> List[Dict]:
+    """Search hits as the dicts returned by the retrievers (no embeddings)."""
+    hits = response.get("hits", {}).get("hits", [])
+    _log.info(f"Retrieved {len(hits)} results for query.")
+
+    # Extract title, text, score and the chunk's position in its document
+    return [
+        {
+            "id": hit["_id"],
+            "title": hit["_source"]["title"],
+            "text": hit["_source"]["text"],
+            "score": hit["_score"],
+            "document_id": hit["_source"].get("document_id"),
+            "chunk_id": hit["_source"].get("chunk_id"),
+            "page_number": hit["_source"].get("page_number"),
+            "char_start": hit["_source"].get("char_start"),
+            "char_end": hit["_source"].get("char_end"),
+        }
+        for hit in hits
+    ]
+
+
+def knn_section(
+    query_embedding: List[float],
+    k: int,
+    num_candidates: int,
+    rescore_oversample: Optional[float] = None,
+    filters: Optional[List[Dict]] = None,
+) -> Dict:
+    """`knn` section of a search body; with `rescore_oversample`, Elasticsearch gathers
+    `k * oversample` candidates from the quantized vectors and rescores them with the raw floats.
+
+    `filters` are applied during the HNSW search (pre-filtering), so the `k` neighbours are
+    all taken from the matching chunks instead of being filtered out after the search.
+    """
+    section = {
+        "field": "embedding",
+        "query_vector": query_embedding,
+        "k": k,
+        "num_candidates": max(num_candidates, k),
+    }
+    if filters:
+        section["filter"] = {"bool": {"filter": filters}}
+    if rescore_oversample:
+        section["rescore_vector"] = {"oversample": rescore_oversample}
+    return section
+
+
+class VectorStore(ABC):
+    """Storage and vector search of the embedded chunks of one index.
+
+    `ElasticVectorManager` writes through a store and `ElasticRetriever` can search one, so
+    the pipeline runs unchanged on Elasticsearch (`ElasticVectorStore`) or on the embedded
+    `LocalVectorStore`. Scores follow Elasticsearch's cosine kNN convention, `(1 + cosine) / 2`.
+
+    Attributes:
+        index_name (str): name of the index.
+    """
+
+    index_name: str
+
+    @abstractmethod
+    def exists(self) -> bool: ...
+
+    @abstractmethod
+    def create(self, embedding_dim: int):
+        """Create the (empty) index for vectors of `embedding_dim` dimensions."""
+
+    @abstractmethod
+    def write(self, documents: Iterable[Document], batch_size: int = 200) -> Iterator[bool]:
+        """Write embedded chunks in batches of `batch_size`, replacing chunks with the same `chunk_key`.
+
+        Yields one success flag per chunk, as soon as its batch is stored.
+        """
+
+    def write_batches(
+        self, batches: Iterable[ChunkBatch], batch_size: int = 200, writer: Optional[ParallelBulkWriter] = None
+    ) -> Iterator[bool]:
+        """`write` for chunks already grouped in ChunkBatches; stores that can write the
+        columns directly override it. `writer` is the parallel writer of a `bulk_load`,
+        only used by Elasticsearch stores."""
+        return self.write((doc for batch in batches for doc in batch.to_documents()), batch_size=batch_size)
+
+    @abstractmethod
+    def search(self, query_embedding: List[float], top_k: int = 5, num_candidates: Optional[int] = None) -> List[Dict]:
+        """The `top_k` chunks closest to the query, best first."""
+
+    async def asearch(self, query_embedding: List[float], top_k: int = 5, num_candidates: Optional[int] = None) -> List[Dict]:
+        """Async variant of `search`; stores without an async client search inline."""
+        return self.search(query_embedding, top_k=top_k, num_candidates=num_candidates)
+
+    def search_batch(self, query_embeddings: List[List[float]], top_k: int = 5, num_candidates: Optional[int] = None) -> List[List[Dict]]:
+        """`search` for several queries, in order; stores that can score queries together override it."""
+        return [self.search(query_embedding, top_k=top_k, num_candidates=num_candidates) for query_embedding in query_embeddings]
+
+    @abstractmethod
+    def count(self, document_id: str, user_id: str) -> int:
+        """Number of chunks stored for a document of a user."""
+
+    @abstractmethod
+    def delete_stale(self, document_id: str, user_id: str, source_file: str) -> int:
+        """Delete chunks of the same user and source file but another document id; returns how many."""
+
+    @abstractmethod
+    def delete_document(self, document_id: str, user_id: str) -> int:
+        """Delete every chunk of a document of a user; returns how many."""
+
+    @abstractmethod
+    def embeddings(self, document_id: str, user_id: str) -> Dict[str, List[float]]:
+        """Stored embeddings of a document of a user, by chunk `content_hash`."""
+
+    @abstractmethod
+    def drop(self):
+        """Delete the whole index."""
+
+
+class ElasticVectorStore(VectorStore):
+    """Chunks stored in an Elasticsearch index whose `embedding` field is an HNSW `dense_vector`.
+
+    With `quantization` the HNSW graph is built over quantized vectors (`int8_hnsw`, `int4_hnsw`
+    or `bbq_hnsw` for "binary"), cutting the memory the graph needs to 1/4, 1/8 or about 1/32 of
+    float32; Elasticsearch keeps the raw floats on disk, and `rescore_oversample` rescores the
+    quantized candidates with them.
+
+    Attributes:
+        es (Elasticsearch): client used for writes and searches.
+        async_es (Optional[AsyncElasticsearch]): client used by `asearch`, if any.
+        similarity (str): vector similarity of the mapping.
+        hnsw_m (int): HNSW graph connections per node.
+        hnsw_ef_construction (int): HNSW candidates considered while building the graph.
+        quantization (str): "none", "int8", "int4" or "binary".
+        rescore_oversample (Optional[float]): candidates rescored with full precision, as a multiple of k.
+        vector_encoding (str): how embeddings are sent in bulk requests, "float" (a JSON array of
+            numbers, the default) or "base64" (packed float32, Elasticsearch 8.19 / 9.1 and later only).
+    """
+
+    def __init__(
+        self,
+        es: Elasticsearch,
+        index_name: str,
+        async_es: Optional[AsyncElasticsearch] = None,
+        similarity: str = "cosine",
+        hnsw_m: int = 16,
+        hnsw_ef_construction: int = 100,
+        quantization: str = "none",
+        rescore_oversample: Optional[float] = None,
+        vector_encoding: str = "float",
+    ):
+        if quantization not in ELASTIC_INDEX_TYPES:
+            raise ValueError(f"quantization must be one of {tuple(ELASTIC_INDEX_TYPES)}, got '{quantization}'")
+        if vector_encoding not in VECTOR_ENCODINGS:
+            raise ValueError(f"vector_encoding must be one of {VECTOR_ENCODINGS}, got '{vector_encoding}'")
+        self.es = es
+        self.index_name = index_name
+        self.async_es = async_es
+        self.similarity = similarity
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_construction = hnsw_ef_construction
+        self.quantization = quantization
+        self.rescore_oversample = rescore_oversample
+        self.vector_encoding = vector_encoding
+
+    # hooks of stores sharing one physical index between several logical ones
+    routing: Optional[str] = None
+
+    @property
+    def data_index(self) -> str:
+        """Physical index holding the chunks."""
+        return self.index_name
+
+    def scope(self) -> List[Dict]:
+        """Filters selecting this store's chunks in `data_index` (none: the index holds only them)."""
+        return []
+
+    def doc_id(self, doc: Union[Document, ChunkRow]) -> str:
+        return chunk_key(doc)
+
+    def exists(self) -> bool:
+        return bool(self.es.indices.exists(index=self.index_name))
+
+    def create(self, embedding_dim: int):
+        """Create the index with mapping for text + embeddings."""
+        self._create_index(self.index_name, embedding_dim)
+
+    def _create_index(self, index: str, embedding_dim: int):
+        mapping = {
+            "mappings": {
+                "properties": {
+                    "document_id": {"type": "keyword"},
+                    "content_hash": {"type": "keyword"},
+                    "title": {"type": "text"},
+                    "user_id": {"type": "keyword"},
+                    "session_id": {"type": "keyword"},
+                    "chunk_id": {"type": "integer"},
+                    "text": {"type": "text"},
+                    "embedding": {
+                        "type": "dense_vector",
+                        "dims": embedding_dim,
+                        "index": True,  # builds the HNSW graph used by `knn` search
+                        "similarity": self.similarity,
+                        "index_options": {
+                            "type": ELASTIC_INDEX_TYPES[self.quantization],
+                            "m": self.hnsw_m,
+                            "ef_construction": self.hnsw_ef_construction,
+                        },
+                    },
+                    "source_file": {"type": "keyword"},
+                    "page_number": {"type": "integer"},
+                    "char_start": {"type": "integer"},
+                    "char_end": {"type": "integer"}
+                }
+            }
+        }
+        try:
+            self.es.indices.create(index=index, body=mapping)
+            _log.info(f"Successfully created index '{index}'")
+        except Exception as e:
+            _log.error(f"Failed to create index '{index}': {e}")
+            raise Exception(f"Failed to create index '{index}': {e}")
+
+    def write(self, documents: Iterable[Document], batch_size: int = 200) -> Iterator[bool]:
+        return self.write_batches(iter_chunk_batches(documents, batch_size), batch_size=batch_size)
+
+    def write_batches(
+        self, batches: Iterable[ChunkBatch], batch_size: int = 200, writer: Optional[ParallelBulkWriter] = None
+    ) -> Iterator[bool]:
+        actions = (action for batch in batches for action in self._actions(batch))
+        if writer is not None:
+            yield from writer.write(actions)
+            return
+        for ok, _ in helpers.streaming_bulk(self.es, actions, chunk_size=batch_size):
+            yield ok
+
+    @contextmanager
+    def bulk_load(
+        self,
+        workers: int = 4,
+        max_actions: int = 500,
+        max_bytes: int = 10 * 1024 * 1024,
+        max_retries: int = 5,
+        initial_backoff: float = 1.0,
+        force_merge: bool = True,
+    ) -> Iterator[ParallelBulkWriter]:
+        """Tune `data_index` for a large load and yield a `ParallelBulkWriter` for it.
+
+        Refreshes and replicas are turned off during the load (`bulk_load_settings`), and the
+        index is force-merged before they are restored, so `SharedElasticVectorStore` (whose
+        `data_index` holds every session) refuses it. Only writes given the writer (`write_batches(..., writer=writer)`) use
+        it: the store itself is shared and unchanged, so concurrent writes keep
+        `streaming_bulk`. `writer.stats` counts indexed, rejected and failed items and docs/sec.
+        """
+        writer = ParallelBulkWriter(
+            self.es, workers=workers, max_actions=max_actions, max_bytes=max_bytes,
+            max_retries=max_retries, initial_backoff=initial_backoff,
+        )
+        with bulk_load_settings(self.es, self.data_index, force_merge=force_merge):
+            try:
+                yield writer
+            finally:
+                writer.stats.finish()
+                _log.info(f"Bulk load of '{self.index_name}' finished | {writer.stats.snapshot()}")
+
+    def _actions(self, batch: ChunkBatch) -> Iterator[Dict]:
+        for row, source in zip(batch, batch.sources(self.vector_encoding)):
+            action = {"_index": self.data_index, "_id": self.doc_id(row), "_source": source}
+            if self.routing is not None:
+                action["_routing"] = self.routing
+            yield action
+
+    def search(self, query_embedding: List[float], top_k: int = 5, num_candidates: Optional[int] = None) -> List[Dict]:
+        body = self._knn_body(query_embedding, top_k, num_candidates)
+        return format_hits(self.es.search(index=self.data_index, body=body, routing=self.routing))
+
+    async def asearch(self, query_embedding: List[float], top_k: int = 5, num_candidates: Optional[int] = None) -> List[Dict]:
+        if self.async_es is None:
+            return await super().asearch(query_embedding, top_k, num_candidates)
+        body = self._knn_body(query_embedding, top_k, num_candidates)
+        return format_hits(await self.async_es.search(index=self.data_index, body=body, routing=self.routing))
+
+    def count(self, document_id: str, user_id: str) -> int:
+        query = {"bool": {"filter": self._document_filters(document_id, user_id)}}
+        return self.es.count(index=self.data_index, query=query, routing=self.routing)["count"]
+
+    def delete_stale(self, document_id: str, user_id: str, source_file: str) -> int:
+        query = {
+            "bool": {
+                "filter": [{"term": {"user_id": user_id}}, {"term": {"source_file": source_file}}, *self.scope()],
+                "must_not": [{"term": {"document_id": document_id}}],
+            }
+        }
+        response = self.es.delete_by_query(
+            index=self.data_index, query=query, routing=self.routing, refresh=True, conflicts="proceed"
+        )
+        return response.get("deleted", 0)
+
+    def delete_document(self, document_id: str, user_id: str) -> int:
+        # chunks written since the last refresh (e.g. of a failed ingest) are not visible to delete_by_query
+        self.es.indices.refresh(index=self.data_index)
+        query = {"bool": {"filter": self._document_filters(document_id, user_id)}}
+        response = self.es.delete_by_query(
+            index=self.data_index, query=query, routing=self.routing, refresh=True, conflicts="proceed"
+        )
+        return response.get("deleted", 0)
+
+    def embeddings(self, document_id: str, user_id: str) -> Dict[str, List[float]]:
+        """Scrolls the document's chunks, reading only `content_hash` and `embedding` from `_source`.
+
+        Chunks whose `_source` does not return the vector (e.g. indices excluding vectors
+        from `_source`) are left out, so they are embedded again.
+        """
+        hits = helpers.scan(
+            self.es,
+            index=self.data_index,
+            query={"query": {"bool": {"filter": self._document_filters(document_id, user_id)}}},
+            _source=["content_hash", "embedding"],
+            routing=self.routing,
+            size=500,
+        )
+        vectors = {}
+        for hit in hits:
+            source = hit["_source"]
+            if source.get("content_hash") and source.get("embedding") is not None:
+                vectors[source["content_hash"]] = decode_vector(source["embedding"])
+        return vectors
+
+    def _document_filters(self, document_id: str, user_id: str) -> List[Dict]:
+        return [{"term": {"document_id": document_id}}, {"term": {"user_id": user_id}}, *self.scope()]
+
+    def drop(self):
+        self.es.indices.delete(index=self.index_name, ignore_unavailable=True)
+
+    def _knn_body(self, query_embedding: List[float], top_k: int, num_candidates: Optional[int]) -> Dict:
+        return {
+            "size": top_k,
+            "knn": knn_section(query_embedding, top_k, num_candidates or 100, self.rescore_oversample, self.scope()),
+            "_source": {"excludes": ["embedding"]},
+        }
+
+
+class SharedElasticVectorStore(ElasticVectorStore):
+    """Chunks of one user session stored in an Elasticsearch index shared by all sessions.
+
+    One index per session multiplies shards, mappings and HNSW graphs that each hold a few
+    hundred chunks. Here every session writes into `shared_index`, routed by `user_id` so a
+    user's chunks live on one shard, and every request is restricted to the session with
+    `user_id`/`session_id` term filters (applied inside the kNN search, see `knn_section`).
+
+    `index_name` stays the name clients use: it becomes a filtered alias of `shared_index`
+    carrying the same filters and routing, so anything reading through the alias only sees
+    the session's chunks, and `from_alias` recovers the session from the alias alone.
+
+    Attributes:
+        shared_index (str): physical index shared by all sessions.
+        user_id (str): owner of the session; also the shard routing key.
+        session_id (str): session whose chunks this store reads and writes.
+    """
+
+    def __init__(self, es: Elasticsearch, index_name: str, shared_index: str, user_id: str, session_id: str, **options):
+        super().__init__(es, index_name, **options)
+        self.shared_index = shared_index
+        self.user_id = user_id
+        self.session_id = session_id
+        self.routing = user_id
+
+    def bulk_load(self, **options):
+        """Not available: the settings change and force merge would apply to every session of `shared_index`."""
+        raise ValueError(
+            f"Bulk load mode tunes and force-merges the whole index; it is not available for session "
+            f"'{self.index_name}' of the shared index '{self.shared_index}'"
+        )
+
+    @classmethod
+    def from_alias(cls, es: Elasticsearch, index_name: str, **options) -> Optional["SharedElasticVectorStore"]:
+        """Store behind the alias `index_name`, or None when `index_name` is not an alias of a shared index."""
+        try:
+            response = es.indices.get_alias(name=index_name)
+        except NotFoundError:
+            return None
+        for shared_index, definition in response.items():
+            alias = definition.get("aliases", {}).get(index_name, {})
+            terms = {
+                field: value
+                for clause in alias.get("filter", {}).get("bool", {}).get("filter", [])
+                for field, value in clause.get("term", {}).items()
+            }
+            if "user_id" in terms and "session_id" in terms:
+                return cls(es, index_name, shared_index, terms["user_id"], terms["session_id"], **options)
+        return None
+
+    @classmethod
+    def from_index(cls, es: Elasticsearch, index_name: str, shared_index: str, **options) -> "SharedElasticVectorStore":
+        """Store for the chunks of the per-session index `index_name` once merged into `shared_index`.
+
+        Raises:
+            ValueError: when the index is empty or holds chunks of more than one user session.
+        """
+        hits = es.search(index=index_name, size=1, source_includes=["user_id", "session_id"])["hits"]["hits"]
+        if not hits:
+            raise ValueError(f"Index '{index_name}' is empty")
+        store = cls(es, index_name, shared_index, hits[0]["_source"]["user_id"], hits[0]["_source"]["session_id"], **options)
+
+        total = es.count(index=index_name)["count"]
+        in_session = es.count(index=index_name, query={"bool": {"filter": store.scope()}})["count"]
+        if in_session != total:
+            raise ValueError(f"Index '{index_name}' mixes sessions: {total - in_session} of {total} chunks are not in the first chunk's session")
+        return store
+
+    @property
+    def data_index(self) -> str:
+        return self.shared_index
+
+    def scope(self) -> List[Dict]:
+        return scope_filters(self.user_id, self.session_id)
+
+    def doc_id(self, doc: Union[Document, ChunkRow]) -> str:
+        # one shared index holds every session, so the same file uploaded to two sessions needs two ids
+        return f"{doc.user_id}_{doc.session_id}_{doc.document_id}_{doc.chunk_id}"
+
+    def exists(self) -> bool:
+        return bool(self.es.indices.exists_alias(name=self.index_name))
+
+    def create(self, embedding_dim: int):
+        """Create the shared index on first use, then the session's filtered alias."""
+        self._ensure_shared_index(embedding_dim)
+        self._put_alias()
+
+    def _ensure_shared_index(self, embedding_dim: int):
+        if self.es.indices.exists(index=self.shared_index):
+            return
+        try:
+            self._create_index(self.shared_index, embedding_dim)
+        except Exception as e:
+            # another session created it concurrently
+            if "resource_already_exists_exception" not in str(e):
+                raise
+
+    def _put_alias(self):
+        self.es.indices.put_alias(
+            index=self.shared_index, name=self.index_name, filter={"bool": {"filter": self.scope()}}, routing=self.routing
+        )
+        _log.info(f"Aliased '{self.index_name}' to '{self.shared_index}' | user_id={self.user_id} | session_id={self.session_id}")
+
+    def drop(self):
+        """Delete the session's chunks and its alias; the shared index stays."""
+        self.es.delete_by_query(
+            index=self.shared_index, query={"bool": {"filter": self.scope()}}, routing=self.routing,
+            refresh=True, conflicts="proceed",
+        )
+        try:
+            self.es.indices.delete_alias(index=self.shared_index, name=self.index_name)
+        except NotFoundError:
+            pass
+
+    def merge(self, delete_source: bool = True) -> int:
+        """Move the chunks of the per-session index `index_name` into the shared index.
+
+        Chunks are reindexed server-side with the shared ids and routing (no re-embedding).
+        With `delete_source=True` the per-session index is deleted and its name becomes the
+        session's filtered alias, so clients keep using it.
+
+        Returns:
+            Number of chunks copied.
+        """
+        properties = self.es.indices.get_mapping(index=self.index_name)[self.index_name]["mappings"].get("properties", {})
+        self._ensure_shared_index(properties.get("embedding", {}).get("dims", 768))
+        response = self.es.reindex(
+            source={"index": self.index_name},
+            dest={"index": self.shared_index},
+            script={
+                "lang": "painless",
+                "source": (
+                    "ctx._routing = ctx._source.user_id; "
+                    "ctx._id = ctx._source.user_id + '_' + ctx._source.session_id + '_' "
+                    "+ ctx._source.document_id + '_' + ctx._source.chunk_id"
+                ),
+            },
+            wait_for_completion=True,
+            refresh=True,
+        )
+        if response.get("failures"):
+            raise Exception(f"Failed to merge '{self.index_name}' into '{self.shared_index}': {response['failures']}")
+        _log.info(f"Merged {response.get('total', 0)} chunks of '{self.index_name}' into '{self.shared_index}'")
+
+        if delete_source:
+            self.es.indices.delete(index=self.index_name)
+            self._put_alias()
+        return response.get("total", 0)
+
+
+class LocalVectorStore(VectorStore):
+    """Embedded vector store: float32 vectors in a memory-mapped file, chunk metadata in SQLite.
+
+    Each index is a directory under `root` holding `vectors.f32` (one normalized row per
+    chunk, grown by doubling) and `chunks.sqlite` (row number, chunk id, filter columns and
+    the JSON source without the embedding). Search is exact by default: the query block is
+    multiplied with the vector matrix in blocks of `block_rows` rows and the top-k kept with
+    `argpartition`, which for corpora of a few thousand chunks takes well under a millisecond
+    and needs no server, so it also makes tests hermetic.
+
+    With `approximate=True` an inverted-file (IVF) index is built once the store holds
+    `ivf_min_rows` chunks: rows are clustered with spherical k-means into `n_lists` lists
+    and a query only scores the rows of its `n_probe` closest lists. The IVF index lives in
+    memory; it is rebuilt lazily after a restart or once the store has doubled in size.
+
+    With `quantization`, searches scan compact codes instead of the float matrix and rescore
+    the best `top_k * rescore_oversample` candidates with the float rows (read from the
+    memory-mapped file, so only those rows are paged in):
+        - "int8": one signed byte per dimension plus a float32 scale per row (`codes.i8`,
+          `scales.f32`), about 1/4 of float32.
+        - "binary": the sign bit of each dimension (`codes.u8`), 1/32 of float32, compared by
+          Hamming distance.
+    Codes are rebuilt from the float file when an index is opened with another quantization.
+
+    Deleted and replaced chunks leave tombstoned rows that are masked out of every search.
+
+    Attributes:
+        root (str): directory holding one sub-directory per index.
+        index_name (str): name of the index.
+        approximate (bool): search through the IVF index once it is built.
+        n_lists (Optional[int]): IVF lists; defaults to about `sqrt(rows)`.
+        n_probe (int): IVF lists scored per query.
+        ivf_min_rows (int): chunks needed before the IVF index is built.
+        block_rows (int): rows multiplied per block in exact search.
+        quantization (str): "none", "int8" or "binary".
+        rescore_oversample (float): candidates rescored with full precision, as a multiple of `top_k`.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        index_name: str,
+        approximate: bool = False,
+        n_lists: Optional[int] = None,
+        n_probe: int = 8,
+        ivf_min_rows: int = 10000,
+        block_rows: int = 65536,
+        quantization: str = "none",
+        rescore_oversample: float = 4.0,
+    ):
+        if quantization not in LOCAL_QUANTIZATIONS:
+            raise ValueError(f"quantization must be one of {LOCAL_QUANTIZATIONS}, got '{quantization}'")
+        self.root = root
+        self.index_name = index_name
+        self.approximate = approximate
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.ivf_min_rows = ivf_min_rows
+        self.block_rows = block_rows
+        self.quantization = quantization
+        self.rescore_oversample = rescore_oversample
+        self.path = os.path.join(root, index_name)
+        os.makedirs(self.path, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(os.path.join(self.path, "chunks.sqlite"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS chunks (
+                row INTEGER PRIMARY KEY,
+                id TEXT NOT NULL UNIQUE,
+                document_id TEXT,
+                user_id TEXT,
+                source_file TEXT,
+                deleted INTEGER NOT NULL DEFAULT 0,
+                source TEXT NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_document ON chunks (user_id, document_id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_source ON chunks (user_id, source_file)")
+        self._conn.commit()
+
+        self.dim: Optional[int] = None
+        self._vectors: Optional[np.memmap] = None
+        self._codes: Optional[np.memmap] = None
+        self._scales: Optional[np.memmap] = None
+        self._rows = 0
+        self._alive = np.zeros(0, dtype=bool)
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._ivf_rows = 0  # rows covered when the IVF index was built
+        self._open()
+
+    def exists(self) -> bool:
+        return self.dim is not None
+
+    def create(self, embedding_dim: int):
+        with self._lock:
+            if self.dim is not None:
+                return
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                [("dim", str(embedding_dim)), ("quantization", self.quantization)],
+            )
+            self._conn.commit()
+            self.dim = embedding_dim
+            self._map(1024)
+        _log.info(
+            f"Created local vector index '{self.index_name}' | dim={embedding_dim} | "
+            f"quantization={self.quantization} | path={self.path}"
+        )
+
+    def write(self, documents: Iterable[Document], batch_size: int = 200) -> Iterator[bool]:
+        return self.write_batches(iter_chunk_batches(documents, batch_size), batch_size=batch_size)
+
+    def write_batches(
+        self, batches: Iterable[ChunkBatch], batch_size: int = 200, writer: Optional[ParallelBulkWriter] = None
+    ) -> Iterator[bool]:
+        for batch in batches:
+            if len(batch):
+                yield from self._write_batch(batch)
+
+    def search(self, query_embedding: List[float], top_k: int = 5, num_candidates: Optional[int] = None) -> List[Dict]:
+        return self.search_batch([query_embedding], top_k=top_k)[0]
+
+    def search_batch(self, query_embeddings: List[List[float]], top_k: int = 5, num_candidates: Optional[int] = None) -> List[List[Dict]]:
+        """Top-k chunks of several queries at once; exact search scores all queries in one matmul per block."""
+        if self.dim is None or not query_embeddings:
+            return [[] for _ in query_embeddings]
+
+        queries = _normalize(np.asarray(query_embeddings, dtype=np.float32))
+        with self._lock:
+            rows, alive = self._rows, self._alive
+            arrays = (self._vectors, self._codes, self._scales)
+            if self.approximate:
+                self._ensure_ivf()
+            centroids, assignments = self._centroids, self._assignments
+
+        if self.approximate and centroids is not None:
+            ranked = [self._search_ivf(query, top_k, arrays, alive[:rows], centroids, assignments[:rows]) for query in queries]
+        else:
+            ranked = self._search_exact(queries, top_k, arrays, alive[:rows], rows)
+
+        results = [self._hits(row_ids, scores) for row_ids, scores in ranked]
+        _log.debug(f"Local vector search | index={self.index_name} | queries={len(queries)} | rows={rows}")
+        return results
+
+    def count(self, document_id: str, user_id: str) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM chunks WHERE document_id = ? AND user_id = ? AND deleted = 0", (document_id, user_id)
+            ).fetchone()[0]
+
+    def delete_stale(self, document_id: str, user_id: str, source_file: str) -> int:
+        with self._lock:
+            rows = [row for (row,) in self._conn.execute(
+                "SELECT row FROM chunks WHERE user_id = ? AND source_file = ? AND document_id != ? AND deleted = 0",
+                (user_id, source_file, document_id),
+            )]
+            self._delete_rows(rows)
+        return len(rows)
+
+    def delete_document(self, document_id: str, user_id: str) -> int:
+        with self._lock:
+            rows = [row for (row,) in self._conn.execute(
+                "SELECT row FROM chunks WHERE user_id = ? AND document_id = ? AND deleted = 0", (user_id, document_id)
+            )]
+            self._delete_rows(rows)
+        return len(rows)
+
+    def embeddings(self, document_id: str, user_id: str) -> Dict[str, List[float]]:
+        """Rows of the document, as stored (normalized, which cosine search does not distinguish)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT row, source FROM chunks WHERE user_id = ? AND document_id = ? AND deleted = 0", (user_id, document_id)
+            ).fetchall()
+            vectors = {}
+            for row, source in rows:
+                content_hash = json.loads(source).get("content_hash")
+                if content_hash:
+                    vectors[content_hash] = self._vectors[row].tolist()
+        return vectors
+
+    def drop(self):
+        with self._lock:
+            self._conn.close()
+            self._vectors = self._codes = self._scales = None
+            shutil.rmtree(self.path, ignore_errors=True)
+            self.dim = None
+        _log.info(f"Dropped local vector index '{self.index_name}'")
+
+    def build_ivf(self, n_lists: Optional[int] = None, iterations: int = 10, seed: int = 0):
+        """Cluster the live rows into `n_lists` lists with spherical k-means."""
+        with self._lock:
+            live = np.flatnonzero(self._alive[:self._rows])
+            if len(live) == 0:
+                return
+            n_lists = min(n_lists or self.n_lists or max(int(np.sqrt(len(live))), 1), len(live))
+            vectors = np.asarray(self._vectors[live])
+
+            rng = np.random.default_rng(seed)
+            centroids = vectors[rng.choice(len(live), n_lists, replace=False)].copy()
+            for _ in range(iterations):
+                labels = np.argmax(vectors @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, labels, vectors)
+                empty = ~np.bincount(labels, minlength=n_lists).astype(bool)
+                sums[empty] = centroids[empty]
+                centroids = _normalize(sums)
+
+            assignments = np.full(len(self._alive), -1, dtype=np.int32)
+            assignments[live] = np.argmax(vectors @ centroids.T, axis=1)
+            self._centroids, self._assignments, self._ivf_rows = centroids, assignments, self._rows
+        _log.info(f"Built IVF index on '{self.index_name}' | rows={len(live)} | lists={n_lists}")
+
+    def memory_usage(self) -> Dict:
+        """Bytes per vector scanned by searches (`search_bytes`) and kept on disk for rescoring (`vector_bytes`)."""
+        vector_bytes = 4 * (self.dim or 0)
+        search_bytes = {"none": vector_bytes, "int8": (self.dim or 0) + 4, "binary": -(-(self.dim or 0) // 8)}[self.quantization]
+        return {
+            "quantization": self.quantization,
+            "vectors": len(self),
+            "search_bytes_per_vector": search_bytes,
+            "vector_bytes_per_vector": vector_bytes,
+            "search_bytes": search_bytes * len(self),
+        }
+
+    def __len__(self) -> int:
+        return int(self._alive[:self._rows].sum())
+
+    def _open(self):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+        if row is None:
+            return
+        self.dim = int(row[0])
+        capacity = os.path.getsize(self._vectors_path) // (4 * self.dim)
+        self._map(capacity)
+        self._rows = self._conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM chunks").fetchone()[0]
+        live = [row for (row,) in self._conn.execute("SELECT row FROM chunks WHERE deleted = 0")]
+        self._alive[live] = True
+
+        stored = self._conn.execute("SELECT value FROM meta WHERE key = 'quantization'").fetchone()
+        if (stored[0] if stored else "none") != self.quantization:
+            _log.info(f"Re-encoding '{self.index_name}' with quantization={self.quantization}")
+            for start in range(0, self._rows, self.block_rows):
+                stop = min(start + self.block_rows, self._rows)
+                self._encode(np.arange(start, stop), np.asarray(self._vectors[start:stop]))
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('quantization', ?)", (self.quantization,))
+            self._conn.commit()
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.path, "vectors.f32")
+
+    def _map(self, capacity: int):
+        """(Re)map the vector (and code) files with room for `capacity` rows, growing them if needed."""
+        self._vectors = self._memmap("vectors.f32", np.float32, (capacity, self.dim))
+        if self.quantization == "int8":
+            self._codes = self._memmap("codes.i8", np.int8, (capacity, self.dim))
+            self._scales = self._memmap("scales.f32", np.float32, (capacity,))
+        elif self.quantization == "binary":
+            self._codes = self._memmap("codes.u8", np.uint8, (capacity, -(-self.dim // 8)))
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(self._alive)] = self._alive[:capacity]
+        self._alive = alive
+        assignments = np.full(capacity, -1, dtype=np.int32)
+        assignments[:len(self._assignments)] = self._assignments[:capacity]
+        self._assignments = assignments
+
+    def _memmap(self, filename: str, dtype, shape) -> np.memmap:
+        path = os.path.join(self.path, filename)
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        with open(path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+
+    def _encode(self, rows, vectors: np.ndarray):
+        """Write the quantized codes of normalized `vectors` at `rows`."""
+        if self.quantization == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127
+            scales[scales == 0] = 1
+            self._codes[rows] = np.rint(vectors / scales[:, None]).astype(np.int8)
+            self._scales[rows] = scales
+        elif self.quantization == "binary":
+            self._codes[rows] = np.packbits(vectors > 0, axis=1)
+
+    def _write_batch(self, batch: ChunkBatch) -> List[bool]:
+        if self.dim is None:
+            self.create(batch.dim)
+        vectors = _normalize(batch.embeddings)
+        keys = [chunk_key(row) for row in batch]
+
+        with self._lock:
+            placeholders = ",".join("?" * len(keys))
+            existing = dict(self._conn.execute(f"SELECT id, row FROM chunks WHERE id IN ({placeholders})", keys).fetchall())
+            rows = []
+            for key in keys:
+                if key not in existing:
+                    existing[key] = self._rows
+                    self._rows += 1
+                rows.append(existing[key])
+            if self._rows > len(self._vectors):
+                self._map(max(self._rows, 2 * len(self._vectors)))
+
+            self._vectors[rows] = vectors
+            self._encode(rows, vectors)
+            self._vectors.flush()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (row, id, document_id, user_id, source_file, deleted, source) VALUES (?, ?, ?, ?, ?, 0, ?)",
+                [
+                    (row, key, source["document_id"], source["user_id"], source["source_file"], json.dumps(source))
+                    for row, key, source in zip(rows, keys, batch.sources(None))
+                ],
+            )
+            self._conn.commit()
+            self._alive[rows] = True
+            if self._centroids is not None:
+                self._assignments[rows] = np.argmax(vectors @ self._centroids.T, axis=1)
+        return [True] * len(batch)
+
+    def _delete_rows(self, rows: List[int]):
+        if not rows:
+            return
+        self._conn.executemany("UPDATE chunks SET deleted = 1 WHERE row = ?", [(row,) for row in rows])
+        self._conn.commit()
+        self._alive[rows] = False
+
+    def _ensure_ivf(self):
+        live = len(self)
+        if live < self.ivf_min_rows:
+            return
+        if self._centroids is None or self._rows > 2 * self._ivf_rows:
+            self.build_ivf()
+
+    def _search_exact(self, queries: np.ndarray, top_k: int, arrays, alive: np.ndarray, rows: int):
+        candidates_k = self._candidates(top_k)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        best_scores = np.zeros((len(queries), 0), dtype=np.float32)
+        for start in range(0, rows, self.block_rows):
+            stop = min(start + self.block_rows, rows)
+            scores = self._coarse_scores(queries, arrays, slice(start, stop))
+            scores[:, ~alive[start:stop]] = -np.inf
+            candidates = np.concatenate([best_scores, scores], axis=1)
+            candidate_rows = np.concatenate([best_rows, np.broadcast_to(np.arange(start, stop), scores.shape)], axis=1)
+            keep = _top_k(candidates, candidates_k)
+            best_scores = np.take_along_axis(candidates, keep, axis=1)
+            best_rows = np.take_along_axis(candidate_rows, keep, axis=1)
+        return [
+            self._rescore(query, row_ids[np.isfinite(scores)], scores[np.isfinite(scores)], top_k, arrays)
+            for query, row_ids, scores in zip(queries, best_rows, best_scores)
+        ]
+
+    def _search_ivf(self, query: np.ndarray, top_k: int, arrays, alive, centroids, assignments):
+        probe = np.zeros(len(centroids) + 1, dtype=bool)  # the extra slot absorbs unassigned rows (-1)
+        probe[np.argsort(-(centroids @ query))[:self.n_probe]] = True
+        candidates = np.flatnonzero(probe[assignments] & alive)
+        if len(candidates) == 0:
+            return candidates, np.zeros(0, dtype=np.float32)
+        scores = self._coarse_scores(query[None, :], arrays, candidates)
+        keep = _top_k(scores, self._candidates(top_k))[0]
+        return self._rescore(query, candidates[keep], scores[0, keep], top_k, arrays)
+
+    def _candidates(self, top_k: int) -> int:
+        """Candidates kept from the coarse scan: `top_k`, or more when they are rescored."""
+        return top_k if self.quantization == "none" else max(int(np.ceil(top_k * self.rescore_oversample)), top_k)
+
+    def _coarse_scores(self, queries: np.ndarray, arrays, rows) -> np.ndarray:
+        """Scores of `queries` against `rows`: exact cosine, or its approximation from the codes."""
+        vectors, codes, scales = arrays
+        if self.quantization == "none":
+            return queries @ vectors[rows].T
+        if self.quantization == "int8":
+            return (queries @ codes[rows].T.astype(np.float32)) * scales[rows]
+        # binary: 1 - 2 * hamming / dim tracks the angle between the sign patterns
+        row_codes = np.asarray(codes[rows])
+        distances = np.stack([
+            _POPCOUNT[np.bitwise_xor(row_codes, query_bits)].sum(axis=1, dtype=np.int32)
+            for query_bits in np.packbits(queries > 0, axis=1)
+        ])
+        return (1 - 2 * distances / self.dim).astype(np.float32)
+
+    def _rescore(self, query: np.ndarray, row_ids: np.ndarray, scores: np.ndarray, top_k: int, arrays):
+        """Second phase: rank quantized candidates by their full-precision cosine."""
+        if self.quantization == "none" or len(row_ids) == 0:
+            return row_ids[:top_k], scores[:top_k]
+        row_ids = np.sort(row_ids)  # read the float rows in file order
+        exact = np.asarray(arrays[0][row_ids]) @ query
+        keep = _top_k(exact[None, :], top_k)[0]
+        return row_ids[keep], exact[keep]
+
+    def _hits(self, row_ids: np.ndarray, scores: np.ndarray) -> List[Dict]:
+        if len(row_ids) == 0:
+            return []
+        placeholders = ",".join("?" * len(row_ids))
+        with self._lock:
+            stored = {row: (key, source) for row, key, source in self._conn.execute(
+                f"SELECT row, id, source FROM chunks WHERE row IN ({placeholders})", [int(row) for row in row_ids]
+            )}
+        response = {"hits": {"hits": [
+            {"_id": stored[row][0], "_score": float((1 + score) / 2), "_source": json.loads(stored[row][1])}
+            for row, score in zip(map(int, row_ids), scores)
+            if row in stored
+        ]}}
+        return format_hits(response)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Column indices of the `k` best scores of each row, best first."""
+    if scores.shape[1] > k:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        part = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1)
+    return np.take_along_axis(part, order, axis=1)
@@ -0,0 +1,143 @@
+import base64
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+
+# internal imports
+from .schema import Document
+
+# `Document` fields other than `embedding`, in the order of `Document.model_dump`
+METADATA_FIELDS = (
+    "document_id", "user_id", "session_id", "title", "chunk_id", "text", "content_hash", "source_file", "page_number",
+    "char_start", "char_end",
+)
+VECTOR_ENCODINGS = ("base64", "float")
+
+
+class ChunkRow:
+    """Read-only view of one chunk of a `ChunkBatch`, with the attribute names of `Document`.
+
+    Enough for code that only reads metadata, such as `chunk_key` or the store's `doc_id`.
+    """
+
+    __slots__ = ("_batch", "_index")
+
+    def __init__(self, batch: "ChunkBatch", index: int):
+        self._batch = batch
+        self._index = index
+
+    def __getattr__(self, name: str):
+        if name == "embedding":
+            return self._batch.embeddings[self._index]
+        if name not in METADATA_FIELDS:
+            raise AttributeError(name)
+        value = getattr(self._batch, name)[self._index]
+        return int(value) if name == "chunk_id" else value
+
+
+class ChunkBatch:
+    """Embedded chunks stored column by column.
+
+    A `Document` keeps its embedding as a list of Python floats (about 32 bytes per
+    dimension once boxed) and is serialized one float at a time by `model_dump` and the
+    JSON encoder. Here the embeddings of the whole batch are one contiguous float32
+    matrix (4 bytes per dimension) and each metadata field is one column, a list holding
+    references to the (mostly shared) strings of the batch or, for `chunk_id`, an int32
+    array. Bulk bodies are built from the matrix directly: with the opt-in "base64" encoding each
+    vector is the base64 of its big-endian float32 bytes, the `dense_vector` format
+    accepted by Elasticsearch 8.19 / 9.1 and later, so no float is boxed or printed.
+
+    Attributes:
+        embeddings (np.ndarray): float32 matrix of shape (chunks, dim).
+        document_id, user_id, session_id, title, text, content_hash, source_file,
+            page_number, char_start, char_end (list): one column per `Document` field.
+        chunk_id (np.ndarray): int32 position of each chunk in its document.
+    """
+
+    __slots__ = METADATA_FIELDS + ("embeddings",)
+
+    def __init__(self, embeddings: np.ndarray, **columns: Sequence):
+        self.embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        for field in METADATA_FIELDS:
+            column = columns.get(field, [None] * len(self.embeddings))
+            if len(column) != len(self.embeddings):
+                raise ValueError(f"Column '{field}' has {len(column)} values for {len(self.embeddings)} embeddings")
+            setattr(self, field, np.asarray(column, dtype=np.int32) if field == "chunk_id" else list(column))
+
+    @classmethod
+    def from_documents(cls, documents: Sequence[Document]) -> "ChunkBatch":
+        """Columnar copy of embedded Documents; raises ValueError if one has no embedding."""
+        if any(doc.embedding is None for doc in documents):
+            raise ValueError("Every Document of a ChunkBatch needs an embedding")
+        embeddings = np.asarray([doc.embedding for doc in documents], dtype=np.float32) if documents else np.zeros((0, 0), dtype=np.float32)
+        return cls(embeddings, **{field: [getattr(doc, field) for doc in documents] for field in METADATA_FIELDS})
+
+    def __len__(self) -> int:
+        return len(self.embeddings)
+
+    def __getitem__(self, index: int) -> ChunkRow:
+        if not -len(self) <= index < len(self):
+            raise IndexError(index)
+        return ChunkRow(self, index % len(self))
+
+    def __iter__(self) -> Iterator[ChunkRow]:
+        return (ChunkRow(self, i) for i in range(len(self)))
+
+    @property
+    def dim(self) -> int:
+        return self.embeddings.shape[1]
+
+    def packed_embeddings(self) -> List[str]:
+        """Base64 of each embedding's big-endian float32 bytes (`dense_vector` base64 format)."""
+        raw = memoryview(self.embeddings.astype(">f4").tobytes())
+        row_bytes = 4 * self.dim
+        return [base64.b64encode(raw[start:start + row_bytes]).decode("ascii") for start in range(0, len(raw), row_bytes)]
+
+    def sources(self, vector_encoding: Optional[str] = "float") -> Iterator[Dict]:
+        """`_source` of each chunk, with the keys of `Document.model_dump`.
+
+        Arguments:
+            vector_encoding (Optional[str]): "base64" (packed float32), "float" (a JSON list)
+                or None to leave the embedding out.
+        """
+        if vector_encoding == "base64":
+            vectors = self.packed_embeddings()
+        elif vector_encoding == "float":
+            vectors = self.embeddings.tolist()
+        elif vector_encoding is None:
+            vectors = None
+        else:
+            raise ValueError(f"vector_encoding must be one of {VECTOR_ENCODINGS} or None, got '{vector_encoding}'")
+
+        columns = [getattr(self, field) for field in METADATA_FIELDS]
+        for i in range(len(self)):
+            source = {field: column[i] for field, column in zip(METADATA_FIELDS, columns)}
+            source["chunk_id"] = int(source["chunk_id"])
+            if vectors is not None:
+                source["embedding"] = vectors[i]
+            yield source
+
+    def to_documents(self) -> List[Document]:
+        return [
+            Document(embedding=embedding, **{key: value for key, value in source.items() if key != "embedding"})
+            for source, embedding in zip(self.sources(None), self.embeddings.tolist())
+        ]
+
+
+def decode_vector(value: Union[str, Sequence[float]]) -> List[float]:
+    """Embedding of a stored `_source`: a list of floats, or the base64 of its big-endian float32 bytes."""
+    if isinstance(value, str):
+        return np.frombuffer(base64.b64decode(value), dtype=">f4").tolist()
+    return list(value)
+
+
+def iter_chunk_batches(documents: Iterable[Document], batch_size: int) -> Iterator[ChunkBatch]:
+    """Group embedded Documents into ChunkBatches of at most `batch_size` chunks."""
+    batch: List[Document] = []
+    for doc in documents:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield ChunkBatch.from_documents(batch)
+            batch = []
+    if batch:
+        yield ChunkBatch.from_documents(batch)
@@ -11,8 +11,11 @@ class Document(BaseModel):
     chunk_id: int = Field(..., description="Sequential ID for the chunk within the document")
     text: str = Field(..., description="The actual chunk content")
     embedding: Optional[List[float]] = Field(None, description="Vector embedding for semantic search")
+    content_hash: Optional[str] = Field(None, description="Hash of text, title, embedding model and dimensionality; addresses the chunk in the embedding store")
     source_file: Optional[str] = Field(None, description="Original file path or identifier")
     page_number: Optional[int] = Field(None, description="Page number in the original document (if applicable)")
+    char_start: Optional[int] = Field(None, description="Offset of the chunk in the extracted document text (layout chunking)")
+    char_end: Optional[int] = Field(None, description="End offset (exclusive) of the chunk in the extracted document text")
 
 
 # --- Retrieval coomponents ---
@@ -0,0 +1,293 @@
+import os
+import time
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+# internal imports
+from .logger import Logger
+
+_log = Logger.get_logger(__name__)
+
+# seconds; from a cached query embedding (~ms) to a long generation or bulk request
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# stage durations of the request being handled, see `MetricsRegistry.timings`
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("stage_timings", default=None)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Sequence[Tuple[str, str]]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+class _Metric(ABC):
+    """Metric family: one value (or histogram) per combination of label values."""
+
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metric '{self.name}' expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._samples(list(zip(self.labelnames, key)), value))
+        return "\n".join(lines)
+
+    @abstractmethod
+    def _samples(self, labels, value) -> Iterable[str]:
+        """Exposition lines of one labelled value."""
+
+
+class Counter(_Metric):
+    """Monotonic counter, e.g. requests or tokens."""
+
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self, labels, value) -> Iterable[str]:
+        yield f"{self.name}{_format_labels(labels)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative `le` buckets, with their sum and count."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["buckets"][i] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return state["count"] if state else 0
+
+    def _samples(self, labels, state) -> Iterable[str]:
+        cumulative = 0
+        for bound, count in zip(self.buckets, state["buckets"]):
+            cumulative += count
+            yield f"{self.name}_bucket{_format_labels(labels + [('le', _format_value(bound))])} {cumulative}"
+        yield f"{self.name}_sum{_format_labels(labels)} {state['sum']!r}"
+        yield f"{self.name}_count{_format_labels(labels)} {state['count']}"
+
+
+class _Span:
+    """Times one stage; see `MetricsRegistry.span`."""
+
+    __slots__ = ("_registry", "_stage", "_start", "_otel")
+
+    def __init__(self, registry: "MetricsRegistry", stage: str):
+        self._registry = registry
+        self._stage = stage
+        self._otel = None
+
+    def __enter__(self):
+        if self._registry.tracer is not None:
+            self._otel = self._registry.tracer.start_as_current_span(f"rag.{self._stage}")
+            self._otel.__enter__()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._registry.observe(self._stage, time.perf_counter() - self._start, failed=exc_type is not None)
+        if self._otel is not None:
+            self._otel.__exit__(exc_type, exc, tb)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class TimedIterator:
+    """Wraps an iterator and adds up the time spent waiting on it.
+
+    Used for the streaming ingestion, whose stages interleave: the time a stage spends
+    pulling from the previous one is not its own.
+
+    Attributes:
+        elapsed (float): seconds spent inside `next()` of the wrapped iterator.
+    """
+
+    def __init__(self, iterable: Iterable):
+        self._iterator = iter(iterable)
+        self.elapsed = 0.0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            return next(self._iterator)
+        finally:
+            self.elapsed += time.perf_counter() - start
+
+
+class MetricsRegistry:
+    """Latency histograms, counters and token usage of the pipeline's hot paths.
+
+    Stages are timed with `span`, which feeds `rag_stage_seconds` (and `rag_stage_errors_total`
+    when the block raises) and, when an OpenTelemetry tracer is configured, opens a `rag.<stage>`
+    span. `timings` collects the stage durations of one request so they can be logged together.
+    `render` returns everything in the Prometheus text format (`GET /metrics`).
+
+    When disabled, `span` returns a shared no-op context manager and nothing is recorded.
+
+    Attributes:
+        enabled (bool): whether metrics are recorded.
+        tracer: OpenTelemetry tracer, or None.
+        stage_seconds (Histogram): duration of each pipeline stage.
+        stage_errors (Counter): stages that raised.
+        genai_requests (Counter): Gemini requests by model and outcome.
+        genai_tokens (Counter): Gemini tokens by model and type (prompt, output).
+        bulk_items (Counter): items of the parallel bulk writer by outcome (indexed, rejected, failed).
+    """
+
+    def __init__(self, enabled: bool = True, tracer=None):
+        self.enabled = enabled
+        self.tracer = tracer
+        self.stage_seconds = Histogram("rag_stage_seconds", "Duration of a pipeline stage in seconds.", ["stage"])
+        self.stage_errors = Counter("rag_stage_errors_total", "Pipeline stages that raised an exception.", ["stage"])
+        self.genai_requests = Counter("rag_genai_requests_total", "Gemini requests by model and outcome.", ["model", "outcome"])
+        self.genai_tokens = Counter("rag_genai_tokens_total", "Gemini tokens by model and type.", ["model", "type"])
+        self.bulk_items = Counter("rag_bulk_items_total", "Parallel bulk items by outcome; rejected items are retried.", ["outcome"])
+        self._metrics = [self.stage_seconds, self.stage_errors, self.genai_requests, self.genai_tokens, self.bulk_items]
+
+    def span(self, stage: str):
+        """Context manager timing the enclosed block as `stage`."""
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _Span(self, stage)
+
+    def observe(self, stage: str, seconds: float, failed: bool = False):
+        """Record a duration measured by the caller (e.g. the self time of an interleaved stage)."""
+        if not self.enabled:
+            return
+        self.stage_seconds.observe(seconds, stage=stage)
+        if failed:
+            self.stage_errors.inc(stage=stage)
+        timings = _timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def timings(self) -> Iterator[Dict[str, float]]:
+        """Collect the stage durations (seconds, summed per stage) recorded in this context."""
+        timings: Dict[str, float] = {}
+        token = _timings.set(timings)
+        try:
+            yield timings
+        finally:
+            _timings.reset(token)
+
+    def inc(self, counter: Counter, amount: float = 1, **labels):
+        """Increment `counter` unless metrics are disabled."""
+        if self.enabled and amount:
+            counter.inc(amount, **labels)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        if not self.enabled:
+            return ""
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+def format_timings(timings: Dict[str, float]) -> str:
+    """`stage_ms=...` pairs of a `timings` dict, for log lines."""
+    return " | ".join(f"{stage}_ms={seconds * 1000:.1f}" for stage, seconds in timings.items())
+
+
+def _otel_tracer(service_name: str):
+    """Tracer exporting spans over OTLP/HTTP to `OTEL_EXPORTER_OTLP_ENDPOINT`, or None if the SDK is missing."""
+    try:
+        from opentelemetry import trace
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError:
+        _log.warning("OTEL_EXPORTER_OTLP_ENDPOINT is set but OpenTelemetry is not installed; run `uv sync --extra telemetry`")
+        return None
+
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
+    return trace.get_tracer("industrial-rag")
+
+
+_metrics: Optional[MetricsRegistry] = None
+_metrics_lock = threading.Lock()
+
+def get_metrics() -> MetricsRegistry:
+    """Process-wide metrics registry.
+
+    Configured through environment variables:
+        METRICS_ENABLED: record metrics and serve them at `/metrics` (default: true).
+        OTEL_EXPORTER_OTLP_ENDPOINT: also export stage spans with OpenTelemetry (optional `telemetry` extra).
+        OTEL_SERVICE_NAME: service name of the exported spans (default: industrial-rag-api).
+    """
+    global _metrics
+    if _metrics is not None:
+        return _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            enabled = os.environ.get("METRICS_ENABLED", "true").lower() not in ("0", "false", "no")
+            tracer = None
+            if enabled and os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT"):
+                tracer = _otel_tracer(os.environ.get("OTEL_SERVICE_NAME", "industrial-rag-api"))
+            _metrics = MetricsRegistry(enabled=enabled, tracer=tracer)
+            _log.info(f"Initialized metrics | enabled={enabled} | opentelemetry={tracer is not None}")
+        return _metrics
@@ -0,0 +1,96 @@
+"""Memory and CPU cost of holding embedded chunks and serializing their bulk bodies.
+
+Compares the Document path (pydantic models with `List[float]` embeddings, bulk bodies from
+`model_dump` serialized by the Elasticsearch client's JSON serializer) with `ChunkBatch`
+(one float32 matrix plus metadata columns, embeddings sent as base64 `dense_vector`s), and
+the same ChunkBatch with a JSON float array for clusters older than 8.19 / 9.1.
+
+For each path it reports the memory held by the chunks (tracemalloc, after building them
+from the raw embedding rows), the peak memory and CPU time of serializing every bulk body,
+and the bytes sent.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_chunk_batch.py [--chunks 10000] [--dim 768] [--batch-size 200]
+"""
+import gc
+import time
+import argparse
+import tracemalloc
+
+import numpy as np
+from elasticsearch.serializer import JsonSerializer
+
+from app.schemas.chunk_batch import ChunkBatch
+from app.schemas.schema import Document
+
+
+def _documents(embeddings):
+    return [
+        Document(
+            document_id="bench-doc", user_id="bench", session_id="bench", title="bench.pdf", chunk_id=i,
+            text=f"Chunk {i} of the benchmark manual, about motor bearing lubrication.", embedding=embedding,
+            content_hash=f"{i:064x}", source_file="bench.pdf", page_number=i // 2,
+        )
+        for i, embedding in enumerate(embeddings)
+    ]
+
+
+def _bulk_body(serializer, sources):
+    lines = []
+    for i, source in enumerate(sources):
+        lines.append(serializer.dumps({"index": {"_index": "bench", "_id": f"bench_bench-doc_{i}"}}))
+        lines.append(serializer.dumps(source))
+    return b"\n".join(lines) + b"\n"
+
+
+def measure(label, build, serialize):
+    """Memory held by `build()`'s result, then the peak memory, CPU time and size of `serialize(result)`."""
+    gc.collect()
+    tracemalloc.start()
+    chunks = build()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    start = time.process_time()
+    sent = sum(len(body) for body in serialize(chunks))
+    cpu = time.process_time() - start
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    print(f"{label:<28} {held / 2**20:>10.1f} {peak / 2**20:>10.1f} {cpu * 1000:>10.0f} {sent / 2**20:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--batch-size", type=int, default=200, help="chunks per bulk request")
+    args = parser.parse_args()
+
+    # embeddings arrive from the API as lists of floats
+    embeddings = np.random.default_rng(0).normal(size=(args.chunks, args.dim)).astype(np.float32).tolist()
+    serializer = JsonSerializer()
+    size = args.batch_size
+
+    def documents():
+        return _documents(embeddings)
+
+    def batches():
+        documents = _documents(embeddings)
+        return [ChunkBatch.from_documents(documents[start:start + size]) for start in range(0, len(documents), size)]
+
+    def serialize_documents(documents):
+        for start in range(0, len(documents), size):
+            yield _bulk_body(serializer, (doc.model_dump() for doc in documents[start:start + size]))
+
+    def serialize_batches(vector_encoding):
+        return lambda batches: (_bulk_body(serializer, batch.sources(vector_encoding)) for batch in batches)
+
+    print(f"{args.chunks} chunks of {args.dim} dimensions, {size} per bulk request\n")
+    print(f"{'path':<28} {'held MiB':>10} {'peak MiB':>10} {'CPU ms':>10} {'sent MiB':>10}")
+    measure("Document + model_dump", documents, serialize_documents)
+    measure("ChunkBatch + base64", batches, serialize_batches("base64"))
+    measure("ChunkBatch + float array", batches, serialize_batches("float"))
+
+
+if __name__ == "__main__":
+    main()
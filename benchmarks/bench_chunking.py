@@ -0,0 +1,112 @@
+"""Chunk counts, chunk sizes and extraction throughput of layout chunking against word windows.
+
+Reads the same PDFs with `PdfReader(chunking="layout")` (block layout, token-sized chunks
+across pages) and `PdfReader(chunking="words")` (300-word windows per page) and reports, per
+method: chunks per document, mean / p10 chunk size in tokens, chunks below 128 tokens (the
+tails that cost an embedding call each) and pages/sec. The synthetic corpus mixes headings,
+paragraphs, numbered steps and tables with short page tails; `--pdf` adds real files. The
+corpus is read at two sizes to check that layout chunking stays linear in the page count.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_chunking.py [--pages 50] [--repeats 3] [--pdf tests/samples/LB5001.pdf]
+"""
+import time
+import random
+import argparse
+from typing import List, Tuple
+
+import numpy as np
+import pymupdf
+
+from app.pipeline.context import estimate_tokens
+from app.pipeline.extract import PdfReader
+
+WORDS = (
+    "motor stator rotor bearing winding insulation resistance voltage current torque shaft coupling "
+    "alignment vibration temperature lubrication grease terminal inverter frequency cooling enclosure"
+).split()
+
+
+def _sentence(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 18))).capitalize() + "."
+
+
+def synthetic_manual(pages: int, seed: int = 0) -> bytes:
+    """Manual-like PDF: each page has a heading, paragraphs, numbered steps, a table and a short tail."""
+    rng = random.Random(seed)
+    pdf = pymupdf.open()
+    for page_num in range(pages):
+        page = pdf.new_page()
+        y = 60
+        page.insert_text((50, y), f"Section {page_num + 1} {rng.choice(WORDS).capitalize()} checks", fontname="hebo", fontsize=12)
+        y += 10
+        for _ in range(2):
+            text = " ".join(_sentence(rng) for _ in range(rng.randint(3, 6)))
+            rect = pymupdf.Rect(50, y, 560, y + 110)
+            page.insert_textbox(rect, text, fontsize=9)
+            y += 115
+        for step in range(1, rng.randint(3, 6)):
+            page.insert_text((50, y), f"{step}. {_sentence(rng)}", fontsize=9)
+            y += 12
+        y += 10
+        for row in range(rng.randint(3, 6)):
+            page.insert_text((50, y), f"{rng.choice(WORDS)} {row}", fontsize=9)
+            page.insert_text((250, y), f"{rng.randint(1, 400)} Nm", fontsize=9)
+            y += 12
+        page.insert_textbox(pymupdf.Rect(50, y + 10, 560, y + 60), _sentence(rng), fontsize=9)
+    data = pdf.tobytes()
+    pdf.close()
+    return data
+
+
+def measure(reader: PdfReader, corpus: List[Tuple[bytes, str]], repeats: int) -> dict:
+    pages = sum(len(pymupdf.open(stream=data, filetype="pdf")) for data, _ in corpus)
+    elapsed, documents = [], []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        documents = [reader.read(data, name) for data, name in corpus]
+        elapsed.append(time.perf_counter() - start)
+    tokens = np.array([estimate_tokens(doc.text) for docs in documents for doc in docs])
+    return {
+        "chunks_per_doc": len(tokens) / len(corpus),
+        "mean_tokens": float(tokens.mean()),
+        "p10_tokens": float(np.percentile(tokens, 10)),
+        "small": int((tokens < 128).sum()),
+        "pages_per_sec": pages / min(elapsed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=50, help="pages of each synthetic manual")
+    parser.add_argument("--docs", type=int, default=4, help="synthetic manuals")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--pdf", nargs="*", default=[], help="real PDFs added to the corpus")
+    args = parser.parse_args()
+
+    corpus = [(synthetic_manual(args.pages, seed), f"manual-{seed}.pdf") for seed in range(args.docs)]
+    for path in args.pdf:
+        with open(path, "rb") as f:
+            corpus.append((f.read(), path))
+
+    readers = {
+        "words": PdfReader(user_id="bench", session_id="bench", chunking="words"),
+        "layout": PdfReader(user_id="bench", session_id="bench", chunking="layout"),
+    }
+    print(f"{len(corpus)} documents | {args.pages} synthetic pages each\n")
+    print(f"{'chunking':<10} {'chunks/doc':>11} {'mean tok':>9} {'p10 tok':>8} {'<128 tok':>9} {'pages/s':>9}")
+    for name, reader in readers.items():
+        result = measure(reader, corpus, args.repeats)
+        print(
+            f"{name:<10} {result['chunks_per_doc']:>11.1f} {result['mean_tokens']:>9.0f} {result['p10_tokens']:>8.0f} "
+            f"{result['small']:>9} {result['pages_per_sec']:>9.1f}"
+        )
+
+    print("\nlayout chunking, pages/s by document length (flat when linear)")
+    for pages in (args.pages, 4 * args.pages):
+        result = measure(readers["layout"], [(synthetic_manual(pages), "scaling.pdf")], args.repeats)
+        print(f"{pages:>6} pages {result['pages_per_sec']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
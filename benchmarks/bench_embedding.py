@@ -0,0 +1,51 @@
+"""Embedding throughput benchmark for BatchEmbedder against a local fake client.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_embedding.py --chunks 2000 --latency 0.05
+"""
+import time
+import argparse
+
+from app.pipeline.embed import BatchEmbedder
+from app.schemas.schema import Document
+from tests.fakes import FakeEmbeddingClient
+
+
+def run(chunks: int, latency: float, batch_size: int, concurrency: int) -> float:
+    docs = [
+        Document(
+            document_id="bench", user_id="bench", session_id="bench",
+            title="bench.pdf", chunk_id=i, text=f"synthetic chunk {i} " * 50,
+        )
+        for i in range(chunks)
+    ]
+    embedder = BatchEmbedder(
+        client=FakeEmbeddingClient(latency=latency),
+        batch_size=batch_size,
+        max_concurrency=concurrency,
+    )
+    start = time.perf_counter()
+    embedder.embed_documents(docs)
+    return chunks / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated seconds per request")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 25, 100])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    print(f"chunks={args.chunks} | latency={args.latency}s per request")
+    print(f"{'batch_size':>10} {'concurrency':>12} {'chunks/sec':>12}")
+    for batch_size in args.batch_sizes:
+        for concurrency in args.concurrency:
+            # per-chunk requests get slow quickly; keep the sequential baseline short
+            chunks = min(args.chunks, 200) if batch_size == 1 else args.chunks
+            rate = run(chunks, args.latency, batch_size, concurrency)
+            print(f"{batch_size:>10} {concurrency:>12} {rate:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
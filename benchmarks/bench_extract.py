@@ -0,0 +1,62 @@
+"""PDF extraction throughput benchmark for PdfReader over a synthetic corpus.
+
+Reports pages/sec for a serial read and for the process-pool mode at each worker count.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_extract.py --files 4 --pages 250 --workers 1 2 4 8
+"""
+import time
+import argparse
+from typing import List, Tuple
+
+import pymupdf
+
+from app.pipeline.extract import PdfReader
+
+PARAGRAPH = (
+    "Before installation check the motor nameplate, insulation resistance and bearing condition. "
+    "Tighten the terminal box screws to the specified torque and verify the direction of rotation. "
+)
+
+
+def synthetic_corpus(files: int, pages: int) -> List[Tuple[bytes, str]]:
+    corpus = []
+    for file_num in range(files):
+        pdf = pymupdf.open()
+        for page_num in range(pages):
+            page = pdf.new_page()
+            text = f"File {file_num} page {page_num}. " + PARAGRAPH * 12
+            page.insert_textbox(pymupdf.Rect(36, 36, 560, 800), text, fontsize=9)
+        corpus.append((pdf.tobytes(), f"synthetic-{file_num}.pdf"))
+        pdf.close()
+    return corpus
+
+
+def run(corpus: List[Tuple[bytes, str]], workers: int, pages_per_task: int) -> float:
+    reader = PdfReader(user_id="bench", session_id="bench", max_workers=workers, pages_per_task=pages_per_task)
+    if workers > 1:
+        reader.read(*corpus[0])  # spawn the process pool outside the timed section
+
+    pages = sum(len(pymupdf.open(stream=data, filetype="pdf")) for data, _ in corpus)
+    start = time.perf_counter()
+    reader.read_many(corpus)
+    return pages / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=250, help="pages per file")
+    parser.add_argument("--pages-per-task", type=int, default=16)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    corpus = synthetic_corpus(args.files, args.pages)
+    print(f"files={args.files} | pages per file={args.pages} | pages_per_task={args.pages_per_task}")
+    print(f"{'workers':>8} {'pages/sec':>12}")
+    for workers in args.workers:
+        print(f"{workers:>8} {run(corpus, workers, args.pages_per_task):>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
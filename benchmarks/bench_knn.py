@@ -0,0 +1,87 @@
+"""Recall and latency of kNN (HNSW) search against brute-force script_score.
+
+Indexes random vectors into a temporary index on the Elasticsearch cluster configured in
+`.env`, then runs the same queries through both search modes of ElasticRetriever. The
+brute-force results are exact, so they are used as ground truth for recall@k.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_knn.py --docs 20000 --queries 100
+"""
+import os
+import time
+import uuid
+import random
+import argparse
+import statistics
+from dotenv import load_dotenv
+from elasticsearch import helpers
+
+from app.pipeline.index import ElasticVectorManager
+from app.pipeline.retrieve import ElasticRetriever
+
+load_dotenv()
+
+
+def _random_vector(dim: int):
+    return [random.gauss(0, 1) for _ in range(dim)]
+
+
+def _percentile(values, q):
+    return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else values[0]
+
+
+def run(retriever: ElasticRetriever, queries, top_k: int, num_candidates: int):
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = retriever.search_by_vector(query, top_k=top_k, num_candidates=num_candidates)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append([hit["text"] for hit in hits])
+    return results, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--num-candidates", type=int, nargs="+", default=[50, 100, 200])
+    args = parser.parse_args()
+
+    elastic_url = os.environ["ELASTIC_SEARCH_URL"]
+    api_key = os.environ["ELASTIC_SEARCH_API_KEY"]
+    index_name = f"bench-knn-{uuid.uuid4().hex[:8]}"
+    manager = ElasticVectorManager(elastic_url=elastic_url, api_key=api_key, index_name=index_name, embedding_dim=args.dim)
+
+    try:
+        actions = (
+            {"_index": index_name, "_id": str(i), "_source": {"title": "bench", "text": f"doc-{i}", "embedding": _random_vector(args.dim)}}
+            for i in range(args.docs)
+        )
+        helpers.bulk(manager.es, actions, chunk_size=500)
+        manager.es.indices.refresh(index=index_name)
+        manager.es.indices.forcemerge(index=index_name, max_num_segments=1)
+
+        queries = [_random_vector(args.dim) for _ in range(args.queries)]
+        exact, exact_latency = run(
+            ElasticRetriever(elastic_url, api_key, index_name, embedding_dim=args.dim, search_mode="script_score", es=manager.es),
+            queries, args.top_k, 0,
+        )
+
+        print(f"docs={args.docs} | dim={args.dim} | queries={args.queries} | top_k={args.top_k}")
+        print(f"{'mode':>24} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8}")
+        print(f"{'script_score':>24} {1.0:>9.3f} {_percentile(exact_latency, 50):>8.1f} {_percentile(exact_latency, 95):>8.1f}")
+
+        knn_retriever = ElasticRetriever(elastic_url, api_key, index_name, embedding_dim=args.dim, search_mode="knn", es=manager.es)
+        for num_candidates in args.num_candidates:
+            approx, latency = run(knn_retriever, queries, args.top_k, num_candidates)
+            recall = statistics.mean(len(set(a) & set(e)) / len(e) for a, e in zip(approx, exact))
+            label = f"knn (candidates={num_candidates})"
+            print(f"{label:>24} {recall:>9.3f} {_percentile(latency, 50):>8.1f} {_percentile(latency, 95):>8.1f}")
+    finally:
+        manager.es.indices.delete(index=index_name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Recall@k, latency and memory of quantized vector search with full-precision rescoring.
+
+Writes clustered random vectors (topic-like structure, closer to real embeddings than
+isotropic noise) into LocalVectorStore with each quantization and searches them with a
+range of rescore oversampling factors. Exact float32 search is the ground truth for
+recall@k. Memory is reported per million vectors: the bytes a search scans (codes for the
+quantized stores) and the float32 vectors kept on disk for rescoring.
+
+With `--elastic`, the same vectors are indexed on the cluster configured in `.env` with
+`hnsw`, `int8_hnsw`, `int4_hnsw` and `bbq_hnsw` and searched with `rescore_vector`; the
+vector memory per million is the estimate documented by Elasticsearch for each type.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_quantization.py --docs 50000 --dim 768
+    PYTHONPATH=. python benchmarks/bench_quantization.py --elastic
+"""
+import os
+import time
+import uuid
+import argparse
+import tempfile
+import statistics
+
+import numpy as np
+from dotenv import load_dotenv
+
+from app.pipeline.store import ELASTIC_INDEX_TYPES, LOCAL_QUANTIZATIONS, ElasticVectorStore, LocalVectorStore
+from app.schemas.schema import Document
+
+load_dotenv()
+
+MIB = 1024 * 1024
+
+
+def _percentile(values, q):
+    return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else values[0]
+
+
+def _dataset(docs: int, dim: int, queries: int, clusters: int):
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(clusters, dim))
+    vectors = centers[rng.integers(0, clusters, docs)] + 0.5 * rng.normal(size=(docs, dim))
+    probes = centers[rng.integers(0, clusters, queries)] + 0.5 * rng.normal(size=(queries, dim))
+    return vectors.astype(np.float32), probes.astype(np.float32).tolist()
+
+
+def _documents(vectors):
+    for i, vector in enumerate(vectors):
+        yield Document(
+            document_id="bench", user_id="bench", session_id="bench", title="bench", chunk_id=i,
+            text=f"doc-{i}", embedding=vector.tolist(), source_file="bench.pdf",
+        )
+
+
+def _elastic_bytes_per_vector(index_type: str, dim: int) -> float:
+    """Off-heap vector memory per vector documented for each HNSW index type."""
+    return {"hnsw": 4 * dim, "int8_hnsw": dim + 4, "int4_hnsw": dim / 2 + 4, "bbq_hnsw": dim / 8 + 14}[index_type]
+
+
+def run(store, queries, top_k: int):
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = store.search(query, top_k=top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append([hit["chunk_id"] for hit in hits])
+    return results, latencies
+
+
+def report(label, results, latencies, exact, search_mib, vector_mib):
+    recall = statistics.mean(len(set(r) & set(e)) / len(e) for r, e in zip(results, exact))
+    print(
+        f"{label:>28} {recall:>9.3f} {_percentile(latencies, 50):>8.2f} {_percentile(latencies, 95):>8.2f} "
+        f"{search_mib:>12.0f} {vector_mib:>12.0f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--oversample", type=float, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--elastic", action="store_true", help="also benchmark quantized Elasticsearch indices")
+    args = parser.parse_args()
+
+    vectors, queries = _dataset(args.docs, args.dim, args.queries, args.clusters)
+    print(f"docs={args.docs} | dim={args.dim} | queries={args.queries} | top_k={args.top_k} | clusters={args.clusters}")
+    print(f"{'store':>28} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8} {'search MiB/M':>12} {'disk MiB/M':>12}")
+
+    with tempfile.TemporaryDirectory() as root:
+        exact = None
+        for quantization in LOCAL_QUANTIZATIONS:
+            store = LocalVectorStore(root, quantization, quantization=quantization)
+            list(store.write(_documents(vectors), batch_size=1000))
+            usage = store.memory_usage()
+            search_mib = usage["search_bytes_per_vector"] * 1e6 / MIB
+            vector_mib = usage["vector_bytes_per_vector"] * 1e6 / MIB
+
+            if exact is None:
+                exact, latency = run(store, queries, args.top_k)
+                report("local none", exact, latency, exact, search_mib, vector_mib)
+                continue
+            for oversample in args.oversample:
+                store.rescore_oversample = oversample
+                results, latency = run(store, queries, args.top_k)
+                report(f"local {quantization} (rescore x{oversample:g})", results, latency, exact, search_mib, vector_mib)
+
+    if args.elastic:
+        from elasticsearch import Elasticsearch
+
+        es = Elasticsearch(os.environ["ELASTIC_SEARCH_URL"], api_key=os.environ["ELASTIC_SEARCH_API_KEY"])
+        for quantization, index_type in ELASTIC_INDEX_TYPES.items():
+            store = ElasticVectorStore(es, f"bench-quant-{uuid.uuid4().hex[:8]}", quantization=quantization)
+            try:
+                store.create(args.dim)
+                list(store.write(_documents(vectors), batch_size=500))
+                es.indices.refresh(index=store.index_name)
+                es.indices.forcemerge(index=store.index_name, max_num_segments=1)
+                vector_mib = _elastic_bytes_per_vector(index_type, args.dim) * 1e6 / MIB
+                for oversample in ([None] if quantization == "none" else args.oversample):
+                    store.rescore_oversample = oversample
+                    results, latency = run(store, queries, args.top_k)
+                    label = f"es {index_type}" + (f" (rescore x{oversample:g})" if oversample else "")
+                    report(label, results, latency, exact, vector_mib, 4 * args.dim * 1e6 / MIB)
+            finally:
+                store.drop()
+
+
+if __name__ == "__main__":
+    main()
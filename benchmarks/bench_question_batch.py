@@ -0,0 +1,78 @@
+"""Wall time of an evaluation-sized set of questions: one `RAGAgent.run` at a time vs `run_batch`.
+
+Runs offline on the in-memory Elasticsearch and the fake Gemini client, which sleeps
+--latency seconds per embedding request and --generation-latency seconds per generation,
+so the numbers show how the batch path removes per-question round-trips (one batched
+embedding request and one msearch per 50 questions) and overlaps the generations.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_question_batch.py --questions 500 --concurrency 8 32
+"""
+import os
+import time
+import logging
+import argparse
+
+os.environ.setdefault("GEMINI_API_KEY", "offline-benchmark")
+os.environ.setdefault("EMBEDDING_STORE_BACKEND", "none")
+
+from app.pipeline import generate, retrieve
+from app.pipeline.cache import LRUEmbeddingCache
+from app.pipeline.generate import RAGAgent
+from app.pipeline.index import ElasticVectorManager
+from app.pipeline.retrieve import ElasticRetriever
+from app.schemas.schema import Document
+from tests.fakes import FakeGenAIClient, fake_async_elasticsearch, fake_elasticsearch
+
+
+def _agent(latency: float, generation_latency: float) -> RAGAgent:
+    fake_genai = FakeGenAIClient(latency=latency, generation_latency=generation_latency)
+    retrieve.google_client = generate.google_client = fake_genai
+
+    manager = ElasticVectorManager("http://bench-es:9200", "bench", "bench-index", es=fake_elasticsearch("bench-es"))
+    manager.embedder.client = FakeGenAIClient()
+    manager.index_documents([
+        Document(document_id="bench", user_id="bench", session_id="bench", title="bench.pdf", chunk_id=i, text=f"motor manual section {i}")
+        for i in range(200)
+    ])
+    retriever = ElasticRetriever(
+        "http://bench-es:9200", "bench", "bench-index", embedding_cache=LRUEmbeddingCache(),
+        es=manager.es, async_es=fake_async_elasticsearch("bench-es"),
+    )
+    return RAGAgent(model="fake-model", retriever=retriever)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8, 32])
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated seconds per embedding request")
+    parser.add_argument("--generation-latency", type=float, default=0.2, help="simulated seconds per generation")
+    parser.add_argument("--sequential-sample", type=int, default=25, help="questions timed one at a time (extrapolated)")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)  # per-question logs would dominate the measurement
+    agent = _agent(args.latency, args.generation_latency)
+    print(f"questions={args.questions} | embed latency={args.latency}s | generation latency={args.generation_latency}s")
+    print(f"{'mode':>22} {'total s':>9} {'q/s':>7} {'embed/s':>9} {'retrieve/s':>11} {'generate/s':>11}")
+
+    # one at a time: measured on a sample, extrapolated to the full set
+    sample = [f"sequential question {i} about motor section {i}" for i in range(args.sequential_sample)]
+    start = time.perf_counter()
+    for question in sample:
+        agent.run(question)
+    per_question = (time.perf_counter() - start) / len(sample)
+    print(f"{'run() one at a time':>22} {per_question * args.questions:>9.1f} {1 / per_question:>7.1f} {'-':>9} {'-':>11} {'-':>11}")
+
+    for concurrency in args.concurrency:
+        # fresh questions so the query-embedding cache does not help
+        questions = [f"batch {concurrency} question {i} about motor section {i}" for i in range(args.questions)]
+        stats = list(agent.run_batch(questions, max_concurrency=concurrency))[-1]["data"]
+        print(
+            f"{f'run_batch(x{concurrency})':>22} {stats['total_ms'] / 1000:>9.1f} {stats['questions_per_sec']:>7.1f} "
+            f"{stats['embed_per_sec']:>9.1f} {stats['retrieve_per_sec']:>11.1f} {stats['generate_per_sec']:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""CPU cost of the reranking stage per query, by number of candidates.
+
+Candidates are chunks of the sample manuals in `tests/samples` with synthetic retrieval
+scores; queries are the evaluation questions plus sentences taken from the manuals.
+With `--cross-encoder` the local cross-encoder is measured as well (needs the `rerank` extra).
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_rerank.py --candidates 10 20 50 100 --queries 50
+"""
+import glob
+import json
+import time
+import random
+import argparse
+import statistics
+
+from app.pipeline.extract import PdfReader
+from app.pipeline.rerank import CrossEncoderReranker, LexicalReranker
+
+
+def _percentile(values, q):
+    return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else values[0]
+
+
+def run(reranker, queries, chunks, candidates: int, top_n: int):
+    latencies = []
+    for query in queries:
+        documents = [{"text": text, "score": random.uniform(0.6, 0.9)} for text in random.sample(chunks, candidates)]
+        start = time.perf_counter()
+        reranker.rerank(query, documents, top_n)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--candidates", type=int, nargs="+", default=[10, 20, 50, 100])
+    parser.add_argument("--top-n", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--cross-encoder", action="store_true")
+    args = parser.parse_args()
+
+    random.seed(0)
+    reader = PdfReader(user_id="bench", session_id="bench")
+    chunks = [doc.text for path in sorted(glob.glob("tests/samples/*.pdf")) for doc in reader.read(path)]
+    with open("notebooks/rag_evaluation_results.json") as f:
+        queries = [item["question"] for item in json.load(f)]
+    queries += [" ".join(random.choice(chunks).split()[:12]) for _ in range(args.queries - len(queries))]
+
+    rerankers = {"lexical": LexicalReranker()}
+    if args.cross_encoder:
+        rerankers["cross-encoder"] = CrossEncoderReranker()
+
+    avg_chars = statistics.mean(len(chunk) for chunk in chunks)
+    print(f"chunks={len(chunks)} | queries={len(queries)} | top_n={args.top_n} | avg chunk={avg_chars:.0f} chars")
+    print(f"{'reranker':>14} {'candidates':>11} {'p50 ms':>8} {'p95 ms':>8} {'context kept':>13}")
+    for name, reranker in rerankers.items():
+        for candidates in args.candidates:
+            latencies = run(reranker, queries, chunks, min(candidates, len(chunks)), args.top_n)
+            kept = f"{args.top_n}/{candidates}"
+            print(f"{name:>14} {candidates:>11} {_percentile(latencies, 50):>8.2f} {_percentile(latencies, 95):>8.2f} {kept:>13}")
+
+
+if __name__ == "__main__":
+    main()
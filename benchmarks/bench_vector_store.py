@@ -0,0 +1,114 @@
+"""Search latency and recall of the embedded LocalVectorStore, optionally against Elasticsearch.
+
+Writes random vectors into a temporary LocalVectorStore and runs the same queries through
+exact search (one query at a time and batched) and through the IVF index. Exact results
+are the ground truth for recall@k. With `--elastic`, the vectors are also written to a
+temporary index on the cluster configured in `.env` and searched through ElasticVectorStore
+(HNSW kNN), so both paths are compared on the same data.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_vector_store.py --docs 20000 --queries 200
+    PYTHONPATH=. python benchmarks/bench_vector_store.py --elastic
+"""
+import os
+import time
+import uuid
+import argparse
+import tempfile
+import statistics
+
+import numpy as np
+from dotenv import load_dotenv
+
+from app.pipeline.store import ElasticVectorStore, LocalVectorStore, VectorStore
+from app.schemas.schema import Document
+
+load_dotenv()
+
+
+def _percentile(values, q):
+    return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else values[0]
+
+
+def _documents(vectors):
+    for i, vector in enumerate(vectors):
+        yield Document(
+            document_id="bench", user_id="bench", session_id="bench", title="bench", chunk_id=i,
+            text=f"doc-{i}", embedding=vector.tolist(), source_file="bench.pdf",
+        )
+
+
+def run(store: VectorStore, queries, top_k: int):
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = store.search(query, top_k=top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append([hit["chunk_id"] for hit in hits])
+    return results, latencies
+
+
+def report(label, results, latencies, exact):
+    recall = statistics.mean(len(set(r) & set(e)) / len(e) for r, e in zip(results, exact)) if exact else 1.0
+    print(f"{label:>26} {recall:>9.3f} {_percentile(latencies, 50):>8.2f} {_percentile(latencies, 95):>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--n-probe", type=int, nargs="+", default=[4, 16])
+    parser.add_argument("--elastic", action="store_true", help="also benchmark the Elasticsearch path")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(args.docs, args.dim)).astype(np.float32)
+    queries = rng.normal(size=(args.queries, args.dim)).astype(np.float32).tolist()
+
+    with tempfile.TemporaryDirectory() as root:
+        store = LocalVectorStore(root, "bench")
+        start = time.perf_counter()
+        list(store.write(_documents(vectors), batch_size=1000))
+        write_seconds = time.perf_counter() - start
+
+        print(f"docs={args.docs} | dim={args.dim} | queries={args.queries} | top_k={args.top_k}")
+        print(f"local write: {args.docs / write_seconds:,.0f} chunks/sec")
+        print(f"{'store':>26} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8}")
+
+        exact, latency = run(store, queries, args.top_k)
+        report("local exact", exact, latency, None)
+
+        start = time.perf_counter()
+        store.search_batch(queries, top_k=args.top_k)
+        batched_ms = (time.perf_counter() - start) * 1000
+        print(f"{'local exact (batched)':>26} {1.0:>9.3f} {batched_ms / len(queries):>8.2f} {'-':>8}  (per query)")
+
+        store.approximate = True
+        start = time.perf_counter()
+        store.build_ivf()
+        print(f"IVF build: {(time.perf_counter() - start) * 1000:.0f} ms | lists={len(store._centroids)}")
+        for n_probe in args.n_probe:
+            store.n_probe = n_probe
+            results, latency = run(store, queries, args.top_k)
+            report(f"local ivf (n_probe={n_probe})", results, latency, exact)
+
+        if args.elastic:
+            from elasticsearch import Elasticsearch
+
+            es = Elasticsearch(os.environ["ELASTIC_SEARCH_URL"], api_key=os.environ["ELASTIC_SEARCH_API_KEY"])
+            elastic = ElasticVectorStore(es, f"bench-store-{uuid.uuid4().hex[:8]}")
+            try:
+                elastic.create(args.dim)
+                list(elastic.write(_documents(vectors), batch_size=500))
+                es.indices.refresh(index=elastic.index_name)
+                es.indices.forcemerge(index=elastic.index_name, max_num_segments=1)
+                results, latency = run(elastic, queries, args.top_k)
+                report("elasticsearch knn", results, latency, exact)
+            finally:
+                elastic.drop()
+
+
+if __name__ == "__main__":
+    main()
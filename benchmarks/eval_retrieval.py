@@ -0,0 +1,108 @@
+"""Offline retrieval evaluation: context recall and latency per search mode.
+
+Questions and ground-truth answers come from `notebooks/rag_evaluation_results.json`; the
+corpus is the sample manuals in `tests/samples`, indexed into a temporary index. For every
+mode the top-k chunks are retrieved and scored with context recall, the fraction of
+ground-truth words (3+ characters) that appear in the retrieved chunks.
+
+Two targets:
+    (default)   the Elasticsearch cluster and Gemini embeddings configured in `.env`.
+    --offline   in-memory Elasticsearch and fake embeddings. The fake vectors carry no
+                meaning, so this only checks the plumbing and measures client-side overhead;
+                recall numbers are only meaningful against the live target.
+
+Usage:
+    PYTHONPATH=. python benchmarks/eval_retrieval.py --top-k 5 --repeat 20
+    PYTHONPATH=. python benchmarks/eval_retrieval.py --offline
+"""
+import os
+import re
+import glob
+import json
+import time
+import uuid
+import argparse
+import statistics
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MODES = {
+    "knn": {"search_mode": "knn"},
+    "bm25": {"search_mode": "hybrid", "fusion": "weighted", "bm25_weight": 1.0, "vector_weight": 0.0},
+    "hybrid rrf": {"search_mode": "hybrid", "fusion": "rrf"},
+    "hybrid weighted": {"search_mode": "hybrid", "fusion": "weighted", "bm25_weight": 0.3, "vector_weight": 0.7},
+}
+
+
+def context_recall(ground_truth: str, contexts) -> float:
+    expected = {word for word in re.findall(r"\w+", ground_truth.lower()) if len(word) > 2}
+    found = set(re.findall(r"\w+", " ".join(contexts).lower()))
+    return len(expected & found) / len(expected) if expected else 0.0
+
+
+def _percentile(values, q):
+    return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else values[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--offline", action="store_true")
+    parser.add_argument("--dataset", default="notebooks/rag_evaluation_results.json")
+    parser.add_argument("--samples", default="tests/samples/*.pdf")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=10, help="timed runs per question and mode")
+    args = parser.parse_args()
+
+    if args.offline:
+        os.environ.setdefault("GEMINI_API_KEY", "offline-benchmark")
+        os.environ.setdefault("EMBEDDING_STORE_BACKEND", "none")
+
+    from app.pipeline import retrieve
+    from app.pipeline.extract import PdfReader
+    from app.pipeline.index import ElasticVectorManager
+    from app.pipeline.retrieve import ElasticRetriever
+
+    if args.offline:
+        from tests.fakes import FakeGenAIClient, fake_async_elasticsearch, fake_elasticsearch
+        elastic_url, api_key = "http://eval-es:9200", "offline"
+        es, async_es = fake_elasticsearch("eval-es"), fake_async_elasticsearch("eval-es")
+        retrieve.google_client = FakeGenAIClient()
+    else:
+        elastic_url, api_key = os.environ["ELASTIC_SEARCH_URL"], os.environ["ELASTIC_SEARCH_API_KEY"]
+        es, async_es = None, None
+
+    with open(args.dataset) as f:
+        dataset = json.load(f)
+
+    index_name = f"eval-retrieval-{uuid.uuid4().hex[:8]}"
+    manager = ElasticVectorManager(elastic_url=elastic_url, api_key=api_key, index_name=index_name, es=es)
+    if args.offline:
+        manager.embedder.client = FakeGenAIClient()
+
+    try:
+        reader = PdfReader(user_id="eval", session_id="eval")
+        for path in sorted(glob.glob(args.samples)):
+            manager.index_documents(reader.read(path))
+        manager.es.indices.refresh(index=index_name)
+
+        print(f"questions={len(dataset)} | top_k={args.top_k} | target={'offline' if args.offline else elastic_url}")
+        print(f"{'mode':>16} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8}")
+        for label, options in MODES.items():
+            retriever = ElasticRetriever(elastic_url, api_key, index_name, es=manager.es, async_es=async_es, **options)
+            recalls, latencies = [], []
+            for item in dataset:
+                retriever.retrieve(item["question"], top_k=args.top_k)  # warm the query-embedding cache
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    results = retriever.retrieve(item["question"], top_k=args.top_k)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                recalls.append(context_recall(item["ground_truth"], [r["text"] for r in results]))
+            print(f"{label:>16} {statistics.mean(recalls):>9.3f} {_percentile(latencies, 50):>8.1f} {_percentile(latencies, 95):>8.1f}")
+    finally:
+        manager.es.indices.delete(index=index_name)
+
+
+if __name__ == "__main__":
+    main()
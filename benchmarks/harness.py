@@ -0,0 +1,109 @@
+"""Helpers of the offline benchmark suite: latency percentiles, peak RSS, isolated runs and JSON results.
+
+Each scenario runs in a fresh (spawned) process, so its peak RSS is its own and state such as
+the in-memory Elasticsearch, the shared caches and the GenAI gateway starts empty.
+"""
+import sys
+import json
+import time
+import platform
+import resource
+import subprocess
+import multiprocessing
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+# results are compared on these fields; True when higher is better
+COMPARED_FIELDS = {"throughput": True, "p50_ms": False, "p95_ms": False, "p99_ms": False, "peak_rss_mb": False}
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of the current process in MiB (`ru_maxrss` is KiB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def summarize(latencies: List[float], units: float, unit: str, elapsed: Optional[float] = None) -> Dict:
+    """Throughput and latency percentiles of a scenario.
+
+    Arguments:
+        latencies (List[float]): seconds per operation (one query, one PDF, one ingest run).
+        units (float): work done in total, e.g. pages or queries.
+        unit (str): name of the throughput unit, e.g. "pages/s".
+        elapsed (Optional[float]): wall time of the whole scenario; defaults to the sum of the latencies.
+    """
+    elapsed = elapsed if elapsed is not None else sum(latencies)
+    p50, p95, p99 = np.percentile(np.asarray(latencies) * 1000, [50, 95, 99])
+    return {
+        "throughput": round(units / elapsed, 2) if elapsed else None,
+        "unit": unit,
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "samples": len(latencies),
+    }
+
+
+def timed(operation: Callable[[], object]) -> float:
+    start = time.perf_counter()
+    operation()
+    return time.perf_counter() - start
+
+
+def _run_and_measure(scenario: Callable[..., Dict], kwargs: Dict) -> Dict:
+    import logging
+    logging.disable(logging.INFO)  # per-operation logs would dominate the measurement
+    result = scenario(**kwargs)
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def run_isolated(scenario: Callable[..., Dict], **kwargs) -> Dict:
+    """Run `scenario(**kwargs)` in a spawned process; returns its summary with `peak_rss_mb` added."""
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(_run_and_measure, (scenario, kwargs))
+
+
+def git_commit() -> Optional[str]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout.strip()
+        return f"{commit}-dirty" if dirty else commit
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata(params: Dict) -> Dict:
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": multiprocessing.cpu_count(),
+        "params": params,
+    }
+
+
+def save(path: str, meta: Dict, results: Dict[str, Dict]):
+    with open(path, "w") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2)
+
+
+def compare(baseline: Dict[str, Dict], current: Dict[str, Dict], threshold: float) -> List[str]:
+    """Print the relative change of each scenario against `baseline`; returns the regressions beyond `threshold` (0.1 = 10%)."""
+    regressions = []
+    print(f"\n{'scenario':<28} {'field':<12} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name in sorted(set(baseline) & set(current)):
+        for field, higher_is_better in COMPARED_FIELDS.items():
+            before, after = baseline[name].get(field), current[name].get(field)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            worse = -change if higher_is_better else change
+            flag = " !" if worse > threshold else ""
+            print(f"{name:<28} {field:<12} {before:>10} {after:>10} {change:>+7.1%}{flag}")
+            if flag:
+                regressions.append(f"{name} {field}: {before} -> {after} ({change:+.1%})")
+    return regressions
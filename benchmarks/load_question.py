@@ -0,0 +1,107 @@
+"""Load test for POST /question: requests/sec and latency at a fixed concurrency.
+
+Two targets:
+    --url http://127.0.0.1:8000   a running API (live Elasticsearch and Gemini).
+    --offline                     the app in-process with local fakes (in-memory Elasticsearch,
+                                  fake Gemini with --latency seconds per call). It runs the same
+                                  load against the async handler and against the previous
+                                  synchronous handler, which blocks a threadpool worker per request.
+
+Usage:
+    PYTHONPATH=. python benchmarks/load_question.py --offline --concurrency 100 --requests 500
+    PYTHONPATH=. python benchmarks/load_question.py --url http://127.0.0.1:8000 --index-name my-index
+"""
+import os
+import time
+import asyncio
+import logging
+import argparse
+import statistics
+
+import httpx
+
+os.environ.setdefault("GEMINI_API_KEY", "offline-benchmark")
+
+
+async def run_load(client: httpx.AsyncClient, path: str, payload: dict, concurrency: int, total: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def one(i: int):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(path, json={**payload, "question": f"{payload['question']} #{i}"})
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {"rps": total / elapsed, "p50_ms": quantiles[49], "p95_ms": quantiles[94], "errors": errors}
+
+
+def offline_app(latency: float):
+    """The real app wired to local fakes, plus the previous synchronous handler for comparison."""
+    from main import app
+    from api.clients import ClientRegistry, get_clients
+    from api.endpoints.question import QuestionRequest
+    from app.pipeline import generate, retrieve
+    from app.pipeline.generate import RAGAgent
+    from app.schemas.schema import Document
+    from tests.fakes import FakeGenAIClient, fake_async_elasticsearch, fake_elasticsearch
+
+    fake_genai = FakeGenAIClient(latency=latency, generation_latency=latency)
+    retrieve.google_client = generate.google_client = fake_genai
+
+    registry = ClientRegistry("http://bench-es:9200", "bench", es=fake_elasticsearch("bench-es"), async_es=fake_async_elasticsearch("bench-es"))
+    manager = registry.get_vector_manager("bench-index")
+    manager.embedder.client = FakeGenAIClient()
+    manager.index_documents([
+        Document(document_id="bench", user_id="bench", session_id="bench", title="bench.pdf", chunk_id=i, text=f"motor manual section {i}")
+        for i in range(50)
+    ])
+    app.dependency_overrides[get_clients] = lambda: registry
+
+    @app.post("/question/sync-baseline")
+    def generate_answer_sync(req: QuestionRequest):
+        agent = RAGAgent(model="fake-model", retriever=registry.get_retriever(req.index_name))
+        return agent.run(req.question)
+
+    return app
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url")
+    target.add_argument("--offline", action="store_true")
+    parser.add_argument("--index-name", default="bench-index")
+    parser.add_argument("--question", default="What is the process before accepting a motor?")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.1, help="offline: simulated seconds per Gemini call")
+    args = parser.parse_args()
+
+    payload = {"user_id": "bench", "session_id": "bench", "index_name": args.index_name, "question": args.question}
+    print(f"concurrency={args.concurrency} | requests={args.requests}")
+    print(f"{'handler':>16} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=None) as client:
+            stats = await run_load(client, "/question/", payload, args.concurrency, args.requests)
+            print(f"{'live':>16} {stats['rps']:>8.1f} {stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {stats['errors']:>7}")
+        return
+
+    logging.disable(logging.INFO)  # per-request logs would dominate the in-process measurement
+    transport = httpx.ASGITransport(app=offline_app(args.latency))
+    async with httpx.AsyncClient(transport=transport, base_url="http://offline", timeout=None) as client:
+        for label, path in (("sync (before)", "/question/sync-baseline"), ("async (after)", "/question/")):
+            stats = await run_load(client, path, payload, args.concurrency, args.requests)
+            print(f"{label:>16} {stats['rps']:>8.1f} {stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {stats['errors']:>7}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,200 @@
+"""Offline benchmark suite of the ingest and query paths, with JSON results comparable between commits.
+
+Every scenario runs in its own process against local stand-ins: the in-memory Elasticsearch
+node and the fake Gemini client of `tests/fakes.py`, which sleeps --latency seconds per
+embedding request and --generation-latency seconds per generation and, with --rate-limit,
+answers requests beyond that many per second with a 429 and a `Retry-After` header. The
+corpora are synthetic PDFs of --sizes pages, generated deterministically.
+
+Scenarios (per corpus size for the first three):
+    extract/pages=N    `PdfReader.read`, pages/s
+    index/pages=N      `ElasticVectorManager.index_documents` of the extracted chunks, chunks/s
+    ingest/pages=N     `IngestPipeline.run` (extract, embed and bulk overlapped), pages/s
+    retrieve           `ElasticRetriever.retrieve` on the largest corpus, queries/s
+    question           `RAGAgent.run` on the largest corpus, questions/s
+
+Each reports throughput, p50/p95/p99 latency (per PDF or per query) and peak RSS, and the
+results are written as JSON (default `.cache/benchmarks/<commit>.json`). With --baseline, the
+run is compared with an earlier results file and exits with status 1 on a regression larger
+than --threshold.
+
+Usage:
+    PYTHONPATH=. python benchmarks/suite.py [--sizes 10 50 200] [--queries 200] [--rate-limit 50]
+    PYTHONPATH=. python benchmarks/suite.py --baseline .cache/benchmarks/<commit>.json
+"""
+import os
+import sys
+import json
+import random
+import argparse
+
+os.environ.setdefault("GEMINI_API_KEY", "offline-benchmark")
+os.environ.setdefault("EMBEDDING_STORE_BACKEND", "none")
+os.environ.setdefault("ANSWER_CACHE_BACKEND", "none")
+
+import pymupdf
+
+from benchmarks.harness import compare, metadata, run_isolated, save, summarize, timed
+
+WORDS = (
+    "motor stator rotor bearing winding insulation resistance voltage current torque speed frame "
+    "shaft coupling alignment vibration temperature lubrication grease terminal box nameplate "
+    "inverter frequency efficiency cooling fan enclosure protection relay thermistor brush ground "
+    "inspect measure tighten replace clean verify record install operate maintain check"
+).split()
+
+
+def synthetic_pdf(pages: int, words_per_page: int = 400, seed: int = 0) -> bytes:
+    """Deterministic PDF of `pages` pages of motor-manual vocabulary (about two chunks per page)."""
+    pdf = pymupdf.open()
+    for page_num in range(pages):
+        rng = random.Random(seed * 100_003 + page_num)
+        text = f"Section {page_num}. " + " ".join(rng.choice(WORDS) for _ in range(words_per_page))
+        page = pdf.new_page()
+        page.insert_textbox(pymupdf.Rect(36, 36, 576, 806), text, fontsize=7)
+    data = pdf.tobytes()
+    pdf.close()
+    return data
+
+
+def _clients(latency: float, generation_latency: float, rate_limit):
+    """Fake Gemini client installed in every pipeline module, and a fresh in-memory Elasticsearch."""
+    from app.pipeline import generate, retrieve
+    from tests.fakes import FakeGenAIClient, InMemoryElasticNode, fake_elasticsearch
+
+    InMemoryElasticNode.reset()
+    client = FakeGenAIClient(latency=latency, generation_latency=generation_latency, requests_per_second=rate_limit)
+    retrieve.google_client = generate.google_client = client
+    return client, fake_elasticsearch("bench-es")
+
+
+def _manager(es, client, index_name: str):
+    from app.pipeline.index import ElasticVectorManager
+
+    manager = ElasticVectorManager("http://bench-es:9200", "bench", index_name, es=es)
+    manager.embedder.client = client
+    return manager
+
+
+def extract(pages: int, repeats: int) -> dict:
+    from app.pipeline.extract import PdfReader
+
+    pdf = synthetic_pdf(pages)
+    reader = PdfReader(user_id="bench", session_id="bench")
+    latencies = [timed(lambda: reader.read(pdf, "bench.pdf")) for _ in range(repeats)]
+    return summarize(latencies, pages * repeats, "pages/s")
+
+
+def index(pages: int, repeats: int, latency: float, generation_latency: float, rate_limit) -> dict:
+    from app.pipeline.extract import PdfReader
+
+    documents = PdfReader(user_id="bench", session_id="bench").read(synthetic_pdf(pages), "bench.pdf")
+    client, es = _clients(latency, generation_latency, rate_limit)
+    latencies = []
+    for repeat in range(repeats):
+        for doc in documents:
+            doc.embedding = None
+        latencies.append(timed(lambda: _manager(es, client, f"bench-index-{repeat}").index_documents(documents)))
+    result = summarize(latencies, len(documents) * repeats, "chunks/s")
+    result["rate_limited"] = client.rate_limited
+    return result
+
+
+def ingest(pages: int, repeats: int, latency: float, generation_latency: float, rate_limit) -> dict:
+    from app.pipeline.extract import PdfReader
+    from app.pipeline.ingest import IngestPipeline
+
+    pdf = synthetic_pdf(pages)
+    client, es = _clients(latency, generation_latency, rate_limit)
+    reader = PdfReader(user_id="bench", session_id="bench")
+    latencies = [
+        timed(lambda: IngestPipeline(reader, _manager(es, client, f"bench-ingest-{repeat}")).run(pdf, "bench.pdf"))
+        for repeat in range(repeats)
+    ]
+    result = summarize(latencies, pages * repeats, "pages/s")
+    result["rate_limited"] = client.rate_limited
+    return result
+
+
+def _query_setup(pages: int, latency: float, generation_latency: float, rate_limit):
+    from app.pipeline.cache import LRUEmbeddingCache
+    from app.pipeline.extract import PdfReader
+    from app.pipeline.retrieve import ElasticRetriever
+
+    client, es = _clients(latency, generation_latency, rate_limit)
+    _manager(es, client, "bench-query").index_documents(PdfReader(user_id="bench", session_id="bench").read(synthetic_pdf(pages), "bench.pdf"))
+    retriever = ElasticRetriever("http://bench-es:9200", "bench", "bench-query", embedding_cache=LRUEmbeddingCache(), es=es)
+    # distinct questions, so the query-embedding cache does not help
+    questions = [f"How is the {WORDS[i % len(WORDS)]} of section {i} checked?" for i in range(10_000)]
+    return client, retriever, questions
+
+
+def retrieve(pages: int, queries: int, latency: float, generation_latency: float, rate_limit) -> dict:
+    client, retriever, questions = _query_setup(pages, latency, generation_latency, rate_limit)
+    latencies = [timed(lambda: retriever.retrieve(question)) for question in questions[:queries]]
+    result = summarize(latencies, queries, "queries/s")
+    result["rate_limited"] = client.rate_limited
+    return result
+
+
+def question(pages: int, queries: int, latency: float, generation_latency: float, rate_limit) -> dict:
+    from app.pipeline.generate import RAGAgent
+
+    client, retriever, questions = _query_setup(pages, latency, generation_latency, rate_limit)
+    agent = RAGAgent(model="fake-model", retriever=retriever)
+    latencies = [timed(lambda: agent.run(question)) for question in questions[:queries]]
+    result = summarize(latencies, queries, "questions/s")
+    result["rate_limited"] = client.rate_limited
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 200], help="pages of the synthetic corpora")
+    parser.add_argument("--repeats", type=int, default=3, help="runs of each extract/index/ingest scenario")
+    parser.add_argument("--queries", type=int, default=100, help="queries of the retrieve and question scenarios")
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated seconds per embedding request")
+    parser.add_argument("--generation-latency", type=float, default=0.05, help="simulated seconds per generation")
+    parser.add_argument("--rate-limit", type=int, default=None, help="fake server quota in requests/s; beyond it, 429s")
+    parser.add_argument("--output", default=None, help="results file (default: .cache/benchmarks/<commit>.json)")
+    parser.add_argument("--baseline", default=None, help="earlier results file to compare with")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change reported as a regression")
+    args = parser.parse_args()
+
+    fakes = {"latency": args.latency, "generation_latency": args.generation_latency, "rate_limit": args.rate_limit}
+    scenarios = []
+    for pages in args.sizes:
+        scenarios.append((f"extract/pages={pages}", extract, {"pages": pages, "repeats": args.repeats}))
+        scenarios.append((f"index/pages={pages}", index, {"pages": pages, "repeats": args.repeats, **fakes}))
+        scenarios.append((f"ingest/pages={pages}", ingest, {"pages": pages, "repeats": args.repeats, **fakes}))
+    largest = max(args.sizes)
+    scenarios.append(("retrieve", retrieve, {"pages": largest, "queries": args.queries, **fakes}))
+    scenarios.append(("question", question, {"pages": largest, "queries": args.queries, **fakes}))
+
+    results = {}
+    print(f"{'scenario':<28} {'throughput':>16} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'peak MiB':>9}")
+    for name, scenario, kwargs in scenarios:
+        result = results[name] = run_isolated(scenario, **kwargs)
+        throughput = f"{result['throughput']} {result['unit']}"
+        print(f"{name:<28} {throughput:>16} {result['p50_ms']:>9} {result['p95_ms']:>9} {result['p99_ms']:>9} {result['peak_rss_mb']:>9}")
+
+    meta = metadata({key: value for key, value in vars(args).items() if key not in ("output", "baseline")})
+    output = args.output or os.path.join(".cache", "benchmarks", f"{meta['commit'] or 'results'}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    save(output, meta, results)
+    print(f"\nResults written to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"Compared with {args.baseline} (commit {baseline['meta'].get('commit')})")
+        if baseline["meta"].get("params") != meta["params"]:
+            print(f"Note: the baseline ran with other parameters: {baseline['meta'].get('params')}")
+        regressions = compare(baseline["results"], results, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
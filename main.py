@@ -1,8 +1,28 @@
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
 from fastapi import FastAPI
-from api.endpoints import documents, question, health
+from fastapi.concurrency import run_in_threadpool
+from api.clients import ClientRegistry
+from api.jobs import IngestJobQueue
+from api.endpoints import documents, question, health, metrics
 
-app = FastAPI(title="Industrial RAG API")
+load_dotenv()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # shared, keep-alive clients for every request handler
+    app.state.clients = ClientRegistry.from_env()
+    # background ingestion; resumes jobs interrupted by the previous shutdown
+    app.state.jobs = IngestJobQueue.from_env(app.state.clients)
+    app.state.jobs.recover()
+    yield
+    # let running jobs finish their current file (up to INGEST_SHUTDOWN_TIMEOUT) before the clients close
+    await run_in_threadpool(app.state.jobs.shutdown)
+    await app.state.clients.aclose()
+
+app = FastAPI(title="Industrial RAG API", lifespan=lifespan)
 
 app.include_router(health.router)
+app.include_router(metrics.router)
 app.include_router(documents.router, prefix="/documents", tags=["Documents"])
 app.include_router(question.router, prefix="/question", tags=["Question"])
@@ -97,49 +97,46 @@ def main():
     
     # Process query
     if query_button and user_query.strip():
-        with st.spinner("Searching and generating answer..."):
-            try:
-                # Get response from RAG agent
-                response = agent.run(user_query)
-                
-                if response and isinstance(response, dict):
-                    st.markdown("---")
-                    st.subheader("📖 Answer")
-                    
-                    # Display the main answer
-                    if "answer" in response:
-                        st.markdown(response["answer"])
-                    elif "response" in response:
-                        st.markdown(response["response"])
-                    else:
-                        st.markdown(str(response))
-                    
-                    # Show additional information if available
-                    with st.expander("🔍 Additional Information", expanded=False):
-                        col_left, col_right = st.columns(2)
-                        
-                        with col_left:
-                            if "sources" in response:
-                                st.markdown("**📄 Sources:**")
-                                for i, source in enumerate(response["sources"], 1):
-                                    st.markdown(f"{i}. {source}")
-                        
-                        with col_right:
-                            if "metadata" in response:
-                                st.markdown("**ℹ️ Metadata:**")
-                                st.json(response["metadata"])
-                        
-                        # Show full response structure
-                        st.markdown("**🔧 Full Response Structure:**")
-                        st.json(response)
-                
-                else:
-                    st.error("❌ Received an invalid response from the RAG agent")
-                    
-            except Exception as e:
-                st.error(f"❌ Error processing your question: {e}")
-                _log.error(f"Query processing error: {e}")
-    
+        try:
+            st.markdown("---")
+            st.subheader("📖 Answer")
+            answer_placeholder = st.empty()
+            answer = ""
+            references, timings = [], {}
+
+            # Render the answer while it is generated
+            with st.spinner("Searching and generating answer..."):
+                for event in agent.run_stream(user_query):
+                    if event["event"] == "token":
+                        answer += event["data"]["text"]
+                        answer_placeholder.markdown(answer + "▌")
+                    elif event["event"] == "references":
+                        references = event["data"]
+                    elif event["event"] == "done":
+                        timings = event["data"]
+            answer_placeholder.markdown(answer)
+
+            # Show additional information if available
+            with st.expander("🔍 Additional Information", expanded=False):
+                col_left, col_right = st.columns(2)
+
+                with col_left:
+                    st.markdown("**📄 Sources:**")
+                    for i, reference in enumerate(references, 1):
+                        st.markdown(f"{i}. {reference.get('reference_title')}")
+
+                with col_right:
+                    st.markdown("**⏱️ Timings:**")
+                    st.json(timings)
+
+                # Show full response structure
+                st.markdown("**🔧 Full Response Structure:**")
+                st.json({"response": answer, "reference": references})
+
+        except Exception as e:
+            st.error(f"❌ Error processing your question: {e}")
+            _log.error(f"Query processing error: {e}")
+
     elif query_button and not user_query.strip():
         st.warning("⚠️ Please enter a question before clicking 'Ask'")
     
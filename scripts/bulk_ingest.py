@@ -0,0 +1,80 @@
+"""Ingest a large set of PDFs into one index in bulk load mode.
+
+Usage:
+    PYTHONPATH=. python scripts/bulk_ingest.py <pdf or directory>... --index-name <name> --user-id <id> --session-id <id>
+        [--workers 4] [--max-actions 500] [--max-mb 10] [--max-retries 5] [--no-force-merge] [--extract-workers 1]
+
+While the PDFs are ingested the index has no refreshes and no replicas, chunks are written
+with parallel bulk requests bounded by count and size, and items the cluster rejects (429)
+are retried with backoff. At the end the index is force-merged and its settings restored.
+Reports docs/sec, rejected and failed items. Clients are configured from the same
+ELASTIC_* / VECTOR_STORE_* / ELASTIC_SHARED_INDEX environment variables as the API.
+"""
+import os
+import time
+import argparse
+from dotenv import load_dotenv
+
+from api.clients import ClientRegistry
+from api.jobs import bulk_options_from_env
+from app.pipeline.extract import PdfReader
+from app.pipeline.ingest import IngestPipeline, IngestProgress
+from app.utils.logger import Logger
+
+load_dotenv()
+_log = Logger.get_logger(__name__)
+
+
+def pdf_paths(paths):
+    """The PDFs among `paths`, directories searched recursively, in a stable order."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in sorted(os.walk(path)):
+                yield from (os.path.join(root, name) for name in sorted(files) if name.lower().endswith(".pdf"))
+        else:
+            yield path
+
+
+def main():
+    defaults = bulk_options_from_env()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="PDF files or directories of PDFs")
+    parser.add_argument("--index-name", required=True)
+    parser.add_argument("--user-id", required=True)
+    parser.add_argument("--session-id", required=True)
+    parser.add_argument("--workers", type=int, default=defaults["workers"], help="bulk requests in flight (default: $BULK_WORKERS or 4)")
+    parser.add_argument("--max-actions", type=int, default=defaults["max_actions"], help="chunks per bulk request")
+    parser.add_argument("--max-mb", type=float, default=defaults["max_bytes"] / 2 ** 20, help="size of a bulk request in MiB")
+    parser.add_argument("--max-retries", type=int, default=defaults["max_retries"], help="retries of a rejected chunk")
+    parser.add_argument("--no-force-merge", dest="force_merge", action="store_false", default=defaults["force_merge"])
+    parser.add_argument("--extract-workers", type=int, default=int(os.environ.get("PDF_EXTRACT_WORKERS", 1)))
+    args = parser.parse_args()
+
+    clients = ClientRegistry.from_env()
+    manager = clients.get_vector_manager(args.index_name, user_id=args.user_id, session_id=args.session_id)
+    reader = PdfReader(user_id=args.user_id, session_id=args.session_id, max_workers=args.extract_workers)
+    pipeline = IngestPipeline(reader=reader, vector_manager=manager)
+    progress = IngestProgress()
+
+    start = time.perf_counter()
+    documents = chunks = 0
+    with manager.bulk_load(
+        workers=args.workers, max_actions=args.max_actions, max_bytes=int(args.max_mb * 2 ** 20),
+        max_retries=args.max_retries, force_merge=args.force_merge,
+    ) as writer:
+        for path in pdf_paths(args.paths):
+            chunks += pipeline.run(path, progress=progress, writer=writer)
+            documents += 1
+            _log.info(f"Ingested {path} | documents={documents} | {writer.stats.snapshot()}")
+
+    report = writer.stats.snapshot()
+    _log.info(
+        f"Bulk ingest completed | index={args.index_name} | documents={documents} | chunks={chunks} | "
+        f"pages={progress.pages_extracted} | seconds={time.perf_counter() - start:.1f} | "
+        f"docs_per_second={report['docs_per_second']} | rejected={report['rejected']} | failed={report['failed']}"
+    )
+    clients.es.close()
+
+
+if __name__ == "__main__":
+    main()
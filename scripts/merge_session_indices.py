@@ -0,0 +1,55 @@
+"""Merge per-session indices into the shared index used with ELASTIC_SHARED_INDEX.
+
+Usage:
+    PYTHONPATH=. python scripts/merge_session_indices.py [--pattern "index-*"] [--shared-index <name>] [--dry-run]
+
+Each index matching the pattern is reindexed into the shared index (routed by user_id,
+keeping the stored embeddings), then deleted; its name becomes a filtered alias of the
+shared index for its user and session, so clients keep using the same index_name.
+Indices holding chunks of several sessions, and empty ones, are left untouched.
+"""
+import os
+import argparse
+from dotenv import load_dotenv
+from elasticsearch import Elasticsearch
+
+from app.pipeline.store import SharedElasticVectorStore
+from app.utils.logger import Logger
+
+load_dotenv()
+_log = Logger.get_logger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pattern", default="index-*", help="per-session indices to merge (default: index-*)")
+    parser.add_argument("--shared-index", default=os.environ.get("ELASTIC_SHARED_INDEX"), help="default: $ELASTIC_SHARED_INDEX")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be merged")
+    args = parser.parse_args()
+    if not args.shared_index:
+        parser.error("--shared-index is required when ELASTIC_SHARED_INDEX is not set")
+
+    es = Elasticsearch(os.environ["ELASTIC_SEARCH_URL"], api_key=os.environ["ELASTIC_SEARCH_API_KEY"])
+    # concrete indices only: sessions already merged are aliases of the shared index
+    indices = sorted(name for name in es.indices.get(index=args.pattern, expand_wildcards="open") if name != args.shared_index)
+
+    merged = skipped = 0
+    for index_name in indices:
+        try:
+            store = SharedElasticVectorStore.from_index(es, index_name, args.shared_index)
+        except ValueError as e:
+            _log.warning(f"Skipping '{index_name}': {e}")
+            skipped += 1
+            continue
+
+        if args.dry_run:
+            _log.info(f"Would merge '{index_name}' | user_id={store.user_id} | session_id={store.session_id}")
+        else:
+            store.merge()
+        merged += 1
+
+    _log.info(f"{'Would merge' if args.dry_run else 'Merged'} {merged} indices into '{args.shared_index}' | skipped={skipped}")
+
+
+if __name__ == "__main__":
+    main()
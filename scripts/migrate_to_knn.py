@@ -0,0 +1,42 @@
+"""Migrate an existing index to the kNN (HNSW) mapping without re-embedding.
+
+Usage:
+    PYTHONPATH=. python scripts/migrate_to_knn.py <source_index> [--target <new_index>] [--replace]
+
+With --replace the source index is deleted after the copy and its name becomes an
+alias of the new index, so clients keep using the same index_name.
+"""
+import os
+import argparse
+from dotenv import load_dotenv
+
+from app.pipeline.index import ElasticVectorManager
+from app.utils.logger import Logger
+
+load_dotenv()
+_log = Logger.get_logger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source_index")
+    parser.add_argument("--target", help="name of the new index (default: <source_index>-knn)")
+    parser.add_argument("--replace", action="store_true", help="delete the source and alias its name to the target")
+    parser.add_argument("--embedding-dim", type=int, default=768)
+    args = parser.parse_args()
+
+    manager = ElasticVectorManager(
+        elastic_url=os.environ["ELASTIC_SEARCH_URL"],
+        api_key=os.environ["ELASTIC_SEARCH_API_KEY"],
+        index_name=args.target or f"{args.source_index}-knn",
+        embedding_dim=args.embedding_dim,
+    )
+    if manager.has_vector_index(args.source_index):
+        _log.info(f"Index '{args.source_index}' is already mapped for kNN. Nothing to do.")
+        return
+
+    manager.migrate_index(args.source_index, delete_source=args.replace)
+
+
+if __name__ == "__main__":
+    main()
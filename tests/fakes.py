@@ -0,0 +1,572 @@
+"""Local stand-ins for external services, used by unit tests and benchmarks."""
+import re
+import json
+import base64
+import math
+import time
+import asyncio
+import hashlib
+import threading
+from uuid import uuid4
+from collections import deque
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+import httpx
+import numpy as np
+from google.genai import errors
+from elasticsearch import AsyncElasticsearch, Elasticsearch
+from elastic_transport import ApiResponseMeta, BaseAsyncNode, BaseNode, HttpHeaders, NodeConfig
+from elastic_transport._node import NodeApiResponse
+
+
+def fake_vector(text: str, dim: int = 768) -> List[float]:
+    """Deterministic pseudo-embedding derived from the text hash."""
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return [digest[i % len(digest)] / 255.0 for i in range(dim)]
+
+
+def rate_limit_error(retry_after: Optional[float] = None) -> errors.ClientError:
+    """The 429 the Gemini API answers when a quota is exhausted, with an optional `Retry-After` header."""
+    headers = {"retry-after": f"{retry_after:g}"} if retry_after is not None else {}
+    return errors.ClientError(
+        429,
+        {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED", "message": "Resource has been exhausted (e.g. check quota)."}},
+        response=httpx.Response(429, headers=headers),
+    )
+
+
+class FakeEmbeddingClient:
+    """Mimics `genai.Client` for `models.embed_content`, with configurable latency and failures.
+
+    Attributes:
+        latency (float): seconds slept per request, simulating the network round-trip.
+        failures (int): number of initial requests answered with a 429 before requests start succeeding.
+        retry_after (Optional[float]): `Retry-After` seconds sent with those 429s.
+        requests_per_second (Optional[int]): server-side quota; requests beyond it within one second
+            get a 429 whose `Retry-After` is the time until the quota frees up.
+        calls (int): number of `embed_content` requests received.
+        rate_limited (int): number of requests answered with a 429.
+        texts_embedded (int): number of texts embedded across all requests.
+        max_in_flight (int): highest number of requests observed running at the same time.
+    """
+
+    def __init__(self, dim: int = 768, latency: float = 0.0, failures: int = 0,
+                 retry_after: Optional[float] = None, requests_per_second: Optional[int] = None):
+        self.dim = dim
+        self.latency = latency
+        self.failures = failures
+        self.retry_after = retry_after
+        self.requests_per_second = requests_per_second
+        self.calls = 0
+        self.rate_limited = 0
+        self._recent = deque()
+        self.texts_embedded = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self.models = self
+
+    def embed_content(self, model: str, contents, config: Optional[object] = None):
+        return self._embed(contents, config, time.sleep)
+
+    def _embed(self, contents, config, sleep):
+        texts = [contents] if isinstance(contents, str) else list(contents)
+        dim = getattr(config, "output_dimensionality", None) or self.dim
+
+        with self._lock:
+            self.calls += 1
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+            if self.failures > 0:
+                self.failures -= 1
+                error = rate_limit_error(self.retry_after)
+            else:
+                error = self._over_quota()
+
+        try:
+            if self.latency:
+                sleep(self.latency)
+            if error is not None:
+                raise error
+            with self._lock:
+                self.texts_embedded += len(texts)
+            return SimpleNamespace(
+                embeddings=[SimpleNamespace(values=fake_vector(text, dim)) for text in texts]
+            )
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _over_quota(self) -> Optional[errors.ClientError]:
+        """Count a request against `requests_per_second` (caller holds the lock); the 429 to answer if over it."""
+        if self.requests_per_second is None:
+            return None
+        now = time.monotonic()
+        while self._recent and now - self._recent[0] >= 1.0:
+            self._recent.popleft()
+        if len(self._recent) >= self.requests_per_second:
+            self.rate_limited += 1
+            return rate_limit_error(round(1.0 - (now - self._recent[0]), 3))
+        self._recent.append(now)
+        return None
+
+
+class FakeGenAIClient(FakeEmbeddingClient):
+    """Mimics `genai.Client` for embeddings and structured generation, sync (`models`) and async (`aio.models`).
+
+    Generated answers are valid `RAGResponse` JSON that echo the question and the first context title.
+    Embeddings and generations count against the same `requests_per_second` quota.
+
+    Attributes:
+        generation_latency (float): seconds slept per `generate_content` call.
+        generation_failures (int): number of initial generations answered with a 429.
+        generations (int): number of `generate_content` calls received.
+    """
+
+    def __init__(self, dim: int = 768, latency: float = 0.0, generation_latency: float = 0.0, failures: int = 0,
+                 generation_failures: int = 0, retry_after: Optional[float] = None, requests_per_second: Optional[int] = None):
+        super().__init__(dim=dim, latency=latency, failures=failures, retry_after=retry_after, requests_per_second=requests_per_second)
+        self.generation_latency = generation_latency
+        self.generation_failures = generation_failures
+        self.generations = 0
+        self.aio = SimpleNamespace(models=_AsyncFakeModels(self))
+
+    def generate_content(self, model: str, contents, config=None):
+        if self.generation_latency:
+            time.sleep(self.generation_latency)
+        return self._generate(contents)
+
+    def generate_content_stream(self, model: str, contents, config=None):
+        if self.generation_latency:
+            time.sleep(self.generation_latency)
+        text = self._generate(contents).text
+        for start in range(0, len(text), 7):
+            yield SimpleNamespace(text=text[start:start + 7])
+
+    def _generate(self, contents):
+        with self._lock:
+            self.generations += 1
+            if self.generation_failures > 0:
+                self.generation_failures -= 1
+                error = rate_limit_error(self.retry_after)
+            else:
+                error = self._over_quota()
+        if error is not None:
+            raise error
+        prompt = contents[0].parts[0].text
+        question = contents[-1].parts[0].text
+        titles = re.findall(r"Title: (.+)", prompt)
+        answer = {
+            "response": f"Answer to: {question}",
+            "reference": [{"reference_title": titles[0], "reference_excerpt": ["..."]}] if titles else [],
+        }
+        text = json.dumps(answer)
+        return SimpleNamespace(
+            text=text,
+            usage_metadata=SimpleNamespace(prompt_token_count=len(prompt) // 4, candidates_token_count=len(text) // 4),
+        )
+
+
+class _AsyncFakeModels:
+    def __init__(self, client: FakeGenAIClient):
+        self._client = client
+
+    async def embed_content(self, model: str, contents, config=None):
+        if self._client.latency:
+            await asyncio.sleep(self._client.latency)
+        return self._client._embed(contents, config, sleep=lambda _: None)
+
+    async def generate_content(self, model: str, contents, config=None):
+        if self._client.generation_latency:
+            await asyncio.sleep(self._client.generation_latency)
+        return self._client._generate(contents)
+
+    async def generate_content_stream(self, model: str, contents, config=None):
+        if self._client.generation_latency:
+            await asyncio.sleep(self._client.generation_latency)
+        text = self._client._generate(contents).text
+
+        async def chunks():
+            for start in range(0, len(text), 7):
+                yield SimpleNamespace(text=text[start:start + 7])
+
+        return chunks()
+
+
+class InMemoryElasticNode(BaseNode):
+    """Transport node that serves a small subset of the Elasticsearch REST API from memory.
+
+    Plugged into a real `Elasticsearch` client via `node_class`, so the client and its
+    `helpers` run unmodified. Indices are shared by every client pointing at the same host.
+    Filtered aliases restrict searches, counts and deletes made through them; routing is ignored.
+    """
+
+    clusters: Dict[str, Dict[str, Dict]] = {}
+    # set to False to answer the retrievers API like a cluster whose license lacks RRF
+    native_fusion = True
+    # bulk items answered with a 429 `es_rejected_execution_exception` before items are accepted again
+    reject_bulk_items = 0
+
+    def __init__(self, config: NodeConfig):
+        super().__init__(config)
+        cluster = InMemoryElasticNode.clusters.setdefault(config.host, {"indices": {}, "aliases": {}, "alias_specs": {}})
+        self.indices = cluster["indices"]
+        self.aliases = cluster["aliases"]
+        self.alias_specs = cluster["alias_specs"]
+        self.requests: List[Tuple[str, str]] = []
+
+    @classmethod
+    def reset(cls):
+        cls.clusters.clear()
+        cls.native_fusion = True
+        cls.reject_bulk_items = 0
+
+    def perform_request(self, method, target, body=None, headers=None, request_timeout=None):
+        url = urlsplit(target)
+        parts = [unquote(p) for p in url.path.strip("/").split("/") if p]
+        params = dict(parse_qsl(url.query))
+        self.requests.append((method, url.path))
+        status, payload = self._route(method, parts, params, body or b"")
+
+        meta = ApiResponseMeta(
+            status=status,
+            http_version="1.1",
+            headers=HttpHeaders({"content-type": "application/json", "x-elastic-product": "Elasticsearch"}),
+            duration=0.0,
+            node=self.config,
+        )
+        data = b"" if method == "HEAD" else json.dumps(payload).encode("utf-8")
+        return NodeApiResponse(meta, data)
+
+    # --- routing ---
+    def _route(self, method, parts, params, body):
+        if parts and parts[-1] == "_msearch":
+            return self._msearch(parts[0] if len(parts) == 2 else None, body)
+        if parts and parts[-1] == "_bulk":
+            return self._bulk(self._resolve(parts[0]) if len(parts) == 2 else None, body)
+        if parts == ["_reindex"]:
+            return self._reindex(json.loads(body))
+        if parts == ["_search", "scroll"]:
+            # `_search?scroll=` returns every hit in its first page, so the scroll is exhausted
+            if method == "DELETE":
+                return 200, {"succeeded": True, "num_freed": 1}
+            return 200, {"_scroll_id": "fake-scroll", "_shards": {"total": 1, "successful": 1, "failed": 0}, "hits": {"hits": []}}
+        if len(parts) == 2 and parts[0] == "_alias":
+            return self._get_alias(parts[1])
+        if len(parts) == 1 and not parts[0].startswith("_"):
+            if parts[0] in self.aliases and method in ("HEAD", "GET"):
+                return self._index_api(method, self._resolve(parts[0]), body)
+            return self._index_api(method, parts[0], body)
+        if len(parts) >= 2:
+            index, action = self._resolve(parts[0]), parts[1]
+            scope = self.alias_specs.get(parts[0], {}).get("filter")
+            if action == "_alias" and len(parts) == 3:
+                return self._alias_api(method, index, parts[2], body)
+            if index not in self.indices:
+                return self._error(404, "index_not_found_exception", f"no such index [{index}]")
+            if action == "_search":
+                search = json.loads(body or b"{}")
+                if "scroll" in params:
+                    search["size"] = len(self.indices[index]["docs"])
+                    status, payload = self._search(index, search, scope)
+                    return status, {**payload, "_scroll_id": "fake-scroll", "_shards": {"total": 1, "successful": 1, "failed": 0}}
+                return self._search(index, search, scope)
+            if action == "_doc" and len(parts) == 3:
+                if method in ("PUT", "POST"):
+                    self.indices[index]["docs"][parts[2]] = json.loads(body)
+                    return 201, {"_index": index, "_id": parts[2], "result": "created"}
+                return self._get(index, parts[2])
+            if action in ("_refresh", "_forcemerge"):
+                return 200, {"_shards": {"total": 1, "successful": 1, "failed": 0}}
+            if action == "_settings":
+                settings = self.indices[index].setdefault("settings", {"index.number_of_replicas": "1"})
+                if method == "PUT":
+                    for name, value in json.loads(body).items():
+                        if value is None:
+                            settings.pop(name, None)
+                        else:
+                            settings[name] = str(value)
+                    return 200, {"acknowledged": True}
+                return 200, {index: {"settings": dict(settings)}}
+            if action == "_count":
+                query = json.loads(body or b"{}").get("query")
+                docs = self.indices[index]["docs"].values()
+                return 200, {"count": sum(1 for doc in docs if _matches(doc, query) and _matches(doc, scope))}
+            if action == "_delete_by_query":
+                query = json.loads(body)["query"]
+                docs = self.indices[index]["docs"]
+                matched = [doc_id for doc_id, doc in docs.items() if _matches(doc, query) and _matches(doc, scope)]
+                for doc_id in matched:
+                    del docs[doc_id]
+                return 200, {"took": 0, "deleted": len(matched), "failures": []}
+            if action == "_mapping":
+                return 200, {index: {"mappings": self.indices[index]["body"].get("mappings", {})}}
+        return self._error(400, "unsupported_operation_exception", f"{method} /{'/'.join(parts)} is not faked")
+
+    def _index_api(self, method, index, body):
+        if method == "HEAD":
+            return (200 if index in self.indices else 404), {}
+        if method == "PUT":
+            if index in self.indices:
+                return self._error(400, "resource_already_exists_exception", f"index [{index}] already exists")
+            self.indices[index] = {"body": json.loads(body or b"{}"), "docs": {}}
+            return 200, {"acknowledged": True, "index": index}
+        if method == "DELETE":
+            if self.indices.pop(index, None) is None:
+                return self._error(404, "index_not_found_exception", f"no such index [{index}]")
+            for alias in [a for a, target in self.aliases.items() if target == index]:
+                del self.aliases[alias]
+                self.alias_specs.pop(alias, None)
+            return 200, {"acknowledged": True}
+        if method == "GET" and index in self.indices:
+            return 200, {index: self.indices[index]["body"]}
+        return self._error(404, "index_not_found_exception", f"no such index [{index}]")
+
+    def _alias_api(self, method, index, name, body):
+        if method in ("PUT", "POST"):
+            spec = json.loads(body or b"{}")
+            self.aliases[name] = index
+            self.alias_specs[name] = {
+                **({"filter": spec["filter"]} if "filter" in spec else {}),
+                **({"index_routing": spec["routing"], "search_routing": spec["routing"]} if "routing" in spec else {}),
+            }
+            return 200, {"acknowledged": True}
+        if method == "DELETE":
+            if self.aliases.get(name) != index:
+                return self._error(404, "aliases_not_found_exception", f"aliases [{name}] missing")
+            del self.aliases[name]
+            self.alias_specs.pop(name, None)
+            return 200, {"acknowledged": True}
+        return self._get_alias(name)
+
+    def _get_alias(self, name):
+        if name not in self.aliases:
+            return 404, {"error": f"alias [{name}] missing", "status": 404}
+        return 200, {self.aliases[name]: {"aliases": {name: self.alias_specs.get(name, {})}}}
+
+    def _bulk(self, default_index, body):
+        lines = [json.loads(line) for line in body.decode("utf-8").splitlines() if line.strip()]
+        items, i = [], 0
+        while i < len(lines):
+            op, meta = next(iter(lines[i].items()))
+            index = self._resolve(meta.get("_index", default_index))
+            docs = self.indices.setdefault(index, {"body": {}, "docs": {}})["docs"]
+            doc_id = meta.get("_id") or uuid4().hex
+            if op == "delete":
+                found = docs.pop(doc_id, None) is not None
+                items.append({op: {"_index": index, "_id": doc_id, "status": 200 if found else 404}})
+                i += 1
+                continue
+            if InMemoryElasticNode.reject_bulk_items > 0:
+                InMemoryElasticNode.reject_bulk_items -= 1
+                error = {"type": "es_rejected_execution_exception", "reason": "rejected execution of coordinating operation"}
+                items.append({op: {"_index": index, "_id": doc_id, "status": 429, "error": error}})
+                i += 2
+                continue
+            docs[doc_id] = lines[i + 1]
+            items.append({op: {"_index": index, "_id": doc_id, "status": 201, "result": "created"}})
+            i += 2
+        return 200, {"took": 0, "errors": any("error" in next(iter(item.values())) for item in items), "items": items}
+
+    def _reindex(self, body):
+        source, dest = body["source"]["index"], body["dest"]["index"]
+        docs = self.indices[self._resolve(source)]["docs"]
+        self.indices.setdefault(dest, {"body": {}, "docs": {}})["docs"].update(
+            {doc_id: dict(doc) for doc_id, doc in docs.items()}
+        )
+        return 200, {"took": 0, "total": len(docs), "created": len(docs), "failures": []}
+
+    def _resolve(self, name):
+        return self.aliases.get(name, name)
+
+    def _get(self, index, doc_id):
+        source = self.indices[index]["docs"].get(doc_id)
+        if source is None:
+            return 404, {"_index": index, "_id": doc_id, "found": False}
+        return 200, {"_index": index, "_id": doc_id, "found": True, "_source": source}
+
+    def _msearch(self, default_index, body):
+        lines = [json.loads(line) for line in body.decode("utf-8").splitlines() if line.strip()]
+        responses = []
+        for header, search in zip(lines[::2], lines[1::2]):
+            name = header.get("index", default_index)
+            index = self._resolve(name)
+            if index not in self.indices:
+                status, payload = self._error(404, "index_not_found_exception", f"no such index [{index}]")
+            else:
+                status, payload = self._search(index, search, self.alias_specs.get(name, {}).get("filter"))
+            responses.append({**payload, "status": status})
+        return 200, {"took": 0, "responses": responses}
+
+    # --- search ---
+    def _search(self, index, body, scope=None):
+        docs = self.indices[index]["docs"]
+        size = body.get("size", 10)
+        if "retriever" in body:
+            if not InMemoryElasticNode.native_fusion:
+                return self._error(403, "security_exception", "current license is non-compliant for [Reciprocal Rank Fusion (RRF)]")
+            scored = self._retrieve(index, body["retriever"], scope)
+        elif "knn" in body:
+            scored = self._knn(index, body["knn"], scope)
+            if isinstance(scored, tuple):
+                return scored
+        else:
+            scored = self._query_ranking(index, body.get("query", {"match_all": {}}), scope)
+
+        source_filter = body.get("_source", {})
+        excludes = source_filter.get("excludes", []) if isinstance(source_filter, dict) else []
+        includes = source_filter if isinstance(source_filter, list) else None
+        hits = [
+            {
+                "_index": index, "_id": i, "_score": s,
+                "_source": {k: v for k, v in docs[i].items() if k not in excludes and (includes is None or k in includes)},
+            }
+            for i, s in scored[:size]
+        ]
+        return 200, {"took": 0, "hits": {"total": {"value": len(scored), "relation": "eq"}, "hits": hits}}
+
+    def _query_ranking(self, index, query, scope=None):
+        scored = []
+        for doc_id, source in self.indices[index]["docs"].items():
+            score = _score(query, source) if _matches(source, scope) else None
+            if score is not None:
+                scored.append((doc_id, score))
+        return sorted(scored, key=lambda x: -x[1])
+
+    def _knn(self, index, knn, scope=None):
+        field_mapping = self.indices[index]["body"].get("mappings", {}).get("properties", {}).get(knn["field"], {})
+        if field_mapping.get("index") is False:
+            return self._error(400, "illegal_argument_exception", f"[{knn['field']}] is not indexed for knn")
+        if "dims" in field_mapping and len(knn["query_vector"]) != field_mapping["dims"]:
+            return self._error(
+                400, "illegal_argument_exception",
+                f"the query vector has a different number of dimensions [{len(knn['query_vector'])}] than the document vectors [{field_mapping['dims']}]",
+            )
+        docs = self.indices[index]["docs"]
+        scored = [
+            (doc_id, (1 + _cosine(knn["query_vector"], source[knn["field"]])) / 2)
+            for doc_id, source in docs.items() if _matches(source, knn.get("filter")) and _matches(source, scope)
+        ]
+        return sorted(scored, key=lambda x: -x[1])[:knn["k"]]
+
+    def _retrieve(self, index, retriever, scope=None):
+        """Ranked (id, score) pairs of a `standard`, `knn`, `rrf` or `linear` retriever."""
+        kind, spec = next(iter(retriever.items()))
+        if kind == "standard":
+            return self._query_ranking(index, spec["query"], scope)
+        if kind == "knn":
+            return self._knn(index, spec, scope)
+
+        window = spec.get("rank_window_size", 10)
+        fused: Dict[str, float] = {}
+        for child in spec["retrievers"]:
+            weight = child.get("weight", 1.0) if "retriever" in child else 1.0
+            ranked = self._retrieve(index, child.get("retriever", child), scope)[:window]
+            scores = [score for _, score in ranked]
+            for rank, (doc_id, score) in enumerate(ranked, start=1):
+                if kind == "rrf":
+                    contribution = weight / (spec.get("rank_constant", 60) + rank)
+                else:
+                    low, high = min(scores), max(scores)
+                    contribution = weight * ((score - low) / (high - low) if high > low else 1.0)
+                fused[doc_id] = fused.get(doc_id, 0.0) + contribution
+        return sorted(fused.items(), key=lambda x: -x[1])
+
+    @staticmethod
+    def _error(status, error_type, reason):
+        return status, {"error": {"type": error_type, "reason": reason}, "status": status}
+
+
+def _vector(value) -> List[float]:
+    """`dense_vector` value of a source: a list of floats or base64 of big-endian float32 bytes."""
+    if isinstance(value, str):
+        return np.frombuffer(base64.b64decode(value), dtype=">f4").tolist()
+    return value
+
+
+def _cosine(a, b) -> float:
+    a, b = _vector(a), _vector(b)
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def _tokens(text: str) -> List[str]:
+    return re.findall(r"\w+", text.lower())
+
+
+def _matches(source: Dict, query: Optional[Dict]) -> bool:
+    return query is None or _score(query, source) is not None
+
+
+def _score(query: Dict, source: Dict) -> Optional[float]:
+    """Score a document against the supported query DSL subset, or None when it does not match."""
+    kind, spec = next(iter(query.items()))
+    if kind == "match_all":
+        return 1.0
+    if kind == "term":
+        field, value = next(iter(spec.items()))
+        value = value["value"] if isinstance(value, dict) else value
+        return 1.0 if source.get(field) == value else None
+    if kind == "terms":
+        field, values = next(iter(spec.items()))
+        return 1.0 if source.get(field) in values else None
+    if kind == "bool":
+        must, filters, must_not = (
+            group if isinstance(group, list) else [group]
+            for group in (spec.get(k, []) for k in ("must", "filter", "must_not"))
+        )
+        scores = [_score(c, source) for c in must]
+        if None in scores or any(_score(c, source) is None for c in filters):
+            return None
+        if any(_score(c, source) is not None for c in must_not):
+            return None
+        return sum(scores) if must else 1.0  # only `must` clauses contribute to the score
+    if kind in ("match", "multi_match"):
+        if kind == "match":
+            field, value = next(iter(spec.items()))
+            text, fields = (value["query"] if isinstance(value, dict) else value), [field]
+        else:
+            text, fields = spec["query"], spec.get("fields", ["text"])
+        score = 0.0
+        for field_spec in fields:
+            field, _, boost = field_spec.partition("^")
+            tokens = _tokens(str(source.get(field, "")))
+            for term in set(_tokens(text)):
+                tf = tokens.count(term)
+                score += float(boost or 1) * tf / (tf + 1.2)  # BM25-style term frequency saturation
+        return score or None
+    if kind == "script_score":
+        if _score(spec["query"], source) is None:
+            return None
+        params = spec["script"]["params"]
+        field = re.search(r"'(\w+)'", spec["script"]["source"]).group(1)
+        return _cosine(params["query_vector"], source[field])
+    raise ValueError(f"Query type '{kind}' is not supported by the in-memory Elasticsearch")
+
+
+class InMemoryAsyncElasticNode(BaseAsyncNode):
+    """Async counterpart of InMemoryElasticNode, serving the same in-memory indices."""
+
+    def __init__(self, config: NodeConfig):
+        super().__init__(config)
+        self._sync = InMemoryElasticNode(config)
+        self.requests = self._sync.requests
+
+    async def perform_request(self, method, target, body=None, headers=None, request_timeout=None):
+        return self._sync.perform_request(method, target, body, headers, request_timeout)
+
+    async def close(self):
+        pass
+
+
+def fake_elasticsearch(host: str = "fake-es") -> Elasticsearch:
+    """Real Elasticsearch client backed by InMemoryElasticNode."""
+    return Elasticsearch(f"http://{host}:9200", node_class=InMemoryElasticNode)
+
+
+def fake_async_elasticsearch(host: str = "fake-es") -> AsyncElasticsearch:
+    """Real AsyncElasticsearch client backed by the same in-memory indices."""
+    return AsyncElasticsearch(f"http://{host}:9200", node_class=InMemoryAsyncElasticNode)
@@ -1,3 +1,4 @@
+import time
 import requests
 from elasticsearch import Elasticsearch
 import os
@@ -26,13 +27,23 @@ def test_upload_pdfs():
     }
 
     response = requests.post(API_URL, files=files, data=data)
-    result = response.json()
-    print("Response:", result)
-
-    assert response.status_code == 200
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+
+    # ingestion runs in the background; poll the job until it finishes
+    deadline = time.monotonic() + 600
+    while True:
+        result = requests.get(f"{API_URL}jobs/{job_id}").json()
+        if result["status"] in ("completed", "failed") or time.monotonic() > deadline:
+            break
+        time.sleep(1)
+    print("Job:", result)
+
+    assert result["status"] == "completed"
     assert "documents_indexed" in result
     assert "total_chunks" in result
     assert result["documents_indexed"] == 2
+    assert result["progress"]["chunks_indexed"] == result["total_chunks"]
 
     # Cleanup: delete index
     try:
@@ -0,0 +1,19 @@
+import os
+
+# pipeline modules build their GenAI clients at import time; unit tests swap in fakes afterwards
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+os.environ.setdefault("EMBEDDING_STORE_BACKEND", "none")
+os.environ.setdefault("ANSWER_CACHE_BACKEND", "none")
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _fresh_singletons():
+    """Rate-limit state (pauses, AIMD limits, open circuits) and metrics must not leak between tests."""
+    from app.pipeline import gateway
+    from app.utils import metrics
+
+    gateway._gateway = metrics._metrics = None
+    yield
+    gateway._gateway = metrics._metrics = None
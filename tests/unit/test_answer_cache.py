@@ -0,0 +1,97 @@
+import time
+import asyncio
+
+import numpy as np
+
+from app.pipeline.cache import SemanticAnswerCache
+from app.pipeline.index import ElasticVectorManager
+from app.schemas.schema import Document
+from tests.fakes import FakeGenAIClient
+from tests.unit.test_rag_agent import _agent, _collect
+
+ANSWER = {"response": "Check the nameplate.", "reference": []}
+
+
+def _vector(seed: int, dim: int = 16) -> np.ndarray:
+    return np.random.default_rng(seed).normal(size=dim)
+
+
+def test_paraphrase_with_same_evidence_hits():
+    cache = SemanticAnswerCache(similarity_threshold=0.95)
+    query = _vector(0)
+    cache.set("idx", list(query), ["a", "b"], ANSWER)
+
+    paraphrase = query + 0.05 * _vector(1)
+    assert cache.get("idx", list(paraphrase), ["b", "a"]) == ANSWER
+    # same question, but the retrieved evidence changed
+    assert cache.get("idx", list(paraphrase), ["a", "c"]) is None
+    # unrelated question, or another index
+    assert cache.get("idx", list(_vector(2)), ["a", "b"]) is None
+    assert cache.get("other-idx", list(query), ["a", "b"]) is None
+
+    assert cache.stats() == {"backend": "SemanticAnswerCache", "hits": 1, "misses": 3, "hit_rate": 0.25, "size": 1}
+
+
+def test_expired_answers_are_dropped():
+    cache = SemanticAnswerCache(ttl_seconds=0.05)
+    cache.set("idx", list(_vector(0)), ["a"], ANSWER)
+    time.sleep(0.1)
+
+    assert cache.get("idx", list(_vector(0)), ["a"]) is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_answer_is_evicted():
+    cache = SemanticAnswerCache(max_entries=2)
+    for seed in range(2):
+        cache.set("idx", list(_vector(seed)), ["a"], {"response": str(seed)})
+    cache.get("idx", list(_vector(0)), ["a"])
+    cache.set("idx", list(_vector(2)), ["a"], {"response": "2"})
+
+    assert len(cache) == 2
+    assert cache.get("idx", list(_vector(0)), ["a"]) == {"response": "0"}
+    assert cache.get("idx", list(_vector(1)), ["a"]) is None
+
+
+def test_agent_reuses_answer_until_the_index_changes(monkeypatch):
+    client = FakeGenAIClient(dim=8)
+    agent = _agent(monkeypatch, client)
+    agent.answer_cache = SemanticAnswerCache()
+    question = "What is the process before accepting a motor?"
+
+    first = agent.run(question)
+    second = agent.run(question)
+    events = list(agent.run_stream(question))
+
+    assert client.generations == 1
+    assert first["cached"] is False and second["cached"] is True
+    assert second["response"] == first["response"] and second["reference"] == first["reference"]
+    assert events[0] == {"event": "token", "data": {"text": first["response"]}}
+    assert events[-1]["data"]["cached"] is True
+
+    manager = ElasticVectorManager(
+        "http://fake-es:9200", "test", "agent-idx", embedding_dim=8, answer_cache=agent.answer_cache, es=agent.retriever.es
+    )
+    manager.embedder.client = client
+    manager.index_documents([
+        Document(document_id="doc2", user_id="u", session_id="s", title="addendum.pdf", chunk_id=0, text="Store motors dry")
+    ])
+
+    assert len(agent.answer_cache) == 0
+    assert agent.run(question)["cached"] is False
+    assert client.generations == 2
+
+
+def test_async_stream_stores_the_streamed_answer(monkeypatch):
+    client = FakeGenAIClient(dim=8)
+    agent = _agent(monkeypatch, client)
+    agent.answer_cache = SemanticAnswerCache()
+    question = "What is the process before accepting a motor?"
+
+    events = asyncio.run(_collect(agent.astream(question)))
+    cached = agent.run(question)
+
+    assert client.generations == 1
+    assert cached["cached"] is True
+    assert cached["response"] == "".join(e["data"]["text"] for e in events if e["event"] == "token")
+    assert cached["reference"] == events[-2]["data"]
@@ -0,0 +1,93 @@
+from app.pipeline.embed import BatchEmbedder
+from app.schemas.schema import Document
+from tests.fakes import FakeEmbeddingClient, fake_vector
+
+
+def _make_documents(n: int, titles=("manual.pdf",)):
+    return [
+        Document(
+            document_id="doc",
+            user_id="user",
+            session_id="session",
+            title=titles[i % len(titles)],
+            chunk_id=i,
+            text=f"chunk text number {i}",
+        )
+        for i in range(n)
+    ]
+
+
+def test_embeddings_stay_tied_to_documents():
+    """Every Document receives the embedding of its own text, in input order"""
+    client = FakeEmbeddingClient(dim=8, latency=0.01)
+    embedder = BatchEmbedder(client=client, embedding_dim=8, batch_size=7, max_concurrency=4)
+    docs = _make_documents(50)
+
+    embedder.embed_documents(docs)
+
+    for doc in docs:
+        assert doc.embedding == fake_vector(doc.text, 8)
+    assert client.calls == 8, "50 chunks at batch_size=7 should take 8 requests"
+    assert client.max_in_flight <= 4
+
+
+def test_batches_split_on_title():
+    """Chunks with different titles never share a request"""
+    embedder = BatchEmbedder(client=FakeEmbeddingClient(dim=8), embedding_dim=8, batch_size=10)
+    docs = _make_documents(4, titles=("a.pdf", "a.pdf", "b.pdf", "b.pdf"))
+
+    batches = list(embedder._iter_batches(docs))
+
+    assert [[doc.title for doc in batch] for batch in batches] == [["a.pdf", "a.pdf"], ["b.pdf", "b.pdf"]]
+
+
+def test_streaming_keeps_bounded_batches_in_flight():
+    """The input stream is consumed lazily, at most max_concurrency batches ahead"""
+    embedder = BatchEmbedder(client=FakeEmbeddingClient(dim=8), embedding_dim=8, batch_size=5, max_concurrency=2)
+    pulled = []
+
+    def source():
+        for doc in _make_documents(100):
+            pulled.append(doc.chunk_id)
+            yield doc
+
+    stream = embedder.iter_embedded(source())
+    first = next(stream)
+
+    assert first.chunk_id == 0 and first.embedding is not None
+    # two batches in flight plus the one being assembled when the window filled up
+    assert len(pulled) <= 5 * 3 + 1
+    assert [doc.chunk_id for doc in stream] == list(range(1, 100))
+
+
+def test_batch_is_retried_as_a_whole():
+    """A failing request is retried per batch, not per chunk"""
+    client = FakeEmbeddingClient(dim=8, failures=2)
+    embedder = BatchEmbedder(client=client, embedding_dim=8, batch_size=100, initial_backoff=0)
+    docs = _make_documents(30)
+
+    embedder.embed_documents(docs)
+
+    assert client.calls == 3
+    assert all(doc.embedding is not None for doc in docs)
+
+
+def test_batch_raises_after_max_retries():
+    client = FakeEmbeddingClient(dim=8, failures=5)
+    embedder = BatchEmbedder(client=client, embedding_dim=8, max_retries=3, initial_backoff=0)
+
+    try:
+        embedder.embed_documents(_make_documents(3))
+    except Exception as e:
+        assert "failed after retries" in str(e)
+    else:
+        raise AssertionError("Expected embedding to fail after max retries")
+
+
+if __name__ == "__main__":
+    test_embeddings_stay_tied_to_documents()
+    test_batches_split_on_title()
+    test_streaming_keeps_bounded_batches_in_flight()
+    test_batch_is_retried_as_a_whole()
+    test_batch_raises_after_max_retries()
+    print("Batch embedder tests passed!")
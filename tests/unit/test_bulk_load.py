@@ -0,0 +1,121 @@
+import threading
+
+import pytest
+from elasticsearch.helpers import BulkIndexError
+
+from app.pipeline.bulk import ParallelBulkWriter, bulk_load_settings
+from app.pipeline.extract import PdfReader
+from app.pipeline.index import ElasticVectorManager
+from app.pipeline.ingest import IngestPipeline
+from app.pipeline.store import LocalVectorStore
+from tests.fakes import FakeEmbeddingClient, InMemoryElasticNode, fake_elasticsearch
+from tests.unit.test_ingest_pipeline import _synthetic_pdf, _vector_manager
+
+
+def _settings(es, index):
+    return es.indices.get_settings(index=index, flat_settings=True)[index]["settings"]
+
+
+def test_parallel_writer_retries_rejected_items():
+    InMemoryElasticNode.reset()
+    es = fake_elasticsearch()
+    es.indices.create(index="bulk")
+    InMemoryElasticNode.reject_bulk_items = 7
+    writer = ParallelBulkWriter(es, workers=3, max_actions=10, max_bytes=600, initial_backoff=0.0)
+
+    actions = [{"_index": "bulk", "_id": str(i), "_source": {"text": f"chunk {i}"}} for i in range(50)]
+    assert list(writer.write(actions)) == [True] * 50
+
+    stats = writer.stats.snapshot()
+    assert es.count(index="bulk")["count"] == 50
+    assert stats["indexed"] == 50 and stats["rejected"] == 7 and stats["failed"] == 0
+    bulk_requests = [r for r in es.transport.node_pool.get().requests if r[1].endswith("_bulk")]
+    # ~40-byte items under a 600-byte limit: more requests than the 5 that max_actions alone needs
+    assert len(bulk_requests) == stats["requests"] > 5
+
+
+def test_items_rejected_after_every_retry_are_reported_as_failed():
+    InMemoryElasticNode.reset()
+    es = fake_elasticsearch()
+    es.indices.create(index="bulk")
+    InMemoryElasticNode.reject_bulk_items = 100
+    writer = ParallelBulkWriter(es, workers=1, max_retries=2, initial_backoff=0.0)
+
+    actions = [{"_index": "bulk", "_id": "1", "_source": {"text": "chunk"}}]
+    with pytest.raises(BulkIndexError) as failure:
+        list(writer.write(actions))
+    assert failure.value.errors[0]["index"]["status"] == 429
+    assert writer.stats.snapshot()["rejected"] == 3 and writer.stats.snapshot()["failed"] == 1
+
+    assert list(writer.write(actions, raise_on_error=False)) == [False]
+
+
+def test_bulk_load_tunes_the_index_and_restores_it():
+    manager = _vector_manager("test-bulk-load")
+    es = manager.es
+    es.indices.put_settings(index="test-bulk-load", settings={"index.refresh_interval": "5s"})
+    pipeline = IngestPipeline(PdfReader(user_id="u", session_id="s"), manager)
+
+    with manager.bulk_load(workers=2, max_actions=4, initial_backoff=0.0) as writer:
+        assert _settings(es, "test-bulk-load")["index.refresh_interval"] == "-1"
+        assert _settings(es, "test-bulk-load")["index.number_of_replicas"] == "0"
+        InMemoryElasticNode.reject_bulk_items = 2
+        assert pipeline.run(_synthetic_pdf(10), "backfill.pdf", writer=writer) == 10
+        # writes without the writer, e.g. another job on the same cached store, keep streaming_bulk
+        assert pipeline.run(_synthetic_pdf(3), "other.pdf") == 3
+
+    stats = writer.stats.snapshot()
+    assert stats["indexed"] == 10 and stats["rejected"] == 2
+    assert _settings(es, "test-bulk-load") == {"index.refresh_interval": "5s", "index.number_of_replicas": "1"}
+    requests = es.transport.node_pool.get().requests
+    assert ("POST", "/test-bulk-load/_forcemerge") in requests
+    assert es.count(index="test-bulk-load")["count"] == 13
+
+
+def test_merging_one_index_does_not_block_loads_of_others():
+    InMemoryElasticNode.reset()
+    es = fake_elasticsearch()
+    es.indices.create(index="merging")
+    es.indices.create(index="other")
+    merging, merged = threading.Event(), threading.Event()
+    forcemerge = es.indices.forcemerge
+
+    def slow_forcemerge(index, **kwargs):
+        if index == "merging":
+            merging.set()
+            merged.wait(10)
+        return forcemerge(index=index, **kwargs)
+
+    es.indices.forcemerge = slow_forcemerge
+    es.options = lambda **kwargs: es
+
+    finished = threading.Event()
+
+    def load(index):
+        with bulk_load_settings(es, index):
+            pass
+        if index == "other":
+            finished.set()
+
+    thread = threading.Thread(target=load, args=("merging",))
+    thread.start()
+    assert merging.wait(10)
+    other = threading.Thread(target=load, args=("other",))
+    other.start()
+    assert finished.wait(5), "a load of another index waited for the merge"
+    merged.set()
+    thread.join()
+    other.join()
+    assert _settings(es, "merging") == _settings(es, "other") == {"index.number_of_replicas": "1"}
+
+
+def test_bulk_load_needs_elasticsearch(tmp_path):
+    InMemoryElasticNode.reset()
+    manager = ElasticVectorManager(
+        elastic_url="http://fake-es:9200", api_key="test", index_name="local", embedding_dim=8,
+        es=fake_elasticsearch(), store=LocalVectorStore(str(tmp_path), "local"),
+    )
+    manager.embedder.client = FakeEmbeddingClient(dim=8)
+
+    with pytest.raises(ValueError, match="Elasticsearch store"):
+        manager.bulk_load()
@@ -0,0 +1,69 @@
+import base64
+
+import numpy as np
+import pytest
+
+from app.pipeline.ingest import IngestPipeline
+from app.pipeline.extract import PdfReader
+from app.pipeline.store import ElasticVectorStore, LocalVectorStore, chunk_key
+from app.schemas.chunk_batch import ChunkBatch
+from tests.fakes import InMemoryElasticNode, fake_elasticsearch
+from tests.unit.test_ingest_pipeline import _synthetic_pdf, _vector_manager
+from tests.unit.test_vector_store import _documents
+
+
+def test_chunk_batch_round_trips_documents():
+    vectors = np.random.default_rng(0).normal(size=(5, 8)).astype(np.float32)
+    documents = _documents(vectors)
+    batch = ChunkBatch.from_documents(documents)
+
+    assert len(batch) == 5 and batch.embeddings.dtype == np.float32 and batch.embeddings.flags["C_CONTIGUOUS"]
+    assert chunk_key(batch[3]) == chunk_key(documents[3]) and batch[-1].chunk_id == 4
+    assert batch.to_documents() == documents
+
+    expected = [doc.model_dump() for doc in documents]
+    assert list(batch.sources("float")) == expected
+    packed = list(batch.sources("base64"))
+    for source, doc in zip(packed, documents):
+        decoded = np.frombuffer(base64.b64decode(source.pop("embedding")), dtype=">f4")
+        assert decoded.tolist() == doc.embedding
+        assert source == doc.model_dump(exclude={"embedding"})
+
+    with pytest.raises(ValueError):
+        ChunkBatch.from_documents([doc.model_copy(update={"embedding": None}) for doc in documents])
+
+
+@pytest.mark.parametrize("vector_encoding", ["base64", "float"])
+def test_elastic_store_writes_either_vector_encoding(vector_encoding):
+    InMemoryElasticNode.reset()
+    store = ElasticVectorStore(fake_elasticsearch(), "test-encoding", vector_encoding=vector_encoding)
+    store.create(4)
+    assert all(store.write(_documents(np.eye(4)), batch_size=3))
+
+    stored = store.es.transport.node_pool.get().indices["test-encoding"]["docs"]["u_doc_2"]["embedding"]
+    assert isinstance(stored, str if vector_encoding == "base64" else list)
+    assert [hit["chunk_id"] for hit in store.search([0.0, 0.0, 1.0, 0.0], top_k=1)] == [2]
+
+
+def test_local_store_writes_chunk_batches(tmp_path):
+    vectors = np.random.default_rng(1).normal(size=(10, 8)).astype(np.float32)
+    store = LocalVectorStore(str(tmp_path), "idx")
+    batches = [ChunkBatch.from_documents(_documents(vectors)[start:start + 4]) for start in range(0, 10, 4)]
+
+    assert sum(store.write_batches(batches)) == 10
+    assert store.search(vectors[7].tolist(), top_k=1)[0]["chunk_id"] == 7
+
+
+def test_ingest_sends_floats_by_default_and_packed_vectors_on_request():
+    manager = _vector_manager("test-floats")
+    IngestPipeline(PdfReader(user_id="u", session_id="s"), manager).run(_synthetic_pdf(2), "synthetic.pdf")
+    docs = manager.es.transport.node_pool.get().indices["test-floats"]["docs"]
+    assert all(isinstance(source["embedding"], list) for source in docs.values())
+
+    manager = _vector_manager("test-packed")
+    manager.store.vector_encoding = "base64"
+    indexed = IngestPipeline(PdfReader(user_id="u", session_id="s"), manager).run(_synthetic_pdf(3), "synthetic.pdf")
+
+    docs = manager.es.transport.node_pool.get().indices["test-packed"]["docs"]
+    assert indexed == len(docs) > 0
+    assert all(isinstance(source["embedding"], str) for source in docs.values())
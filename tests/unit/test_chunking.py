@@ -0,0 +1,71 @@
+import pymupdf
+
+from app.pipeline.chunking import Block, LayoutChunker, page_blocks
+from app.pipeline.context import estimate_tokens
+from app.pipeline.extract import PdfReader
+
+SENTENCE = "Check the insulation resistance of the winding before the first start. "
+
+
+def _manual_pdf() -> bytes:
+    pdf = pymupdf.open()
+    page = pdf.new_page()
+    page.insert_text((72, 72), "Bearing Lubrication", fontname="hebo", fontsize=12)
+    page.insert_textbox(pymupdf.Rect(72, 80, 540, 160), "Bearings are lubricated at the factory. Relubricate them at the intervals below.", fontsize=10)
+    page.insert_text((72, 180), "1. Clean the grease fitting.", fontsize=10)
+    page.insert_text((72, 194), "2. Add the amount of grease of the table.", fontsize=10)
+    for i, (frame, grease) in enumerate([("Frame", "Grease (g)"), ("up to 210", "8.4"), ("210 to 280", "18")]):
+        page.insert_text((72, 230 + i * 12), frame, fontsize=10)
+        page.insert_text((250, 230 + i * 12), grease, fontsize=10)
+    pdf.new_page().insert_text((72, 72), "Store the motor in a dry place.", fontsize=10)
+    data = pdf.tobytes()
+    pdf.close()
+    return data
+
+
+def _document_text(pages):
+    return "\n".join(unit for _, blocks in pages for block in blocks for unit in block.units)
+
+
+def test_page_blocks_reads_headings_lists_and_tables():
+    with pymupdf.open(stream=_manual_pdf(), filetype="pdf") as pdf:
+        blocks = page_blocks(pdf[0])
+
+    assert [block.kind for block in blocks] == ["heading", "paragraph", "list", "table"]
+    assert blocks[0].units == ("Bearing Lubrication",)
+    assert blocks[2].units == ("1. Clean the grease fitting.", "2. Add the amount of grease of the table.")
+    assert blocks[3].units == ("Frame | Grease (g)", "up to 210 | 8.4", "210 to 280 | 18")
+
+
+def test_chunks_follow_structure_and_record_offsets():
+    table = Block("table", tuple(f"row {i} | {SENTENCE.strip()}" for i in range(8)))
+    pages = [
+        (1, [Block("heading", ("Installation",)), Block("paragraph", (SENTENCE * 10,)), table]),
+        (2, [Block("heading", ("Maintenance",)), Block("paragraph", (SENTENCE * 30,))]),
+        (3, [Block("paragraph", ("Keep this manual.",))]),
+    ]
+    chunks = list(LayoutChunker(max_tokens=200, min_tokens=50).chunk(pages))
+    text = _document_text(pages)
+
+    for chunk in chunks:
+        assert chunk.text == text[chunk.char_start:chunk.char_end]
+        assert estimate_tokens(chunk.text) <= 200 + 50
+    assert [chunk.char_start for chunk in chunks][1:] == [chunk.char_end + 1 for chunk in chunks][:-1]
+    # the table fits in a chunk, so it is not cut; headings open chunks and never close one
+    assert sum("row 0" in chunk.text for chunk in chunks) == 1
+    assert any(chunk.text.startswith("row 0") and "row 7" in chunk.text for chunk in chunks)
+    assert [chunk.page_number for chunk in chunks if chunk.text.startswith("Maintenance")] == [2]
+    assert not any(chunk.text.endswith(("Installation", "Maintenance")) for chunk in chunks)
+    # the short last page is merged into the previous chunk
+    assert chunks[-1].text.endswith("Keep this manual.") and chunks[-1].page_number == 2
+
+
+def test_layout_chunking_merges_short_pages():
+    pdf = _manual_pdf()
+    layout = PdfReader(user_id="u", session_id="s").read(pdf, "manual.pdf")
+    words = PdfReader(user_id="u", session_id="s", chunking="words").read(pdf, "manual.pdf")
+
+    assert len(words) == 2 and len(layout) == 1
+    assert layout[0].text.startswith("Bearing Lubrication\n") and layout[0].text.endswith("Store the motor in a dry place.")
+    assert (layout[0].char_start, layout[0].char_end) == (0, len(layout[0].text))
+    assert words[0].char_start is None
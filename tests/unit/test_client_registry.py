@@ -0,0 +1,120 @@
+from fastapi.testclient import TestClient
+
+import time
+
+from api.clients import ClientRegistry, get_clients
+from api.jobs import IngestJobQueue, IngestJobStore, get_jobs
+from main import app
+from tests.fakes import FakeEmbeddingClient, InMemoryElasticNode, fake_async_elasticsearch, fake_elasticsearch
+
+pdf_path = "tests/samples/LB5001.pdf"
+
+
+def _registry() -> ClientRegistry:
+    InMemoryElasticNode.reset()
+    return ClientRegistry("http://fake-es:9200", "test", es=fake_elasticsearch(), async_es=fake_async_elasticsearch())
+
+
+def _requests(registry: ClientRegistry, method: str, path: str) -> int:
+    node = registry.es.transport.node_pool.get()
+    return sum(1 for m, p in node.requests if m == method and p == path)
+
+
+def test_registry_caches_per_index_and_memoizes_existence_check():
+    registry = _registry()
+
+    manager = registry.get_vector_manager("idx")
+    assert registry.get_vector_manager("idx") is manager
+    assert registry.get_retriever("idx") is registry.get_retriever("idx")
+    assert registry.get_retriever("idx").es is registry.es is manager.es
+    assert _requests(registry, "HEAD", "/idx") == 1
+
+    registry.forget_index("idx")
+    assert registry.get_vector_manager("idx") is not manager
+
+
+def test_local_backend_shares_one_store_per_index(tmp_path):
+    registry = ClientRegistry(
+        "http://fake-es:9200", "test", vector_store="local", vector_store_path=str(tmp_path),
+        es=fake_elasticsearch(), async_es=fake_async_elasticsearch(),
+    )
+
+    store = registry.get_vector_manager("idx").store
+    assert registry.get_retriever("idx").store is store
+    assert store.exists() and (tmp_path / "idx").exists()
+    assert registry.es.transport.node_pool.get().requests == []
+
+    registry.delete_index("idx")
+    assert not (tmp_path / "idx").exists()
+    assert registry.get_vector_manager("idx").store is not store
+
+
+def test_document_uploads_reuse_the_shared_registry(tmp_path):
+    """Consecutive uploads to the same index reuse one client and one existence check"""
+    registry = _registry()
+    registry.get_vector_manager("shared-idx").embedder.client = FakeEmbeddingClient()
+    jobs = IngestJobQueue(registry, IngestJobStore(str(tmp_path / "jobs.sqlite")), str(tmp_path / "spool"))
+    app.dependency_overrides[get_clients] = lambda: registry
+    app.dependency_overrides[get_jobs] = lambda: jobs
+    client = TestClient(app)
+
+    try:
+        for _ in range(2):
+            with open(pdf_path, "rb") as f:
+                response = client.post(
+                    "/documents/",
+                    data={"user_id": "u", "session_id": "s", "index_name": "shared-idx"},
+                    files=[("files", ("LB5001.pdf", f, "application/pdf"))],
+                )
+            assert response.status_code == 202
+            job = _wait_for_job(client, response.json()["status_url"])
+            assert job["status"] == "completed"
+            assert job["documents_indexed"] == 1
+    finally:
+        app.dependency_overrides.clear()
+        jobs.shutdown()
+
+    assert _requests(registry, "HEAD", "/shared-idx") == 1
+
+
+def test_update_and_delete_of_a_missing_index_do_not_create_it(tmp_path):
+    registry = _registry()
+    registry.es.indices.create(index="data")
+    registry.es.indices.put_alias(index="data", name="session-alias")
+    jobs = IngestJobQueue(registry, IngestJobStore(str(tmp_path / "jobs.sqlite")), str(tmp_path / "spool"))
+    app.dependency_overrides[get_clients] = lambda: registry
+    app.dependency_overrides[get_jobs] = lambda: jobs
+    client = TestClient(app)
+
+    try:
+        deleted = client.delete("/documents/doc", params={"user_id": "u", "session_id": "s", "index_name": "missing"})
+        with open(pdf_path, "rb") as f:
+            updated = client.put(
+                "/documents/doc",
+                data={"user_id": "u", "session_id": "s", "index_name": "missing"},
+                files={"file": ("LB5001.pdf", f, "application/pdf")},
+            )
+    finally:
+        app.dependency_overrides.clear()
+        jobs.shutdown()
+
+    assert deleted.status_code == updated.status_code == 404
+    assert not registry.es.indices.exists(index="missing")
+    assert not registry.index_exists("missing") and "missing" not in registry._managers
+    assert registry.index_exists("data") and registry.index_exists("session-alias")
+
+
+def _wait_for_job(client: TestClient, status_url: str, timeout: float = 30) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(status_url).json()
+        if job["status"] in ("completed", "failed") or time.monotonic() > deadline:
+            return job
+        time.sleep(0.05)
+
+
+if __name__ == "__main__":
+    test_registry_caches_per_index_and_memoizes_existence_check()
+    import tempfile, pathlib
+    test_document_uploads_reuse_the_shared_registry(pathlib.Path(tempfile.mkdtemp()))
+    print("Client registry tests passed!")
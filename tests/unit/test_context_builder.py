@@ -0,0 +1,93 @@
+from app.pipeline.chunking import Block, LayoutChunker
+from app.pipeline.context import ContextBuilder, estimate_tokens
+from app.pipeline.extract import PdfReader
+from tests.fakes import FakeGenAIClient
+from tests.unit.test_rag_agent import _agent
+
+WORDS = [f"word{i}" for i in range(60)]
+SENTENCE = "Check the insulation resistance of the winding before the first start. "
+
+
+def _chunks():
+    """Overlapping chunks of one page, as produced by PdfReader"""
+    reader = PdfReader(chunk_size=20, chunk_overlap=5)
+    return [
+        {"title": "manual.pdf", "text": text, "score": 0.9 - i * 0.01, "document_id": "doc", "page_number": 1, "chunk_id": i}
+        for i, text in enumerate(reader._chunk_text(" ".join(WORDS)))
+    ]
+
+
+def test_adjacent_chunks_are_merged_without_overlap():
+    chunks = _chunks()
+    # retrieval order is not chunk order; the merged passage keeps the best rank
+    context = ContextBuilder().build([chunks[1], chunks[0], chunks[3]])
+
+    assert context.merged == 1
+    assert [p["chunk_ids"] for p in context.passages] == [[0, 1], [3]]
+    assert context.passages[0]["text"] == " ".join(WORDS[:35])
+    assert context.passages[0]["score"] == chunks[0]["score"]
+
+
+def test_layout_chunks_are_merged_by_offset_across_pages():
+    blocks = [Block("paragraph", (f"{SENTENCE * 6}Page {page}.",)) for page in range(1, 4)]
+    pages = [(page, [block]) for page, block in enumerate(blocks, start=1)]
+    document_text = "\n".join(block.units[0] for block in blocks)
+    chunks = [
+        {"title": "manual.pdf", "text": chunk.text, "score": 0.9 - i * 0.01, "document_id": "doc", "chunk_id": i,
+         "page_number": chunk.page_number, "char_start": chunk.char_start, "char_end": chunk.char_end}
+        for i, chunk in enumerate(LayoutChunker(max_tokens=60, min_tokens=20).chunk(pages))
+    ]
+    assert len(chunks) > 3 and len({chunk["page_number"] for chunk in chunks}) == 3
+
+    context = ContextBuilder().build([chunks[2], chunks[0], chunks[1], chunks[3]])
+
+    assert context.merged == 3
+    passage = context.passages[0]
+    assert passage["chunk_ids"] == [0, 1, 2, 3]
+    # chunks cut between sentences are joined with a newline instead of the original space
+    assert passage["text"].split() == document_text[chunks[0]["char_start"]:chunks[3]["char_end"]].split()
+    assert len(passage["text"]) == chunks[3]["char_end"] - chunks[0]["char_start"]
+    assert (passage["char_start"], passage["char_end"]) == (chunks[0]["char_start"], chunks[3]["char_end"])
+
+
+def test_near_duplicates_are_dropped():
+    chunk = _chunks()[0]
+    copy = {**chunk, "document_id": "other-upload", "title": "manual (1).pdf"}
+
+    context = ContextBuilder().build([chunk, copy])
+
+    assert context.duplicates == 1
+    assert [p["title"] for p in context.passages] == ["manual.pdf"]
+
+
+def test_budget_is_packed_in_priority_order():
+    passages = [
+        {"title": f"t{i}", "text": text, "score": 1.0}
+        for i, text in enumerate(["a" * 400, "b" * 400, "c" * 40])
+    ]
+
+    context = ContextBuilder(max_tokens=120).build(passages)
+
+    assert [p["title"] for p in context.passages] == ["t0", "t2"]
+    assert context.over_budget == 1
+    assert context.tokens == estimate_tokens("a" * 400) + estimate_tokens("c" * 40) <= 120
+
+
+def test_agent_reports_token_usage(monkeypatch):
+    agent = _agent(monkeypatch, FakeGenAIClient(dim=8))
+
+    usage = agent.run("How to check insulation?")["usage"]
+    done = list(agent.run_stream("How to check insulation?"))[-1]["data"]
+
+    assert usage["prompt_tokens"] > usage["context_tokens"] > 0
+    # the three chunks are consecutive chunks of one document
+    assert usage["candidates"] == 3 and usage["passages"] == 1 and usage["merged"] == 2
+    assert done["usage"]["context_tokens"] == usage["context_tokens"]
+
+
+if __name__ == "__main__":
+    test_adjacent_chunks_are_merged_without_overlap()
+    test_layout_chunks_are_merged_by_offset_across_pages()
+    test_near_duplicates_are_dropped()
+    test_budget_is_packed_in_priority_order()
+    print("Context builder tests passed!")
@@ -0,0 +1,154 @@
+from app.pipeline.index import ElasticVectorManager
+import asyncio
+
+import pytest
+from elasticsearch import BadRequestError
+
+from app.pipeline.retrieve import ElasticRetriever, fuse_rankings
+from app.schemas.schema import Document
+from tests.fakes import FakeEmbeddingClient, InMemoryElasticNode, fake_async_elasticsearch, fake_elasticsearch, fake_vector
+
+TEXTS = [
+    "Inspect the motor nameplate before accepting the delivery",
+    "Lubricate bearings every 2000 operating hours",
+    "Check insulation resistance with a megohmmeter",
+    "Mount the motor on a rigid foundation to avoid vibration",
+]
+
+
+def _populated_index(index_name: str) -> ElasticVectorManager:
+    InMemoryElasticNode.reset()
+    manager = ElasticVectorManager(
+        elastic_url="http://fake-es:9200",
+        api_key="test",
+        index_name=index_name,
+        embedding_dim=8,
+        es=fake_elasticsearch(),
+    )
+    manager.embedder.client = FakeEmbeddingClient(dim=8)
+    manager.index_documents([
+        Document(document_id="doc", user_id="u", session_id="s", title="manual.pdf", chunk_id=i, text=text)
+        for i, text in enumerate(TEXTS)
+    ])
+    return manager
+
+
+def _retriever(index_name: str, search_mode: str, **kwargs) -> ElasticRetriever:
+    return ElasticRetriever(
+        elastic_url="http://fake-es:9200",
+        api_key="test",
+        index_name=index_name,
+        embedding_dim=8,
+        search_mode=search_mode,
+        es=fake_elasticsearch(),
+        async_es=fake_async_elasticsearch(),
+        **kwargs,
+    )
+
+
+def test_index_is_mapped_for_knn():
+    manager = _populated_index("test-knn-mapping")
+    embedding = manager.es.indices.get_mapping(index="test-knn-mapping")["test-knn-mapping"]["mappings"]["properties"]["embedding"]
+
+    assert embedding["index"] is True
+    assert embedding["similarity"] == "cosine"
+    assert embedding["index_options"]["type"] == "hnsw"
+    assert manager.has_vector_index()
+
+
+def test_knn_and_brute_force_agree_on_ranking():
+    """kNN and script_score return the same chunks; kNN scores are normalized to [0, 1]"""
+    _populated_index("test-knn-search")
+    query = fake_vector(TEXTS[2], 8)
+
+    knn_results = _retriever("test-knn-search", "knn").search_by_vector(query, top_k=3)
+    brute_results = _retriever("test-knn-search", "script_score").search_by_vector(query, top_k=3)
+
+    assert [r["text"] for r in knn_results] == [r["text"] for r in brute_results]
+    assert knn_results[0]["text"] == TEXTS[2]
+    assert abs(knn_results[0]["score"] - 1.0) < 1e-6
+    assert all("embedding" not in r for r in knn_results)
+
+
+def test_legacy_index_falls_back_and_migrates():
+    """An index without a vector index is searched by brute force until migrated"""
+    InMemoryElasticNode.reset()
+    es = fake_elasticsearch()
+    es.indices.create(index="legacy", body={"mappings": {"properties": {"embedding": {"type": "dense_vector", "dims": 8, "index": False}}}})
+    es.index(index="legacy", id="u_doc_0", document={"title": "manual.pdf", "text": TEXTS[0], "embedding": fake_vector(TEXTS[0], 8)})
+
+    retriever = _retriever("legacy", "knn")
+    results = retriever.search_by_vector(fake_vector(TEXTS[0], 8), top_k=1)
+    assert results[0]["text"] == TEXTS[0]
+    assert retriever.search_mode == "knn", "the fallback only applies to the failed request"
+    batched = retriever.search_batch([TEXTS[0]], [fake_vector(TEXTS[0], 8)], top_k=1)
+    assert [r["text"] for r in batched[0]] == [TEXTS[0]]
+    assert asyncio.run(retriever.asearch_by_vector(fake_vector(TEXTS[0], 8), top_k=1))[0]["text"] == TEXTS[0]
+
+    manager = ElasticVectorManager(
+        elastic_url="http://fake-es:9200", api_key="test", index_name="legacy-knn", embedding_dim=8, es=es,
+    )
+    assert not manager.has_vector_index("legacy")
+    manager.migrate_index("legacy", delete_source=True)
+
+    results = _retriever("legacy", "knn").search_by_vector(fake_vector(TEXTS[0], 8), top_k=1)
+    assert results[0]["text"] == TEXTS[0]
+
+
+def test_other_bad_requests_do_not_fall_back():
+    """Only an index without a vector index is searched with script_score; other 400s surface"""
+    _populated_index("test-bad-request")
+    retriever = _retriever("test-bad-request", "knn")
+
+    with pytest.raises(BadRequestError):
+        retriever.search_by_vector(fake_vector(TEXTS[0], 4), top_k=1)  # wrong number of dimensions
+    assert retriever.search_mode == "knn"
+    requests = [path for _, path in retriever.es.transport.node_pool.get().requests]
+    assert requests.count("/test-bad-request/_search") == 1
+
+
+def test_hybrid_search_recovers_exact_codes():
+    """BM25 finds the fault code that the (here meaningless) embedding misses, natively or client-side"""
+    manager = _populated_index("test-hybrid")
+    manager.index_documents([
+        Document(document_id="doc", user_id="u", session_id="s", title="faults.pdf", chunk_id=99,
+                 text="Fault code F-0412 means the winding thermistor tripped")
+    ])
+    query, embedding = "what does F-0412 mean", fake_vector(TEXTS[1], 8)
+
+    for fusion in ("rrf", "weighted"):
+        native = _retriever("test-hybrid", "hybrid", fusion=fusion).hybrid_search(query, embedding, top_k=3)
+        assert native[0]["text"].startswith("Fault code F-0412")
+        assert native[0]["id"] == "u_doc_99" and native[0]["chunk_id"] == 99
+
+        InMemoryElasticNode.native_fusion = False
+        retriever = _retriever("test-hybrid", "hybrid", fusion=fusion)
+        fallback = retriever.hybrid_search(query, embedding, top_k=3)
+        fallback_async = asyncio.run(retriever.ahybrid_search(query, embedding, top_k=3))
+        InMemoryElasticNode.native_fusion = True
+
+        assert [r["id"] for r in fallback] == [r["id"] for r in native] == [r["id"] for r in fallback_async]
+        requests = retriever.es.transport.node_pool.get().requests
+        assert [path for _, path in requests].count("/test-hybrid/_search") == 1, "native fusion is only tried once"
+
+
+def test_fuse_rankings():
+    bm25 = [{"_id": "a", "_score": 9.0}, {"_id": "b", "_score": 3.0}]
+    knn = [{"_id": "b", "_score": 0.9}, {"_id": "c", "_score": 0.8}, {"_id": "a", "_score": 0.1}]
+
+    rrf = fuse_rankings([bm25, knn], [1.0, 1.0], method="rrf", rank_constant=60)
+    assert [hit["_id"] for hit in rrf] == ["b", "a", "c"]
+    assert abs(rrf[0]["_score"] - (1 / 62 + 1 / 61)) < 1e-12
+
+    weighted = fuse_rankings([bm25, knn], [0.3, 0.7], method="weighted")
+    assert [hit["_id"] for hit in weighted] == ["b", "c", "a"]
+    assert abs(weighted[1]["_score"] - 0.7 * 0.875) < 1e-12
+
+
+if __name__ == "__main__":
+    test_index_is_mapped_for_knn()
+    test_knn_and_brute_force_agree_on_ranking()
+    test_legacy_index_falls_back_and_migrates()
+    test_hybrid_search_recovers_exact_codes()
+    test_fuse_rankings()
+    print("Elastic retriever tests passed!")
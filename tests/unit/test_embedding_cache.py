@@ -0,0 +1,58 @@
+import time
+
+from app.pipeline import retrieve
+from app.pipeline.cache import LRUEmbeddingCache, SQLiteEmbeddingCache, make_cache_key
+from app.pipeline.retrieve import ElasticRetriever
+from tests.fakes import FakeEmbeddingClient, fake_elasticsearch
+
+
+def test_key_normalizes_text_and_separates_parameters():
+    key = make_cache_key("gemini-embedding-001", 768, "SEMANTIC_SIMILARITY", "What is  the Process?")
+    assert key == make_cache_key("gemini-embedding-001", 768, "SEMANTIC_SIMILARITY", " what is the process? ")
+    assert key != make_cache_key("gemini-embedding-001", 256, "SEMANTIC_SIMILARITY", "what is the process?")
+    assert key != make_cache_key("gemini-embedding-001", 768, "RETRIEVAL_QUERY", "what is the process?")
+
+
+def test_lru_evicts_least_recently_used_and_expires():
+    cache = LRUEmbeddingCache(max_entries=2, ttl_seconds=0.05)
+    cache.set("a", [1.0])
+    cache.set("b", [2.0])
+    assert cache.get("a") == [1.0]  # "a" becomes most recently used
+    cache.set("c", [3.0])
+
+    assert cache.get("b") is None
+    assert cache.get("c") == [3.0]
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 2
+
+
+def test_sqlite_cache_survives_reopen(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    SQLiteEmbeddingCache(path).set("key", [0.5, 0.25])
+
+    reopened = SQLiteEmbeddingCache(path)
+    assert reopened.get("key") == [0.5, 0.25]
+    assert len(reopened) == 1
+
+
+def test_retrievers_share_the_query_cache(monkeypatch):
+    """A retriever created per request reuses embeddings computed by a previous one"""
+    client = FakeEmbeddingClient(dim=8)
+    monkeypatch.setattr(retrieve, "google_client", client)
+    cache = LRUEmbeddingCache()
+
+    for _ in range(3):
+        retriever = ElasticRetriever("http://fake-es:9200", "test", "idx", embedding_dim=8, embedding_cache=cache, es=fake_elasticsearch())
+        retriever._generate_embeddings("What is the process before accepting a motor?")
+
+    assert client.calls == 1
+    assert cache.stats()["hits"] == 2
+
+
+if __name__ == "__main__":
+    import tempfile, pathlib
+    test_key_normalizes_text_and_separates_parameters()
+    test_lru_evicts_least_recently_used_and_expires()
+    test_sqlite_cache_survives_reopen(pathlib.Path(tempfile.mkdtemp()))
+    print("Embedding cache tests passed!")
@@ -0,0 +1,150 @@
+import time
+import asyncio
+
+import pytest
+from google.genai import errors
+
+from app.pipeline.embed import BatchEmbedder
+from app.pipeline.gateway import AdaptiveConcurrency, CircuitOpenError, GenAIGateway, TokenBucket
+from tests.fakes import FakeEmbeddingClient, FakeGenAIClient
+from tests.unit.test_batch_embedder import _make_documents
+from tests.unit.test_question_batch import QUESTIONS
+from tests.unit.test_rag_agent import _agent
+
+
+def _server_error() -> errors.ServerError:
+    return errors.ServerError(503, {"error": {"code": 503, "status": "UNAVAILABLE", "message": "overloaded"}})
+
+
+def test_retry_waits_for_retry_after(monkeypatch):
+    client = FakeGenAIClient(dim=8, generation_failures=1, retry_after=0.3)
+    agent = _agent(monkeypatch, client)
+    agent.gateway = GenAIGateway(initial_backoff=0)
+
+    start = time.perf_counter()
+    response = agent.run("How often are bearings lubricated?")
+    assert time.perf_counter() - start >= 0.3
+    assert response["response"] == "Answer to: How often are bearings lubricated?"
+
+    client.generation_failures = 1
+    start = time.perf_counter()
+    asyncio.run(agent.arun("How is insulation checked?"))
+    assert time.perf_counter() - start >= 0.3
+    assert client.generations == 4
+    assert agent.gateway.stats()["fake-model"]["rate_limited"] == 2
+
+
+def test_retry_delay_reads_retry_info():
+    gateway = GenAIGateway(initial_backoff=0)
+    error = errors.ClientError(429, {"error": {"code": 429, "details": [
+        {"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": "13s"},
+    ]}})
+
+    assert gateway.retry_delay(error, attempt=0) == 13.0
+    assert gateway.retry_delay(ValueError("bad response"), attempt=0) is None
+    assert gateway.retry_delay(errors.ClientError(400, {"error": {"code": 400}}), attempt=0) is None
+
+
+def test_token_bucket_paces_requests():
+    bucket = TokenBucket(rate_per_minute=60)  # one token per second, burst of one
+    assert bucket.reserve(1) == 0
+    assert bucket.reserve(2) == pytest.approx(2.0, abs=0.05)
+
+    gateway = GenAIGateway(requests_per_minute=1200)  # 20 per second
+    start = time.perf_counter()
+    for _ in range(30):
+        gateway.call("model", lambda: None)
+    assert time.perf_counter() - start >= 0.45
+
+
+def test_concurrency_halves_on_rate_limit_and_grows_on_success():
+    limiter = AdaptiveConcurrency(max_limit=8, decrease_interval=10)
+    for _ in range(2):
+        limiter.acquire()
+        limiter.release(rate_limited=True)
+    assert int(limiter.limit) == 4  # the second 429 falls in the same decrease interval
+
+    for _ in range(12):
+        limiter.acquire()
+        limiter.release(succeeded=True)
+    assert 6 <= int(limiter.limit) <= 8
+
+
+def test_circuit_opens_after_server_errors_and_probes_after_cooldown():
+    gateway = GenAIGateway(max_retries=1, failure_threshold=3, cooldown=0.1)
+    calls = []
+
+    def failing():
+        calls.append(1)
+        raise _server_error()
+
+    for _ in range(3):
+        with pytest.raises(errors.ServerError):
+            gateway.call("model", failing)
+    with pytest.raises(CircuitOpenError):
+        gateway.call("model", failing)
+    assert len(calls) == 3 and gateway.stats()["model"]["circuit"] == "open"
+
+    time.sleep(0.1)
+    assert gateway.call("model", lambda: "ok") == "ok"
+    assert gateway.stats()["model"]["circuit"] == "closed"
+
+
+def test_interrupted_admission_gives_back_the_probe(monkeypatch):
+    """A probe cancelled while waiting for a permit leaves the circuit ready for the next probe"""
+    gateway = GenAIGateway(max_retries=1, max_concurrency=1, failure_threshold=1, cooldown=0.05)
+
+    def failing():
+        raise _server_error()
+
+    with pytest.raises(errors.ServerError):
+        gateway.call("model", failing)
+    time.sleep(0.05)
+    gate = gateway._gate("model")
+
+    async def cancelled_probe():
+        gate.concurrency.acquire()  # the only permit is taken, so the probe waits
+        task = asyncio.create_task(gateway.acall("model", lambda: asyncio.sleep(0)))
+        await asyncio.sleep(0.01)
+        assert gateway.stats()["model"]["circuit"] == "half_open"
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        gate.concurrency.release()
+
+    asyncio.run(cancelled_probe())
+    assert gateway.stats()["model"]["in_flight"] == 0
+
+    def interrupted():
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(gate.concurrency, "acquire", interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        gateway.call("model", lambda: "ok")
+    monkeypatch.undo()
+
+    assert gateway.call("model", lambda: "ok") == "ok"
+    assert gateway.stats()["model"]["circuit"] == "closed"
+
+
+def test_batch_completes_against_a_rate_limited_server(monkeypatch):
+    client = FakeGenAIClient(dim=8, generation_latency=0.01)
+    agent = _agent(monkeypatch, client)
+    agent.gateway = GenAIGateway(initial_backoff=0.05, max_retries=20)
+    client.requests_per_second = 4
+
+    events = list(agent.run_batch(QUESTIONS * 2, max_concurrency=8))
+
+    assert events[-1]["data"]["answered"] == 12 and events[-1]["data"]["failed"] == 0
+    assert client.rate_limited > 0
+    assert agent.gateway.stats()["fake-model"]["concurrency_limit"] < 16
+
+
+def test_embedder_shares_the_gateway_pause():
+    client = FakeEmbeddingClient(dim=8, requests_per_second=2)
+    embedder = BatchEmbedder(client=client, embedding_dim=8, batch_size=5, max_concurrency=4, initial_backoff=0.01)
+
+    docs = embedder.embed_documents(_make_documents(20))
+
+    assert all(doc.embedding is not None for doc in docs)
+    assert client.texts_embedded == 20 and client.rate_limited > 0
@@ -0,0 +1,135 @@
+import os
+import time
+
+from api.clients import ClientRegistry
+from api.jobs import IngestJobQueue, IngestJobStore
+from tests.fakes import FakeEmbeddingClient, InMemoryElasticNode, fake_async_elasticsearch, fake_elasticsearch
+from tests.unit.test_ingest_pipeline import _synthetic_pdf
+
+
+def _queue(tmp_path, client=None) -> IngestJobQueue:
+    InMemoryElasticNode.reset()
+    registry = ClientRegistry("http://fake-es:9200", "test", es=fake_elasticsearch(), async_es=fake_async_elasticsearch())
+    registry.get_vector_manager("jobs-idx").embedder.client = client or FakeEmbeddingClient()
+    return IngestJobQueue(registry, IngestJobStore(str(tmp_path / "jobs.sqlite")), str(tmp_path / "spool"))
+
+
+def _wait(queue: IngestJobQueue, job_id: str, timeout: float = 30) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        job = queue.status(job_id)
+        if job["status"] in ("completed", "failed") or time.monotonic() > deadline:
+            return job
+        time.sleep(0.02)
+
+
+def test_job_reports_progress_and_throughput(tmp_path):
+    queue = _queue(tmp_path)
+    job = queue.submit("u", "s", "jobs-idx", [("a.pdf", _synthetic_pdf(4)), ("b.pdf", _synthetic_pdf(6))])
+
+    status = _wait(queue, job["id"])
+    queue.shutdown()
+
+    assert status["status"] == "completed"
+    assert status["documents_indexed"] == status["documents_total"] == 2
+    assert status["total_chunks"] == 10
+    assert status["progress"]["pages_extracted"] == 10
+    assert status["progress"]["chunks_embedded"] == status["progress"]["chunks_indexed"] == 10
+    assert status["progress"]["chunks_per_second"] > 0
+    assert not os.listdir(tmp_path / "spool"), "spooled uploads are removed once the job finishes"
+
+
+def test_failed_job_records_error_and_keeps_other_documents(tmp_path):
+    client = FakeEmbeddingClient()
+    queue = _queue(tmp_path, client)
+    queue.clients.get_vector_manager("jobs-idx").embedder.max_retries = 1
+    assert _wait(queue, queue.submit("u", "s", "jobs-idx", [("a.pdf", _synthetic_pdf(2))])["id"])["status"] == "completed"
+
+    client.failures = 100
+    status = _wait(queue, queue.submit("u", "s", "jobs-idx", [("b.pdf", _synthetic_pdf(3))])["id"])
+    queue.shutdown()
+
+    assert status["status"] == "failed"
+    assert "Embedding generation failed" in status["error"]
+    assert queue.clients.es.count(index="jobs-idx")["count"] == 2, "only the failing file is rolled back"
+
+
+def test_bulk_load_job_reports_bulk_stats(tmp_path):
+    queue = _queue(tmp_path)
+    queue.bulk_options = {"workers": 2, "initial_backoff": 0.0}
+    InMemoryElasticNode.reject_bulk_items = 3
+
+    status = _wait(queue, queue.submit("u", "s", "jobs-idx", [("a.pdf", _synthetic_pdf(4))], bulk_load=True)["id"])
+    queue.shutdown()
+
+    assert status["status"] == "completed" and status["bulk_load"]
+    assert status["bulk"]["indexed"] == 4 and status["bulk"]["rejected"] == 3
+    assert status["bulk"]["docs_per_second"] > 0
+    settings = queue.clients.es.indices.get_settings(index="jobs-idx", flat_settings=True)["jobs-idx"]["settings"]
+    assert settings == {"index.number_of_replicas": "1"}, "refresh and replica settings are restored"
+
+
+def test_bulk_load_job_fails_when_chunks_are_lost(tmp_path):
+    queue = _queue(tmp_path)
+    queue.bulk_options = {"workers": 2, "max_retries": 1, "initial_backoff": 0.0}
+    InMemoryElasticNode.reject_bulk_items = 100
+
+    status = _wait(queue, queue.submit("u", "s", "jobs-idx", [("a.pdf", _synthetic_pdf(4))], bulk_load=True)["id"])
+    queue.shutdown()
+
+    assert status["status"] == "failed" and "failed to index" in status["error"]
+    assert status["bulk"]["failed"] == 4
+    assert queue.clients.es.count(index="jobs-idx")["count"] == 0
+
+
+def test_interrupted_job_resumes_after_restart(tmp_path):
+    """A job left running by a previous process resumes at its first unfinished file"""
+    queue = _queue(tmp_path)
+    queue.shutdown()
+    job = queue.store.create("interrupted", "jobs-idx", "u", "s", ["a.pdf", "b.pdf"])
+    os.makedirs(tmp_path / "spool" / "interrupted")
+    for position, (filename, pages) in enumerate([("a.pdf", 3), ("b.pdf", 5)]):
+        with open(queue._spool_path(job["id"], position, filename), "wb") as f:
+            f.write(_synthetic_pdf(pages))
+    queue.store.update(job["id"], status="running", started_at=time.time(), documents_indexed=1, total_chunks=3)
+
+    restarted = IngestJobQueue(queue.clients, IngestJobStore(queue.store.path), queue.spool_dir)
+    assert restarted.recover() == 1
+    status = _wait(restarted, job["id"])
+    restarted.shutdown()
+
+    assert status["status"] == "completed"
+    assert status["documents_indexed"] == 2
+    assert status["total_chunks"] == 8
+    assert restarted.clients.es.count(index="jobs-idx")["count"] == 5, "only the unfinished file is ingested again"
+
+
+def test_shutdown_waits_for_the_running_file_and_requeues_the_job(tmp_path):
+    """Shutdown lets the running job finish its file; the rest of the job runs after the restart"""
+    queue = _queue(tmp_path, FakeEmbeddingClient(latency=0.2))
+    files = [(f"{name}.pdf", _synthetic_pdf(1)) for name in "abcd"]
+    job = queue.submit("u", "s", "jobs-idx", files)
+    while queue.status(job["id"])["status"] != "running":
+        time.sleep(0.01)
+
+    queue.shutdown()
+    interrupted = queue.status(job["id"])
+    assert interrupted["status"] == "queued"
+    assert 0 < interrupted["documents_indexed"] < 4
+    assert queue.clients.es.count(index="jobs-idx")["count"] == interrupted["documents_indexed"], "no partial file"
+
+    restarted = IngestJobQueue(queue.clients, IngestJobStore(queue.store.path), queue.spool_dir)
+    assert restarted.recover() == 1
+    status = _wait(restarted, job["id"])
+    restarted.shutdown()
+
+    assert status["status"] == "completed" and status["documents_indexed"] == 4
+    assert restarted.clients.es.count(index="jobs-idx")["count"] == 4
+
+
+if __name__ == "__main__":
+    import tempfile, pathlib
+    test_job_reports_progress_and_throughput(pathlib.Path(tempfile.mkdtemp()))
+    test_failed_job_records_error_and_keeps_other_documents(pathlib.Path(tempfile.mkdtemp()))
+    test_interrupted_job_resumes_after_restart(pathlib.Path(tempfile.mkdtemp()))
+    print("Ingest job tests passed!")
@@ -0,0 +1,149 @@
+import pymupdf
+
+from app.pipeline.cache import LRUEmbeddingCache
+from app.pipeline.extract import PdfReader
+from app.pipeline.index import ElasticVectorManager
+from app.pipeline.ingest import IngestPipeline, prefetch
+from tests.fakes import FakeEmbeddingClient, InMemoryElasticNode, fake_elasticsearch
+
+
+def _synthetic_pdf(pages: int, revised_page: int = -1) -> bytes:
+    pdf = pymupdf.open()
+    for page_num in range(pages):
+        page = pdf.new_page()
+        revision = " revised" if page_num == revised_page else ""
+        # one paragraph of about 310 tokens: two pages do not fit in one chunk with layout chunking
+        page.insert_textbox(pymupdf.Rect(72, 72, 540, 770), f"Page {page_num}{revision} motor installation step " * 40)
+    data = pdf.tobytes()
+    pdf.close()
+    return data
+
+
+def _vector_manager(index_name: str, embedding_store=None) -> ElasticVectorManager:
+    InMemoryElasticNode.reset()
+    manager = ElasticVectorManager(
+        elastic_url="http://fake-es:9200",
+        api_key="test",
+        index_name=index_name,
+        embedding_dim=8,
+        embedding_batch_size=4,
+        bulk_chunk_size=3,
+        embedding_store=embedding_store,
+        es=fake_elasticsearch(),
+    )
+    manager.embedder.client = FakeEmbeddingClient(dim=8)
+    return manager
+
+
+def test_streaming_ingest_indexes_every_chunk():
+    """extract → embed → bulk-write streams every chunk into the index"""
+    manager = _vector_manager("test-stream")
+    reader = PdfReader(user_id="u", session_id="s")
+
+    indexed = IngestPipeline(reader, manager, prefetch_size=2).run(_synthetic_pdf(12), "synthetic.pdf")
+
+    assert indexed == 12
+    assert manager.es.count(index="test-stream")["count"] == 12
+    bulk_requests = [r for r in manager.es.transport.node_pool.get().requests if r[1].endswith("_bulk")]
+    assert len(bulk_requests) == 4, "12 chunks at bulk_chunk_size=3 should be written in 4 requests"
+
+
+def test_reingest_skips_unchanged_and_reembeds_only_revised_pages():
+    """Unchanged PDFs are a no-op; revisions only embed changed chunks and drop stale ones"""
+    manager = _vector_manager("test-content-addressed", embedding_store=LRUEmbeddingCache(ttl_seconds=None))
+    client = manager.embedder.client
+    pipeline = IngestPipeline(PdfReader(user_id="u", session_id="s"), manager)
+
+    original, revised = _synthetic_pdf(12), _synthetic_pdf(12, revised_page=5)
+
+    pipeline.run(original, "manual.pdf")
+    assert client.texts_embedded == 12
+
+    assert pipeline.run(original, "manual.pdf") == 12
+    assert client.texts_embedded == 12, "an unchanged PDF must not hit the embedding API"
+
+    pipeline.run(revised, "manual.pdf")
+    assert client.texts_embedded == 13, "only the revised page should be embedded"
+
+    revised_id = PdfReader.document_id_for(revised)
+    chunks = manager.es.search(index="test-content-addressed", body={"size": 100})["hits"]["hits"]
+    assert len(chunks) == 12
+    assert {hit["_source"]["document_id"] for hit in chunks} == {revised_id}
+
+
+def test_replace_reuses_indexed_embeddings_and_deletes_old_version():
+    """A replacement under another file name only embeds its changed chunks, without an embedding store"""
+    manager = _vector_manager("test-replace")
+    client = manager.embedder.client
+    pipeline = IngestPipeline(PdfReader(user_id="u", session_id="s"), manager)
+    original, revised = _synthetic_pdf(6), _synthetic_pdf(6, revised_page=2)
+    pipeline.run(original, "manual.pdf")
+    pipeline.run(_synthetic_pdf(3), "other.pdf")
+    embedded = client.texts_embedded
+
+    # the title is part of the embedding input, so keep it; the id is what is replaced
+    assert pipeline.run(revised, "manual.pdf", replaces=PdfReader.document_id_for(original)) == 6
+    assert client.texts_embedded == embedded + 1, "only the revised page should be embedded"
+    assert manager.count_chunks(PdfReader.document_id_for(original), "u") == 0
+    assert manager.count_chunks(PdfReader.document_id_for(revised), "u") == 6
+    assert manager.es.count(index="test-replace")["count"] == 9, "other documents are kept"
+
+    assert manager.delete_document(PdfReader.document_id_for(revised), "u") == 6
+    assert manager.es.count(index="test-replace")["count"] == 3
+
+
+def test_failed_ingest_rolls_back_only_its_own_chunks():
+    manager = _vector_manager("test-rollback")
+    pipeline = IngestPipeline(PdfReader(user_id="u", session_id="s"), manager)
+    pipeline.run(_synthetic_pdf(3), "kept.pdf")
+
+    # the first request batch of the next PDF is embedded and written, then the API fails
+    client = manager.embedder.client
+    client.failures, calls = 0, client.calls
+    real_embed = client.embed_content
+    def failing_embed(model, contents, config=None):
+        if client.calls > calls:
+            client.failures = 100
+        return real_embed(model, contents, config)
+    client.embed_content = failing_embed
+    manager.embedder.max_concurrency, manager.embedder.max_retries = 1, 1
+
+    requests = manager.es.transport.node_pool.get().requests
+    before = len(requests)
+    failing = _synthetic_pdf(12)
+    try:
+        pipeline.run(failing, "failing.pdf")
+    except Exception as e:
+        assert "Embedding generation failed" in str(e)
+    else:
+        raise AssertionError("Expected the embedding failure to reach the caller")
+
+    written = sum(1 for r in requests[before:] if r[1].endswith("_bulk"))
+    deletes = [r for r in requests[before:] if r[1].endswith("_delete_by_query")]
+    assert written and len(deletes) == 1, "the partially written chunks are rolled back"
+    assert manager.count_chunks(PdfReader.document_id_for(failing), "u") == 0
+    assert manager.es.count(index="test-rollback")["count"] == 3
+
+
+def test_prefetch_propagates_producer_errors():
+    def broken():
+        yield 1
+        raise RuntimeError("extraction failed")
+
+    stream = prefetch(broken(), maxsize=1)
+    assert next(stream) == 1
+    try:
+        next(stream)
+    except RuntimeError as e:
+        assert "extraction failed" in str(e)
+    else:
+        raise AssertionError("Expected the producer error to reach the consumer")
+
+
+if __name__ == "__main__":
+    test_streaming_ingest_indexes_every_chunk()
+    test_reingest_skips_unchanged_and_reembeds_only_revised_pages()
+    test_replace_reuses_indexed_embeddings_and_deletes_old_version()
+    test_failed_ingest_rolls_back_only_its_own_chunks()
+    test_prefetch_propagates_producer_errors()
+    print("Ingest pipeline tests passed!")
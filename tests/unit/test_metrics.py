@@ -0,0 +1,59 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.pipeline.ingest import IngestPipeline
+from app.pipeline.extract import PdfReader
+from app.utils.metrics import MetricsRegistry, get_metrics
+from tests.fakes import FakeGenAIClient
+from tests.unit.test_ingest_pipeline import _synthetic_pdf, _vector_manager
+from tests.unit.test_rag_agent import _agent
+
+
+def test_span_records_duration_and_errors():
+    metrics = MetricsRegistry()
+    with metrics.timings() as timings:
+        with metrics.span("search"):
+            pass
+        with pytest.raises(ValueError):
+            with metrics.span("search"):
+                raise ValueError("boom")
+
+    assert metrics.stage_seconds.count(stage="search") == 2
+    assert metrics.stage_errors.value(stage="search") == 1
+    assert set(timings) == {"search"}
+
+    text = metrics.render()
+    assert "# TYPE rag_stage_seconds histogram" in text
+    assert 'rag_stage_seconds_bucket{stage="search",le="+Inf"} 2' in text
+    assert 'rag_stage_seconds_count{stage="search"} 2' in text
+    assert 'rag_stage_errors_total{stage="search"} 1.0' in text
+
+
+def test_disabled_registry_records_nothing():
+    metrics = MetricsRegistry(enabled=False)
+    with metrics.timings() as timings, metrics.span("search"):
+        pass
+    metrics.inc(metrics.genai_tokens, 10, model="m", type="prompt")
+
+    assert timings == {} and metrics.stage_seconds.count(stage="search") == 0
+    assert metrics.render() == ""
+
+
+def test_question_and_ingest_stages_are_exposed(monkeypatch):
+    from main import app
+
+    agent = _agent(monkeypatch, FakeGenAIClient(dim=8))
+    agent.run("How often are bearings lubricated?")
+    manager = _vector_manager("test-metrics")
+    IngestPipeline(PdfReader(user_id="u", session_id="s"), manager).run(_synthetic_pdf(3), "synthetic.pdf")
+
+    metrics = get_metrics()
+    for stage in ("question", "query_embed", "search", "context_build", "generation", "json_parse", "extract", "embed", "bulk"):
+        assert metrics.stage_seconds.count(stage=stage) >= 1, stage
+    assert metrics.genai_tokens.value(model="fake-model", type="prompt") > 0
+    assert metrics.genai_requests.value(model="fake-model", outcome="success") == 1
+
+    response = TestClient(app).get("/metrics")
+    assert response.status_code == 200 and response.headers["content-type"].startswith("text/plain")
+    assert 'rag_stage_seconds_count{stage="generation"} 1' in response.text
+    assert 'rag_genai_tokens_total{model="fake-model",type="output"}' in response.text
@@ -0,0 +1,28 @@
+from app.pipeline.extract import PdfReader
+from tests.unit.test_ingest_pipeline import _synthetic_pdf
+
+
+def test_parallel_extraction_matches_serial_chunk_order():
+    """Page ranges read on the process pool merge back into the serial chunk order"""
+    pdf = _synthetic_pdf(40)
+    serial = PdfReader(user_id="u", session_id="s").read(pdf, "long.pdf")
+    parallel = PdfReader(user_id="u", session_id="s", max_workers=2, pages_per_task=7).read(pdf, "long.pdf")
+
+    assert [doc.model_dump() for doc in parallel] == [doc.model_dump() for doc in serial]
+    assert [doc.chunk_id for doc in parallel] == list(range(40))
+
+
+def test_read_many_keeps_source_order():
+    sources = [(_synthetic_pdf(pages), f"file-{pages}.pdf") for pages in (20, 3, 11)]
+    reader = PdfReader(user_id="u", session_id="s", max_workers=2, pages_per_task=4)
+
+    results = reader.read_many(sources)
+
+    assert [len(docs) for docs in results] == [20, 3, 11]
+    assert [docs[0].title for docs in results] == ["file-20.pdf", "file-3.pdf", "file-11.pdf"]
+
+
+if __name__ == "__main__":
+    test_parallel_extraction_matches_serial_chunk_order()
+    test_read_many_keeps_source_order()
+    print("PDF reader tests passed!")
@@ -0,0 +1,78 @@
+import json
+import time
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from api.clients import ClientRegistry, get_clients
+from tests.fakes import FakeGenAIClient, InMemoryElasticNode
+from tests.unit.test_rag_agent import TEXTS, _agent, _collect
+
+QUESTIONS = [f"Question {i} about {TEXTS[i % 3]}?" for i in range(6)]
+
+
+def _requests(es, path_suffix: str) -> int:
+    return sum(1 for _, path in es.transport.node_pool.get().requests if path.endswith(path_suffix))
+
+
+def test_batch_embeds_once_and_searches_with_msearch(monkeypatch):
+    client = FakeGenAIClient(dim=8)
+    agent = _agent(monkeypatch, client)
+    calls_before = client.calls
+
+    events = list(agent.run_batch(QUESTIONS, max_concurrency=3))
+
+    answers = sorted((e["data"] for e in events if e["event"] == "answer"), key=lambda answer: answer["index"])
+    assert [answer["question"] for answer in answers] == QUESTIONS
+    assert answers[2]["response"] == agent.run(QUESTIONS[2])["response"]
+    assert client.calls - calls_before == 1  # one request for the batch; `run` reuses its cached embedding
+    assert _requests(agent.retriever.es, "/_msearch") == 1
+
+    done = events[-1]
+    assert done["event"] == "done"
+    assert done["data"]["answered"] == 6 and done["data"]["failed"] == 0
+    assert {"embed_per_sec", "retrieve_per_sec", "generate_per_sec", "questions_per_sec"} <= set(done["data"])
+
+
+def test_batch_hybrid_search_matches_single_searches(monkeypatch):
+    agent = _agent(monkeypatch, FakeGenAIClient(dim=8))
+    retriever = agent.retriever
+    retriever.search_mode = "hybrid"
+    InMemoryElasticNode.native_fusion = False  # client-side fusion, two searches per query
+
+    batched = retriever.retrieve_batch(QUESTIONS, top_k=2)
+
+    assert retriever._native_fusion is False
+    assert batched == [retriever.retrieve(question, top_k=2) for question in QUESTIONS]
+
+
+def test_async_batch_bounds_concurrent_generations(monkeypatch):
+    agent = _agent(monkeypatch, FakeGenAIClient(dim=8, generation_latency=0.1))
+
+    start = time.perf_counter()
+    events = asyncio.run(_collect(agent.arun_batch(QUESTIONS, max_concurrency=3)))
+    elapsed = time.perf_counter() - start
+
+    assert len([e for e in events if e["event"] == "answer"]) == 6
+    # two waves of three generations: concurrent, but capped
+    assert 0.2 <= elapsed < 0.5
+
+
+def test_batch_endpoint_streams_answers(monkeypatch):
+    from main import app
+
+    agent = _agent(monkeypatch, FakeGenAIClient(dim=8))
+    registry = ClientRegistry("http://fake-es:9200", "test", es=agent.retriever.es, async_es=agent.retriever.async_es)
+    registry._retrievers["agent-idx"] = agent.retriever
+    app.dependency_overrides[get_clients] = lambda: registry
+    try:
+        payload = {"user_id": "u", "session_id": "s", "index_name": "agent-idx", "questions": QUESTIONS[:3]}
+        response = TestClient(app).post("/question/batch", json=payload)
+        empty = TestClient(app).post("/question/batch", json={**payload, "questions": []})
+    finally:
+        app.dependency_overrides.clear()
+
+    events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+    assert [e[0] for e in events] == ["event: answer"] * 3 + ["event: done"]
+    assert json.loads(events[-1][1][len("data: "):])["questions"] == 3
+    assert empty.status_code == 422
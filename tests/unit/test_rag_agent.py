@@ -0,0 +1,116 @@
+import json
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from api.clients import ClientRegistry, get_clients
+from app.pipeline import generate, retrieve
+from app.pipeline.cache import LRUEmbeddingCache
+from app.pipeline.generate import RAGAgent, _ResponseFieldStreamer
+from app.pipeline.index import ElasticVectorManager
+from app.pipeline.retrieve import ElasticRetriever
+from app.schemas.schema import Document
+from tests.fakes import FakeGenAIClient, InMemoryElasticNode, fake_async_elasticsearch, fake_elasticsearch
+
+TEXTS = [
+    "Inspect the motor nameplate before accepting the delivery",
+    "Lubricate bearings every 2000 operating hours",
+    "Check insulation resistance with a megohmmeter",
+]
+
+
+def _agent(monkeypatch, client: FakeGenAIClient) -> RAGAgent:
+    InMemoryElasticNode.reset()
+    monkeypatch.setattr(retrieve, "google_client", client)
+    monkeypatch.setattr(generate, "google_client", client)
+
+    manager = ElasticVectorManager("http://fake-es:9200", "test", "agent-idx", embedding_dim=8, es=fake_elasticsearch())
+    manager.embedder.client = client
+    manager.index_documents([
+        Document(document_id="doc", user_id="u", session_id="s", title="manual.pdf", chunk_id=i, text=text)
+        for i, text in enumerate(TEXTS)
+    ])
+
+    retriever = ElasticRetriever(
+        "http://fake-es:9200", "test", "agent-idx", embedding_dim=8,
+        embedding_cache=LRUEmbeddingCache(), es=manager.es, async_es=fake_async_elasticsearch(),
+    )
+    return RAGAgent(model="fake-model", retriever=retriever)
+
+
+def test_sync_and_async_runs_agree(monkeypatch):
+    agent = _agent(monkeypatch, FakeGenAIClient(dim=8))
+    question = "What is the process before accepting a motor?"
+
+    sync_response = agent.run(question)
+    async_response = asyncio.run(agent.arun(question))
+
+    assert sync_response == async_response
+    assert sync_response["response"] == f"Answer to: {question}"
+    assert sync_response["reference"][0]["reference_title"] == "manual.pdf"
+
+
+def test_async_runs_overlap(monkeypatch):
+    """Concurrent async runs wait on Gemini together instead of one after another"""
+    client = FakeGenAIClient(dim=8, generation_latency=0.2)
+    agent = _agent(monkeypatch, client)
+
+    async def run_many():
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await asyncio.gather(*(agent.arun(f"question {i}") for i in range(10)))
+        return loop.time() - start
+
+    assert asyncio.run(run_many()) < 1.0
+    assert client.generations == 10
+
+
+def test_response_field_streamer_handles_split_escapes():
+    raw = json.dumps({"response": "Check \"phase\" order\nthen 😀 start", "reference": []})
+    for step in (1, 2, 5):
+        streamer = _ResponseFieldStreamer()
+        streamed = "".join(streamer.feed(raw[i:i + step]) for i in range(0, len(raw), step))
+        assert streamed == json.loads(raw)["response"]
+
+
+def test_stream_emits_tokens_then_references(monkeypatch):
+    agent = _agent(monkeypatch, FakeGenAIClient(dim=8))
+    question = "What is the process before accepting a motor?"
+
+    events = list(agent.run_stream(question))
+    async_events = asyncio.run(_collect(agent.astream(question)))
+
+    for stream in (events, async_events):
+        kinds = [e["event"] for e in stream]
+        assert kinds[0] == "token" and kinds[-2:] == ["references", "done"]
+        assert "".join(e["data"]["text"] for e in stream if e["event"] == "token") == f"Answer to: {question}"
+        assert stream[-2]["data"][0]["reference_title"] == "manual.pdf"
+        assert stream[-1]["data"]["ttft_ms"] <= stream[-1]["data"]["total_ms"]
+
+
+def test_stream_endpoint_sends_server_sent_events(monkeypatch):
+    from main import app
+
+    agent = _agent(monkeypatch, FakeGenAIClient(dim=8))
+    registry = ClientRegistry("http://fake-es:9200", "test", es=agent.retriever.es, async_es=agent.retriever.async_es)
+    registry._retrievers["agent-idx"] = agent.retriever
+    app.dependency_overrides[get_clients] = lambda: registry
+    try:
+        payload = {"user_id": "u", "session_id": "s", "index_name": "agent-idx", "question": "How to mount?"}
+        response = TestClient(app).post("/question/stream", json=payload)
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [block.split("\n") for block in response.text.strip().split("\n\n")]
+    assert events[0][0] == "event: token"
+    assert [e[0] for e in events[-2:]] == ["event: references", "event: done"]
+
+
+async def _collect(stream):
+    return [event async for event in stream]
+
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__])
@@ -0,0 +1,46 @@
+import asyncio
+
+from app.pipeline.rerank import LexicalReranker
+from tests.unit.test_rag_agent import _agent
+from tests.fakes import FakeGenAIClient
+
+CANDIDATES = [
+    {"title": "manual.pdf", "text": "Store the motor in a clean and dry place", "score": 0.91},
+    {"title": "manual.pdf", "text": "Check insulation resistance with a megohmmeter before start up", "score": 0.90},
+    {"title": "manual.pdf", "text": "Insulation resistance below 1 megohm requires drying the winding", "score": 0.80},
+    {"title": "manual.pdf", "text": "Lubricate bearings every 2000 operating hours", "score": 0.85},
+]
+
+
+def test_lexical_reranker_promotes_term_matches():
+    reranker = LexicalReranker()
+
+    ranked = reranker.rerank("how to check insulation resistance", CANDIDATES, top_n=2)
+
+    assert [doc["text"] for doc in ranked] == [CANDIDATES[1]["text"], CANDIDATES[2]["text"]]
+    assert ranked[0]["rerank_score"] >= ranked[1]["rerank_score"]
+    assert ranked[0]["score"] == 0.90, "the retrieval score is kept next to the rerank score"
+    assert reranker.stats()["calls"] == 1 and reranker.stats()["candidates"] == 4
+
+
+def test_retrieval_weight_one_keeps_retrieval_order():
+    ranked = LexicalReranker(retrieval_weight=1.0).rerank("insulation", CANDIDATES, top_n=4)
+    assert [doc["score"] for doc in ranked] == sorted((doc["score"] for doc in CANDIDATES), reverse=True)
+
+
+def test_agent_over_fetches_and_passes_top_n_to_generation(monkeypatch):
+    agent = _agent(monkeypatch, FakeGenAIClient(dim=8))
+    agent.reranker, agent.top_k, agent.rerank_candidates = LexicalReranker(), 1, 3
+
+    documents = agent._retrieve("megohmmeter insulation check")
+    async_documents = asyncio.run(agent._aretrieve("megohmmeter insulation check"))
+
+    assert len(documents) == len(async_documents) == 1
+    assert documents[0]["text"] == async_documents[0]["text"] == "Check insulation resistance with a megohmmeter"
+    assert agent.reranker.stats()["candidates"] == 6
+
+
+if __name__ == "__main__":
+    test_lexical_reranker_promotes_term_matches()
+    test_retrieval_weight_one_keeps_retrieval_order()
+    print("Reranker tests passed!")
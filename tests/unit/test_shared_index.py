@@ -0,0 +1,148 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from api.clients import ClientRegistry, IndexNotFoundError, get_clients
+from api.jobs import IngestJobQueue, IngestJobStore, get_jobs
+from app.pipeline import retrieve
+from app.pipeline.store import ElasticVectorStore, SharedElasticVectorStore
+from app.schemas.schema import Document
+from tests.fakes import FakeGenAIClient, InMemoryElasticNode, fake_async_elasticsearch, fake_elasticsearch, fake_vector
+from main import app
+from tests.unit.test_rag_agent import TEXTS
+
+
+def _registry(monkeypatch, **options) -> ClientRegistry:
+    InMemoryElasticNode.reset()
+    monkeypatch.setattr(retrieve, "google_client", FakeGenAIClient(dim=8))
+    return ClientRegistry(
+        "http://fake-es:9200", "test", shared_index="chunks", es=fake_elasticsearch(), async_es=fake_async_elasticsearch(),
+        **options,
+    )
+
+
+def _session_documents(user_id, session_id, texts=TEXTS):
+    return [
+        Document(document_id="doc", user_id=user_id, session_id=session_id, title=f"{session_id}.pdf", chunk_id=i, text=text)
+        for i, text in enumerate(texts)
+    ]
+
+
+def _ingest(registry, index_name, user_id, session_id):
+    manager = registry.get_vector_manager(index_name, user_id=user_id, session_id=session_id)
+    manager.embedder.client = FakeGenAIClient(dim=8)
+    manager.index_documents(_session_documents(user_id, session_id))
+
+
+@pytest.mark.parametrize("search_mode", ["knn", "script_score", "hybrid"])
+def test_sessions_share_one_index_but_only_see_their_chunks(monkeypatch, search_mode):
+    registry = _registry(monkeypatch, retriever_options={"search_mode": search_mode})
+    _ingest(registry, "index-u1-a", "u1", "a")
+    _ingest(registry, "index-u1-b", "u1", "b")
+    _ingest(registry, "index-u2-a", "u2", "a")
+
+    node = registry.es.transport.node_pool.get()
+    assert list(node.indices) == ["chunks"] and len(node.indices["chunks"]["docs"]) == 9
+
+    retriever = registry.get_retriever("index-u1-b")
+    hits = retriever.retrieve(TEXTS[1], top_k=10)
+    assert retriever.routing == "u1"
+    assert [hit["title"] for hit in hits] == ["b.pdf"] * 3
+    assert hits[0]["text"] == TEXTS[1]
+
+
+def test_delete_index_drops_only_the_session(monkeypatch):
+    registry = _registry(monkeypatch)
+    _ingest(registry, "index-u1-a", "u1", "a")
+    _ingest(registry, "index-u2-a", "u2", "a")
+
+    registry.delete_index("index-u1-a")
+
+    assert not registry.es.indices.exists_alias(name="index-u1-a")
+    assert registry.es.count(index="chunks")["count"] == 3
+    assert [hit["title"] for hit in registry.get_retriever("index-u2-a").retrieve(TEXTS[0])] == ["a.pdf"] * 3
+
+
+def test_per_session_index_is_merged_behind_an_alias(monkeypatch):
+    registry = _registry(monkeypatch)
+    es = registry.es
+    for index_name, documents in (
+        ("index-u1-a", _session_documents("u1", "a")),
+        ("index-mixed", _session_documents("u1", "a") + _session_documents("u2", "b", TEXTS[:1])),
+    ):
+        store = ElasticVectorStore(es, index_name)
+        store.create(8)
+        for doc in documents:
+            doc.embedding = fake_vector(doc.text, 8)
+        list(store.write(documents))
+
+    with pytest.raises(ValueError, match="mixes sessions"):
+        SharedElasticVectorStore.from_index(es, "index-mixed", "chunks")
+
+    store = SharedElasticVectorStore.from_index(es, "index-u1-a", "chunks")
+    assert store.merge() == 3
+
+    assert es.indices.exists_alias(name="index-u1-a") and es.indices.exists(index="chunks")
+    assert SharedElasticVectorStore.from_alias(es, "index-u1-a").session_id == "a"
+    assert es.count(index="index-u1-a")["count"] == 3
+    assert registry.get_retriever("index-u1-a").filters == store.scope()
+
+
+def test_bulk_load_is_refused_for_sessions_of_the_shared_index(monkeypatch):
+    registry = _registry(monkeypatch)
+    _ingest(registry, "index-u1-a", "u1", "a")
+
+    with pytest.raises(ValueError, match="shared index"):
+        registry.get_vector_manager("index-u1-a").bulk_load()
+    settings = registry.es.indices.get_settings(index="chunks", flat_settings=True)["chunks"]["settings"]
+    assert "index.refresh_interval" not in settings
+
+
+def test_upload_endpoint_rejects_bulk_load_with_a_shared_index(monkeypatch, tmp_path):
+    registry = _registry(monkeypatch)
+    jobs = IngestJobQueue(registry, IngestJobStore(str(tmp_path / "jobs.sqlite")), str(tmp_path / "spool"))
+    app.dependency_overrides[get_clients] = lambda: registry
+    app.dependency_overrides[get_jobs] = lambda: jobs
+    try:
+        response = TestClient(app).post(
+            "/documents/",
+            data={"user_id": "u1", "session_id": "a", "bulk_load": "true"},
+            files=[("files", ("a.pdf", b"%PDF-1.4", "application/pdf"))],
+        )
+    finally:
+        app.dependency_overrides.clear()
+        jobs.shutdown()
+
+    assert response.status_code == 400
+    assert jobs.store.unfinished() == []
+
+
+def test_retriever_is_refused_for_the_shared_index_and_unknown_names(monkeypatch):
+    registry = _registry(monkeypatch)
+    _ingest(registry, "index-u1-a", "u1", "a")
+    legacy = ElasticVectorStore(registry.es, "index-u2-b")
+    legacy.create(8)
+
+    for index_name in ("chunks", "index-unknown"):
+        with pytest.raises(IndexNotFoundError, match="not a session"):
+            registry.get_retriever(index_name)
+        assert index_name not in registry._retrievers
+    with pytest.raises(ValueError, match="is the shared index"):
+        registry.get_vector_manager("chunks", user_id="u1", session_id="a")
+    assert not registry.index_exists("chunks")
+
+    assert registry.get_retriever("index-u1-a").filters
+    assert registry.get_retriever("index-u2-b").filters == []
+
+
+def test_question_endpoint_returns_404_for_the_shared_index(monkeypatch):
+    registry = _registry(monkeypatch)
+    _ingest(registry, "index-u1-a", "u1", "a")
+    app.dependency_overrides[get_clients] = lambda: registry
+    try:
+        response = TestClient(app).post(
+            "/question/", json={"user_id": "u2", "session_id": "b", "index_name": "chunks", "question": TEXTS[0]}
+        )
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 404
@@ -0,0 +1,171 @@
+import asyncio
+
+import numpy as np
+
+from app.pipeline import generate, retrieve
+from app.pipeline.cache import LRUEmbeddingCache
+from app.pipeline.generate import RAGAgent
+from app.pipeline.index import ElasticVectorManager
+from app.pipeline.retrieve import ElasticRetriever
+from app.pipeline.store import ElasticVectorStore, LocalVectorStore
+from app.schemas.schema import Document
+from tests.fakes import FakeGenAIClient, InMemoryElasticNode, fake_elasticsearch
+from tests.unit.test_rag_agent import TEXTS
+
+
+def _documents(vectors, document_id="doc", source_file="manual.pdf"):
+    return [
+        Document(
+            document_id=document_id, user_id="u", session_id="s", title="manual.pdf", chunk_id=i,
+            text=f"chunk {i}", embedding=list(map(float, vector)), source_file=source_file,
+        )
+        for i, vector in enumerate(vectors)
+    ]
+
+
+def _exact_top_k(vectors, query, k):
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return list(np.argsort(-(normalized @ (query / np.linalg.norm(query))))[:k])
+
+
+def test_exact_search_matches_brute_force(tmp_path):
+    vectors = np.random.default_rng(0).normal(size=(3000, 32)).astype(np.float32)
+    # small blocks and a small initial file exercise block merging and file growth
+    store = LocalVectorStore(str(tmp_path), "idx", block_rows=512)
+    list(store.write(_documents(vectors), batch_size=700))
+
+    queries = np.random.default_rng(1).normal(size=(4, 32))
+    for query, hits in zip(queries, store.search_batch(queries.tolist(), top_k=5)):
+        assert [hit["chunk_id"] for hit in hits] == _exact_top_k(vectors, query, 5)
+        assert hits[0]["id"] == f"u_doc_{hits[0]['chunk_id']}"
+        assert 0 <= hits[-1]["score"] <= hits[0]["score"] <= 1
+
+
+def test_store_persists_and_replaces_chunks(tmp_path):
+    vectors = np.eye(4, dtype=np.float32)
+    store = LocalVectorStore(str(tmp_path), "idx")
+    list(store.write(_documents(vectors)))
+
+    # same chunk ids overwrite their rows instead of adding new ones
+    list(store.write(_documents(vectors[::-1])))
+    reopened = LocalVectorStore(str(tmp_path), "idx")
+
+    assert len(reopened) == 4
+    assert reopened.count("doc", "u") == 4
+    assert reopened.search(list(vectors[0]), top_k=1)[0]["chunk_id"] == 3
+
+
+def test_stale_chunks_are_masked_out_of_search(tmp_path):
+    store = LocalVectorStore(str(tmp_path), "idx")
+    list(store.write(_documents(np.eye(4), document_id="old")))
+    list(store.write(_documents(np.eye(4)[:2], document_id="new")))
+
+    assert store.delete_stale("new", "u", "manual.pdf") == 4
+    assert store.count("old", "u") == 0
+    assert {hit["document_id"] for hit in store.search([1, 1, 1, 1], top_k=10)} == {"new"}
+
+    store.drop()
+    assert not (tmp_path / "idx").exists()
+
+
+def test_document_delete_and_stored_embeddings(tmp_path):
+    store = LocalVectorStore(str(tmp_path), "idx")
+    documents = _documents(2 * np.eye(4))
+    for doc in documents:
+        doc.content_hash = f"hash-{doc.chunk_id}"
+    list(store.write(documents))
+    list(store.write(_documents(np.eye(4), document_id="other", source_file="other.pdf")))
+
+    embeddings = store.embeddings("doc", "u")
+    assert sorted(embeddings) == [f"hash-{i}" for i in range(4)]
+    assert np.allclose(embeddings["hash-1"], np.eye(4)[1]), "stored rows are normalized"
+
+    assert store.delete_document("doc", "u") == 4
+    assert store.embeddings("doc", "u") == {}
+    assert {hit["document_id"] for hit in store.search([1, 1, 1, 1], top_k=10)} == {"other"}
+
+
+def test_approximate_search_recall(tmp_path):
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(20, 16))
+    vectors = (centers[rng.integers(0, 20, 4000)] + 0.3 * rng.normal(size=(4000, 16))).astype(np.float32)
+    store = LocalVectorStore(str(tmp_path), "idx", approximate=True, ivf_min_rows=1000, n_probe=4)
+    list(store.write(_documents(vectors), batch_size=1000))
+
+    queries = centers[:10] + 0.3 * rng.normal(size=(10, 16))
+    recall = np.mean([
+        len({hit["chunk_id"] for hit in hits} & set(_exact_top_k(vectors, query, 10))) / 10
+        for query, hits in zip(queries, store.search_batch(queries.tolist(), top_k=10))
+    ])
+
+    assert store._centroids is not None
+    assert recall >= 0.9
+
+
+def _clustered(rows, dim, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(50, dim))
+    vectors = centers[rng.integers(0, 50, rows)] + 0.5 * rng.normal(size=(rows, dim))
+    queries = centers[:8] + 0.5 * rng.normal(size=(8, dim))
+    return vectors.astype(np.float32), queries
+
+
+def test_quantized_search_rescores_with_full_precision(tmp_path):
+    vectors, queries = _clustered(3000, 64)
+    for quantization, min_recall in (("int8", 1.0), ("binary", 0.9)):
+        store = LocalVectorStore(str(tmp_path), quantization, quantization=quantization, rescore_oversample=8)
+        list(store.write(_documents(vectors), batch_size=1000))
+
+        recalls = []
+        for query, hits in zip(queries, store.search_batch(queries.tolist(), top_k=10)):
+            expected = _exact_top_k(vectors, query, 10)
+            recalls.append(len({hit["chunk_id"] for hit in hits} & set(expected)) / 10)
+            # returned scores are the exact cosine of the rescoring phase
+            exact = vectors[hits[0]["chunk_id"]] @ query / np.linalg.norm(vectors[hits[0]["chunk_id"]]) / np.linalg.norm(query)
+            assert abs(hits[0]["score"] - (1 + exact) / 2) < 1e-5
+
+        assert np.mean(recalls) >= min_recall, quantization
+    assert store.memory_usage()["search_bytes_per_vector"] == 8
+
+
+def test_reopening_with_another_quantization_reencodes(tmp_path):
+    vectors, queries = _clustered(500, 32)
+    list(LocalVectorStore(str(tmp_path), "idx").write(_documents(vectors)))
+
+    store = LocalVectorStore(str(tmp_path), "idx", quantization="int8")
+
+    assert store._codes[:500].any()
+    assert store.search(list(queries[0]), top_k=3)[0]["chunk_id"] == _exact_top_k(vectors, queries[0], 1)[0]
+
+
+def test_elastic_store_maps_quantized_index_and_rescores():
+    InMemoryElasticNode.reset()
+    store = ElasticVectorStore(fake_elasticsearch(), "quantized", quantization="binary", rescore_oversample=3)
+    store.create(64)
+
+    mapping = store.es.indices.get_mapping(index="quantized")["quantized"]["mappings"]
+    assert mapping["properties"]["embedding"]["index_options"]["type"] == "bbq_hnsw"
+    assert store._knn_body([0.0] * 64, 5, None)["knn"]["rescore_vector"] == {"oversample": 3}
+
+
+def test_agent_runs_on_local_store_without_elasticsearch(monkeypatch, tmp_path):
+    client = FakeGenAIClient(dim=8)
+    monkeypatch.setattr(retrieve, "google_client", client)
+    monkeypatch.setattr(generate, "google_client", client)
+    store = LocalVectorStore(str(tmp_path), "agent-idx")
+
+    # unreachable URLs: any Elasticsearch request would fail
+    manager = ElasticVectorManager("http://nowhere:1", "test", "agent-idx", embedding_dim=8, store=store)
+    manager.embedder.client = client
+    manager.index_documents([
+        Document(document_id="doc", user_id="u", session_id="s", title="manual.pdf", chunk_id=i, text=text)
+        for i, text in enumerate(TEXTS)
+    ])
+    retriever = ElasticRetriever(
+        "http://nowhere:1", "test", "agent-idx", embedding_dim=8, embedding_cache=LRUEmbeddingCache(), store=store,
+    )
+    agent = RAGAgent(model="fake-model", retriever=retriever)
+
+    assert len(retriever.retrieve(TEXTS[1], top_k=1)) == 1
+    assert retriever.retrieve(TEXTS[1], top_k=1)[0]["text"] == TEXTS[1]
+    assert asyncio.run(agent.arun("How often should bearings be lubricated?"))["reference"][0]["reference_title"] == "manual.pdf"